@@ -0,0 +1,30 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/attendance.db")
+
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    engine = create_engine(DATABASE_URL)
+
+indexes = [
+    ("sessions", "ix_sessions_session_id_expires_at", "session_id, expires_at"),
+    ("sessions", "ix_sessions_expires_at", "expires_at"),
+    ("sessions", "ix_sessions_user_id_created_at", "user_id, created_at"),
+    ("attendance_sessions", "ix_attendance_sessions_class_id_date_id", "class_id, session_date, id"),
+    ("attendance_records", "ix_attendance_records_session_id_student_id", "session_id, student_id"),
+]
+
+with engine.connect() as conn:
+    for table, name, columns in indexes:
+        try:
+            conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+            conn.commit()
+            print(f"✅ Created index {name}")
+        except Exception as e:
+            conn.rollback()
+            print(f"Index {name} might already exist or error: {e}")
@@ -0,0 +1,119 @@
+"""
+Compare requests/sec of the sync and async (USE_ASYNC_DB) database paths.
+
+Seeds a throwaway SQLite database, then runs the app in-process once per
+mode and fires requests at the hot endpoints with N concurrent clients.
+
+Usage:
+    python async_benchmark.py --clients 500 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+
+ENDPOINTS = [
+    ("student", "/api/student/my-schedule"),
+    ("student", "/api/student/my-attendance"),
+    ("teacher", "/api/teacher/classes/1/attendance"),
+]
+
+def seed(nrof_classes: int, nrof_weeks: int):
+    from database import SessionLocal, engine, Base
+    from models import (User, Teacher, Student, Subject, Class, ClassSchedule, ClassStudent,
+                        AttendanceSession, AttendanceRecord)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    teacher = Teacher(teacher_code="GV001", full_name="Bench Teacher", password="x")
+    student = Student(student_code="SV001", full_name="Bench Student", password="x")
+    subject = Subject(subject_code="MH001", subject_name="Bench Subject")
+    db.add_all([teacher, student, subject])
+    db.flush()
+    db.add_all([
+        User(username="GV001", password="x", role="teacher", teacher_id=teacher.id),
+        User(username="SV001", password="x", role="student", student_id=student.id),
+    ])
+
+    today = date.today()
+    for i in range(nrof_classes):
+        cls = Class(class_code=f"LOP{i + 1:03d}", class_name=f"Class {i + 1}", subject_id=subject.id,
+                    teacher_id=teacher.id, semester="2025-1", year=2025)
+        db.add(cls)
+        db.flush()
+        db.add(ClassStudent(class_id=cls.id, student_id=student.id))
+        for day in range(1, 8):
+            db.add(ClassSchedule(class_id=cls.id, day_of_week=day, start_time=dtime(7, 0),
+                                 end_time=dtime(9, 0), room="A101"))
+        for week in range(nrof_weeks):
+            session = AttendanceSession(class_id=cls.id, session_date=today - timedelta(weeks=week),
+                                        start_time=dtime(7, 0), end_time=dtime(9, 0))
+            db.add(session)
+            db.flush()
+            db.add(AttendanceRecord(session_id=session.id, student_id=student.id, status="present"))
+    db.commit()
+    db.close()
+
+async def run_mode(clients: int, nrof_requests: int):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sessions = {}
+        for role, username in (("student", "SV001"), ("teacher", "GV001")):
+            response = await client.post("/api/auth/login", json={"username": username, "password": "x"})
+            sessions[role] = response.json()["session_id"]
+
+        results = {}
+        for role, path in ENDPOINTS:
+            semaphore = asyncio.Semaphore(clients)
+            errors = 0
+
+            async def call():
+                nonlocal errors
+                async with semaphore:
+                    response = await client.get(path, headers={"session-id": sessions[role]})
+                    if response.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(call() for _ in range(nrof_requests)))
+            elapsed = time.perf_counter() - started
+            results[path] = {"requests_per_second": round(nrof_requests / elapsed, 1), "errors": errors}
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async DB path benchmark")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--classes", type=int, default=8)
+    parser.add_argument("--weeks", type=int, default=15)
+    parser.add_argument("--worker", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(asyncio.run(run_mode(args.clients, args.requests))))
+        return
+
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", SESSION_SWEEP_INTERVAL_SECONDS="0")
+    subprocess.run([sys.executable, "-c", f"import async_benchmark; async_benchmark.seed({args.classes}, {args.weeks})"],
+                   env=env, check=True)
+
+    for mode in ("sync", "async"):
+        mode_env = dict(env, USE_ASYNC_DB="true" if mode == "async" else "false")
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--clients", str(args.clients), "--requests", str(args.requests)],
+            env=mode_env, check=True, capture_output=True, text=True
+        ).stdout
+        for path, stats in json.loads(output.strip().splitlines()[-1]).items():
+            print(f"{mode:5s} {path:40s} {stats['requests_per_second']:9.1f} req/s  errors={stats['errors']}")
+
+if __name__ == "__main__":
+    main()
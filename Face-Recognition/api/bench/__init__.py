@@ -0,0 +1,12 @@
+"""
+End-to-end latency benchmark of the face recognition pipeline.
+
+Runs FaceRecognitionService stage by stage on a fixed corpus of frames and
+writes per-stage latency percentiles, throughput per concurrency level and
+peak RSS as JSON, so two commits can be compared and regressions fail CI.
+
+Usage (from the api directory):
+    python -m bench.corpus --faces_dir ../Dataset/FaceData/processed --output bench_corpus.json
+    python -m bench --corpus bench_corpus.json --output results.json
+    python -m bench --corpus bench_corpus.json --output results.json --baseline baseline.json
+"""
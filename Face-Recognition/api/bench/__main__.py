@@ -0,0 +1,143 @@
+"""
+Run the latency benchmark and optionally fail on regressions.
+
+Times every stage of one sequential pass over the corpus, then measures
+frames/sec with N concurrent callers (the API runs recognize_face in the
+threadpool, so callers are threads sharing one service). Exits 1 when the
+results regress against --baseline, 2 when the baseline used another corpus.
+
+Usage (from the api directory):
+    python -m bench --corpus bench_corpus.json --output results.json --concurrency 1 2 4 8
+    python -m bench --corpus bench_corpus.json --baseline baseline.json --max_regression 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end face recognition latency benchmark")
+    parser.add_argument("--corpus", type=str, required=True, help="Frame corpus written by python -m bench.corpus")
+    parser.add_argument("--output", type=str, default="bench_results.json")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the corpus per measurement")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed passes run first")
+    parser.add_argument("--database_url", type=str, default=None, help="Defaults to a throwaway SQLite database")
+    parser.add_argument("--nrof_students", type=int, default=1000, help="Students in the seeded database")
+    parser.add_argument("--skip_db", action="store_true", help="Leave out the attendance write")
+    parser.add_argument("--baseline", type=str, default=None, help="Results file to compare against")
+    parser.add_argument("--max_regression", type=float, default=0.15)
+    parser.add_argument("--min_delta_ms", type=float, default=1.0, help="Ignore latency regressions smaller than this")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault("SESSION_SWEEP_INTERVAL_SECONDS", "0")
+
+    from bench.corpus import load_corpus
+    from bench.pipeline import STAGES, AttendanceWriter, instrument, run_frame
+    from bench.report import compare, summarize
+    from services.face_recognition import face_recognition_service
+
+    corpus = load_corpus(args.corpus)
+    frames = [frame["image_base64"] for frame in corpus["frames"]]
+    startup_rss = peak_rss_mb()
+
+    load_started = time.perf_counter()
+    service = instrument(face_recognition_service)
+    load_seconds = time.perf_counter() - load_started
+    writer = None if args.skip_db else AttendanceWriter(service.snapshot().class_names, args.nrof_students)
+
+    for _ in range(args.warmup):
+        for image_base64 in frames:
+            run_frame(service, image_base64, writer)
+
+    laps = {stage: [] for stage in STAGES}
+    totals = []
+    outcomes = Counter()
+    for _ in range(args.repeats):
+        for image_base64 in frames:
+            frame_laps, outcome, total = run_frame(service, image_base64, writer)
+            for stage, seconds in frame_laps.items():
+                laps[stage].append(seconds)
+            totals.append(total)
+            outcomes[outcome] += 1
+
+    throughput = []
+    for level in args.concurrency:
+        work = frames * args.repeats
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            started = time.perf_counter()
+            results = list(pool.map(lambda image_base64: run_frame(service, image_base64, writer), work))
+            elapsed = time.perf_counter() - started
+        throughput.append(dict(concurrency=level, frames_per_second=round(len(work) / elapsed, 2),
+                               latency=summarize([total for _, _, total in results])))
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {"path": args.corpus, "source": corpus.get("source"), "digest": corpus["digest"],
+                   "nrof_frames": len(frames)},
+        "config": {"repeats": args.repeats, "warmup": args.warmup, "concurrency": args.concurrency,
+                   "nrof_students": args.nrof_students, "skip_db": args.skip_db},
+        "model_load_seconds": round(load_seconds, 3),
+        "outcomes": dict(outcomes),
+        "stages": {stage: summarize(laps[stage]) for stage in STAGES},
+        "total": summarize(totals),
+        "throughput": throughput,
+        "startup_rss_mb": startup_rss,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(f"{'stage':15s} {'count':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for stage, stats in list(results["stages"].items()) + [("total", results["total"])]:
+        if stats["count"]:
+            print(f"{stage:15s} {stats['count']:6d} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+    for level in throughput:
+        print(f"concurrency {level['concurrency']:3d} {level['frames_per_second']:9.2f} frames/s  "
+              f"p95 {level['latency']['p95_ms']:.1f} ms")
+    print(f"outcomes {dict(outcomes)}  peak RSS {results['peak_rss_mb']} MB  -> {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("corpus", {}).get("digest") != corpus["digest"]:
+            print(f"Baseline {args.baseline} was recorded on a different corpus, not comparing")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.max_regression, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (commit {baseline.get('commit')})")
+
+if __name__ == "__main__":
+    main()
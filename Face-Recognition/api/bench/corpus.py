@@ -0,0 +1,129 @@
+"""
+Build the fixed frame corpus the latency benchmark runs on.
+
+Recorded frames (--frames_dir) are stored byte for byte. Otherwise frames are
+synthesised from a seed: aligned faces from --faces_dir (or a drawn face when
+no dataset is at hand) are pasted at varying size and position onto a noisy
+background, and every --no_face_every frame is left empty so the "No face
+detected" path is timed too. The corpus is written once and kept next to the
+baseline results; its digest is recorded with every run.
+
+Usage:
+    python -m bench.corpus --faces_dir ../Dataset/FaceData/processed --output bench_corpus.json
+    python -m bench.corpus --frames_dir recorded/ --output bench_corpus.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+def list_images(directory: str):
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+def drawn_face(size: int = 160):
+    face = np.full((size, size, 3), (60, 60, 60), dtype=np.uint8)
+    center = (size // 2, size // 2)
+    cv2.ellipse(face, center, (size * 3 // 8, size // 2 - 4), 0, 0, 360, (140, 170, 210), -1)
+    for dx in (-size // 6, size // 6):
+        cv2.circle(face, (center[0] + dx, center[1] - size // 10), size // 16, (40, 40, 40), -1)
+    cv2.ellipse(face, (center[0], center[1] + size // 5), (size // 8, size // 20), 0, 0, 180, (60, 60, 150), 2)
+    return face
+
+def synthetic_frames(nrof_frames: int, width: int, height: int, faces, seed: int, no_face_every: int):
+    rng = np.random.RandomState(seed)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    frames = []
+    for i in range(nrof_frames):
+        noise = rng.normal(0, 12, (height, width, 3)).astype(np.float32)
+        frame = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        if not (no_face_every and i % no_face_every == no_face_every - 1):
+            face = faces[i % len(faces)]
+            size = int(rng.randint(min(height, width) // 5, min(height, width) // 2))
+            x = int(rng.randint(0, width - size))
+            y = int(rng.randint(0, height - size))
+            frame[y:y + size, x:x + size] = cv2.resize(face, (size, size))
+        frames.append(frame)
+    return frames
+
+def encode_frames(frames, quality: int):
+    encoded = []
+    for frame in frames:
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("Failed to encode synthetic frame")
+        encoded.append(buffer.tobytes())
+    return encoded
+
+def build_corpus(names, images, source: str):
+    frames = [{"name": name, "image_base64": base64.b64encode(data).decode("ascii")}
+              for name, data in zip(names, images)]
+    return {"source": source, "digest": corpus_digest(frames), "frames": frames}
+
+def corpus_digest(frames):
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(frame["image_base64"].encode("ascii"))
+    return digest.hexdigest()
+
+def load_corpus(path: str):
+    with open(path) as f:
+        corpus = json.load(f)
+    if not corpus.get("frames"):
+        raise ValueError(f"Corpus {path} holds no frames")
+    if corpus_digest(corpus["frames"]) != corpus.get("digest"):
+        raise ValueError(f"Corpus {path} does not match its digest, rebuild it with python -m bench.corpus")
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the latency benchmark frame corpus")
+    parser.add_argument("--output", type=str, default="bench_corpus.json")
+    parser.add_argument("--frames_dir", type=str, default=None, help="Store these recorded frames as they are")
+    parser.add_argument("--faces_dir", type=str, default=None, help="Aligned faces pasted into synthetic frames")
+    parser.add_argument("--nrof_frames", type=int, default=32)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--no_face_every", type=int, default=8, help="Leave every Nth synthetic frame without a face (0 never)")
+    parser.add_argument("--jpeg_quality", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=666)
+    args = parser.parse_args()
+
+    if args.frames_dir:
+        paths = list_images(args.frames_dir)[:args.nrof_frames]
+        if not paths:
+            parser.error(f"No images found in {args.frames_dir}")
+        images = []
+        for path in paths:
+            with open(path, "rb") as f:
+                images.append(f.read())
+        corpus = build_corpus([os.path.relpath(p, args.frames_dir) for p in paths], images, "recorded")
+    else:
+        faces = []
+        if args.faces_dir:
+            paths = list_images(args.faces_dir)
+            rng = np.random.RandomState(args.seed)
+            for path in rng.permutation(paths)[:args.nrof_frames]:
+                face = cv2.imread(path, cv2.IMREAD_COLOR)
+                if face is not None:
+                    faces.append(face)
+        if not faces:
+            print("No aligned faces given, drawing faces instead; MTCNN may not detect them")
+            faces = [drawn_face()]
+        frames = synthetic_frames(args.nrof_frames, args.width, args.height, faces, args.seed, args.no_face_every)
+        names = [f"synthetic_{i:04d}.jpg" for i in range(len(frames))]
+        corpus = build_corpus(names, encode_frames(frames, args.jpeg_quality), "synthetic")
+
+    with open(args.output, "w") as f:
+        json.dump(corpus, f)
+    print(f"Wrote {len(corpus['frames'])} {corpus['source']} frames to {args.output} (digest {corpus['digest'][:12]})")
+
+if __name__ == "__main__":
+    main()
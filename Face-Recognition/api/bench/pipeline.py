@@ -0,0 +1,137 @@
+"""
+Stage-timed run of one frame through FaceRecognitionService.
+
+The frame goes through the service's own stage methods in the order
+recognize_face calls them. MTCNN runs as one detect_face call, so the RNet
+and ONet callables handed to it are wrapped: their first call closes the
+previous lap, which splits detection into the PNet pyramid (image scaling,
+PNet, NMS), the RNet stage and the ONet stage without touching detect_face.
+"""
+import threading
+import time
+from datetime import date, time as dtime
+
+STAGES = ("base64_decode", "image_decode", "mtcnn_pyramid", "mtcnn_rnet", "mtcnn_onet",
+          "crop_resize", "prewhiten", "embedding", "match", "db_write")
+
+_current = threading.local()
+
+class LapTimer:
+    """Splits the wall time of one frame into consecutive stages"""
+
+    def __init__(self):
+        self.laps = {}
+        self.stage = None
+        self._started = 0.0
+
+    def lap(self, stage=None):
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.laps[self.stage] = self.laps.get(self.stage, 0.0) + now - self._started
+        self.stage = stage
+        self._started = now
+
+class StageBoundary:
+    """MTCNN network callable whose first call per frame starts a new lap"""
+
+    def __init__(self, net, stage: str, after: str):
+        self.net = net
+        self.stage = stage
+        self.after = after
+
+    def __call__(self, *args):
+        timer = getattr(_current, "timer", None)
+        if timer is not None and timer.stage == self.after:
+            timer.lap(self.stage)
+        return self.net(*args)
+
+def instrument(service):
+    """Load the service's models and wrap RNet/ONet of the serving model so detection is timed per network"""
+    loaded = service.snapshot()
+    if not isinstance(loaded.rnet, StageBoundary):
+        loaded.rnet = StageBoundary(loaded.rnet, "mtcnn_rnet", "mtcnn_pyramid")
+        loaded.onet = StageBoundary(loaded.onet, "mtcnn_onet", "mtcnn_rnet")
+    return service
+
+class AttendanceWriter:
+    """
+    The database work routers/face.py does for a recognised face, through the
+    same services.attendance helpers: find the student by name, look for an
+    existing record and insert one. The record is inserted even when one
+    exists, so every repeat of a frame pays for the write instead of
+    returning "Already marked".
+    """
+
+    def __init__(self, class_names, nrof_students: int):
+        from database import SessionLocal, engine, Base
+        from models import Teacher, Student, Subject, Class, AttendanceSession
+
+        self.SessionLocal = SessionLocal
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        teacher = Teacher(teacher_code="GV001", full_name="Bench Teacher", password="x")
+        subject = Subject(subject_code="MH001", subject_name="Bench Subject")
+        db.add_all([teacher, subject])
+        db.flush()
+        cls = Class(class_code="LOP001", class_name="Bench Class", subject_id=subject.id,
+                    teacher_id=teacher.id, semester="2025-1", year=2025)
+        db.add(cls)
+        db.flush()
+        names = list(class_names) + [f"Filler Student {i}" for i in range(max(nrof_students - len(class_names), 0))]
+        db.add_all([Student(student_code=f"SV{i + 1:06d}", full_name=name.replace('_', ' '), password="x")
+                    for i, name in enumerate(names)])
+        session = AttendanceSession(class_id=cls.id, session_date=date.today(),
+                                    start_time=dtime(7, 0), end_time=dtime(9, 0))
+        db.add(session)
+        db.commit()
+        self.session_id = session.id
+        db.close()
+
+    def write(self, name: str, confidence: float):
+        from services.attendance import find_student_by_name, existing_record, mark_present
+
+        db = self.SessionLocal()
+        try:
+            student = find_student_by_name(db, name)
+            if student is None:
+                return False
+            existing_record(db, self.session_id, student.id)
+            mark_present(db, self.session_id, student.id, confidence)
+            return True
+        finally:
+            db.close()
+
+def run_frame(service, image_base64: str, writer=None):
+    """Returns (laps in seconds by stage, outcome message, total seconds)"""
+    timer = LapTimer()
+    _current.timer = timer
+    try:
+        started = time.perf_counter()
+        loaded = service.snapshot()
+        timer.lap("base64_decode")
+        image_data = service.decode_base64(image_base64)
+        timer.lap("image_decode")
+        frame = service.decode_image(image_data)
+        if frame is None:
+            outcome = "Failed to decode image"
+        else:
+            timer.lap("mtcnn_pyramid")
+            bounding_boxes = service.detect(loaded, frame)
+            if len(bounding_boxes) == 0:
+                outcome = "No face detected"
+            else:
+                timer.lap("crop_resize")
+                aligned = service.crop(frame, bounding_boxes[0, 0:4])
+                timer.lap("prewhiten")
+                prewhitened = service.prewhiten(loaded, aligned)
+                timer.lap("embedding")
+                emb = service.embed(loaded, prewhitened)
+                timer.lap("match")
+                name, confidence, outcome = service.match(loaded, emb)
+                if name is not None and writer is not None:
+                    timer.lap("db_write")
+                    writer.write(name, confidence)
+        timer.lap()
+        return timer.laps, outcome, time.perf_counter() - started
+    finally:
+        _current.timer = None
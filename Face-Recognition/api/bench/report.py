@@ -0,0 +1,43 @@
+"""
+Latency summaries and the regression check between two result files.
+"""
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+def summarize(seconds):
+    """count, mean and p50/p95/p99 in milliseconds of a list of durations"""
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    summary = {"count": int(ms.size), "mean_ms": round(float(ms.mean()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+        summary[f"p{p}_ms"] = round(float(value), 3)
+    return summary
+
+def compare(current, baseline, max_regression: float, min_delta_ms: float):
+    """
+    List what got worse than the baseline by more than max_regression
+    (a fraction): stage p95 latency, throughput per concurrency level and
+    peak RSS. Latency changes under min_delta_ms are treated as noise.
+    """
+    regressions = []
+    for stage, base in baseline.get("stages", {}).items():
+        now = current.get("stages", {}).get(stage)
+        if not now or not now.get("count") or not base.get("count"):
+            continue
+        if (now["p95_ms"] > base["p95_ms"] * (1 + max_regression)
+                and now["p95_ms"] - base["p95_ms"] > min_delta_ms):
+            regressions.append(f"{stage} p95 {base['p95_ms']:.3f} ms -> {now['p95_ms']:.3f} ms")
+
+    throughput = {level["concurrency"]: level for level in current.get("throughput", [])}
+    for base in baseline.get("throughput", []):
+        now = throughput.get(base["concurrency"])
+        if now and now["frames_per_second"] < base["frames_per_second"] * (1 - max_regression):
+            regressions.append(f"throughput at concurrency {base['concurrency']} "
+                               f"{base['frames_per_second']:.2f} -> {now['frames_per_second']:.2f} frames/s")
+
+    base_rss, now_rss = baseline.get("peak_rss_mb"), current.get("peak_rss_mb")
+    if base_rss and now_rss and now_rss > base_rss * (1 + max_regression):
+        regressions.append(f"peak RSS {base_rss:.1f} MB -> {now_rss:.1f} MB")
+    return regressions
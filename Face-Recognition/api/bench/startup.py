@@ -0,0 +1,188 @@
+"""
+Cold-start profile of the API.
+
+Every repeat starts two fresh interpreters: one runs `import main` under
+-X importtime for the import time of each module, the other imports main,
+enters the app's lifespan through TestClient, waits for /health/ready and
+sends two recognitions to /api/face/recognize as the admin. Phases are
+measured from process start (services.startup), so interpreter start-up
+counts; uvicorn's own start-up is not included.
+
+Usage (from the api directory):
+    python -m bench.startup --output startup_profile.json
+    python -m bench.startup --repeats 5 --no_preload --corpus bench_corpus.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PHASES = ("imported", "schema", "serving", "model_ready", "first_recognition")
+# None of these should be imported before the first recognition needs them
+HEAVY_MODULES = ("tensorflow", "sklearn", "scipy", "cv2", "numpy")
+
+def parse_importtime(stderr: str):
+    """{module: (self_seconds, cumulative_seconds)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        modules[parts[2].strip()] = (int(parts[0]) / 1e6, int(parts[1]) / 1e6)
+    return modules
+
+def import_profile(env):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], env=env,
+                            capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+def probe_frame(corpus_path: str = None) -> str:
+    """base64 JPEG for the recognitions: the first corpus frame, else a synthetic frame with a drawn face"""
+    if corpus_path:
+        from bench.corpus import load_corpus
+        return load_corpus(corpus_path)["frames"][0]["image_base64"]
+
+    import base64
+    from bench.corpus import drawn_face, encode_frames, synthetic_frames
+    frame = synthetic_frames(1, 640, 480, [drawn_face()], seed=666, no_face_every=0)[0]
+    return base64.b64encode(encode_frames([frame], 90)[0]).decode("ascii")
+
+def cold_start(args):
+    """Runs in the child interpreter; the import of main is the first thing it does"""
+    import main
+    from fastapi.testclient import TestClient
+    from models import ADMIN_USERNAME, ADMIN_PASSWORD
+    from services import startup
+
+    with open(args.probe) as f:
+        image_base64 = json.load(f)["image_base64"]
+
+    with TestClient(main.app) as client:
+        deadline = time.perf_counter() + args.ready_timeout
+        ready = client.get("/health/ready")
+        while ready.status_code != 200 and ready.json()["status"] != "failed" and time.perf_counter() < deadline:
+            time.sleep(0.05)
+            ready = client.get("/health/ready")
+
+        login = client.post("/api/auth/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+        login.raise_for_status()
+        headers = {"session-id": login.json()["session_id"]}
+
+        recognitions = []
+        for _ in range(2):
+            started = time.perf_counter()
+            response = client.post("/api/face/recognize", json={"image_base64": image_base64}, headers=headers)
+            recognitions.append((time.perf_counter() - started, response.json().get("message")))
+
+        return {
+            "ready_status": ready.json()["status"],
+            "model": client.get("/api/face/status").json(),
+            "phases": startup.timeline(),
+            "first_recognition_ms": round(recognitions[0][0] * 1000, 2),
+            "second_recognition_ms": round(recognitions[1][0] * 1000, 2),
+            "recognition_message": recognitions[0][1],
+        }
+
+def median(values):
+    values = [value for value in values if value is not None]
+    return round(statistics.median(values), 4) if values else None
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start and import time profile")
+    parser.add_argument("--output", type=str, default="startup_profile.json")
+    parser.add_argument("--repeats", type=int, default=3, help="Cold starts to take the median of")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed imports run first (bytecode caches)")
+    parser.add_argument("--database_url", type=str, default=None, help="Defaults to a throwaway SQLite database")
+    parser.add_argument("--corpus", type=str, default=None, help="Take the recognition frame from this bench corpus")
+    parser.add_argument("--no_preload", action="store_true", help="Start with PRELOAD_MODEL=false")
+    parser.add_argument("--ready_timeout", type=float, default=300)
+    parser.add_argument("--top", type=int, default=25, help="Modules listed by cumulative import time")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--probe", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(cold_start(args)))
+        return
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env.setdefault("SESSION_SWEEP_INTERVAL_SECONDS", "0")
+    env["PRELOAD_MODEL"] = "false" if args.no_preload else "true"
+    subprocess.run([sys.executable, "seed_data.py", "--if_empty"], env=env, capture_output=True, check=True)
+
+    probe = os.path.join(workdir, "probe.json")
+    with open(probe, "w") as f:
+        json.dump({"image_base64": probe_frame(args.corpus)}, f)
+
+    for _ in range(args.warmup):
+        import_profile(env)
+
+    profiles, runs = [], []
+    for _ in range(args.repeats):
+        profiles.append(import_profile(env))
+        child = subprocess.run([sys.executable, "-m", "bench.startup", "--child", "--probe", probe,
+                                "--ready_timeout", str(args.ready_timeout)],
+                               env=env, capture_output=True, text=True)
+        if child.returncode != 0:
+            sys.exit(f"Cold start failed:\n{child.stderr}")
+        runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    packages = {}
+    for index, profile in enumerate(profiles):
+        for module, (self_seconds, _) in profile.items():
+            packages.setdefault(module.split(".", 1)[0], [0.0] * len(profiles))[index] += self_seconds * 1000
+    modules = {module: {"self_ms": median([p.get(module, (0, 0))[0] * 1000 for p in profiles]),
+                        "cumulative_ms": median([p.get(module, (0, 0))[1] * 1000 for p in profiles])}
+               for module in set().union(*profiles)}
+    slowest = sorted(modules.items(), key=lambda item: -item[1]["cumulative_ms"])[:args.top]
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"repeats": args.repeats, "preload_model": not args.no_preload, "corpus": args.corpus},
+        "imports": {
+            "main_ms": modules.get("main", {}).get("cumulative_ms"),
+            "heavy_modules": [name for name in HEAVY_MODULES if name in packages],
+            "packages_ms": dict(sorted(((name, median(times)) for name, times in packages.items()),
+                                       key=lambda item: -item[1])),
+            "modules": dict(slowest),
+        },
+        "cold_start": {
+            "phases_seconds": {phase: median([run["phases"].get(phase) for run in runs]) for phase in PHASES},
+            "first_recognition_ms": median([run["first_recognition_ms"] for run in runs]),
+            "second_recognition_ms": median([run["second_recognition_ms"] for run in runs]),
+            "ready_status": runs[-1]["ready_status"],
+            "recognition_message": runs[-1]["recognition_message"],
+            "model": runs[-1]["model"],
+        },
+        "runs": runs,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    imports = results["imports"]
+    print(f"import main: {imports['main_ms']:.1f} ms, heavy modules at startup: {', '.join(imports['heavy_modules']) or 'none'}")
+    print(f"{'package':30s} {'self ms':>9s}")
+    for name, ms in list(imports["packages_ms"].items())[:10]:
+        print(f"{name:30s} {ms:9.1f}")
+    cold = results["cold_start"]
+    print(f"{'phase':20s} {'seconds':>9s}")
+    for phase, seconds in cold["phases_seconds"].items():
+        print(f"{phase:20s} {seconds if seconds is not None else float('nan'):9.3f}")
+    print(f"First recognition {cold['first_recognition_ms']:.1f} ms, second {cold['second_recognition_ms']:.1f} ms "
+          f"({cold['recognition_message']}); model {cold['model']['state']}")
+    print(f"Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
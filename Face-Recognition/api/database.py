@@ -1,21 +1,165 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from services.metrics import Gauge, instrument_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./db/attendance.db")
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "true").lower() in ("1", "true", "yes")
+
+class PoolStats:
+    """Checkout counters and wait times for one engine's connection pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.checkins = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": round(self.wait_seconds_total / self.waits, 6) if self.waits else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6)
+            }
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def build_engine(url: str = DATABASE_URL, pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW,
+                 pool_timeout: float = DB_POOL_TIMEOUT, pool_recycle: int = DB_POOL_RECYCLE,
+                 pool_pre_ping: bool = DB_POOL_PRE_PING):
+    """Create an engine with the configured pool; returns (engine, PoolStats)"""
+    stats = PoolStats()
+
+    if url.startswith("sqlite"):
+        in_memory = url in ("sqlite://", "sqlite:///:memory:") or ":memory:" in url
+        kwargs = {"connect_args": {"check_same_thread": False}}
+        if not in_memory:
+            kwargs.update(poolclass=InstrumentedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                          pool_timeout=pool_timeout)
+        new_engine = create_engine(url, **kwargs)
+        if not in_memory:
+            event.listen(new_engine, "connect", _set_sqlite_pragmas)
+    else:
+        new_engine = create_engine(
+            url,
+            poolclass=InstrumentedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping
+        )
+
+    if isinstance(new_engine.pool, InstrumentedQueuePool):
+        new_engine.pool.stats = stats
+    event.listen(new_engine, "checkout", stats.on_checkout)
+    event.listen(new_engine, "checkin", stats.on_checkin)
+    instrument_engine(new_engine)
+    return new_engine, stats
+
+engine, pool_stats = build_engine()
+Gauge("db_pool_in_use", "Connections checked out of the pool", function=lambda: pool_stats.in_use)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def ensure_schema(bind=None):
+    """Create only the tables the database lacks; returns their names (one inspection when up to date)"""
+    from sqlalchemy import inspect
+    import models  # registers every table on Base.metadata
+
+    bind = bind or engine
+    existing = set(inspect(bind).get_table_names())
+    missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+    if missing:
+        Base.metadata.create_all(bind=bind, tables=missing)
+    return [table.name for table in missing]
+
+def get_pool_status():
+    """Pool configuration, live counts and checkout wait statistics"""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__, **pool_stats.snapshot()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow()
+        })
+    return status
+
 def get_db():
     db = SessionLocal()
     try:
@@ -23,3 +167,43 @@ def get_db():
     finally:
         db.close()
 
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver (aiosqlite / aiomysql)"""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if dialect == "mysql":
+        return f"mysql+aiomysql://{rest}"
+    raise ValueError(f"No async driver configured for '{dialect}'")
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    """Create the async engine on first use so aiosqlite/aiomysql stay optional"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = async_database_url()
+        if url.startswith("sqlite"):
+            _async_engine = create_async_engine(url)
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        else:
+            _async_engine = create_async_engine(
+                url,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
+                pool_pre_ping=DB_POOL_PRE_PING
+            )
+        instrument_engine(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,58 @@
+"""
+Compare query throughput of the configured connection pool against
+SQLAlchemy's default pool settings.
+
+Usage:
+    python db_load_test.py --threads 50 --seconds 10
+"""
+import argparse
+import threading
+import time
+from sqlalchemy import create_engine, text
+from database import DATABASE_URL, build_engine
+
+QUERY = text("SELECT COUNT(*) FROM users")
+
+def run_load(engine, threads: int, seconds: float):
+    counts = [0] * threads
+    errors = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(QUERY).scalar()
+                counts[index] += 1
+            except Exception:
+                errors[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    return sum(counts) / elapsed, sum(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection pool throughput test")
+    parser.add_argument("--url", default=DATABASE_URL)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    connect_args = {"check_same_thread": False} if args.url.startswith("sqlite") else {}
+    default_engine = create_engine(args.url, connect_args=connect_args)
+    configured_engine, stats = build_engine(args.url)
+
+    for name, engine in (("default pool", default_engine), ("configured pool", configured_engine)):
+        qps, errors = run_load(engine, args.threads, args.seconds)
+        print(f"{name:16s} {qps:10.1f} queries/s  errors={errors}")
+        engine.dispose()
+
+    print("configured pool stats:", stats.snapshot())
+
+if __name__ == "__main__":
+    main()
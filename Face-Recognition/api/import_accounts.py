@@ -0,0 +1,37 @@
+"""
+Bulk import student or teacher accounts from a CSV or JSON-lines file
+
+Usage:
+    python import_accounts.py students students.csv --dry-run
+    python import_accounts.py teachers teachers.jsonl --batch-size 1000
+"""
+import argparse
+import json
+from database import SessionLocal, engine, Base
+from services.accounts import IMPORT_BATCH_SIZE, iter_import_rows, import_accounts
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import student or teacher accounts")
+    parser.add_argument("kind", choices=["students", "teachers"])
+    parser.add_argument("path", help="CSV file with a header row, or a JSON-lines file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None,
+                        help="Input format (default: guessed from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="Only report conflicts, write nothing")
+    args = parser.parse_args()
+
+    file_format = args.format or ("jsonl" if args.path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv")
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            report = import_accounts(db, args.kind[:-1], iter_import_rows(f, file_format),
+                                     dry_run=args.dry_run, batch_size=args.batch_size)
+    finally:
+        db.close()
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+HTTP load-testing kit for the attendance API.
+
+school.py fills a database with a synthetic school (students, teachers,
+classes, weekly schedules, a semester of attendance history) and writes
+synthetic face embeddings for every student. The runner then replays
+traffic mixes against the app, in-process or over localhost, and reports
+latency and error rate per endpoint.
+
+Usage (from the api directory):
+    python -m loadtest.school --database_url sqlite:///loadtest/school.db --output_dir loadtest/data
+    python -m loadtest --database_url sqlite:///loadtest/school.db --data_dir loadtest/data --scenarios morning dashboard admin
+"""
@@ -0,0 +1,201 @@
+"""
+Replay traffic mixes against the attendance API and report per endpoint.
+
+Before the run, --live_classes classes of the school get a schedule slot
+around the current time today and lose today's attendance, so the morning
+burst can check in at any hour and reruns start from the same state. The
+app runs in-process through httpx.ASGITransport with the synthetic
+recogniser, or is reached over --base_url (the server must use the same
+database; it keeps its own recogniser, so check-ins are rejected unless it
+knows the faces).
+
+Usage (from the api directory):
+    python -m loadtest --database_url sqlite:///./loadtest_data/school.db --data_dir loadtest_data
+    python -m loadtest --database_url sqlite:///./loadtest_data/school.db --data_dir loadtest_data \\
+        --base_url http://localhost:8000 --scenarios dashboard admin --duration 120
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SCENARIOS = ("morning", "dashboard", "admin")
+
+def open_check_in_window(db, class_ids, now: datetime, window_minutes: int):
+    """Give the classes one slot today spanning now and clear today's attendance of them"""
+    from models import ClassSchedule, AttendanceSession, AttendanceRecord
+
+    today = now.date()
+    midnight = datetime.combine(today, datetime.min.time())
+    start = max(now - timedelta(minutes=5), midnight).time()
+    end = min(now + timedelta(minutes=window_minutes), midnight + timedelta(days=1, seconds=-1)).time()
+
+    db.query(ClassSchedule).filter(ClassSchedule.class_id.in_(class_ids),
+                                   ClassSchedule.day_of_week == today.isoweekday()).delete(synchronize_session=False)
+    session_ids = [row.id for row in db.query(AttendanceSession.id).filter(
+        AttendanceSession.class_id.in_(class_ids), AttendanceSession.session_date == today)]
+    if session_ids:
+        db.query(AttendanceRecord).filter(AttendanceRecord.session_id.in_(session_ids)).delete(synchronize_session=False)
+        db.query(AttendanceSession).filter(AttendanceSession.id.in_(session_ids)).delete(synchronize_session=False)
+    db.add_all([ClassSchedule(class_id=class_id, day_of_week=today.isoweekday(), start_time=start, end_time=end,
+                              room="LIVE", mode="offline") for class_id in class_ids])
+    db.commit()
+
+def prepare_school(args):
+    """Open the check-in window and collect the accounts and ids the scenarios use"""
+    from database import SessionLocal
+    from models import ADMIN_USERNAME, ADMIN_PASSWORD, Class, ClassStudent, Student, Teacher, AttendanceSession
+    from sqlalchemy import func
+
+    rng = np.random.RandomState(args.seed)
+    db = SessionLocal()
+    try:
+        class_ids = [row.id for row in db.query(Class.id).order_by(Class.id)]
+        if not class_ids:
+            raise SystemExit("No classes found; generate a school with python -m loadtest.school first")
+        live = sorted(int(c) for c in rng.choice(class_ids, min(args.live_classes, len(class_ids)), replace=False))
+        open_check_in_window(db, live, datetime.now(), args.window_minutes)
+
+        enrolled = (db.query(ClassStudent.class_id, Student.id, Student.student_code)
+                    .join(Student, Student.id == ClassStudent.student_id)
+                    .filter(ClassStudent.class_id.in_(live)).all())
+        order = rng.permutation(len(enrolled))[:args.check_ins]
+        check_ins = [{"class_id": enrolled[i].class_id, "student_id": enrolled[i].id,
+                      "username": enrolled[i].student_code, "password": enrolled[i].student_code} for i in order]
+
+        teachers = {}
+        for class_id, code in db.query(Class.id, Teacher.teacher_code).join(Teacher, Teacher.id == Class.teacher_id) \
+                .filter(Class.id.in_(live)).order_by(Class.id):
+            teachers.setdefault(code, {"username": code, "password": code, "class_ids": []})["class_ids"].append(class_id)
+        teacher_accounts = list(teachers.values())[:args.teachers] if args.teachers else list(teachers.values())
+
+        session_ids = [row.id for row in db.query(AttendanceSession.id).order_by(func.random()).limit(1000)]
+        max_student_id = db.query(func.max(Student.id)).scalar() or 0
+    finally:
+        db.close()
+
+    return {
+        "live_classes": live,
+        "check_ins": check_ins,
+        "teachers": teacher_accounts,
+        "admin": {"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD},
+        "session_ids": session_ids,
+        "max_student_id": int(max_student_id),
+    }
+
+def attach_frames(school, embeddings, recognizer):
+    """A check-in frame per arrival, enrolled with the recogniser when running in-process"""
+    from loadtest.recognizer import synthetic_check_in_frame
+
+    labels = dict((str(name), label) for label, name in enumerate(embeddings["class_names"]))
+    for arrival in school["check_ins"]:
+        label = labels.get(arrival["username"], 0)
+        if recognizer is not None:
+            arrival["image_base64"] = recognizer.check_in_frame(label)
+        else:
+            arrival["image_base64"] = base64.b64encode(synthetic_check_in_frame(label)).decode("ascii")
+
+async def run(client, school, args):
+    from loadtest import traffic
+
+    recorder = traffic.Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    tasks = []
+    if "morning" in args.scenarios:
+        tasks.append(traffic.morning(client, recorder, school, args))
+    if "dashboard" in args.scenarios:
+        tasks.append(traffic.dashboard(client, recorder, school, args, deadline))
+    if "admin" in args.scenarios:
+        tasks.append(traffic.admin(client, recorder, school, args, deadline))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return recorder.report(elapsed), elapsed
+
+async def run_in_process(school, args):
+    import httpx
+    import main
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+        return await run(client, school, args)
+
+async def run_over_http(school, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        return await run(client, school, args)
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance API load test on a synthetic school")
+    parser.add_argument("--database_url", type=str, default=None, help="Defaults to the DATABASE_URL of the API")
+    parser.add_argument("--data_dir", type=str, default="loadtest_data", help="Output directory of loadtest.school")
+    parser.add_argument("--base_url", type=str, default=None, help="Test a running server instead of the app in-process")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=60, help="Seconds the dashboard and admin scenarios run")
+    parser.add_argument("--live_classes", type=int, default=40, help="Classes in session during the run")
+    parser.add_argument("--window_minutes", type=int, default=60)
+    parser.add_argument("--check_ins", type=int, default=2000, help="Most student arrivals in the morning burst")
+    parser.add_argument("--burst_seconds", type=float, default=30)
+    parser.add_argument("--clients", type=int, default=200, help="Most students in flight at once")
+    parser.add_argument("--teachers", type=int, default=0, help="Most polling teachers (0 all teachers of live classes)")
+    parser.add_argument("--poll_seconds", type=float, default=5)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--think_seconds", type=float, default=2)
+    parser.add_argument("--min_similarity", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", type=str, default="loadtest_report.json")
+    parser.add_argument("--seed", type=int, default=666)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SESSION_SWEEP_INTERVAL_SECONDS", "0")
+    from database import DATABASE_URL
+
+    embeddings = dict(np.load(os.path.join(args.data_dir, "embeddings.npz")))
+    school = prepare_school(args)
+    recognizer = None
+    if not args.base_url:
+        from services.face_recognition import face_recognition_service
+        from loadtest.recognizer import SyntheticRecognizer
+        recognizer = SyntheticRecognizer(face_recognition_service, embeddings, args.min_similarity, args.seed).install()
+    attach_frames(school, embeddings, recognizer)
+    print(f"{len(school['live_classes'])} classes in session, {len(school['check_ins'])} check-ins, "
+          f"{len(school['teachers'])} teachers, {args.admins} admins")
+
+    endpoints, elapsed = asyncio.run(run_over_http(school, args) if args.base_url else run_in_process(school, args))
+
+    summary_file = os.path.join(args.data_dir, "school.json")
+    school_summary = None
+    if os.path.exists(summary_file):
+        with open(summary_file) as f:
+            school_summary = json.load(f)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "target": args.base_url or "in-process",
+        "database_url": DATABASE_URL,
+        "school": school_summary,
+        "config": {key: value for key, value in vars(args).items() if key not in ("database_url", "data_dir", "output")},
+        "elapsed_seconds": round(elapsed, 2),
+        "endpoints": endpoints,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'endpoint':58s} {'reqs':>6s} {'req/s':>7s} {'err%':>6s} {'4xx%':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint, stats in endpoints.items():
+        latency = stats["latency"]
+        print(f"{endpoint:58s} {stats['requests']:6d} {stats['requests_per_second']:7.1f} "
+              f"{stats['error_rate'] * 100:6.2f} {stats['rejected_rate'] * 100:6.2f} "
+              f"{latency['p50_ms']:8.1f} {latency['p95_ms']:8.1f} {latency['p99_ms']:8.1f}")
+    print(f"Ran {elapsed:.1f}s -> {args.output}")
+
+if __name__ == "__main__":
+    main()
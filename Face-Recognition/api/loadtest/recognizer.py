@@ -0,0 +1,65 @@
+"""
+Stand-in face recogniser for in-process load tests.
+
+The synthetic check-in frames carry no face a FaceNet model would know, so
+the runner enrolls each frame with a probe embedding of its student. The
+recogniser still pays for the request path around the model: it decodes the
+frame with FaceRecognitionService's own stages and searches the whole
+synthetic gallery for the probe. Over localhost the server keeps its real
+recogniser.
+"""
+import base64
+import hashlib
+import threading
+
+import numpy as np
+
+from bench.corpus import drawn_face, encode_frames, synthetic_frames
+
+def synthetic_check_in_frame(label: int, width: int = 160, height: int = 120) -> bytes:
+    """A JPEG frame unique to one gallery label, small enough for the check-in query string"""
+    frame = synthetic_frames(1, width, height, [drawn_face()], seed=label, no_face_every=0)[0]
+    return encode_frames([frame], 80)[0]
+
+class SyntheticRecognizer:
+    def __init__(self, service, embeddings, min_similarity: float = 0.5, seed: int = 666):
+        self.service = service
+        gallery = np.asarray(embeddings["emb_array"], dtype=np.float32)
+        self.gallery = gallery / np.linalg.norm(gallery, axis=1, keepdims=True)
+        self.labels = np.asarray(embeddings["labels"])
+        self.class_names = [str(name) for name in embeddings["class_names"]]
+        identities, first = np.unique(self.labels, return_index=True)
+        self.first_template = dict(zip(identities.tolist(), first.tolist()))
+        self.min_similarity = min_similarity
+        self.rng = np.random.RandomState(seed)
+        self.probes = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        """Route the API's recognize_face calls through this recogniser"""
+        self.service.recognize_face = self.recognize_face
+        return self
+
+    def check_in_frame(self, label: int):
+        """synthetic_check_in_frame (base64) enrolled with a probe of the face with this gallery label"""
+        data = synthetic_check_in_frame(label)
+        template = self.gallery[self.first_template[label]]
+        with self._lock:
+            noise = self.rng.randn(template.size).astype(np.float32) * (0.5 / np.sqrt(template.size))
+        probe = template + noise
+        self.probes[hashlib.sha1(data).hexdigest()] = probe / np.linalg.norm(probe)
+        return base64.b64encode(data).decode("ascii")
+
+    def recognize_face(self, image_base64: str):
+        image_data = self.service.decode_base64(image_base64)
+        if self.service.decode_image(image_data) is None:
+            return None, 0.0, "Failed to decode image"
+        probe = self.probes.get(hashlib.sha1(image_data).hexdigest())
+        if probe is None:
+            return None, 0.0, "No face detected"
+        similarities = self.gallery.dot(probe)
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        if similarity < self.min_similarity:
+            return None, similarity, "Unknown face"
+        return self.class_names[self.labels[best]], similarity, "Success"
@@ -0,0 +1,231 @@
+"""
+Fill an empty database with a synthetic school for load testing.
+
+Students, teachers and the admin get logins (password = username), every
+class meets --slots_per_class times a week, and a semester of attendance
+sessions and records is written up to yesterday. Every student also gets
+--images_per_student synthetic face embeddings, saved with the same keys as
+src/compute_embeddings.py so src/identification.py can load them too.
+
+Usage:
+    python -m loadtest.school --database_url sqlite:///./loadtest_data/school.db --output_dir loadtest_data
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+import numpy as np
+
+PERIODS = [(dtime(7, 0), dtime(9, 0)), (dtime(9, 15), dtime(11, 15)),
+           (dtime(13, 0), dtime(15, 0)), (dtime(15, 15), dtime(17, 15))]
+STATUSES = ("present", "late", "absent")
+STATUS_WEIGHTS = (0.85, 0.07, 0.08)
+FAMILY_NAMES = ["Nguyen", "Tran", "Le", "Pham", "Hoang", "Huynh", "Phan", "Vu", "Vo", "Dang", "Bui", "Do", "Ho", "Ngo"]
+MIDDLE_NAMES = ["Van", "Thi", "Minh", "Ngoc", "Duc", "Thanh", "Quoc", "Hoang", "Gia", "Bao"]
+GIVEN_NAMES = ["An", "Binh", "Cuong", "Dung", "Giang", "Ha", "Hai", "Hung", "Khanh", "Lan", "Linh", "Long",
+               "Mai", "Nam", "Phuong", "Quan", "Son", "Thao", "Trang", "Tuan", "Viet", "Yen"]
+EMBEDDING_SIZE = 512
+
+def student_code(index: int) -> str:
+    return f"SV{index:06d}"
+
+def teacher_code(index: int) -> str:
+    return f"GV{index:04d}"
+
+def random_name(rng) -> str:
+    return " ".join((rng.choice(FAMILY_NAMES), rng.choice(MIDDLE_NAMES), rng.choice(GIVEN_NAMES)))
+
+class BulkWriter:
+    """Buffers rows per table and writes them with executemany, parents before children"""
+
+    def __init__(self, db, tables, chunk_size: int):
+        self.db = db
+        self.tables = tables
+        self.chunk_size = chunk_size
+        self.rows = dict((table, []) for table in tables)
+
+    def add(self, table, row: dict):
+        rows = self.rows[table]
+        rows.append(row)
+        if len(rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        for table in self.tables:
+            if self.rows[table]:
+                self.db.execute(table.insert(), self.rows[table])
+                self.rows[table] = []
+        self.db.commit()
+
+def semester_start(nrof_weeks: int, today: date):
+    """Monday of the first of nrof_weeks weeks, the last one being the current week"""
+    monday = today - timedelta(days=today.weekday())
+    return monday - timedelta(weeks=nrof_weeks - 1)
+
+def build_school(db, args, today: date):
+    from database import Base
+    from models import (ADMIN_USERNAME, ADMIN_PASSWORD, User, Teacher, Student, Subject, Class, ClassSchedule,
+                        ClassStudent, AttendanceSession, AttendanceRecord, FaceDataIndex)
+    from services.face_data import EMBEDDING_TRAINED
+
+    Base.metadata.create_all(bind=db.get_bind())
+    if db.query(Student.id).first() is not None:
+        raise SystemExit("The database already holds students; point --database_url at an empty database")
+
+    rng = np.random.RandomState(args.seed)
+    writer = BulkWriter(db, Base.metadata.sorted_tables, args.chunk_size)
+    created = datetime.now()
+
+    # executemany takes its columns from the first row, so every user row names both profile ids
+    writer.add(User.__table__, dict(id=1, username=ADMIN_USERNAME, password=ADMIN_PASSWORD, role="admin",
+                                    student_id=None, teacher_id=None, created_at=created))
+    user_id = 1
+    for i in range(1, args.subjects + 1):
+        writer.add(Subject.__table__, dict(id=i, subject_code=f"MH{i:04d}", subject_name=f"Subject {i}",
+                                           credits=int(rng.choice([2, 3, 4])), created_at=created))
+    for i in range(1, args.teachers + 1):
+        user_id += 1
+        writer.add(Teacher.__table__, dict(id=i, teacher_code=teacher_code(i), full_name=random_name(rng),
+                                           department=f"Department {(i - 1) % 12 + 1}", password=teacher_code(i),
+                                           created_at=created))
+        writer.add(User.__table__, dict(id=user_id, username=teacher_code(i), password=teacher_code(i),
+                                        role="teacher", student_id=None, teacher_id=i, created_at=created))
+    for i in range(1, args.students + 1):
+        user_id += 1
+        writer.add(Student.__table__, dict(id=i, student_code=student_code(i), full_name=random_name(rng),
+                                           year=int(today.year - rng.randint(0, 4)), password=student_code(i),
+                                           created_at=created))
+        writer.add(User.__table__, dict(id=user_id, username=student_code(i), password=student_code(i),
+                                        role="student", student_id=i, teacher_id=None, created_at=created))
+        writer.add(FaceDataIndex.__table__, dict(student_id=i, image_count=args.images_per_student,
+                                                 total_bytes=args.images_per_student * 20000, last_upload_at=created,
+                                                 embedding_status=EMBEDDING_TRAINED, updated_at=created))
+    writer.flush()
+    print(f"Created {args.students} students, {args.teachers} teachers and {args.subjects} subjects")
+
+    slots = [(day, period) for day in range(1, 7) for period in range(len(PERIODS))]
+    schedules = {}
+    schedule_id = 0
+    for i in range(1, args.classes + 1):
+        writer.add(Class.__table__, dict(id=i, class_code=f"LOP{i:04d}", class_name=f"Class {i}",
+                                         subject_id=int(rng.randint(1, args.subjects + 1)),
+                                         teacher_id=(i - 1) % args.teachers + 1, semester=f"{today.year}-1",
+                                         year=today.year, created_at=created))
+        schedules[i] = [slots[s] for s in rng.choice(len(slots), args.slots_per_class, replace=False)]
+        for day, period in schedules[i]:
+            schedule_id += 1
+            start_time, end_time = PERIODS[period]
+            writer.add(ClassSchedule.__table__, dict(id=schedule_id, class_id=i, day_of_week=day,
+                                                     start_time=start_time, end_time=end_time,
+                                                     room=f"{'ABCDE'[i % 5]}{rng.randint(1, 6)}0{rng.randint(1, 10)}",
+                                                     mode="offline", created_at=created))
+
+    enrolled = {i: [] for i in range(1, args.classes + 1)}
+    enrollment_id = 0
+    for student_id in range(1, args.students + 1):
+        for class_index in rng.choice(args.classes, args.classes_per_student, replace=False):
+            enrollment_id += 1
+            enrolled[class_index + 1].append(student_id)
+            writer.add(ClassStudent.__table__, dict(id=enrollment_id, class_id=int(class_index + 1),
+                                                    student_id=student_id, enrolled_at=created))
+    writer.flush()
+    print(f"Created {args.classes} classes, {schedule_id} weekly slots and {enrollment_id} enrollments")
+
+    first_monday = semester_start(args.weeks, today)
+    session_id = 0
+    record_id = 0
+    started = time.perf_counter()
+    for class_id in range(1, args.classes + 1):
+        students = np.array(enrolled[class_id], dtype=np.int64)
+        for week in range(args.weeks):
+            for day, period in schedules[class_id]:
+                session_date = first_monday + timedelta(weeks=week, days=day - 1)
+                if session_date >= today:
+                    continue
+                start_time, end_time = PERIODS[period]
+                session_id += 1
+                writer.add(AttendanceSession.__table__, dict(id=session_id, class_id=class_id, session_date=session_date,
+                                                             start_time=start_time, end_time=end_time,
+                                                             created_by=(class_id - 1) % args.teachers + 2,
+                                                             created_at=datetime.combine(session_date, start_time)))
+                statuses = rng.choice(len(STATUSES), len(students), p=STATUS_WEIGHTS)
+                minutes = rng.randint(0, 45, len(students))
+                confidences = rng.uniform(0.7, 0.99, len(students))
+                class_start = datetime.combine(session_date, start_time)
+                for student_id, status, minute, confidence in zip(students, statuses, minutes, confidences):
+                    record_id += 1
+                    absent = status == 2
+                    check_in = None if absent else class_start + timedelta(minutes=int(minute if status == 1 else minute % 15))
+                    writer.add(AttendanceRecord.__table__, dict(id=record_id, session_id=session_id,
+                                                                student_id=int(student_id), check_in_time=check_in,
+                                                                status=STATUSES[status],
+                                                                confidence=None if absent else round(float(confidence), 4),
+                                                                created_at=check_in or class_start))
+    writer.flush()
+    print(f"Created {session_id} attendance sessions and {record_id} records in {time.perf_counter() - started:.1f}s")
+
+    return {
+        "students": args.students,
+        "teachers": args.teachers,
+        "subjects": args.subjects,
+        "classes": args.classes,
+        "schedules": schedule_id,
+        "enrollments": enrollment_id,
+        "sessions": session_id,
+        "records": record_id,
+        "semester_start": str(first_monday),
+        "created_for": str(today),
+    }
+
+def synthetic_embeddings(nrof_students: int, images_per_student: int, seed: int, spread: float = 0.5):
+    """Unit-norm embeddings scattered around one random direction per student"""
+    rng = np.random.RandomState(seed)
+    centres = rng.randn(nrof_students, EMBEDDING_SIZE).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    labels = np.repeat(np.arange(nrof_students, dtype=np.int64), images_per_student)
+    noise = rng.randn(len(labels), EMBEDDING_SIZE).astype(np.float32) * (spread / np.sqrt(EMBEDDING_SIZE))
+    emb_array = centres[labels] + noise
+    emb_array /= np.linalg.norm(emb_array, axis=1, keepdims=True)
+    return emb_array, labels
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic school for load testing")
+    parser.add_argument("--database_url", type=str, default=None, help="Defaults to the DATABASE_URL of the API")
+    parser.add_argument("--output_dir", type=str, default="loadtest_data")
+    parser.add_argument("--students", type=int, default=20000)
+    parser.add_argument("--teachers", type=int, default=150)
+    parser.add_argument("--subjects", type=int, default=60)
+    parser.add_argument("--classes", type=int, default=500)
+    parser.add_argument("--classes_per_student", type=int, default=3)
+    parser.add_argument("--slots_per_class", type=int, default=2, help="Weekly meetings of every class")
+    parser.add_argument("--weeks", type=int, default=15, help="Weeks of attendance history")
+    parser.add_argument("--images_per_student", type=int, default=2, help="Synthetic face embeddings per student")
+    parser.add_argument("--chunk_size", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=666)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from database import SessionLocal, DATABASE_URL
+
+    db = SessionLocal()
+    try:
+        summary = build_school(db, args, date.today())
+    finally:
+        db.close()
+
+    emb_array, labels = synthetic_embeddings(args.students, args.images_per_student, args.seed)
+    embeddings_file = os.path.join(args.output_dir, "embeddings.npz")
+    np.savez(embeddings_file, emb_array=emb_array, labels=labels,
+             class_names=np.array([student_code(i) for i in range(1, args.students + 1)]),
+             model=np.array("synthetic"))
+    summary.update(database_url=DATABASE_URL, embeddings=embeddings_file, seed=args.seed)
+    with open(os.path.join(args.output_dir, "school.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Wrote {len(emb_array)} synthetic embeddings to {embeddings_file}")
+
+if __name__ == "__main__":
+    main()
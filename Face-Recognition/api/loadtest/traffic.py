@@ -0,0 +1,129 @@
+"""
+Traffic mixes replayed by the load-testing runner.
+
+morning    students arrive over --burst_seconds, log in, open their schedule
+           and check in to a class that is in session
+dashboard  teachers keep their class attendance page open and poll it
+admin      the admin browses statistics and attendance sessions
+
+Every request is recorded under its route template so the report has one
+row per endpoint.
+"""
+import asyncio
+import time
+from collections import Counter, defaultdict
+
+import httpx
+import numpy as np
+
+from bench.report import summarize
+
+class Recorder:
+    """Latencies and status codes per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, endpoint: str, status: int, seconds: float):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed: float):
+        """Status 0 means no response; 5xx and no response count as errors, 4xx as rejections"""
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            statuses = self.statuses[endpoint]
+            count = sum(statuses.values())
+            errors = sum(n for status, n in statuses.items() if status == 0 or status >= 500)
+            rejected = sum(n for status, n in statuses.items() if 400 <= status < 500)
+            endpoints[endpoint] = {
+                "requests": count,
+                "requests_per_second": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+                "error_rate": round(errors / count, 4),
+                "rejected_rate": round(rejected / count, 4),
+                "statuses": dict((str(status), n) for status, n in sorted(statuses.items())),
+                "latency": summarize(self.latencies[endpoint]),
+            }
+        return endpoints
+
+async def call(client, recorder: Recorder, method: str, endpoint: str, url: str, **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        recorder.record(endpoint, 0, time.perf_counter() - started)
+        return None
+    recorder.record(endpoint, response.status_code, time.perf_counter() - started)
+    return response
+
+async def login(client, recorder: Recorder, username: str, password: str):
+    response = await call(client, recorder, "POST", "POST /api/auth/login", "/api/auth/login",
+                          json={"username": username, "password": password})
+    if response is None or response.status_code != 200:
+        return None
+    return {"session-id": response.json()["session_id"]}
+
+async def morning(client, recorder: Recorder, school, args):
+    """One arrival per (student, class) check-in, spread uniformly over the burst"""
+    rng = np.random.RandomState(args.seed)
+    arrivals = school["check_ins"]
+    offsets = np.sort(rng.uniform(0, args.burst_seconds, len(arrivals)))
+    semaphore = asyncio.Semaphore(args.clients)
+    started = time.perf_counter()
+
+    async def arrive(arrival, offset):
+        await asyncio.sleep(max(0.0, started + offset - time.perf_counter()))
+        async with semaphore:
+            headers = await login(client, recorder, arrival["username"], arrival["password"])
+            if headers is None:
+                return
+            await call(client, recorder, "GET", "GET /api/student/my-schedule", "/api/student/my-schedule",
+                       headers=headers)
+            await call(client, recorder, "POST", "POST /api/student/check-in", "/api/student/check-in",
+                       headers=headers, params={"class_id": arrival["class_id"], "image_base64": arrival["image_base64"]})
+
+    await asyncio.gather(*(arrive(arrival, offset) for arrival, offset in zip(arrivals, offsets)))
+
+async def dashboard(client, recorder: Recorder, school, args, deadline: float):
+    """Each teacher of a class in session polls its attendance every --poll_seconds"""
+    async def teacher(index, account):
+        rng = np.random.RandomState(args.seed + index)
+        headers = await login(client, recorder, account["username"], account["password"])
+        if headers is None:
+            return
+        await call(client, recorder, "GET", "GET /api/teacher/my-classes", "/api/teacher/my-classes", headers=headers)
+        while time.perf_counter() < deadline:
+            for class_id in account["class_ids"]:
+                await call(client, recorder, "GET", "GET /api/teacher/classes/{class_id}/attendance",
+                           f"/api/teacher/classes/{class_id}/attendance", headers=headers)
+            await asyncio.sleep(args.poll_seconds * rng.uniform(0.5, 1.5))
+
+    await asyncio.gather(*(teacher(i, account) for i, account in enumerate(school["teachers"])))
+
+ADMIN_MIX = (
+    (0.35, "GET /api/admin/stats"),
+    (0.25, "GET /api/admin/statistics/student-absence/{student_id}"),
+    (0.20, "GET /api/admin/attendance/sessions/{session_id}/summary"),
+    (0.10, "GET /api/admin/statistics/absence-rate"),
+    (0.10, "GET /api/admin/attendance/sessions"),
+)
+
+async def admin(client, recorder: Recorder, school, args, deadline: float):
+    """--admins sessions pick statistics pages from ADMIN_MIX with --think_seconds between them"""
+    weights = np.array([weight for weight, _ in ADMIN_MIX])
+
+    async def browse(index):
+        rng = np.random.RandomState(args.seed + 1000 + index)
+        headers = await login(client, recorder, school["admin"]["username"], school["admin"]["password"])
+        if headers is None:
+            return
+        while time.perf_counter() < deadline:
+            endpoint = ADMIN_MIX[rng.choice(len(ADMIN_MIX), p=weights / weights.sum())][1]
+            url = endpoint.split(" ", 1)[1].format(
+                student_id=int(rng.randint(1, school["max_student_id"] + 1)),
+                session_id=int(rng.choice(school["session_ids"])) if school["session_ids"] else 0)
+            await call(client, recorder, "GET", endpoint, url, headers=headers)
+            await asyncio.sleep(args.think_seconds * rng.uniform(0.5, 1.5))
+
+    await asyncio.gather(*(browse(i) for i in range(args.admins)))
@@ -1,14 +1,39 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, admin, face, teacher
+from fastapi.responses import JSONResponse, PlainTextResponse
+from database import USE_ASYNC_DB, AUTO_CREATE_SCHEMA, ensure_schema
+from routers import auth, admin, face, teacher, images
+from services import startup
+from services.face_recognition import face_recognition_service, PRELOAD_MODEL
+from services.session_sweeper import session_sweeper
+from services.metrics import METRICS_ENABLED, registry
+from services.tracing import configure_logging, instrumentation_enabled, trace_requests
 
-Base.metadata.create_all(bind=engine)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_CREATE_SCHEMA:
+        created = ensure_schema()
+        if created:
+            logger.info("Created tables: %s", ", ".join(created))
+    startup.mark("schema")
+    session_sweeper.start()
+    if PRELOAD_MODEL:
+        # TensorFlow and the classifier load on their own thread; /health/ready reports when they are done
+        face_recognition_service.preload()
+    startup.mark("serving")
+    yield
+    await session_sweeper.stop()
 
 app = FastAPI(
     title="Face Recognition Attendance API",
     description="API for face recognition based attendance system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -20,10 +45,19 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if instrumentation_enabled():
+    app.middleware("http")(trace_requests)
+
+if USE_ASYNC_DB:
+    # Registered first so the async handlers win for the paths they share with the sync routers
+    from routers import async_api
+    app.include_router(async_api.router)
+
 app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(teacher.router)
 app.include_router(face.router)
+app.include_router(images.router)
 
 from routers import student
 app.include_router(student.router)
@@ -39,6 +73,27 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/ready")
+def readiness_check():
+    """503 until startup finished and, with PRELOAD_MODEL, the model is loaded and warmed up"""
+    model_state = face_recognition_service.state()
+    timeline = startup.timeline()
+    # A reload keeps the previous model serving, so it does not take the API out of rotation
+    ready = "serving" in timeline and (model_state in ("ready", "reloading") or not PRELOAD_MODEL)
+    body = {
+        "status": "ready" if ready else ("failed" if model_state == "failed" else "starting"),
+        "model": model_state,
+        "startup_seconds": timeline
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+if METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+startup.mark("imported")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
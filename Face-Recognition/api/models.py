@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Date, Time
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Date, Time, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -32,6 +32,19 @@ class Session(Base):
 
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (
+        Index("ix_sessions_session_id_expires_at", "session_id", "expires_at"),
+        Index("ix_sessions_expires_at", "expires_at"),
+        Index("ix_sessions_user_id_created_at", "user_id", "created_at"),
+    )
+
+class CodeCounter(Base):
+    __tablename__ = "code_counters"
+
+    prefix = Column(String(10), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class Student(Base):
     __tablename__ = "students"
 
@@ -47,6 +60,50 @@ class Student(Base):
     user = relationship("User", back_populates="student", uselist=False)
     attendance_records = relationship("AttendanceRecord", back_populates="student")
     class_enrollments = relationship("ClassStudent", back_populates="student")
+    face_data = relationship("FaceDataIndex", back_populates="student", uselist=False, cascade="all, delete-orphan")
+    face_images = relationship("FaceImage", back_populates="student")
+
+class FaceDataIndex(Base):
+    __tablename__ = "face_data_index"
+
+    student_id = Column(Integer, ForeignKey("students.id"), primary_key=True)
+    image_count = Column(Integer, nullable=False, default=0)
+    total_bytes = Column(Integer, nullable=False, default=0)
+    last_upload_at = Column(DateTime, nullable=True)
+    embedding_status = Column(String(20), nullable=False, default="none")
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    student = relationship("Student", back_populates="face_data")
+
+    @property
+    def has_face_data(self):
+        return self.image_count > 0
+
+class FaceImage(Base):
+    __tablename__ = "face_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    sha256 = Column(String(64), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(50))
+    size_bytes = Column(Integer, nullable=False)
+    width = Column(Integer)
+    height = Column(Integer)
+    has_thumbnail = Column(Boolean, default=False)
+    quality_score = Column(Float)
+    sharpness = Column(Float)
+    face_size = Column(Integer)
+    roll = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    student = relationship("Student", back_populates="face_images")
+
+    __table_args__ = (
+        UniqueConstraint("student_id", "kind", "sha256", name="uq_face_images_student_kind_sha256"),
+        Index("ix_face_images_student_id_kind_filename", "student_id", "kind", "filename"),
+    )
 
 class Teacher(Base):
     __tablename__ = "teachers"
@@ -133,6 +190,10 @@ class AttendanceSession(Base):
     records = relationship("AttendanceRecord", back_populates="session")
     creator = relationship("User")
 
+    __table_args__ = (
+        Index("ix_attendance_sessions_class_id_date_id", "class_id", "session_date", "id"),
+    )
+
 class AttendanceRecord(Base):
     __tablename__ = "attendance_records"
 
@@ -147,3 +208,7 @@ class AttendanceRecord(Base):
     session = relationship("AttendanceSession", back_populates="records")
     student = relationship("Student", back_populates="attendance_records")
 
+    __table_args__ = (
+        Index("ix_attendance_records_session_id_student_id", "session_id", "student_id"),
+    )
+
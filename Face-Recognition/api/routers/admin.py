@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.orm import Session, joinedload
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
-from database import get_db
+from database import get_db, get_pool_status
 from models import Student, Teacher, Subject, Class, ClassSchedule, ClassStudent, User
 from routers.auth import require_admin
+from services.auth import delete_user_sessions
+from services.session_cache import session_cache
+from services.session_sweeper import session_sweeper
+from services.timetable import timetable_cache, invalidate_class_timetables
+from services.face_data import student_has_face_data, mark_face_data_pending, rebuild_face_data_index, EMBEDDING_TRAINED
+from services.image_store import image_store, image_info
+from services.upload_validation import upload_validator, face_quality, MAX_UPLOAD_BYTES
+from services.accounts import create_student_account, create_teacher_account, iter_import_rows, import_accounts
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
@@ -57,6 +65,27 @@ def get_stats(db: Session = Depends(get_db), _admin = Depends(require_admin)):
         "total_subjects": total_subjects
     }
 
+@router.get("/session-cache")
+def get_session_cache_stats(_admin = Depends(require_admin)):
+    """Hit/miss counters of the in-process session cache"""
+    return session_cache.stats()
+
+@router.get("/session-sweeper")
+def get_session_sweeper_stats(_admin = Depends(require_admin)):
+    """Expired-session sweeper metrics (sessions table size, sweep duration)"""
+    return session_sweeper.stats()
+
+@router.post("/session-sweeper/run")
+def run_session_sweep(_admin = Depends(require_admin)):
+    """Run an expired-session sweep now"""
+    deleted = session_sweeper.sweep_once()
+    return {"deleted": deleted, **session_sweeper.stats()}
+
+@router.get("/db-pool")
+def get_db_pool_stats(_admin = Depends(require_admin)):
+    """Connection pool in-use counts and checkout wait times"""
+    return get_pool_status()
+
 # Student management
 @router.get("/students")
 def get_students(db: Session = Depends(get_db), current_user = Depends(require_admin)):
@@ -70,31 +99,7 @@ def create_student(student_data: StudentCreate, db: Session = Depends(get_db), c
     if student_data.year and (student_data.year < 2000 or student_data.year > 2100):
         raise HTTPException(status_code=400, detail="Year must be between 2000 and 2100")
 
-    last_student = db.query(Student).order_by(Student.id.desc()).first()
-    next_number = 1 if not last_student else last_student.id + 1
-    student_code = f"SV{next_number:03d}"
-
-    student = Student(
-        student_code=student_code,
-        full_name=student_data.full_name,
-        email=student_data.email,
-        phone=student_data.phone,
-        year=student_data.year,
-        password=student_data.password
-    )
-    db.add(student)
-    db.commit()
-    db.refresh(student)
-
-    user = User(
-        username=student.student_code,
-        password=student_data.password,
-        role="student",
-        student_id=student.id
-    )
-    db.add(user)
-    db.commit()
-
+    student = create_student_account(db, student_data)
     return student
 
 @router.put("/students/{student_id}")
@@ -128,29 +133,65 @@ def delete_student(student_id: int, db: Session = Depends(get_db), current_user
 
     user = db.query(User).filter(User.student_id == student.id).first()
     if user:
+        delete_user_sessions(db, user.id)
         db.delete(user)
 
+    image_store.delete_student_images(db, student, commit=False)
     db.delete(student)
     db.commit()
+    timetable_cache.invalidate_students([student_id])
     return {"message": "Student deleted"}
 
 @router.post("/students/{student_id}/face-data")
 async def upload_face_data(student_id: int, data: dict, db: Session = Depends(get_db), _admin = Depends(require_admin)):
     import base64
-    import os
-    from pathlib import Path
     student = db.query(Student).filter(Student.id == student_id).first()
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    student_dir = Path(f"../Dataset/FaceData/raw/{student.student_code}")
-    student_dir.mkdir(parents=True, exist_ok=True)
-    existing_files = list(student_dir.glob("*.jpg"))
-    next_index = len(existing_files) + 1
     image_data = base64.b64decode(data["image_base64"])
-    image_path = student_dir / f"{next_index}.jpg"
-    with open(image_path, "wb") as f:
-        f.write(image_data)
-    return {"message": "Image uploaded", "path": str(image_path)}
+    if len(image_data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+    result = await upload_validator.validate(image_data)
+    if not result.ok:
+        raise HTTPException(status_code=400, detail=f"Image rejected: {result.reason}")
+    image, created = image_store.save(db, student, image_data, "raw", filename="upload.jpg",
+                                      quality=face_quality(result.metrics))
+    image_path = image_store.dataset_path(image, student.student_code)
+    mark_face_data_pending(db, student)
+    return {"message": "Image uploaded" if created else "Image already uploaded", "path": str(image_path), "duplicate": not created}
+
+@router.get("/students/{student_id}/face-images")
+def get_student_face_images(student_id: int, kind: Optional[str] = None, sort: str = "created",
+                            db: Session = Depends(get_db), _admin = Depends(require_admin)):
+    """A student's raw and processed images with their quality scores; sort=quality lists the best first"""
+    student = db.query(Student).filter(Student.id == student_id).first()
+    if not student:
+        raise HTTPException(status_code=404, detail="Student not found")
+    images = [{**image_info(image), "kind": image.kind} for image in image_store.list_images(db, student.id, kind, sort)]
+    return {"student_code": student.student_code, "count": len(images), "images": images}
+
+@router.post("/import/{kind}")
+def import_account_file(
+    kind: str,
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    file_format: Optional[str] = None,
+    db: Session = Depends(get_db),
+    _admin = Depends(require_admin)
+):
+    """Bulk import students or teachers from a CSV or JSON-lines file"""
+    if kind not in ("students", "teachers"):
+        raise HTTPException(status_code=404, detail="Import kind must be 'students' or 'teachers'")
+
+    if not file_format:
+        filename = (file.filename or "").lower()
+        file_format = "jsonl" if filename.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+    try:
+        rows = iter_import_rows(file.file, file_format)
+        return import_accounts(db, kind[:-1], rows, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # Teacher management
 @router.get("/teachers")
@@ -162,31 +203,7 @@ def get_all_teachers(db: Session = Depends(get_db), current_user = Depends(requi
 @router.post("/teachers")
 def create_teacher(teacher_data: TeacherCreate, db: Session = Depends(get_db), current_user = Depends(require_admin)):
     """Create teacher profile"""
-    last_teacher = db.query(Teacher).order_by(Teacher.id.desc()).first()
-    next_number = 1 if not last_teacher else last_teacher.id + 1
-    teacher_code = f"GV{next_number:03d}"
-
-    teacher = Teacher(
-        teacher_code=teacher_code,
-        full_name=teacher_data.full_name,
-        email=teacher_data.email,
-        phone=teacher_data.phone,
-        department=teacher_data.department,
-        password=teacher_data.password
-    )
-    db.add(teacher)
-    db.commit()
-    db.refresh(teacher)
-
-    user = User(
-        username=teacher.teacher_code,
-        password=teacher_data.password,
-        role="teacher",
-        teacher_id=teacher.id
-    )
-    db.add(user)
-    db.commit()
-
+    teacher = create_teacher_account(db, teacher_data)
     return teacher
 
 @router.put("/teachers/{teacher_id}")
@@ -210,6 +227,7 @@ def update_teacher(teacher_id: int, teacher_data: TeacherCreate, db: Session = D
 
     db.commit()
     db.refresh(teacher)
+    timetable_cache.clear()
     return teacher
 
 @router.delete("/teachers/{teacher_id}")
@@ -220,10 +238,12 @@ def delete_teacher(teacher_id: int, db: Session = Depends(get_db), current_user
 
     user = db.query(User).filter(User.teacher_id == teacher.id).first()
     if user:
+        delete_user_sessions(db, user.id)
         db.delete(user)
 
     db.delete(teacher)
     db.commit()
+    timetable_cache.clear()
     return {"message": "Teacher deleted"}
 
 # Get all classes
@@ -302,6 +322,7 @@ def update_class(class_id: int, class_data: dict, db: Session = Depends(get_db),
         cls.year = class_data["year"]
 
     db.commit()
+    invalidate_class_timetables(db, class_id)
     db.refresh(cls)
     return cls
 
@@ -311,6 +332,7 @@ def delete_class(class_id: int, db: Session = Depends(get_db), current_user = De
     cls = db.query(Class).filter(Class.id == class_id).first()
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found")
+    invalidate_class_timetables(db, class_id)
     db.delete(cls)
     db.commit()
     return {"message": "Class deleted"}
@@ -342,6 +364,7 @@ def add_student_to_class(class_id: int, student_id: int, db: Session = Depends(g
     class_student = ClassStudent(class_id=class_id, student_id=student_id)
     db.add(class_student)
     db.commit()
+    timetable_cache.invalidate_students([student_id])
 
     return {"message": "Student added to class"}
 
@@ -359,20 +382,17 @@ def remove_student_from_class(class_id: int, student_id: int, db: Session = Depe
 
     db.delete(enrollment)
     db.commit()
+    timetable_cache.invalidate_students([student_id])
     return {"message": "Student removed from class"}
 
 @router.get("/classes/{class_id}/students")
 def get_class_students(class_id: int, db: Session = Depends(get_db), current_user = Depends(require_admin)):
-    from models import ClassStudent
-    import os
-
-    enrollments = db.query(ClassStudent).filter(ClassStudent.class_id == class_id).all()
+    enrollments = db.query(ClassStudent).options(
+        joinedload(ClassStudent.student).joinedload(Student.face_data)
+    ).filter(ClassStudent.class_id == class_id).all()
     students = []
     for enrollment in enrollments:
         student = enrollment.student
-        face_data_path = f"../Dataset/FaceData/processed/{student.student_code}"
-        has_face_data = os.path.exists(face_data_path) and len(os.listdir(face_data_path)) > 0
-
         students.append({
             "student_id": student.id,
             "student_code": student.student_code,
@@ -380,7 +400,7 @@ def get_class_students(class_id: int, db: Session = Depends(get_db), current_use
             "email": student.email,
             "phone": student.phone,
             "year": student.year,
-            "has_face_data": has_face_data
+            "has_face_data": student_has_face_data(student)
         })
 
     return students
@@ -539,7 +559,7 @@ def get_student_absence_statistics(student_id: int, db: Session = Depends(get_db
 
 # Train model
 @router.post("/train-model")
-async def train_model(_admin = Depends(require_admin)):
+async def train_model(db: Session = Depends(get_db), _admin = Depends(require_admin)):
     """Train face recognition model (admin only)"""
     from services.training import training_service
     import asyncio
@@ -549,10 +569,24 @@ async def train_model(_admin = Depends(require_admin)):
 
     if success:
         from services.face_recognition import face_recognition_service
-        face_recognition_service.model_loaded = False
+        face_recognition_service.reload()
+        # Alignment rewrote the processed folders; adopt its output into the image store and refresh the index once
+        await loop.run_in_executor(None, image_store.sync_dataset, db, "processed")
+        await loop.run_in_executor(None, rebuild_face_data_index, db, training_service.output_dir, EMBEDDING_TRAINED)
 
     return {"success": success, "message": message}
 
+@router.post("/image-store/sync")
+def sync_image_store(db: Session = Depends(get_db), _admin = Depends(require_admin)):
+    """Adopt files already under FaceData/raw and FaceData/processed into the image store"""
+    return [image_store.sync_dataset(db, kind) for kind in ("raw", "processed")]
+
+@router.post("/face-data-index/rebuild")
+def rebuild_face_data(db: Session = Depends(get_db), _admin = Depends(require_admin)):
+    """Rescan the processed dataset into the face-data index (backfill or after manual changes)"""
+    from services.training import training_service
+    return rebuild_face_data_index(db, training_service.output_dir)
+
 @router.get("/subjects")
 def get_all_subjects(db: Session = Depends(get_db), _admin = Depends(require_admin)):
     subjects = db.query(Subject).all()
@@ -583,6 +617,7 @@ def update_subject(subject_id: int, subject_data: SubjectCreate, db: Session = D
     subject.credits = subject_data.credits
     db.commit()
     db.refresh(subject)
+    timetable_cache.clear()
     return subject
 
 @router.delete("/subjects/{subject_id}")
@@ -592,6 +627,7 @@ def delete_subject(subject_id: int, db: Session = Depends(get_db), _admin = Depe
         raise HTTPException(status_code=404, detail="Subject not found")
     db.delete(subject)
     db.commit()
+    timetable_cache.clear()
     return {"message": "Subject deleted"}
 
 @router.get("/classes/{class_id}/schedules")
@@ -616,6 +652,7 @@ def create_class_schedule(class_id: int, schedule_data: ClassScheduleCreate, db:
     db.add(schedule)
     db.commit()
     db.refresh(schedule)
+    invalidate_class_timetables(db, class_id)
     return schedule
 
 @router.put("/schedules/{schedule_id}")
@@ -630,6 +667,7 @@ def update_schedule(schedule_id: int, schedule_data: ClassScheduleCreate, db: Se
     schedule.mode = schedule_data.mode
     db.commit()
     db.refresh(schedule)
+    invalidate_class_timetables(db, schedule.class_id)
     return schedule
 
 @router.delete("/schedules/{schedule_id}")
@@ -637,6 +675,8 @@ def delete_schedule(schedule_id: int, db: Session = Depends(get_db), _admin = De
     schedule = db.query(ClassSchedule).filter(ClassSchedule.id == schedule_id).first()
     if not schedule:
         raise HTTPException(status_code=404, detail="Schedule not found")
+    class_id = schedule.class_id
     db.delete(schedule)
     db.commit()
+    invalidate_class_timetables(db, class_id)
     return {"message": "Schedule deleted"}
@@ -0,0 +1,268 @@
+"""Async (sqlalchemy.ext.asyncio) versions of the most frequently hit endpoints.
+
+Included ahead of the sync routers when USE_ASYNC_DB is set, so these
+handlers take over the same paths without holding a threadpool slot
+while they wait on the database.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from datetime import datetime, date, time
+from typing import List, Optional
+from database import get_async_db
+from models import Student, Class, ClassSchedule, ClassStudent, AttendanceSession, AttendanceRecord
+from routers.auth import LoginRequest, LoginResponse, require_student_async, require_teacher_async
+from routers.teacher import AttendanceInfo
+from services.auth import authenticate_user_async
+from services.timetable import timetable_cache, load_student_timetable
+from services.attendance import student_attendance_query, attendance_page_query, attendance_row, attendance_page, decode_cursor
+
+router = APIRouter(tags=["async"])
+
+@router.post("/api/auth/login", response_model=LoginResponse)
+async def login(request: LoginRequest, db = Depends(get_async_db)):
+    session_id, user, student, teacher = await authenticate_user_async(db, request.username, request.password, request.role)
+    if not session_id or not user:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+
+    response = {
+        "session_id": session_id,
+        "username": user.username,
+        "role": user.role
+    }
+
+    if user.role == "student" and student:
+        response["student_id"] = student.id
+        response["student_code"] = student.student_code
+        response["full_name"] = student.full_name
+    elif user.role == "teacher" and teacher:
+        response["teacher_id"] = teacher.id
+        response["teacher_code"] = teacher.teacher_code
+        response["full_name"] = teacher.full_name
+
+    return response
+
+@router.get("/api/student/my-schedule")
+async def get_my_schedule(
+    schedule_date: str = None,
+    user = Depends(require_student_async),
+    db = Depends(get_async_db)
+):
+    if not user.student_id:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+
+    target_date = datetime.strptime(schedule_date, "%Y-%m-%d").date() if schedule_date else date.today()
+    day_of_week = target_date.isoweekday()
+
+    schedule_list = timetable_cache.get(user.student_id, day_of_week)
+    if schedule_list is None:
+        schedule_list = await db.run_sync(load_student_timetable, user.student_id, day_of_week)
+        timetable_cache.put(user.student_id, day_of_week, schedule_list)
+
+    return {
+        "date": str(target_date),
+        "day_of_week": day_of_week,
+        "schedules": schedule_list
+    }
+
+@router.get("/api/student/my-attendance")
+async def get_my_attendance(
+    class_id: int = None,
+    user = Depends(require_student_async),
+    db = Depends(get_async_db)
+):
+    if not user.student_id:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+
+    if class_id:
+        enrollment = await db.scalar(select(ClassStudent.id).where(
+            ClassStudent.student_id == user.student_id,
+            ClassStudent.class_id == class_id
+        ).limit(1))
+        if not enrollment:
+            raise HTTPException(status_code=404, detail="Not enrolled in this class")
+
+    result = await db.execute(
+        student_attendance_query(user.student_id, class_id)
+        .order_by(AttendanceSession.session_date.desc(), AttendanceSession.id)
+    )
+    return [attendance_row(row) for row in result]
+
+@router.get("/api/student/my-attendance/history")
+async def get_my_attendance_history(
+    class_id: int = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user = Depends(require_student_async),
+    db = Depends(get_async_db)
+):
+    if not user.student_id:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+
+    if class_id:
+        enrollment = await db.scalar(select(ClassStudent.id).where(
+            ClassStudent.student_id == user.student_id,
+            ClassStudent.class_id == class_id
+        ).limit(1))
+        if not enrollment:
+            raise HTTPException(status_code=404, detail="Not enrolled in this class")
+
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await db.execute(attendance_page_query(user.student_id, class_id, position, limit))
+    return attendance_page(result, limit)
+
+@router.post("/api/student/check-in")
+async def student_check_in(
+    class_id: int,
+    image_base64: str,
+    user = Depends(require_student_async),
+    db = Depends(get_async_db)
+):
+    if not user.student_id:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+
+    student = await db.get(Student, user.student_id)
+    enrollment = await db.scalar(select(ClassStudent.id).where(
+        ClassStudent.student_id == user.student_id,
+        ClassStudent.class_id == class_id
+    ).limit(1))
+    if not enrollment:
+        raise HTTPException(status_code=404, detail="Not enrolled in this class")
+
+    today = date.today()
+    now = datetime.now()
+    current_time = now.time()
+
+    schedule = await db.scalar(select(ClassSchedule).where(
+        ClassSchedule.class_id == class_id,
+        ClassSchedule.day_of_week == today.isoweekday()
+    ).limit(1))
+    if not schedule:
+        raise HTTPException(status_code=400, detail="No class scheduled for today")
+
+    if current_time < schedule.start_time or current_time > schedule.end_time:
+        raise HTTPException(status_code=400, detail=f"Check-in only allowed between {schedule.start_time} and {schedule.end_time}")
+
+    session = await db.scalar(select(AttendanceSession).where(
+        AttendanceSession.class_id == class_id,
+        AttendanceSession.session_date == today
+    ).limit(1))
+
+    if session:
+        existing_record = await db.scalar(select(AttendanceRecord.id).where(
+            AttendanceRecord.session_id == session.id,
+            AttendanceRecord.student_id == user.student_id
+        ).limit(1))
+        if existing_record:
+            raise HTTPException(status_code=400, detail="Already checked in for this session")
+
+    from services.face_recognition import face_recognition_service
+
+    try:
+        name, confidence, message = await run_in_threadpool(face_recognition_service.recognize_face, image_base64)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Check-in failed: {str(e)}")
+
+    if name is None:
+        raise HTTPException(status_code=400, detail=f"Face not recognized: {message}")
+    if name != student.student_code:
+        raise HTTPException(status_code=400, detail="Face does not match your profile")
+
+    status = "present"
+    if current_time > schedule.start_time:
+        time_diff = (datetime.combine(today, current_time) - datetime.combine(today, schedule.start_time)).total_seconds() / 60
+        if time_diff > 15:
+            status = "late"
+
+    if not session:
+        session = AttendanceSession(
+            class_id=class_id,
+            session_date=today,
+            start_time=schedule.start_time,
+            end_time=schedule.end_time,
+            created_by=user.user_id
+        )
+        db.add(session)
+        await db.flush()
+
+    confidence = float(confidence) if confidence is not None else None
+    db.add(AttendanceRecord(
+        session_id=session.id,
+        student_id=user.student_id,
+        status=status,
+        check_in_time=now,
+        confidence=confidence
+    ))
+    await db.commit()
+
+    return {
+        "success": True,
+        "status": status,
+        "check_in_time": str(now),
+        "confidence": confidence,
+        "message": f"Checked in successfully as {status}"
+    }
+
+@router.get("/api/teacher/classes/{class_id}/attendance", response_model=List[AttendanceInfo])
+async def get_class_attendance(
+    class_id: int,
+    attendance_date: Optional[date] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    user = Depends(require_teacher_async),
+    db = Depends(get_async_db)
+):
+    if not user.teacher_id:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+
+    cls = await db.scalar(select(Class.id).where(Class.id == class_id, Class.teacher_id == user.teacher_id))
+    if not cls:
+        raise HTTPException(status_code=404, detail="Class not found or you don't have permission")
+
+    if not attendance_date:
+        attendance_date = date.today()
+
+    session_filter = [AttendanceSession.class_id == class_id, AttendanceSession.session_date == attendance_date]
+    if start_time and end_time:
+        try:
+            session_filter += [
+                AttendanceSession.start_time == time.fromisoformat(start_time),
+                AttendanceSession.end_time == time.fromisoformat(end_time)
+            ]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid time format. Use HH:MM:SS")
+
+    records = (
+        select(AttendanceRecord.student_id, AttendanceRecord.check_in_time,
+               AttendanceRecord.status, AttendanceRecord.confidence)
+        .join(AttendanceSession, AttendanceSession.id == AttendanceRecord.session_id)
+        .where(*session_filter)
+        .subquery()
+    )
+    result = await db.execute(
+        select(Student.id, Student.student_code, Student.full_name,
+               records.c.check_in_time, records.c.status, records.c.confidence)
+        .join(ClassStudent, ClassStudent.student_id == Student.id)
+        .outerjoin(records, records.c.student_id == Student.id)
+        .where(ClassStudent.class_id == class_id)
+        .order_by(ClassStudent.id)
+    )
+
+    attendance = {}
+    for student_id, student_code, full_name, check_in_time, status, confidence in result:
+        if student_id in attendance:
+            continue
+        attendance[student_id] = AttendanceInfo(
+            student_id=student_id,
+            student_code=student_code,
+            full_name=full_name,
+            check_in_time=check_in_time,
+            status=status or "absent",
+            confidence=confidence
+        )
+
+    return list(attendance.values())
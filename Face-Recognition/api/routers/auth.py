@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, get_async_db
 from pydantic import BaseModel
 from typing import Optional
-from services.auth import authenticate_user, get_session, logout_user, get_user_from_session, require_role
+from services.auth import authenticate_user, get_session, logout_user, get_user_from_session, require_role, get_session_entry_async
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -54,6 +54,20 @@ def require_auth(auth_session_id: str = Header(None, alias="session-id"), db: Se
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     return user
 
+async def _require_role_async(auth_session_id, db, role: str, detail: str):
+    if not auth_session_id:
+        raise HTTPException(status_code=401, detail="Session ID required")
+    entry = await get_session_entry_async(db, auth_session_id)
+    if not entry or entry.role != role:
+        raise HTTPException(status_code=403, detail=detail)
+    return entry
+
+async def require_student_async(auth_session_id: str = Header(None, alias="session-id"), db = Depends(get_async_db)):
+    return await _require_role_async(auth_session_id, db, "student", "Student access required")
+
+async def require_teacher_async(auth_session_id: str = Header(None, alias="session-id"), db = Depends(get_async_db)):
+    return await _require_role_async(auth_session_id, db, "teacher", "Teacher access required")
+
 @router.post("/login", response_model=LoginResponse)
 def login(request: LoginRequest, db: Session = Depends(get_db)):
     session_id, user = authenticate_user(db, request.username, request.password, request.role)
@@ -3,10 +3,11 @@ from sqlalchemy.orm import Session
 from database import get_db
 from pydantic import BaseModel
 from typing import Optional
-from models import Student, AttendanceRecord, AttendanceSession
+from models import AttendanceSession
+from services.attendance import find_student_by_name, existing_record, mark_present
 from services.face_recognition import face_recognition_service
 from routers.auth import require_admin
-from datetime import datetime, date
+from datetime import date
 
 router = APIRouter(prefix="/api/face", tags=["Face Recognition"])
 
@@ -48,22 +49,11 @@ def recognize_face(request: FaceRecognitionRequest, db: Session = Depends(get_db
     if name is None:
         return {
             "success": False,
+            "confidence": confidence,
             "message": message
         }
 
-    import unicodedata
-    def normalize_name(text):
-        text = unicodedata.normalize('NFD', text)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        text = text.replace(' ', '').replace('_', '').lower().strip()
-        return text
-
-    normalized_recognized = normalize_name(name)
-    student = None
-    for s in db.query(Student).all():
-        if normalize_name(s.full_name) == normalized_recognized:
-            student = s
-            break
+    student = find_student_by_name(db, name)
 
     if not student:
         return {
@@ -77,12 +67,7 @@ def recognize_face(request: FaceRecognitionRequest, db: Session = Depends(get_db
         attendance_session = get_or_create_session(db, first_class.id)
 
     if attendance_session:
-        existing = db.query(AttendanceRecord).filter(
-            AttendanceRecord.session_id == attendance_session.id,
-            AttendanceRecord.student_id == student.id
-        ).first()
-
-        if existing:
+        if existing_record(db, attendance_session.id, student.id):
             return {
                 "success": False,
                 "student_name": student.full_name,
@@ -91,15 +76,7 @@ def recognize_face(request: FaceRecognitionRequest, db: Session = Depends(get_db
                 "message": "Already marked"
             }
 
-        record = AttendanceRecord(
-            session_id=attendance_session.id,
-            student_id=student.id,
-            status="present",
-            confidence=confidence,
-            check_in_time=datetime.now()
-        )
-        db.add(record)
-        db.commit()
+        mark_present(db, attendance_session.id, student.id, confidence)
 
         return {
             "success": True,
@@ -121,6 +98,10 @@ def recognize_face(request: FaceRecognitionRequest, db: Session = Depends(get_db
 def get_model_status():
     return {
         "model_loaded": face_recognition_service.model_loaded,
+        "state": face_recognition_service.state(),
+        "load_seconds": face_recognition_service.load_seconds,
+        "warmup_seconds": face_recognition_service.warmup_seconds,
+        "error": face_recognition_service.load_error,
         "model_path": face_recognition_service.model_path,
         "classifier_path": face_recognition_service.classifier_path
     }
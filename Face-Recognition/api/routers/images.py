@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from database import get_db
+from models import FaceImage, Class, ClassStudent
+from routers.auth import require_auth
+from services.image_store import image_store, CHUNK_SIZE
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+# Blobs are addressed by content hash, so a given URL never changes its bytes
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def _get_visible_image(image_id: int, user, db: Session) -> FaceImage:
+    image = db.get(FaceImage, image_id)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    if user.role == "admin":
+        return image
+    if user.role == "student" and user.student_id == image.student_id:
+        return image
+    if user.role == "teacher" and user.teacher_id:
+        teaches_student = db.query(ClassStudent.id).join(Class, Class.id == ClassStudent.class_id).filter(
+            ClassStudent.student_id == image.student_id,
+            Class.teacher_id == user.teacher_id
+        ).first()
+        if teaches_student:
+            return image
+
+    raise HTTPException(status_code=403, detail="Not allowed to view this image")
+
+def _stream(open_blob, etag: str, media_type: str, if_none_match: str):
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        blob = open_blob()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image content missing from store")
+
+    def chunks():
+        with blob:
+            while True:
+                chunk = blob.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
+
+@router.get("/{image_id}")
+def get_image(
+    image_id: int,
+    if_none_match: str = Header(None),
+    user = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    image = _get_visible_image(image_id, user, db)
+    return _stream(lambda: image_store.open_image(image), f'"{image.sha256}"',
+                   image.content_type or "image/jpeg", if_none_match)
+
+@router.get("/{image_id}/thumbnail")
+def get_image_thumbnail(
+    image_id: int,
+    if_none_match: str = Header(None),
+    user = Depends(require_auth),
+    db: Session = Depends(get_db)
+):
+    image = _get_visible_image(image_id, user, db)
+    if not image.has_thumbnail:
+        raise HTTPException(status_code=404, detail="No thumbnail for this image")
+    return _stream(lambda: image_store.open_thumbnail(image), f'"{image.sha256}-thumb"',
+                   "image/jpeg", if_none_match)
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, joinedload, selectinload
 from database import get_db
-from models import User, Student, Class, ClassSchedule, ClassStudent, AttendanceSession, AttendanceRecord, Teacher, Subject
+from models import User, Student, Class, ClassSchedule, ClassStudent, AttendanceSession, AttendanceRecord, Teacher, Subject, FaceImage
 from routers.auth import require_student
+from services.timetable import get_student_timetable
+from services.face_data import refresh_face_data, EMBEDDING_PENDING
+from services.image_store import image_store, image_info
+from services.upload_validation import upload_validator, spool_upload, UploadTooLarge, face_quality
+from services.attendance import student_attendance_query, attendance_page_query, attendance_row, attendance_page, decode_cursor
 from datetime import datetime, date, time
-from typing import List
-import os
-import shutil
-from pathlib import Path
+from typing import List, Optional
+import asyncio
 
 router = APIRouter(prefix="/api/student", tags=["student"])
 
@@ -23,36 +27,7 @@ def get_my_schedule(
     target_date = datetime.strptime(schedule_date, "%Y-%m-%d").date() if schedule_date else date.today()
     day_of_week = target_date.isoweekday()
     
-    enrollments = db.query(ClassStudent).filter(ClassStudent.student_id == user.student.id).all()
-    
-    schedule_list = []
-    for enrollment in enrollments:
-        cls = enrollment.class_obj
-        schedules = db.query(ClassSchedule).filter(
-            ClassSchedule.class_id == cls.id,
-            ClassSchedule.day_of_week == day_of_week
-        ).all()
-        
-        for schedule in schedules:
-            teacher = db.query(Teacher).filter(Teacher.id == cls.teacher_id).first()
-            subject = db.query(Subject).filter(Subject.id == cls.subject_id).first()
-            
-            schedule_list.append({
-                "class_id": cls.id,
-                "class_code": cls.class_code,
-                "class_name": cls.class_name,
-                "subject_code": subject.subject_code if subject else None,
-                "subject_name": subject.subject_name if subject else None,
-                "teacher_code": teacher.teacher_code if teacher else None,
-                "teacher_name": teacher.full_name if teacher else None,
-                "start_time": str(schedule.start_time),
-                "end_time": str(schedule.end_time),
-                "room": schedule.room,
-                "mode": schedule.mode,
-                "day_of_week": schedule.day_of_week
-            })
-    
-    schedule_list.sort(key=lambda x: x["start_time"])
+    schedule_list = get_student_timetable(db, user.student.id, day_of_week)
     
     return {
         "date": str(target_date),
@@ -68,17 +43,23 @@ def get_my_classes(
     if not user.student:
         raise HTTPException(status_code=404, detail="Student profile not found")
     
-    enrollments = db.query(ClassStudent).filter(ClassStudent.student_id == user.student.id).all()
+    enrolled_classes = db.query(Class).join(
+        ClassStudent, ClassStudent.class_id == Class.id
+    ).filter(
+        ClassStudent.student_id == user.student.id
+    ).options(
+        joinedload(Class.teacher),
+        joinedload(Class.subject),
+        selectinload(Class.schedules)
+    ).order_by(ClassStudent.id).all()
     
     classes = []
-    for enrollment in enrollments:
-        cls = enrollment.class_obj
-        teacher = db.query(Teacher).filter(Teacher.id == cls.teacher_id).first()
-        subject = db.query(Subject).filter(Subject.id == cls.subject_id).first()
+    for cls in enrolled_classes:
+        teacher = cls.teacher
+        subject = cls.subject
         
-        schedules = db.query(ClassSchedule).filter(ClassSchedule.class_id == cls.id).all()
         schedule_list = []
-        for schedule in schedules:
+        for schedule in cls.schedules:
             schedule_list.append({
                 "day_of_week": schedule.day_of_week,
                 "start_time": str(schedule.start_time),
@@ -119,39 +100,44 @@ def get_my_attendance(
         ).first()
         if not enrollment:
             raise HTTPException(status_code=404, detail="Not enrolled in this class")
-        
-        sessions = db.query(AttendanceSession).filter(AttendanceSession.class_id == class_id).all()
-    else:
-        enrollments = db.query(ClassStudent).filter(ClassStudent.student_id == user.student.id).all()
-        class_ids = [e.class_id for e in enrollments]
-        sessions = db.query(AttendanceSession).filter(AttendanceSession.class_id.in_(class_ids)).all()
     
-    attendance_records = []
-    for session in sessions:
-        cls = db.query(Class).filter(Class.id == session.class_id).first()
-        record = db.query(AttendanceRecord).filter(
-            AttendanceRecord.session_id == session.id,
-            AttendanceRecord.student_id == user.student.id
+    rows = db.execute(
+        student_attendance_query(user.student.id, class_id)
+        .order_by(AttendanceSession.session_date.desc(), AttendanceSession.id)
+    )
+    
+    return [attendance_row(row) for row in rows]
+
+@router.get("/my-attendance/history")
+def get_my_attendance_history(
+    class_id: int = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(require_student),
+    db: Session = Depends(get_db)
+):
+    """Attendance history, newest first; pass next_cursor back to get the following page"""
+    if not user.student:
+        raise HTTPException(status_code=404, detail="Student profile not found")
+    
+    if class_id:
+        enrollment = db.query(ClassStudent).filter(
+            ClassStudent.student_id == user.student.id,
+            ClassStudent.class_id == class_id
         ).first()
-        
-        attendance_records.append({
-            "session_id": session.id,
-            "class_code": cls.class_code,
-            "class_name": cls.class_name,
-            "session_date": str(session.session_date),
-            "start_time": str(session.start_time),
-            "end_time": str(session.end_time),
-            "status": record.status if record else "absent",
-            "check_in_time": str(record.check_in_time) if record and record.check_in_time else None,
-            "confidence": record.confidence if record else None
-        })
+        if not enrollment:
+            raise HTTPException(status_code=404, detail="Not enrolled in this class")
     
-    attendance_records.sort(key=lambda x: x["session_date"], reverse=True)
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return attendance_records
+    rows = db.execute(attendance_page_query(user.student.id, class_id, position, limit))
+    return attendance_page(rows, limit)
 
 @router.post("/check-in")
-async def student_check_in(
+def student_check_in(
     class_id: int,
     image_base64: str,
     user: User = Depends(require_student),
@@ -208,46 +194,42 @@ async def student_check_in(
     if existing_record:
         raise HTTPException(status_code=400, detail="Already checked in for this session")
     
-    import base64
     from services.face_recognition import face_recognition_service
-    
+
     try:
-        image_data = base64.b64decode(image_base64)
-        result = await face_recognition_service.recognize_face(image_data)
-        
-        if not result or not result.get("student_code"):
-            raise HTTPException(status_code=400, detail="Face not recognized")
-        
-        if result["student_code"] != user.student.student_code:
-            raise HTTPException(status_code=400, detail="Face does not match your profile")
-        
-        status = "present"
-        if current_time > schedule.start_time:
-            time_diff = (datetime.combine(today, current_time) - datetime.combine(today, schedule.start_time)).total_seconds() / 60
-            if time_diff > 15:
-                status = "late"
-        
-        record = AttendanceRecord(
-            session_id=session.id,
-            student_id=user.student.id,
-            status=status,
-            check_in_time=now,
-            confidence=result.get("confidence")
-        )
-        db.add(record)
-        db.commit()
-        
-        return {
-            "success": True,
-            "status": status,
-            "check_in_time": str(now),
-            "confidence": result.get("confidence"),
-            "message": f"Checked in successfully as {status}"
-        }
-        
+        name, confidence, message = face_recognition_service.recognize_face(image_base64)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Check-in failed: {str(e)}")
 
+    if name is None:
+        raise HTTPException(status_code=400, detail=f"Face not recognized: {message}")
+    if name != user.student.student_code:
+        raise HTTPException(status_code=400, detail="Face does not match your profile")
+
+    status = "present"
+    if current_time > schedule.start_time:
+        time_diff = (datetime.combine(today, current_time) - datetime.combine(today, schedule.start_time)).total_seconds() / 60
+        if time_diff > 15:
+            status = "late"
+
+    record = AttendanceRecord(
+        session_id=session.id,
+        student_id=user.student.id,
+        status=status,
+        check_in_time=now,
+        confidence=float(confidence) if confidence is not None else None
+    )
+    db.add(record)
+    db.commit()
+
+    return {
+        "success": True,
+        "status": status,
+        "check_in_time": str(now),
+        "confidence": record.confidence,
+        "message": f"Checked in successfully as {status}"
+    }
+
 
 @router.post("/upload-face-images")
 async def upload_face_images(
@@ -261,41 +243,55 @@ async def upload_face_images(
 
     student_code = user.student.student_code
 
-    # Create directory for student's face data
-    base_dir = Path("Dataset/FaceData/processed")
-    student_dir = base_dir / student_code
-    student_dir.mkdir(parents=True, exist_ok=True)
-
     uploaded_files = []
-    for file in files:
-        if not file.content_type.startswith("image/"):
-            continue
+    rejected_files = []
+    spooled = []
+    try:
+        for file in files:
+            if not (file.content_type or "").startswith("image/"):
+                rejected_files.append({"filename": file.filename, "reason": "Not an image"})
+                continue
+            try:
+                spooled.append((file, await spool_upload(file)))
+            except UploadTooLarge as e:
+                rejected_files.append({"filename": file.filename, "reason": str(e)})
 
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        ext = os.path.splitext(file.filename)[1]
-        filename = f"{student_code}_{timestamp}{ext}"
-        file_path = student_dir / filename
+        results = await asyncio.gather(*(upload_validator.validate_file(path) for _, path in spooled))
+    finally:
+        for _, path in spooled:
+            path.unlink(missing_ok=True)
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    for (file, _), (data, result) in zip(spooled, results):
+        if not result.ok:
+            rejected_files.append({"filename": file.filename, "reason": result.reason, "checks": result.to_dict()})
+            continue
 
+        image, created = await run_in_threadpool(image_store.save, db, user.student, data, "processed",
+                                                 filename=file.filename, content_type=file.content_type,
+                                                 quality=face_quality(result.metrics))
         uploaded_files.append({
-            "filename": filename,
-            "path": str(file_path)
+            **image_info(image),
+            "path": str(image_store.dataset_path(image, student_code)),
+            "duplicate": not created,
+            "checks": result.to_dict()
         })
 
+    if uploaded_files:
+        refresh_face_data(db, user.student, image_store.dataset_dir("processed", student_code), EMBEDDING_PENDING)
+
     return {
         "success": True,
         "uploaded_count": len(uploaded_files),
         "files": uploaded_files,
+        "rejected_count": len(rejected_files),
+        "rejected": rejected_files,
         "message": f"Uploaded {len(uploaded_files)} images for {student_code}"
     }
 
 
 @router.get("/my-face-images")
 def get_my_face_images(
+    sort: str = "created",
     user: User = Depends(require_student),
     db: Session = Depends(get_db)
 ):
@@ -304,19 +300,7 @@ def get_my_face_images(
         raise HTTPException(status_code=404, detail="Student profile not found")
 
     student_code = user.student.student_code
-    student_dir = Path("Dataset/FaceData/processed") / student_code
-
-    if not student_dir.exists():
-        return {"images": [], "count": 0}
-
-    images = []
-    for img_file in student_dir.glob("*"):
-        if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-            images.append({
-                "filename": img_file.name,
-                "size": img_file.stat().st_size,
-                "created_at": datetime.fromtimestamp(img_file.stat().st_ctime).isoformat()
-            })
+    images = [image_info(image) for image in image_store.list_images(db, user.student.id, "processed", sort)]
 
     return {
         "images": images,
@@ -336,16 +320,16 @@ def delete_my_face_image(
         raise HTTPException(status_code=404, detail="Student profile not found")
 
     student_code = user.student.student_code
-    file_path = Path("Dataset/FaceData/processed") / student_code / filename
-
-    if not file_path.exists():
+    image = db.query(FaceImage).filter(
+        FaceImage.student_id == user.student.id,
+        FaceImage.kind == "processed",
+        FaceImage.filename == filename
+    ).first()
+    if not image:
         raise HTTPException(status_code=404, detail="Image not found")
 
-    # Security check: ensure filename doesn't contain path traversal
-    if ".." in filename or "/" in filename or "\\" in filename:
-        raise HTTPException(status_code=400, detail="Invalid filename")
-
-    file_path.unlink()
+    image_store.delete(db, image, student_code)
+    refresh_face_data(db, user.student, image_store.dataset_dir("processed", student_code), EMBEDDING_PENDING)
 
     return {
         "success": True,
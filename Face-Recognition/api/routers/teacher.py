@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime, date, time
-import os
-import shutil
 
 from database import get_db
 from models import User, Teacher, Class, Student, ClassStudent, AttendanceSession, AttendanceRecord
 from routers.auth import require_teacher
+from services.accounts import create_student_account
+from services.timetable import timetable_cache
+from services.face_data import student_has_face_data, refresh_face_data
+from services.image_store import image_store, image_info
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
 
@@ -40,6 +42,11 @@ class AddStudentsRequest(BaseModel):
 class FaceImageInfo(BaseModel):
     image_path: str
     created_at: Optional[str]
+    url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    quality_score: Optional[float] = None
+    sharpness: Optional[float] = None
+    face_size: Optional[int] = None
 
 class AttendanceInfo(BaseModel):
     student_id: int
@@ -55,13 +62,9 @@ def get_all_students(user: User = Depends(require_teacher), db: Session = Depend
     if not user.teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
 
-    students = db.query(Student).all()
+    students = db.query(Student).options(joinedload(Student.face_data)).all()
     result = []
     for student in students:
-        # Check if student has face data
-        face_data_path = f"Dataset/FaceData/processed/{student.student_code}"
-        has_face_data = os.path.exists(face_data_path) and len(os.listdir(face_data_path)) > 0
-
         result.append(StudentInfo(
             student_id=student.id,
             student_code=student.student_code,
@@ -69,7 +72,7 @@ def get_all_students(user: User = Depends(require_teacher), db: Session = Depend
             email=student.email,
             phone=student.phone,
             year=student.year,
-            has_face_data=has_face_data
+            has_face_data=student_has_face_data(student)
         ))
 
     return result
@@ -119,15 +122,14 @@ def get_class_students(class_id: int, user: User = Depends(require_teacher), db:
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found or you don't have permission")
 
-    enrollments = db.query(ClassStudent).filter(ClassStudent.class_id == class_id).all()
+    enrollments = db.query(ClassStudent).options(
+        joinedload(ClassStudent.student).joinedload(Student.face_data)
+    ).filter(ClassStudent.class_id == class_id).all()
 
     result = []
     for enrollment in enrollments:
         student = enrollment.student
 
-        face_data_path = os.path.join("Dataset", "FaceData", "processed", student.student_code)
-        has_face_data = os.path.exists(face_data_path) and len(os.listdir(face_data_path)) > 0
-
         result.append(StudentInfo(
             student_id=student.id,
             student_code=student.student_code,
@@ -135,7 +137,7 @@ def get_class_students(class_id: int, user: User = Depends(require_teacher), db:
             email=student.email,
             phone=student.phone,
             year=student.year,
-            has_face_data=has_face_data
+            has_face_data=student_has_face_data(student)
         ))
 
     return result
@@ -166,6 +168,7 @@ def add_students_to_class(class_id: int, request: AddStudentsRequest, user: User
             added_count += 1
 
     db.commit()
+    timetable_cache.invalidate_students(request.student_ids)
 
     return {"message": f"Added {added_count} students to class", "added_count": added_count}
 
@@ -188,11 +191,12 @@ def remove_student_from_class(class_id: int, student_id: int, user: User = Depen
 
     db.delete(enrollment)
     db.commit()
+    timetable_cache.invalidate_students([student_id])
 
     return {"message": "Student removed from class"}
 
 @router.get("/students/{student_id}/face-images", response_model=List[FaceImageInfo])
-def get_student_face_images(student_id: int, user: User = Depends(require_teacher), db: Session = Depends(get_db)):
+def get_student_face_images(student_id: int, sort: str = "created", user: User = Depends(require_teacher), db: Session = Depends(get_db)):
     if not user.teacher:
         raise HTTPException(status_code=404, detail="Teacher profile not found")
 
@@ -210,20 +214,18 @@ def get_student_face_images(student_id: int, user: User = Depends(require_teache
     if not enrolled_classes:
         raise HTTPException(status_code=403, detail="Student not in any of your classes")
 
-    face_data_path = os.path.join("Dataset", "FaceData", "processed", student.student_code)
-
-    if not os.path.exists(face_data_path):
-        return []
-
     images = []
-    for filename in os.listdir(face_data_path):
-        if filename.endswith(('.jpg', '.jpeg', '.png')):
-            image_path = os.path.join(face_data_path, filename)
-            created_at = datetime.fromtimestamp(os.path.getctime(image_path)).isoformat()
-            images.append(FaceImageInfo(
-                image_path=image_path,
-                created_at=created_at
-            ))
+    for image in image_store.list_images(db, student.id, "processed", sort):
+        info = image_info(image)
+        images.append(FaceImageInfo(
+            image_path=str(image_store.dataset_path(image, student.student_code)),
+            created_at=info["created_at"],
+            url=info["url"],
+            thumbnail_url=info["thumbnail_url"],
+            quality_score=image.quality_score,
+            sharpness=image.sharpness,
+            face_size=image.face_size
+        ))
 
     return images
 
@@ -246,13 +248,11 @@ def delete_student_face_images(student_id: int, user: User = Depends(require_tea
     if not enrolled_classes:
         raise HTTPException(status_code=403, detail="Student not in any of your classes")
 
-    face_data_path = os.path.join("Dataset", "FaceData", "processed", student.student_code)
-
-    if not os.path.exists(face_data_path):
+    deleted_count = image_store.delete_student_images(db, student, "processed")
+    if not deleted_count:
         return {"message": "No face images found", "deleted_count": 0}
 
-    deleted_count = len(os.listdir(face_data_path))
-    shutil.rmtree(face_data_path)
+    refresh_face_data(db, student, image_store.dataset_dir("processed", student.student_code))
 
     return {"message": f"Deleted {deleted_count} face images", "deleted_count": deleted_count}
 
@@ -445,36 +445,7 @@ def create_and_add_student(
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found or you don't have permission")
 
-    last_student = db.query(Student).order_by(Student.id.desc()).first()
-    next_number = 1 if not last_student else last_student.id + 1
-    student_code = f"SV{next_number:03d}"
-
-    student = Student(
-        student_code=student_code,
-        full_name=student_data.full_name,
-        email=student_data.email,
-        phone=student_data.phone,
-        year=student_data.year,
-        password=student_data.password
-    )
-    db.add(student)
-    db.commit()
-    db.refresh(student)
-
-    user_account = User(
-        username=student.student_code,
-        password=student_data.password,
-        role="student",
-        student_id=student.id
-    )
-    db.add(user_account)
-
-    enrollment = ClassStudent(
-        class_id=class_id,
-        student_id=student.id
-    )
-    db.add(enrollment)
-    db.commit()
+    student = create_student_account(db, student_data, class_id=class_id)
 
     return {
         "student_id": student.id,
@@ -554,6 +525,7 @@ def remove_student_from_class(
 
     db.delete(enrollment)
     db.commit()
+    timetable_cache.invalidate_students([student_id])
 
     return {"message": "Student removed from class successfully"}
 
@@ -561,6 +533,7 @@ def remove_student_from_class(
 def get_student_images(
     class_id: int,
     student_id: int,
+    sort: str = "created",
     user: User = Depends(require_teacher),
     db: Session = Depends(get_db)
 ):
@@ -582,20 +555,12 @@ def get_student_images(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    face_data_path = f"../Dataset/FaceData/processed/{student.student_code}"
-    if not os.path.exists(face_data_path):
-        return {"student_code": student.student_code, "images": []}
-
     images = []
-    for filename in os.listdir(face_data_path):
-        if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-            image_path = os.path.join(face_data_path, filename)
-            stat = os.stat(image_path)
-            images.append({
-                "filename": filename,
-                "path": image_path,
-                "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat()
-            })
+    for image in image_store.list_images(db, student.id, "processed", sort):
+        images.append({
+            **image_info(image),
+            "path": str(image_store.dataset_path(image, student.student_code))
+        })
 
     return {
         "student_code": student.student_code,
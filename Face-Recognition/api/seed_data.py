@@ -1,15 +1,30 @@
 """
 Seed database with sample data
+
+Usage:
+    python seed_data.py              # add whatever sample rows are missing
+    python seed_data.py --if_empty   # only seed a database without users (used on container start)
 """
-from database import SessionLocal, engine, Base
+import argparse
+import sys
+from database import SessionLocal, ensure_schema
 from models import User, Teacher, Student, Subject, Class, ClassSchedule, ClassStudent
 from datetime import time
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+parser = argparse.ArgumentParser(description="Seed the database with sample data")
+parser.add_argument("--if_empty", action="store_true", help="Do nothing when the database already has users")
+args = parser.parse_args()
+
+# Create missing tables
+ensure_schema()
 
 db = SessionLocal()
 
+if args.if_empty and db.query(User.id).first() is not None:
+    print("ℹ️  Database already has users, skipping seed")
+    db.close()
+    sys.exit(0)
+
 # Clear existing data (optional - comment out if you want to keep existing data)
 # db.query(ClassStudent).delete()
 # db.query(ClassSchedule).delete()
@@ -46,20 +61,18 @@ for t_data in teachers_data:
         teachers.append(existing_teacher)
         continue
 
-    user = User(username=t_data["code"], password=t_data["password"], role="teacher")
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
     teacher = Teacher(
-        user_id=user.id,
         teacher_code=t_data["code"],
         full_name=t_data["name"],
         email=t_data["email"],
         phone=t_data["phone"],
-        department=t_data["dept"]
+        department=t_data["dept"],
+        password=t_data["password"]
     )
     db.add(teacher)
+    db.flush()
+
+    db.add(User(username=t_data["code"], password=t_data["password"], role="teacher", teacher_id=teacher.id))
     db.commit()
     db.refresh(teacher)
     teachers.append(teacher)
@@ -83,20 +96,18 @@ for s_data in students_data:
         students.append(existing_student)
         continue
 
-    user = User(username=s_data["code"], password=s_data["password"], role="student")
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-
     student = Student(
-        user_id=user.id,
         student_code=s_data["code"],
         full_name=s_data["name"],
         email=s_data["email"],
         phone=s_data["phone"],
-        year=s_data["year"]
+        year=s_data["year"],
+        password=s_data["password"]
     )
     db.add(student)
+    db.flush()
+
+    db.add(User(username=s_data["code"], password=s_data["password"], role="student", student_id=student.id))
     db.commit()
     db.refresh(student)
     students.append(student)
@@ -179,6 +190,14 @@ schedules_data = [
 ]
 
 for sched_data in schedules_data:
+    # Skip schedules that already exist
+    if db.query(ClassSchedule.id).filter(
+        ClassSchedule.class_id == classes[sched_data["class_idx"]].id,
+        ClassSchedule.day_of_week == sched_data["day"],
+        ClassSchedule.start_time == time.fromisoformat(sched_data["start"])
+    ).first():
+        continue
+
     schedule = ClassSchedule(
         class_id=classes[sched_data["class_idx"]].id,
         day_of_week=sched_data["day"],
@@ -208,6 +227,13 @@ class_students_data = [
 ]
 
 for cs_data in class_students_data:
+    # Skip enrollments that already exist
+    if db.query(ClassStudent.id).filter(
+        ClassStudent.class_id == classes[cs_data["class_idx"]].id,
+        ClassStudent.student_id == students[cs_data["student_idx"]].id
+    ).first():
+        continue
+
     class_student = ClassStudent(
         class_id=classes[cs_data["class_idx"]].id,
         student_id=students[cs_data["student_idx"]].id
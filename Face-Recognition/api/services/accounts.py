@@ -0,0 +1,283 @@
+import csv
+import io
+import json
+import os
+import time
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import CodeCounter, Student, Teacher, User, Class, ClassStudent
+
+STUDENT_CODE_PREFIX = "SV"
+TEACHER_CODE_PREFIX = "GV"
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# kind -> (model, code attribute, code prefix, user role, user foreign key, extra profile fields)
+_IMPORT_SPECS = {
+    "student": (Student, "student_code", STUDENT_CODE_PREFIX, "student", "student_id", ("email", "phone", "year")),
+    "teacher": (Teacher, "teacher_code", TEACHER_CODE_PREFIX, "teacher", "teacher_id", ("email", "phone", "department")),
+}
+
+def _current_max_code(db: Session, prefix: str, code_column) -> int:
+    highest = 0
+    for (code,) in db.query(code_column).filter(code_column.like(f"{prefix}%")):
+        suffix = code[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+def _locked_counter(db: Session, prefix: str, code_column) -> CodeCounter:
+    """The counter row of `prefix`, created from the codes in use if missing, locked until the caller commits"""
+    counter = db.query(CodeCounter).filter(CodeCounter.prefix == prefix).with_for_update().first()
+    if not counter:
+        try:
+            with db.begin_nested():
+                db.add(CodeCounter(prefix=prefix, last_value=_current_max_code(db, prefix, code_column)))
+        except IntegrityError:
+            pass
+        counter = db.query(CodeCounter).filter(CodeCounter.prefix == prefix).with_for_update().first()
+    return counter
+
+def allocate_codes(db: Session, prefix: str, code_column, count: int = 1):
+    """Reserve `count` consecutive codes for `prefix`.
+
+    The counter row is locked until the caller commits, so concurrent
+    requests never hand out the same code.
+    """
+    counter = _locked_counter(db, prefix, code_column)
+    first = counter.last_value + 1
+    counter.last_value = counter.last_value + count
+    db.flush()
+    return [f"{prefix}{value:03d}" for value in range(first, first + count)]
+
+def reserve_codes(db: Session, prefix: str, code_column, codes):
+    """Move the counter of `prefix` past explicitly chosen codes so it never allocates one of them"""
+    suffixes = [int(code[len(prefix):]) for code in codes
+                if code.startswith(prefix) and code[len(prefix):].isdigit()]
+    if not suffixes:
+        return
+    counter = _locked_counter(db, prefix, code_column)
+    if max(suffixes) > counter.last_value:
+        counter.last_value = max(suffixes)
+        db.flush()
+
+def create_student_account(db: Session, student_data, class_id: int = None) -> Student:
+    """Create a student, its login and (optionally) an enrollment in one transaction"""
+    student_code = allocate_codes(db, STUDENT_CODE_PREFIX, Student.student_code)[0]
+    student = Student(
+        student_code=student_code,
+        full_name=student_data.full_name,
+        email=student_data.email,
+        phone=student_data.phone,
+        year=student_data.year,
+        password=student_data.password
+    )
+    db.add(student)
+    db.flush()
+
+    db.add(User(
+        username=student_code,
+        password=student_data.password,
+        role="student",
+        student_id=student.id
+    ))
+    if class_id:
+        db.add(ClassStudent(class_id=class_id, student_id=student.id))
+    db.commit()
+    db.refresh(student)
+    return student
+
+def create_teacher_account(db: Session, teacher_data) -> Teacher:
+    """Create a teacher and its login in one transaction"""
+    teacher_code = allocate_codes(db, TEACHER_CODE_PREFIX, Teacher.teacher_code)[0]
+    teacher = Teacher(
+        teacher_code=teacher_code,
+        full_name=teacher_data.full_name,
+        email=teacher_data.email,
+        phone=teacher_data.phone,
+        department=teacher_data.department,
+        password=teacher_data.password
+    )
+    db.add(teacher)
+    db.flush()
+
+    db.add(User(
+        username=teacher_code,
+        password=teacher_data.password,
+        role="teacher",
+        teacher_id=teacher.id
+    ))
+    db.commit()
+    db.refresh(teacher)
+    return teacher
+
+def iter_import_rows(stream, file_format: str):
+    """Yield (row_number, row, error) from a binary CSV or JSON-lines stream without loading it whole"""
+    if file_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format '{file_format}'. Use one of: {', '.join(IMPORT_FORMATS)}")
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(text), 1):
+            yield row_number, row, None
+        return
+
+    row_number = 0
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object"
+            continue
+        yield row_number, row, None
+
+def _clean_value(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _clean_row(kind: str, row: dict):
+    _, code_field, _, _, _, extra_fields = _IMPORT_SPECS[kind]
+    values = {
+        "code": _clean_value(row.get(code_field)),
+        "full_name": _clean_value(row.get("full_name")),
+        "password": _clean_value(row.get("password")),
+    }
+    for field in extra_fields:
+        values[field] = _clean_value(row.get(field))
+
+    if not values["full_name"]:
+        return None, "full_name is required"
+    if not values["password"]:
+        return None, "password is required"
+
+    if "year" in values and values["year"] is not None:
+        try:
+            values["year"] = int(values["year"])
+        except ValueError:
+            return None, "year must be an integer"
+        if values["year"] < 2000 or values["year"] > 2100:
+            return None, "Year must be between 2000 and 2100"
+
+    if kind == "student":
+        class_codes = row.get("class_codes") or []
+        if isinstance(class_codes, str):
+            class_codes = class_codes.replace(",", ";").split(";")
+        values["class_codes"] = [c for c in (_clean_value(c) for c in class_codes) if c]
+
+    return values, None
+
+def _import_batch(db: Session, kind: str, batch, dry_run: bool, seen_codes: set, report: dict):
+    model, code_field, prefix, role, user_fk, extra_fields = _IMPORT_SPECS[kind]
+    code_column = getattr(model, code_field)
+
+    explicit_codes = [values["code"] for _, values in batch if values["code"]]
+    taken = set()
+    if explicit_codes:
+        taken.update(code for (code,) in db.query(code_column).filter(code_column.in_(explicit_codes)))
+        taken.update(name for (name,) in db.query(User.username).filter(User.username.in_(explicit_codes)))
+
+    class_ids = {}
+    wanted_classes = {code for _, values in batch for code in values.get("class_codes", [])}
+    if wanted_classes:
+        class_ids = dict(db.query(Class.class_code, Class.id).filter(Class.class_code.in_(wanted_classes)))
+
+    accepted = []
+    for row_number, values in batch:
+        code = values["code"]
+        if code and (code in taken or code in seen_codes):
+            report["conflicts"].append({"row": row_number, "code": code, "reason": "Code or username already exists"})
+            continue
+        unknown = [c for c in values.get("class_codes", []) if c not in class_ids]
+        if unknown:
+            report["conflicts"].append({"row": row_number, "code": code, "reason": f"Unknown class code(s): {', '.join(unknown)}"})
+            continue
+        if code:
+            seen_codes.add(code)
+        accepted.append((row_number, values))
+
+    enrollment_count = sum(len(values.get("class_codes", [])) for _, values in accepted)
+    if dry_run or not accepted:
+        report["created"] += len(accepted)
+        report["enrollments"] += enrollment_count
+        return
+
+    # Explicit codes first, so the counter never hands them out, in this batch or later
+    reserve_codes(db, prefix, code_column, [values["code"] for _, values in accepted if values["code"]])
+    auto_rows = [values for _, values in accepted if not values["code"]]
+    if auto_rows:
+        for values, code in zip(auto_rows, allocate_codes(db, prefix, code_column, len(auto_rows))):
+            values["code"] = code
+
+    codes = [values["code"] for _, values in accepted]
+    try:
+        profiles = []
+        for _, values in accepted:
+            profile = {code_field: values["code"], "full_name": values["full_name"], "password": values["password"]}
+            for field in extra_fields:
+                profile[field] = values[field]
+            profiles.append(profile)
+        db.execute(insert(model), profiles)
+
+        ids = dict(db.query(code_column, model.id).filter(code_column.in_(codes)))
+        db.execute(insert(User), [
+            {"username": values["code"], "password": values["password"], "role": role, user_fk: ids[values["code"]]}
+            for _, values in accepted
+        ])
+        if enrollment_count:
+            db.execute(insert(ClassStudent), [
+                {"class_id": class_ids[class_code], "student_id": ids[values["code"]]}
+                for _, values in accepted for class_code in values["class_codes"]
+            ])
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        for row_number, values in accepted:
+            report["conflicts"].append({"row": row_number, "code": values["code"], "reason": f"Batch rejected by database: {e.orig}"})
+        return
+
+    report["created"] += len(accepted)
+    report["enrollments"] += enrollment_count
+
+def import_accounts(db: Session, kind: str, rows, dry_run: bool = False, batch_size: int = IMPORT_BATCH_SIZE):
+    """Import student or teacher accounts from rows produced by `iter_import_rows`.
+
+    Rows are inserted in batches of `batch_size`, one transaction per batch.
+    Codes missing from a row are allocated from the shared code counter.
+    With `dry_run` nothing is written and the report only lists conflicts.
+    """
+    if kind not in _IMPORT_SPECS:
+        raise ValueError(f"Unsupported account kind '{kind}'")
+
+    started = time.perf_counter()
+    report = {"kind": kind, "dry_run": dry_run, "total_rows": 0, "created": 0, "enrollments": 0, "conflicts": []}
+    seen_codes = set()
+    batch = []
+
+    for row_number, row, error in rows:
+        report["total_rows"] += 1
+        if error is None:
+            values, error = _clean_row(kind, row)
+        if error:
+            report["conflicts"].append({"row": row_number, "code": None, "reason": error})
+            continue
+        batch.append((row_number, values))
+        if len(batch) >= batch_size:
+            _import_batch(db, kind, batch, dry_run, seen_codes, report)
+            batch = []
+
+    if batch:
+        _import_batch(db, kind, batch, dry_run, seen_codes, report)
+
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,104 @@
+import base64
+import unicodedata
+from datetime import date, datetime
+from sqlalchemy import select, and_, or_
+from models import Class, ClassStudent, Student, AttendanceSession, AttendanceRecord
+
+def normalize_name(text: str) -> str:
+    """Accents, spaces and underscores removed and lowercased, so classifier names match full names"""
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    return text.replace(' ', '').replace('_', '').lower().strip()
+
+def find_student_by_name(db, name: str):
+    """The student whose full name matches a recognised name, or None"""
+    normalized = normalize_name(name)
+    for student in db.query(Student).all():
+        if normalize_name(student.full_name) == normalized:
+            return student
+    return None
+
+def existing_record(db, session_id: int, student_id: int):
+    return db.query(AttendanceRecord).filter(
+        AttendanceRecord.session_id == session_id,
+        AttendanceRecord.student_id == student_id
+    ).first()
+
+def mark_present(db, session_id: int, student_id: int, confidence: float):
+    record = AttendanceRecord(
+        session_id=session_id,
+        student_id=student_id,
+        status="present",
+        confidence=confidence,
+        check_in_time=datetime.now()
+    )
+    db.add(record)
+    db.commit()
+    return record
+
+def student_attendance_query(student_id: int, class_id: int = None):
+    """Sessions of the student's classes outer-joined with the student's own record"""
+    if class_id:
+        class_filter = AttendanceSession.class_id == class_id
+    else:
+        class_filter = AttendanceSession.class_id.in_(
+            select(ClassStudent.class_id).where(ClassStudent.student_id == student_id)
+        )
+
+    return (
+        select(AttendanceSession, Class.class_code, Class.class_name,
+               AttendanceRecord.status, AttendanceRecord.check_in_time, AttendanceRecord.confidence)
+        .join(Class, Class.id == AttendanceSession.class_id)
+        .outerjoin(AttendanceRecord, and_(
+            AttendanceRecord.session_id == AttendanceSession.id,
+            AttendanceRecord.student_id == student_id
+        ))
+        .where(class_filter)
+    )
+
+def attendance_page_query(student_id: int, class_id: int = None, cursor=None, limit: int = 20):
+    """One page of history, newest first, keyset-paginated on (session_date, id)"""
+    query = student_attendance_query(student_id, class_id)
+    if cursor:
+        cursor_date, cursor_id = cursor
+        query = query.where(or_(
+            AttendanceSession.session_date < cursor_date,
+            and_(AttendanceSession.session_date == cursor_date, AttendanceSession.id < cursor_id)
+        ))
+    return query.order_by(AttendanceSession.session_date.desc(), AttendanceSession.id.desc()).limit(limit + 1)
+
+def attendance_row(row):
+    session, class_code, class_name, status, check_in_time, confidence = row
+    return {
+        "session_id": session.id,
+        "class_code": class_code,
+        "class_name": class_name,
+        "session_date": str(session.session_date),
+        "start_time": str(session.start_time),
+        "end_time": str(session.end_time),
+        "status": status or "absent",
+        "check_in_time": str(check_in_time) if check_in_time else None,
+        "confidence": confidence
+    }
+
+def encode_cursor(session_date: date, session_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{session_date.isoformat()}|{session_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        session_date, session_id = raw.split("|", 1)
+        return date.fromisoformat(session_date), int(session_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def attendance_page(rows, limit: int):
+    """Split a limit+1 result into (items, next_cursor)"""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_session = rows[-1][0]
+        next_cursor = encode_cursor(last_session.session_date, last_session.id)
+    return {"items": [attendance_row(row) for row in rows], "next_cursor": next_cursor}
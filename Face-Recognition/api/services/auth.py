@@ -1,7 +1,38 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime
-from models import Session as DBSession, User, Student
-from utils import generate_session_id, get_session_expiry
+from models import Session as DBSession, User, Student, Teacher
+from utils import generate_session_id, get_session_expiry, MAX_SESSIONS_PER_USER
+from services.session_cache import session_cache, SessionEntry
+
+class AuthenticatedUser:
+    """Stand-in for `User` built from a cached session entry.
+
+    Exposes the attributes routers read from the current user; the
+    student/teacher profile is only loaded if a handler touches it.
+    """
+
+    def __init__(self, db: Session, entry: SessionEntry):
+        self._db = db
+        self.id = entry.user_id
+        self.username = entry.username
+        self.role = entry.role
+        self.student_id = entry.student_id
+        self.teacher_id = entry.teacher_id
+        self._student = None
+        self._teacher = None
+
+    @property
+    def student(self):
+        if self._student is None and self.student_id is not None:
+            self._student = self._db.get(Student, self.student_id)
+        return self._student
+
+    @property
+    def teacher(self):
+        if self._teacher is None and self.teacher_id is not None:
+            self._teacher = self._db.get(Teacher, self.teacher_id)
+        return self._teacher
 
 def authenticate_user(db: Session, username: str, password: str, role: str = None):
     user = db.query(User).filter(User.username == username).first()
@@ -13,16 +44,34 @@ def authenticate_user(db: Session, username: str, password: str, role: str = Non
         return None, None
 
     session_id = generate_session_id()
+    expires_at = get_session_expiry()
+    entry = SessionEntry(user.id, user.username, user.role, user.student_id, user.teacher_id, expires_at)
     session = DBSession(
         session_id=session_id,
         user_id=user.id,
-        expires_at=get_session_expiry()
+        expires_at=expires_at
     )
     db.add(session)
+    if MAX_SESSIONS_PER_USER > 0:
+        db.flush()
+        _trim_user_sessions(db, entry.user_id, MAX_SESSIONS_PER_USER)
     db.commit()
 
+    session_cache.put(session_id, entry)
     return session_id, user
 
+def _trim_user_sessions(db: Session, user_id: int, keep: int):
+    """Delete all but the `keep` newest sessions of a user"""
+    stale = db.query(DBSession.id, DBSession.session_id).filter(
+        DBSession.user_id == user_id
+    ).order_by(DBSession.created_at.desc(), DBSession.id.desc()).offset(keep).all()
+    if not stale:
+        return
+
+    db.query(DBSession).filter(DBSession.id.in_([row.id for row in stale])).delete(synchronize_session=False)
+    for row in stale:
+        session_cache.invalidate(row.session_id)
+
 def get_session(db: Session, session_id: str):
     session = db.query(DBSession).filter(
         DBSession.session_id == session_id,
@@ -31,14 +80,23 @@ def get_session(db: Session, session_id: str):
     return session
 
 def get_user_from_session(db: Session, session_id: str):
-    session = get_session(db, session_id)
-    if not session:
-        return None
+    entry = session_cache.get(session_id)
+    if entry is None:
+        row = db.query(
+            User.id, User.username, User.role, User.student_id, User.teacher_id, DBSession.expires_at
+        ).join(DBSession, DBSession.user_id == User.id).filter(
+            DBSession.session_id == session_id,
+            DBSession.expires_at > datetime.utcnow()
+        ).first()
+        if not row:
+            return None
+        entry = SessionEntry(*row)
+        session_cache.put(session_id, entry)
 
-    user = db.query(User).filter(User.id == session.user_id).first()
-    return user
+    return AuthenticatedUser(db, entry)
 
 def logout_user(db: Session, session_id: str):
+    session_cache.invalidate(session_id)
     session = db.query(DBSession).filter(DBSession.session_id == session_id).first()
     if session:
         db.delete(session)
@@ -46,8 +104,56 @@ def logout_user(db: Session, session_id: str):
         return True
     return False
 
+def delete_user_sessions(db: Session, user_id: int):
+    """Remove every session of a user; call before deleting the user"""
+    db.query(DBSession).filter(DBSession.user_id == user_id).delete(synchronize_session=False)
+    session_cache.invalidate_user(user_id)
+
 def require_role(db: Session, session_id: str, required_role: str):
     user = get_user_from_session(db, session_id)
     if not user or user.role != required_role:
         return None
     return user
+
+async def authenticate_user_async(db, username: str, password: str, role: str = None):
+    """Async login: returns (session_id, user, student, teacher) using one profile query"""
+    result = await db.execute(
+        select(User, Student, Teacher)
+        .outerjoin(Student, User.student_id == Student.id)
+        .outerjoin(Teacher, User.teacher_id == Teacher.id)
+        .where(User.username == username)
+    )
+    row = result.first()
+    if not row:
+        return None, None, None, None
+
+    user, student, teacher = row
+    if user.password != password or (role and user.role != role):
+        return None, None, None, None
+
+    session_id = generate_session_id()
+    expires_at = get_session_expiry()
+    db.add(DBSession(session_id=session_id, user_id=user.id, expires_at=expires_at))
+    if MAX_SESSIONS_PER_USER > 0:
+        await db.flush()
+        await db.run_sync(lambda sync_db: _trim_user_sessions(sync_db, user.id, MAX_SESSIONS_PER_USER))
+    await db.commit()
+
+    session_cache.put(session_id, SessionEntry(user.id, user.username, user.role, user.student_id, user.teacher_id, expires_at))
+    return session_id, user, student, teacher
+
+async def get_session_entry_async(db, session_id: str):
+    """Async counterpart of get_user_from_session; returns a SessionEntry"""
+    entry = session_cache.get(session_id)
+    if entry is None:
+        result = await db.execute(
+            select(User.id, User.username, User.role, User.student_id, User.teacher_id, DBSession.expires_at)
+            .join(DBSession, DBSession.user_id == User.id)
+            .where(DBSession.session_id == session_id, DBSession.expires_at > datetime.utcnow())
+        )
+        row = result.first()
+        if not row:
+            return None
+        entry = SessionEntry(*row)
+        session_cache.put(session_id, entry)
+    return entry
@@ -0,0 +1,78 @@
+import os
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy.orm import Session
+from models import Student, FaceDataIndex
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# embedding_status values
+EMBEDDING_NONE = "none"        # no processed images
+EMBEDDING_PENDING = "pending"  # images changed since the last successful training run
+EMBEDDING_TRAINED = "trained"  # images are included in the current classifier
+
+def scan_face_dir(directory):
+    """(image_count, total_bytes, newest mtime) of one student's image folder, in a single directory pass"""
+    count = 0
+    total_bytes = 0
+    newest = None
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return 0, 0, None
+
+    with entries:
+        for entry in entries:
+            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            count += 1
+            total_bytes += stat.st_size
+            newest = stat.st_mtime if newest is None else max(newest, stat.st_mtime)
+
+    return count, total_bytes, datetime.fromtimestamp(newest) if newest is not None else None
+
+def get_face_data(db: Session, student_id: int) -> FaceDataIndex:
+    entry = db.get(FaceDataIndex, student_id)
+    if entry is None:
+        entry = FaceDataIndex(student_id=student_id, image_count=0, total_bytes=0, embedding_status=EMBEDDING_NONE)
+        db.add(entry)
+    return entry
+
+def refresh_face_data(db: Session, student: Student, directory, embedding_status: str = None, commit: bool = True):
+    """Re-read one student's processed folder after a write to it and store the result in the index"""
+    count, total_bytes, last_upload_at = scan_face_dir(directory)
+
+    entry = get_face_data(db, student.id)
+    entry.image_count = count
+    entry.total_bytes = total_bytes
+    entry.last_upload_at = last_upload_at
+    if count == 0:
+        entry.embedding_status = EMBEDDING_NONE
+    elif embedding_status:
+        entry.embedding_status = embedding_status
+
+    if commit:
+        db.commit()
+    return entry
+
+def mark_face_data_pending(db: Session, student: Student, commit: bool = True):
+    """Flag a student whose raw images changed; counts update once alignment writes the processed folder"""
+    entry = get_face_data(db, student.id)
+    entry.embedding_status = EMBEDDING_PENDING
+    if commit:
+        db.commit()
+    return entry
+
+def rebuild_face_data_index(db: Session, processed_dir, embedding_status: str = None):
+    """Rescan every student's processed folder, e.g. after alignment or to backfill an existing install"""
+    processed_dir = Path(processed_dir)
+    students = db.query(Student).all()
+    for student in students:
+        refresh_face_data(db, student, processed_dir / student.student_code, embedding_status, commit=False)
+    db.commit()
+    return {"students": len(students)}
+
+def student_has_face_data(student: Student) -> bool:
+    """Column read of the index; load Student.face_data eagerly when listing many students"""
+    return student.face_data is not None and student.face_data.has_face_data
@@ -1,120 +1,287 @@
 import sys
 import os
 import base64
-import cv2
-import numpy as np
+import logging
+import time
 from datetime import datetime
 import threading
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from services import startup
+from services.metrics import Counter, Gauge, Histogram
+from services.tracing import span
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+# facenet imports its siblings as top-level modules, as the scripts run from src/
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../src'))
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Load and warm up the model in the background at startup instead of on the first request
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "true").lower() in ("1", "true", "yes")
+
+STAGE_SECONDS = Histogram("recognition_stage_seconds", "Time spent in each recognition pipeline stage", ["stage"])
+RECOGNITIONS = Counter("recognition_requests_total", "Recognitions by outcome", ["outcome"])
+FACES_DETECTED = Histogram("recognition_faces_detected", "Faces MTCNN found per frame",
+                           buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16))
+EMBEDDING_BATCH_SIZE = Histogram("recognition_embedding_batch_size", "Faces per embedding forward pass",
+                                 buckets=(1, 2, 4, 8, 16, 32, 64))
+QUEUE_DEPTH = Gauge("recognition_queue_depth", "Recognitions in progress, including those waiting for the model")
+MODEL_INFO = Gauge("recognition_model_info", "The loaded embedding model and classifier",
+                   ["model", "classifier", "backend", "classes", "trained_at"])
+MODEL_LOAD_SECONDS = Gauge("recognition_model_load_seconds", "Time the last model load took")
 
 class FaceRecognitionService:
     def __init__(self):
         self.model_path = "../Models/20180402-114759.pb"
         self.classifier_path = "../Models/facemodel.pkl"
         self.model_loaded = False
+        self.load_error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._loaded = None
         self._load_lock = threading.Lock()
+        self._preload_thread = None
 
-    def load_model(self):
-        if self.model_loaded:
+    def load_model(self, warm: bool = False, force: bool = False):
+        """Load the classifier, FaceNet and MTCNN; force replaces a loaded model (after retraining).
+
+        Every load builds its own graph and session and is swapped in only once
+        it loaded (and, with warm, warmed up), so a failed reload leaves the
+        current model serving. The swap is a single assignment of the whole
+        model, which recognitions read once through snapshot().
+        """
+        if self.model_loaded and not force:
             return
 
         with self._load_lock:
-            if self.model_loaded:
+            if self.model_loaded and not force:
                 return
 
+            started = time.perf_counter()
             try:
                 import tensorflow as tf
                 tf.compat.v1.disable_v2_behavior()
-                import pickle
-
-                with open(self.classifier_path, 'rb') as f:
-                    self.model, self.class_names = pickle.load(f)
-
+                from src import face_classifier
+                from src import open_set
                 from src import facenet
+                from src import image_normalization
                 from src.align import detect_face
 
-                self.facenet = facenet
-                self.detect_face = detect_face
-
-                gpu_options = tf.compat.v1.GPUOptions(per_process_gpu_memory_fraction=0.6)
-                self.sess = tf.compat.v1.Session(config=tf.compat.v1.ConfigProto(gpu_options=gpu_options, log_device_placement=False))
+                model = face_classifier.load_classifier(self.classifier_path)
 
-                self.facenet.load_model(self.model_path)
+                graph = tf.Graph()
+                with graph.as_default():
+                    gpu_options = tf.compat.v1.GPUOptions(per_process_gpu_memory_fraction=0.6)
+                    sess = tf.compat.v1.Session(graph=graph, config=tf.compat.v1.ConfigProto(gpu_options=gpu_options, log_device_placement=False))
+                    try:
+                        with sess.as_default():
+                            facenet.load_model(self.model_path)
+                            pnet, rnet, onet = detect_face.create_mtcnn(sess, None)
 
-                self.images_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("input:0")
-                self.embeddings = tf.compat.v1.get_default_graph().get_tensor_by_name("embeddings:0")
-                self.phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
-                self.embedding_size = self.embeddings.get_shape()[1]
+                        embeddings = graph.get_tensor_by_name("embeddings:0")
+                        loaded = SimpleNamespace(
+                            model=model,
+                            class_names=model.class_names,
+                            open_set=open_set,
+                            thresholds=open_set.thresholds(model),
+                            facenet=facenet,
+                            image_normalization=image_normalization,
+                            detect_face=detect_face,
+                            graph=graph,
+                            sess=sess,
+                            images_placeholder=graph.get_tensor_by_name("input:0"),
+                            embeddings=embeddings,
+                            phase_train_placeholder=graph.get_tensor_by_name("phase_train:0"),
+                            embedding_size=embeddings.get_shape()[1],
+                            pnet=pnet,
+                            rnet=rnet,
+                            onet=onet
+                        )
+                        if warm:
+                            self.warm_up(loaded)
+                    except Exception:
+                        sess.close()
+                        raise
 
-                pnet, rnet, onet = self.detect_face.create_mtcnn(self.sess, None)
-                self.pnet = pnet
-                self.rnet = rnet
-                self.onet = onet
+                # Recognitions running on the previous model hold their own snapshot of it;
+                # its session is released with the last of them
+                self._loaded = loaded
 
                 self.model_loaded = True
-                print("Face recognition model loaded successfully")
+                self.load_error = None
+                load_seconds = time.perf_counter() - started
+                self.load_seconds = round(load_seconds, 3)
+                MODEL_LOAD_SECONDS.set(load_seconds)
+                MODEL_INFO.clear()
+                MODEL_INFO.set(1, model=os.path.basename(self.model_path), classifier=os.path.basename(self.classifier_path),
+                               backend=loaded.model.backend, classes=len(loaded.class_names),
+                               trained_at=loaded.model.metadata.get("trained_at", ""))
+                logger.info("Face recognition model loaded in %.1fs (%d classes)", load_seconds, len(loaded.class_names))
 
             except Exception as e:
-                print(f"Error loading model: {e}")
+                self.load_error = str(e)
+                logger.exception("Error loading model")
                 raise
-    
-    def recognize_face(self, image_base64: str):
+
+    def warm_up(self, loaded=None, image_size: int = 160):
+        """Run MTCNN and one embedding on a noise frame so the first request skips TensorFlow's first-run setup.
+
+        loaded is a model load_model has not swapped in yet; defaults to the serving one.
+        """
+        import numpy as np
+
+        loaded = loaded or self._loaded
+        started = time.perf_counter()
+        frame = np.random.RandomState(0).randint(0, 256, (image_size, image_size, 3)).astype(np.uint8)
+        loaded.detect_face.detect_face(frame, 20, loaded.pnet, loaded.rnet, loaded.onet, [0.6, 0.7, 0.7], 0.709)
+        loaded.sess.run(loaded.embeddings, feed_dict={
+            loaded.images_placeholder: np.zeros((1, image_size, image_size, 3), dtype=np.float32),
+            loaded.phase_train_placeholder: False
+        })
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        logger.info("Face recognition model warmed up in %.1fs", self.warmup_seconds)
+
+    def preload(self, force: bool = False):
+        """Load and warm up the model on a background thread.
+
+        On first load, recognitions wait on the load lock meanwhile; with force
+        (a reload) the current model keeps serving until the new one is swapped in.
+        """
+        if self._preload_thread is not None and self._preload_thread.is_alive():
+            return self._preload_thread
+        self._preload_thread = threading.Thread(target=self._preload, args=(force,), name="model-preload", daemon=True)
+        self._preload_thread.start()
+        return self._preload_thread
+
+    def _preload(self, force: bool):
+        try:
+            self.load_model(warm=True, force=force)
+        except Exception:
+            # load_model logged it; the next recognition retries the load if no model is serving
+            return
+        startup.mark("model_ready")
+
+    def snapshot(self):
+        """The serving model, loading it first if needed; read it once per recognition so a reload can't mix two models"""
         if not self.model_loaded:
             self.load_model()
+        return self._loaded
 
-        try:
-            if ',' in image_base64:
-                image_base64 = image_base64.split(',')[1]
+    def reload(self):
+        """Pick up a retrained classifier: in the background with PRELOAD_MODEL, else on the next recognition"""
+        if PRELOAD_MODEL:
+            return self.preload(force=True)
+        self.model_loaded = False
 
-            image_data = base64.b64decode(image_base64)
-            nparr = np.frombuffer(image_data, np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    def state(self) -> str:
+        """loading or reloading while a preload runs, then ready, failed or not_loaded"""
+        if self._preload_thread is not None and self._preload_thread.is_alive():
+            return "reloading" if self.model_loaded else "loading"
+        if self.model_loaded:
+            return "ready"
+        return "failed" if self.load_error else "not_loaded"
 
-            if frame is None:
-                return None, 0.0, "Failed to decode image"
+    def decode_base64(self, image_base64: str) -> bytes:
+        if ',' in image_base64:
+            image_base64 = image_base64.split(',')[1]
+        return base64.b64decode(image_base64)
 
-            bounding_boxes, _ = self.detect_face.detect_face(
-                frame, 20, self.pnet, self.rnet, self.onet,
-                [0.6, 0.7, 0.7], 0.709
-            )
+    def decode_image(self, image_data: bytes):
+        import cv2
+        import numpy as np
 
-            if len(bounding_boxes) == 0:
-                return None, 0.0, "No face detected"
+        nparr = np.frombuffer(image_data, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    def detect(self, loaded, frame):
+        bounding_boxes, _ = loaded.detect_face.detect_face(
+            frame, 20, loaded.pnet, loaded.rnet, loaded.onet,
+            [0.6, 0.7, 0.7], 0.709
+        )
+        FACES_DETECTED.observe(len(bounding_boxes))
+        return bounding_boxes
+
+    def crop(self, frame, det, margin: int = 32, image_size: int = 160):
+        import cv2
+        import numpy as np
+
+        bb = np.zeros(4, dtype=np.int32)
+        bb[0] = np.maximum(det[0] - margin / 2, 0)
+        bb[1] = np.maximum(det[1] - margin / 2, 0)
+        bb[2] = np.minimum(det[2] + margin / 2, frame.shape[1])
+        bb[3] = np.minimum(det[3] + margin / 2, frame.shape[0])
+
+        cropped = frame[bb[1]:bb[3], bb[0]:bb[2], :]
+        return cv2.resize(cropped, (image_size, image_size))
+
+    def prewhiten(self, loaded, aligned):
+        import numpy as np
 
-            det = bounding_boxes[0, 0:4]
+        return loaded.image_normalization.prewhiten_batch(aligned[np.newaxis])
 
-            bb = np.zeros(4, dtype=np.int32)
-            bb[0] = np.maximum(det[0] - 32 / 2, 0)
-            bb[1] = np.maximum(det[1] - 32 / 2, 0)
-            bb[2] = np.minimum(det[2] + 32 / 2, frame.shape[1])
-            bb[3] = np.minimum(det[3] + 32 / 2, frame.shape[0])
+    def embed(self, loaded, prewhitened):
+        EMBEDDING_BATCH_SIZE.observe(len(prewhitened))
+        feed_dict = {
+            loaded.images_placeholder: prewhitened,
+            loaded.phase_train_placeholder: False
+        }
+        return loaded.sess.run(loaded.embeddings, feed_dict=feed_dict)
 
-            cropped = frame[bb[1]:bb[3], bb[0]:bb[2], :]
-            aligned = cv2.resize(cropped, (160, 160))
+    def match(self, loaded, emb):
+        # Strangers are rejected here, before the caller looks anyone up in the database
+        scores = loaded.open_set.scores(loaded.model, emb)
+        confidence = float(scores['probability'][0])
+        if not loaded.open_set.accept(scores, loaded.thresholds)[0]:
+            return None, confidence, "Unknown face"
 
-            prewhitened = self.facenet.prewhiten(aligned)
+        name = loaded.class_names[scores['best_class_indices'][0]]
 
-            feed_dict = {
-                self.images_placeholder: [prewhitened],
-                self.phase_train_placeholder: False
-            }
-            emb = self.sess.run(self.embeddings, feed_dict=feed_dict)[0]
+        return name, confidence, "Success"
 
-            predictions = self.model.predict_proba([emb])
-            best_class_indices = np.argmax(predictions, axis=1)
-            best_class_probabilities = predictions[
-                np.arange(len(best_class_indices)),
-                best_class_indices
-            ]
+    def recognize_face(self, image_base64: str):
+        QUEUE_DEPTH.inc()
+        outcome = "error"
+        try:
+            loaded = self.snapshot()
+
+            # Each step is its own method so api/bench can time the stages of this exact path
+            with span("recognition.decode", STAGE_SECONDS, stage="decode"):
+                frame = self.decode_image(self.decode_base64(image_base64))
+
+            if frame is None:
+                outcome = "decode_failed"
+                return None, 0.0, "Failed to decode image"
+
+            with span("recognition.detect", STAGE_SECONDS, stage="detect"):
+                bounding_boxes = self.detect(loaded, frame)
+
+            if len(bounding_boxes) == 0:
+                outcome = "no_face"
+                return None, 0.0, "No face detected"
 
-            name = self.class_names[best_class_indices[0]]
-            confidence = best_class_probabilities[0]
+            with span("recognition.crop", STAGE_SECONDS, stage="crop"):
+                aligned = self.crop(frame, bounding_boxes[0, 0:4])
+            with span("recognition.prewhiten", STAGE_SECONDS, stage="prewhiten"):
+                prewhitened = self.prewhiten(loaded, aligned)
+            with span("recognition.embed", STAGE_SECONDS, stage="embed"):
+                emb = self.embed(loaded, prewhitened)
+            with span("recognition.match", STAGE_SECONDS, stage="match"):
+                name, confidence, message = self.match(loaded, emb)
 
-            return name, confidence, "Success"
+            outcome = "success" if name is not None else "unknown"
+            return name, confidence, message
 
         except Exception as e:
+            logger.exception("Face recognition failed")
             return None, 0.0, f"Error: {str(e)}"
+        finally:
+            QUEUE_DEPTH.dec()
+            RECOGNITIONS.inc(outcome=outcome)
+            if outcome != "error":
+                startup.mark("first_recognition")
     
     def train_model(self):
         return "Training not implemented in API yet. Please run training scripts manually."
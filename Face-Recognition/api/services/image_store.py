@@ -0,0 +1,307 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from models import Student, FaceImage
+from services.upload_validation import measure_face_quality
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+FACE_DATA_DIR = Path(os.getenv("FACE_DATA_DIR", str(PROJECT_ROOT / "Dataset" / "FaceData")))
+IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "local")
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", str(PROJECT_ROOT / "Dataset" / "ImageStore")))
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "160"))
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+CONTENT_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+CHUNK_SIZE = 64 * 1024
+
+class StorageBackend:
+    """Blob storage addressed by string keys; subclasses provide the actual medium"""
+
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def open(self, key: str):
+        """Binary file object positioned at the start of the blob"""
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def materialize(self, key: str, path: Path):
+        """Place a copy of the blob at a local path (the training scripts read plain folders)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as out, self.open(key) as blob:
+            shutil.copyfileobj(blob, out, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+
+class LocalDiskBackend(StorageBackend):
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, path)
+
+    def exists(self, key: str) -> bool:
+        return self._path(key).is_file()
+
+    def open(self, key: str):
+        return open(self._path(key), "rb")
+
+    def size(self, key: str) -> int:
+        return self._path(key).stat().st_size
+
+    def delete(self, key: str):
+        self._path(key).unlink(missing_ok=True)
+
+    def materialize(self, key: str, path: Path):
+        # A hard link costs no extra space; fall back to a copy across filesystems
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)
+        try:
+            os.link(self._path(key), path)
+        except OSError:
+            super().materialize(key, path)
+
+BACKENDS = {
+    "local": lambda: LocalDiskBackend(IMAGE_STORE_DIR),
+}
+
+def register_backend(name: str, factory):
+    """Make a backend selectable through IMAGE_STORE_BACKEND (e.g. an S3-compatible store)"""
+    BACKENDS[name] = factory
+
+def blob_key(sha256: str) -> str:
+    return f"blobs/{sha256[:2]}/{sha256}"
+
+def thumbnail_key(sha256: str) -> str:
+    return f"thumbs/{sha256[:2]}/{sha256}.jpg"
+
+def normalize_extension(filename: str, content_type: str = None) -> str:
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return ".jpg" if ext == ".jpeg" else ext
+    return ".png" if content_type == "image/png" else ".jpg"
+
+def make_thumbnail(data: bytes, size: int = THUMBNAIL_SIZE):
+    """(jpeg thumbnail bytes, width, height) of the original; (None, None, None) if it does not decode"""
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None, None, None
+
+    height, width = image.shape[:2]
+    scale = min(1.0, size / max(height, width))
+    if scale < 1.0:
+        image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return (encoded.tobytes() if ok else None), width, height
+
+class ImageStore:
+    """Content-addressed face image storage.
+
+    Each distinct image is stored once as a blob keyed by its SHA-256,
+    with a pre-rendered thumbnail next to it. face_images rows map
+    (student, kind) to blobs, and every image is also materialized
+    under FaceData/<kind>/<student_code>/ where the alignment and
+    training scripts expect it.
+    """
+
+    def __init__(self, backend: StorageBackend, face_data_dir: Path = FACE_DATA_DIR):
+        self.backend = backend
+        self.face_data_dir = Path(face_data_dir)
+
+    def dataset_dir(self, kind: str, student_code: str) -> Path:
+        return self.face_data_dir / kind / student_code
+
+    def dataset_path(self, image: FaceImage, student_code: str) -> Path:
+        return self.dataset_dir(image.kind, student_code) / image.filename
+
+    def _find(self, db: Session, student: Student, kind: str, sha256: str):
+        return db.query(FaceImage).filter(
+            FaceImage.student_id == student.id,
+            FaceImage.kind == kind,
+            FaceImage.sha256 == sha256
+        ).first()
+
+    def _store_blobs(self, sha256: str, data: bytes):
+        """Write the original and its thumbnail unless another upload already did; returns (has_thumbnail, width, height)"""
+        if not self.backend.exists(blob_key(sha256)):
+            self.backend.put(blob_key(sha256), data)
+        thumbnail, width, height = make_thumbnail(data)
+        if thumbnail and not self.backend.exists(thumbnail_key(sha256)):
+            self.backend.put(thumbnail_key(sha256), thumbnail)
+        return thumbnail is not None, width, height
+
+    def save(self, db: Session, student: Student, data: bytes, kind: str, filename: str = None,
+             content_type: str = None, quality: dict = None, commit: bool = True):
+        """Store one upload; returns (FaceImage, created) where created is False for a duplicate"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        existing = self._find(db, student, kind, sha256)
+        if existing:
+            return existing, False
+
+        ext = normalize_extension(filename, content_type)
+        has_thumbnail, width, height = self._store_blobs(sha256, data)
+        image = FaceImage(
+            student_id=student.id,
+            kind=kind,
+            sha256=sha256,
+            filename=f"{sha256[:20]}{ext}",
+            content_type=CONTENT_TYPES[ext],
+            size_bytes=len(data),
+            width=width,
+            height=height,
+            has_thumbnail=has_thumbnail,
+            **(quality or {})
+        )
+        self.backend.materialize(blob_key(sha256), self.dataset_path(image, student.student_code))
+
+        db.add(image)
+        if commit:
+            db.commit()
+        return image, True
+
+    def register_file(self, db: Session, student: Student, path: Path, kind: str):
+        """Adopt a file already in the dataset folder (legacy upload or alignment output).
+
+        Keeps its name so the training folders are untouched; a byte-identical
+        duplicate of an image the student already has is removed instead.
+        """
+        data = path.read_bytes()
+        sha256 = hashlib.sha256(data).hexdigest()
+        existing = self._find(db, student, kind, sha256)
+        if existing:
+            if existing.filename != path.name:
+                path.unlink()
+            return existing, False
+
+        has_thumbnail, width, height = self._store_blobs(sha256, data)
+        image = FaceImage(
+            student_id=student.id,
+            kind=kind,
+            sha256=sha256,
+            filename=path.name,
+            content_type=CONTENT_TYPES.get(normalize_extension(path.name), "image/jpeg"),
+            size_bytes=len(data),
+            width=width,
+            height=height,
+            has_thumbnail=has_thumbnail,
+            **measure_face_quality(data)
+        )
+        db.add(image)
+        return image, True
+
+    def sync_dataset(self, db: Session, kind: str):
+        """Bring face_images in line with FaceData/<kind>: adopt untracked files, drop rows whose file is gone"""
+        report = {"kind": kind, "added": 0, "duplicates_removed": 0, "missing_removed": 0}
+        for student in db.query(Student).all():
+            directory = self.dataset_dir(kind, student.student_code)
+            tracked = {image.filename: image for image in db.query(FaceImage).filter(
+                FaceImage.student_id == student.id, FaceImage.kind == kind
+            )}
+            present = set()
+            if directory.is_dir():
+                for path in sorted(directory.iterdir()):
+                    if not path.is_file() or path.suffix.lower() not in IMAGE_EXTENSIONS:
+                        continue
+                    if path.name in tracked:
+                        present.add(path.name)
+                        continue
+                    image, created = self.register_file(db, student, path, kind)
+                    db.flush()
+                    if created:
+                        tracked[image.filename] = image
+                        present.add(image.filename)
+                        report["added"] += 1
+                    else:
+                        report["duplicates_removed"] += 1
+            for filename, image in tracked.items():
+                if filename not in present:
+                    self._release(db, image)
+                    report["missing_removed"] += 1
+        db.commit()
+        return report
+
+    def delete(self, db: Session, image: FaceImage, student_code: str, commit: bool = True):
+        self.dataset_path(image, student_code).unlink(missing_ok=True)
+        self._release(db, image)
+        if commit:
+            db.commit()
+
+    def delete_student_images(self, db: Session, student: Student, kind: str = None, commit: bool = True) -> int:
+        query = db.query(FaceImage).filter(FaceImage.student_id == student.id)
+        if kind:
+            query = query.filter(FaceImage.kind == kind)
+        images = query.all()
+        for image in images:
+            self.delete(db, image, student.student_code, commit=False)
+        if commit:
+            db.commit()
+        return len(images)
+
+    def _release(self, db: Session, image: FaceImage):
+        """Delete a row, and its blob once no other row references the same content"""
+        db.delete(image)
+        db.flush()
+        still_used = db.query(FaceImage.id).filter(FaceImage.sha256 == image.sha256).first()
+        if not still_used:
+            self.backend.delete(blob_key(image.sha256))
+            self.backend.delete(thumbnail_key(image.sha256))
+
+    def open_image(self, image: FaceImage):
+        return self.backend.open(blob_key(image.sha256))
+
+    def open_thumbnail(self, image: FaceImage):
+        return self.backend.open(thumbnail_key(image.sha256))
+
+    def list_images(self, db: Session, student_id: int, kind: str = None, sort: str = "created"):
+        """A student's images, oldest first, or best first with sort="quality" (unscored images last)"""
+        query = db.query(FaceImage).filter(FaceImage.student_id == student_id)
+        if kind:
+            query = query.filter(FaceImage.kind == kind)
+        if sort == "quality":
+            return query.order_by(FaceImage.quality_score.is_(None), FaceImage.quality_score.desc(), FaceImage.id).all()
+        return query.order_by(FaceImage.created_at, FaceImage.id).all()
+
+def image_info(image: FaceImage):
+    return {
+        "id": image.id,
+        "filename": image.filename,
+        "size": image.size_bytes,
+        "width": image.width,
+        "height": image.height,
+        "created_at": image.created_at.isoformat() if image.created_at else None,
+        "url": f"/api/images/{image.id}",
+        "thumbnail_url": f"/api/images/{image.id}/thumbnail" if image.has_thumbnail else None,
+        "quality": {
+            "score": image.quality_score,
+            "sharpness": image.sharpness,
+            "face_size": image.face_size,
+            "roll": image.roll
+        }
+    }
+
+image_store = ImageStore(BACKENDS[IMAGE_STORE_BACKEND]())
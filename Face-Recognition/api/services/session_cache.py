@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+
+SessionEntry = namedtuple("SessionEntry", ["user_id", "username", "role", "student_id", "teacher_id", "expires_at"])
+
+class SessionCache:
+    """In-process LRU cache of session_id -> SessionEntry with a TTL.
+
+    Entries are dropped after `ttl` seconds or when the session itself
+    expires, whichever comes first. A `max_size` of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        if self.max_size <= 0:
+            return None
+
+        with self._lock:
+            item = self._entries.get(session_id)
+            if item is None:
+                self.misses += 1
+                return None
+
+            entry, cached_at = item
+            if time.monotonic() - cached_at > self.ttl or entry.expires_at <= datetime.utcnow():
+                del self._entries[session_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry
+
+    def put(self, session_id: str, entry: SessionEntry):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[session_id] = (entry, time.monotonic())
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            stale = [sid for sid, (entry, _) in self._entries.items() if entry.user_id == user_id]
+            for sid in stale:
+                del self._entries[sid]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+session_cache = SessionCache()
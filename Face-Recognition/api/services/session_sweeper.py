@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+from database import SessionLocal
+from models import Session as DBSession
+
+load_dotenv()
+
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "600"))
+SESSION_SWEEP_BATCH_SIZE = int(os.getenv("SESSION_SWEEP_BATCH_SIZE", "1000"))
+SESSION_SWEEP_MAX_BATCHES = int(os.getenv("SESSION_SWEEP_MAX_BATCHES", "100"))
+
+class SessionSweeper:
+    """Deletes expired rows from the sessions table in bounded batches"""
+
+    def __init__(self, interval: float = SESSION_SWEEP_INTERVAL_SECONDS,
+                 batch_size: int = SESSION_SWEEP_BATCH_SIZE, max_batches: int = SESSION_SWEEP_MAX_BATCHES):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.sweeps = 0
+        self.total_deleted = 0
+        self.last_deleted = 0
+        self.last_duration_seconds = None
+        self.last_sweep_at = None
+        self.table_size = None
+        self.last_error = None
+        self._task = None
+
+    def sweep_once(self):
+        """Run one sweep; each batch is its own short transaction"""
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        deleted = 0
+        db = SessionLocal()
+        try:
+            for _ in range(self.max_batches):
+                ids = [row.id for row in db.query(DBSession.id).filter(
+                    DBSession.expires_at <= now
+                ).limit(self.batch_size)]
+                if not ids:
+                    break
+                db.query(DBSession).filter(DBSession.id.in_(ids)).delete(synchronize_session=False)
+                db.commit()
+                deleted += len(ids)
+                if len(ids) < self.batch_size:
+                    break
+
+            self.table_size = db.query(DBSession).count()
+        finally:
+            db.close()
+
+        self.sweeps += 1
+        self.last_deleted = deleted
+        self.total_deleted += deleted
+        self.last_duration_seconds = round(time.perf_counter() - started, 4)
+        self.last_sweep_at = now
+        return deleted
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.sweep_once)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Session sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "batch_size": self.batch_size,
+            "sweeps": self.sweeps,
+            "last_deleted": self.last_deleted,
+            "total_deleted": self.total_deleted,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_sweep_at": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+            "table_size": self.table_size,
+            "last_error": self.last_error
+        }
+
+session_sweeper = SessionSweeper()
@@ -0,0 +1,36 @@
+import os
+import threading
+import time
+from services.metrics import Gauge
+
+STARTUP_SECONDS = Gauge("app_startup_seconds", "Seconds from process start to each startup phase", ["phase"])
+
+def _process_started() -> float:
+    """Wall-clock start of this process, so interpreter start-up counts too; falls back to now off Linux"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields after it are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        age = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - max(age, 0.0)
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+PROCESS_STARTED = _process_started()
+
+_marks = {}
+_lock = threading.Lock()
+
+def mark(phase: str) -> float:
+    """Record the first time a phase is reached; later calls keep the first value"""
+    with _lock:
+        if phase not in _marks:
+            _marks[phase] = round(time.time() - PROCESS_STARTED, 4)
+            STARTUP_SECONDS.set(_marks[phase], phase=phase)
+        return _marks[phase]
+
+def timeline() -> dict:
+    with _lock:
+        return dict(_marks)
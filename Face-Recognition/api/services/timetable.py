@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from models import Class, ClassSchedule, ClassStudent, Subject, Teacher
+
+load_dotenv()
+
+TIMETABLE_CACHE_SIZE = int(os.getenv("TIMETABLE_CACHE_SIZE", "50000"))
+TIMETABLE_CACHE_TTL_SECONDS = float(os.getenv("TIMETABLE_CACHE_TTL_SECONDS", "600"))
+
+class TimetableCache:
+    """LRU cache of (student_id, day_of_week) -> list of schedule entries.
+
+    Writers must invalidate when enrollments, schedules, classes,
+    teachers or subjects change; the TTL bounds staleness across
+    worker processes.
+    """
+
+    def __init__(self, max_size: int = TIMETABLE_CACHE_SIZE, ttl: float = TIMETABLE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id: int, day_of_week: int):
+        if self.max_size <= 0:
+            return None
+
+        key = (student_id, day_of_week)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or time.monotonic() - item[1] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, student_id: int, day_of_week: int, entries):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[(student_id, day_of_week)] = (entries, time.monotonic())
+            self._entries.move_to_end((student_id, day_of_week))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_students(self, student_ids):
+        student_ids = set(student_ids)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in student_ids]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+timetable_cache = TimetableCache()
+
+def schedule_entry(schedule: ClassSchedule, cls: Class, subject: Subject, teacher: Teacher):
+    return {
+        "class_id": cls.id,
+        "class_code": cls.class_code,
+        "class_name": cls.class_name,
+        "subject_code": subject.subject_code if subject else None,
+        "subject_name": subject.subject_name if subject else None,
+        "teacher_code": teacher.teacher_code if teacher else None,
+        "teacher_name": teacher.full_name if teacher else None,
+        "start_time": str(schedule.start_time),
+        "end_time": str(schedule.end_time),
+        "room": schedule.room,
+        "mode": schedule.mode,
+        "day_of_week": schedule.day_of_week
+    }
+
+def load_student_timetable(db: Session, student_id: int, day_of_week: int):
+    """All of a student's schedule entries for one weekday, in one query"""
+    rows = db.query(ClassSchedule, Class, Subject, Teacher).join(
+        Class, Class.id == ClassSchedule.class_id
+    ).join(
+        ClassStudent, ClassStudent.class_id == Class.id
+    ).outerjoin(
+        Subject, Subject.id == Class.subject_id
+    ).outerjoin(
+        Teacher, Teacher.id == Class.teacher_id
+    ).filter(
+        ClassStudent.student_id == student_id,
+        ClassSchedule.day_of_week == day_of_week
+    ).order_by(ClassSchedule.start_time).all()
+
+    return [schedule_entry(*row) for row in rows]
+
+def get_student_timetable(db: Session, student_id: int, day_of_week: int):
+    """Read-through lookup of the (student, weekday) timetable"""
+    entries = timetable_cache.get(student_id, day_of_week)
+    if entries is None:
+        entries = load_student_timetable(db, student_id, day_of_week)
+        timetable_cache.put(student_id, day_of_week, entries)
+    return entries
+
+def invalidate_class_timetables(db: Session, class_id: int):
+    """Drop cached timetables of every student enrolled in a class"""
+    student_ids = [row.student_id for row in db.query(ClassStudent.student_id).filter(ClassStudent.class_id == class_id)]
+    timetable_cache.invalidate_students(student_ids)
@@ -0,0 +1,99 @@
+import logging
+import os
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+from services.metrics import METRICS_ENABLED, Histogram
+
+load_dotenv()
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Request-ID")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [trace=%(trace_id)s] %(message)s"
+
+# Incoming ids are echoed into logs and headers, so only short plain tokens are accepted
+_VALID_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+trace_id_var = ContextVar("trace_id", default="-")
+logger = logging.getLogger("trace")
+
+HTTP_REQUEST_SECONDS = Histogram("http_request_seconds", "Time to answer HTTP requests", ["method", "route", "status"])
+
+def current_trace_id() -> str:
+    return trace_id_var.get()
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current request's trace id to every record as %(trace_id)s"""
+
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+def configure_logging(level: str = LOG_LEVEL):
+    root = logging.getLogger()
+    if any(isinstance(f, TraceIdFilter) for handler in root.handlers for f in handler.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    root.setLevel(level)
+
+def trace_event(name: str, seconds: float, **fields):
+    """Log one finished span of the current request; does nothing unless tracing is on"""
+    if TRACING_ENABLED and trace_id_var.get() != "-":
+        details = " ".join(f"{key}={value}" for key, value in fields.items())
+        logger.info("%s %.3fms %s", name, seconds * 1000, details)
+
+class span:
+    """Times a block into histogram (with **labels) and into the request trace"""
+
+    __slots__ = ("name", "histogram", "labels", "started")
+
+    def __init__(self, name: str, histogram: Histogram = None, **labels):
+        self.name = name
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        if self.histogram is not None:
+            self.histogram.observe(elapsed, **self.labels)
+        trace_event(self.name, elapsed, **self.labels)
+        return False
+
+async def trace_requests(request, call_next):
+    """HTTP middleware: request latency per route, and the trace id of the request"""
+    trace_id = request.headers.get(TRACE_HEADER)
+    if trace_id is None or not _VALID_TRACE_ID.match(trace_id):
+        trace_id = new_trace_id() if TRACING_ENABLED else None
+    token = trace_id_var.set(trace_id) if trace_id else None
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if trace_id:
+            response.headers[TRACE_HEADER] = trace_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=status)
+        trace_event("http", elapsed, method=request.method, route=route, status=status)
+        if token is not None:
+            trace_id_var.reset(token)
+
+def instrumentation_enabled() -> bool:
+    return METRICS_ENABLED or TRACING_ENABLED
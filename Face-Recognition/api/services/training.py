@@ -2,6 +2,15 @@ import sys
 import os
 import subprocess
 from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CLEAN_DATASET_BEFORE_TRAINING = os.getenv("CLEAN_DATASET_BEFORE_TRAINING", "false").lower() in ("1", "true", "yes")
+CLEAN_OUTLIER_THRESHOLD = os.getenv("CLEAN_OUTLIER_THRESHOLD", "3.0")
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "svc")
+CLASSIFIER_INCREMENTAL = os.getenv("CLASSIFIER_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+OPEN_SET_FAR = os.getenv("OPEN_SET_FAR", "0.01")
 
 # Add parent directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
@@ -11,9 +20,36 @@ class TrainingService:
         self.project_root = Path(__file__).parent.parent.parent
         self.preprocessing_script = self.project_root / "src" / "align_dataset_mtcnn.py"
         self.classifier_script = self.project_root / "src" / "classifier.py"
+        self.cleaning_script = self.project_root / "src" / "calculate_filtering_metrics.py"
         self.input_dir = self.project_root / "Dataset" / "FaceData" / "raw"
         self.output_dir = self.project_root / "Dataset" / "FaceData" / "processed"
-        
+        self.quarantine_dir = self.project_root / "Dataset" / "FaceData" / "quarantine"
+        self.model_file = self.project_root / "Models" / "20180402-114759.pb"
+
+    def clean_dataset(self):
+        """Quarantine likely mislabeled and outlier images of the aligned dataset before the classifier sees them"""
+        result = subprocess.run(
+            [
+                sys.executable,
+                str(self.cleaning_script),
+                str(self.output_dir),
+                str(self.model_file),
+                str(self.project_root / "Models" / "filtering_metrics.h5"),
+                "--quarantine_dir", str(self.quarantine_dir),
+                "--report", str(self.quarantine_dir / "report.json"),
+                "--outlier_threshold", CLEAN_OUTLIER_THRESHOLD,
+                "--batch_size", "90"
+            ],
+            cwd=str(self.project_root / "src"),
+            capture_output=True,
+            text=True,
+            timeout=300
+        )
+
+        print("Cleaning stdout:", result.stdout)
+        print("Cleaning stderr:", result.stderr)
+        return result.returncode == 0, result.stderr
+
     def train_model(self):
         """Run preprocessing and training"""
         try:
@@ -49,19 +85,31 @@ class TrainingService:
                 return False, f"Preprocessing failed: {result.stderr}"
 
             print("Preprocessing completed")
+
+            if CLEAN_DATASET_BEFORE_TRAINING:
+                self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+                success, error = self.clean_dataset()
+                if not success:
+                    return False, f"Dataset cleaning failed: {error}"
+                print("Dataset cleaning completed")
             
             # Run classifier training
             print("Running classifier training...")
+            command = [
+                sys.executable,
+                str(self.classifier_script),
+                "TRAIN",
+                str(self.output_dir),
+                str(self.model_file),
+                str(self.project_root / "Models" / "facemodel.pkl"),
+                "--batch_size", "90",
+                "--classifier_backend", CLASSIFIER_BACKEND,
+                "--open_set_far", OPEN_SET_FAR
+            ]
+            if CLASSIFIER_INCREMENTAL:
+                command.append("--incremental")
             result = subprocess.run(
-                [
-                    sys.executable,
-                    str(self.classifier_script),
-                    "TRAIN",
-                    str(self.output_dir),
-                    str(self.project_root / "Models" / "20180402-114759.pb"),
-                    str(self.project_root / "Models" / "facemodel.pkl"),
-                    "--batch_size", "90"
-                ],
+                command,
                 cwd=str(self.project_root / "src"),
                 capture_output=True,
                 text=True,
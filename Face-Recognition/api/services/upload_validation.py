@@ -0,0 +1,192 @@
+import asyncio
+import io
+import math
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dotenv import load_dotenv
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+
+load_dotenv()
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_DECODE_MAX_SIDE = int(os.getenv("UPLOAD_DECODE_MAX_SIDE", "640"))
+MIN_FACE_SIZE = int(os.getenv("MIN_FACE_SIZE", "80"))
+BLUR_THRESHOLD = float(os.getenv("BLUR_THRESHOLD", "60"))
+MAX_ROLL_DEGREES = float(os.getenv("MAX_ROLL_DEGREES", "20"))
+UPLOAD_VALIDATION_WORKERS = int(os.getenv("UPLOAD_VALIDATION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+class UploadTooLarge(ValueError):
+    pass
+
+class ValidationResult:
+    def __init__(self, ok: bool, reason: str = None, **metrics):
+        self.ok = ok
+        self.reason = reason
+        self.metrics = metrics
+
+    def to_dict(self):
+        return {"ok": self.ok, "reason": self.reason, **self.metrics}
+
+async def spool_upload(upload_file, max_bytes: int = MAX_UPLOAD_BYTES) -> Path:
+    """Copy an UploadFile to a temp file chunk by chunk, stopping as soon as it exceeds max_bytes"""
+    fd, tmp_path = tempfile.mkstemp(suffix=".upload")
+    written = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"File exceeds {max_bytes} bytes")
+                out.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return Path(tmp_path)
+
+_cascades = threading.local()
+
+def _detectors():
+    """Per-thread Haar cascades; CascadeClassifier instances are not shared between threads"""
+    if not hasattr(_cascades, "face"):
+        import cv2
+        _cascades.face = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+        _cascades.eye = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_eye.xml"))
+        if _cascades.face.empty():
+            raise RuntimeError("OpenCV face cascade not available")
+    return _cascades.face, _cascades.eye
+
+def _reduced_decode_flag(data: bytes, max_side: int):
+    """Pick the largest IMREAD_REDUCED_* factor that keeps the long side at or above max_side"""
+    import cv2
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as header:
+            width, height = header.size
+    except Exception:
+        return cv2.IMREAD_COLOR, 1
+
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if max(width, height) / factor >= max_side:
+            return flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+def check_face_image(data: bytes) -> ValidationResult:
+    """Decode at reduced resolution and require exactly one sharp, large enough, roughly upright frontal face"""
+    import cv2
+    import numpy as np
+
+    flag, factor = _reduced_decode_flag(data, UPLOAD_DECODE_MAX_SIDE)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+    if image is None:
+        return ValidationResult(False, "File is not a decodable image")
+
+    scale = 1.0
+    if max(image.shape[:2]) > UPLOAD_DECODE_MAX_SIDE:
+        scale = UPLOAD_DECODE_MAX_SIDE / max(image.shape[:2])
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    to_original = factor / scale
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    face_cascade, eye_cascade = _detectors()
+    min_side = max(20, int(MIN_FACE_SIZE / to_original / 2))
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_side, min_side))
+
+    if len(faces) == 0:
+        return ValidationResult(False, "No frontal face detected")
+    if len(faces) > 1:
+        return ValidationResult(False, "More than one face detected", faces=len(faces))
+
+    x, y, w, h = faces[0]
+    face_size = int(min(w, h) * to_original)
+    if face_size < MIN_FACE_SIZE:
+        return ValidationResult(False, f"Face too small ({face_size}px, need {MIN_FACE_SIZE}px)", face_size=face_size)
+
+    face = gray[y:y + h, x:x + w]
+    sharpness = float(cv2.Laplacian(face, cv2.CV_64F).var())
+    if sharpness < BLUR_THRESHOLD:
+        return ValidationResult(False, "Image too blurry", face_size=face_size, sharpness=round(sharpness, 1))
+
+    roll = None
+    eyes = eye_cascade.detectMultiScale(face[:h // 2 + h // 8], scaleFactor=1.1, minNeighbors=5)
+    if len(eyes) >= 2:
+        (ex1, ey1, ew1, eh1), (ex2, ey2, ew2, eh2) = sorted(eyes, key=lambda eye: eye[2] * eye[3], reverse=True)[:2]
+        dx = (ex2 + ew2 / 2) - (ex1 + ew1 / 2)
+        dy = (ey2 + eh2 / 2) - (ey1 + eh1 / 2)
+        roll = abs(math.degrees(math.atan2(dy, abs(dx)))) if dx else 90.0
+        if roll > MAX_ROLL_DEGREES:
+            return ValidationResult(False, "Head is tilted too far", face_size=face_size,
+                                    sharpness=round(sharpness, 1), roll=round(roll, 1))
+
+    return ValidationResult(True, face_size=face_size, sharpness=round(sharpness, 1),
+                            roll=round(roll, 1) if roll is not None else None)
+
+def face_quality(metrics: dict) -> dict:
+    """Quality fields stored on FaceImage, scored by src/face_quality.py from the validation metrics"""
+    from src.face_quality import quality_score
+
+    if metrics.get("sharpness") is None or metrics.get("face_size") is None:
+        return {}
+    roll = metrics.get("roll") or 0.0
+    return {
+        "quality_score": round(float(quality_score(metrics["sharpness"], metrics["face_size"], roll=roll)), 4),
+        "sharpness": metrics["sharpness"],
+        "face_size": metrics["face_size"],
+        "roll": metrics.get("roll")
+    }
+
+def measure_face_quality(data: bytes) -> dict:
+    """Quality of an image already in the dataset; aligned crops with no detectable face are scored as a whole"""
+    import cv2
+    import numpy as np
+
+    result = check_face_image(data)
+    if result.metrics.get("sharpness") is not None:
+        return face_quality(result.metrics)
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return {}
+    sharpness = round(float(cv2.Laplacian(image, cv2.CV_64F).var()), 1)
+    return face_quality({"sharpness": sharpness, "face_size": int(min(image.shape[:2]))})
+
+class UploadValidator:
+    """Runs check_face_image on a bounded thread pool (OpenCV releases the GIL while it works)"""
+
+    def __init__(self, workers: int = UPLOAD_VALIDATION_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload-validation")
+        return self._executor
+
+    async def validate(self, data: bytes) -> ValidationResult:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, check_face_image, data)
+
+    async def validate_file(self, path: Path):
+        """(bytes, ValidationResult) for a spooled upload; the file is read on the worker, not the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _read_and_check, path)
+
+def _read_and_check(path: Path):
+    data = Path(path).read_bytes()
+    return data, check_face_image(data)
+
+upload_validator = UploadValidator()
@@ -6,6 +6,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 SESSION_TIMEOUT_HOURS = int(os.getenv("SESSION_TIMEOUT_HOURS", "24"))
+MAX_SESSIONS_PER_USER = int(os.getenv("MAX_SESSIONS_PER_USER", "0"))
 
 def generate_session_id() -> str:
     """Generate random session ID"""
@@ -1,8 +1,10 @@
 #!/bin/bash
 
-# Run database seeding (creates tables and populates with sample data)
-python seed_data.py
+# Seed sample data into a fresh database only; the API creates missing tables itself on startup.
+# Set SEED_SAMPLE_DATA=false to skip the seeding step entirely.
+if [ "${SEED_SAMPLE_DATA:-true}" = "true" ]; then
+    python seed_data.py --if_empty
+fi
 
 # Start the FastAPI application
 uvicorn main:app --host 0.0.0.0 --port 8000
-
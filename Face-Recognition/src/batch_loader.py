@@ -0,0 +1,102 @@
+"""Prefetching batch loader: decodes the next batches on a thread pool while the current one is used.
+
+Batches are written into a ring of `depth + 1` preallocated float32 buffers, so no
+per-batch arrays are allocated. Decoding with PIL/OpenCV releases the GIL, so
+the workers run in parallel with each other and with sess.run. A batch yielded
+by the loader is a view into the ring and stays valid only until the next batch
+is requested; copy it to keep it longer.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+class BatchLoader(object):
+    """Iterates over batches of load_image(path) results for image_paths, in order.
+
+    load_image must return an array of image_shape. While the consumer holds
+    a batch, up to depth batches after it are decoded ahead, each into its
+    own slot of a ring of depth + 1 buffers.
+    """
+
+    def __init__(self, image_paths, batch_size, load_image, image_shape, depth=2, nrof_threads=4):
+        if depth < 1:
+            raise ValueError('depth must be at least 1')
+        self.image_paths = list(image_paths)
+        self.batch_size = batch_size
+        self.load_image = load_image
+        self.depth = depth
+        self.nrof_threads = nrof_threads
+        self.nrof_batches = int(np.ceil(len(self.image_paths) / batch_size))
+        self.buffers = np.empty((min(depth + 1, max(self.nrof_batches, 1)), batch_size) + tuple(image_shape), dtype=np.float32)
+        self.load_seconds = 0.0      # time the consumer waited for batches to be ready
+        self.compute_seconds = 0.0   # time the consumer spent between batches
+        self.decode_seconds = 0.0    # worker time spent decoding, summed over threads
+
+    def __len__(self):
+        return self.nrof_batches
+
+    def _load_into(self, slot, row, path):
+        start_time = time.time()
+        self.buffers[slot, row] = self.load_image(path)
+        return time.time() - start_time
+
+    def _submit(self, executor, batch_index):
+        slot = batch_index % self.buffers.shape[0]
+        start = batch_index * self.batch_size
+        paths = self.image_paths[start:start + self.batch_size]
+        return [executor.submit(self._load_into, slot, row, path) for row, path in enumerate(paths)]
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=self.nrof_threads)
+        pending = {}
+        try:
+            nrof_submitted = 0
+            for batch_index in range(self.nrof_batches):
+                # The slot of the batch before this one is free again, so keep depth batches ahead of this one
+                while nrof_submitted < min(batch_index + self.buffers.shape[0], self.nrof_batches):
+                    pending[nrof_submitted] = self._submit(executor, nrof_submitted)
+                    nrof_submitted += 1
+
+                wait_start = time.time()
+                futures = pending.pop(batch_index)
+                self.decode_seconds += sum(future.result() for future in futures)
+                ready_time = time.time()
+                self.load_seconds += ready_time - wait_start
+
+                yield self.buffers[batch_index % self.buffers.shape[0], :len(futures)]
+                self.compute_seconds += time.time() - ready_time
+        finally:
+            for futures in pending.values():
+                for future in futures:
+                    future.cancel()
+            executor.shutdown(wait=True)
+
+    def summary(self):
+        return ('Loader: waited %.3f s for data, %.3f s of compute, %.3f s of decoding on %d threads (depth %d)' %
+                (self.load_seconds, self.compute_seconds, self.decode_seconds, self.nrof_threads, self.depth))
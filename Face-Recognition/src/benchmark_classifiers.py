@@ -0,0 +1,130 @@
+"""Training time and accuracy of the classifier backends in face_classifier.py.
+
+Embeddings come from a classifier file saved by classifier.py (which keeps the
+embeddings it was trained on) or, without one, from synthetic unit length
+embeddings clustered per class for each of --nrof_classes. For every backend
+the script reports the time of a full fit, the time of an update adding
+--nrof_new_images images of existing classes and of one update adding a new
+class, and the accuracy on held out images after the updates.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+import argparse
+import warnings
+import numpy as np
+import face_classifier
+
+def synthetic_embeddings(nrof_classes, nrof_images_per_class, embedding_size, spread, rng):
+    centers = rng.randn(nrof_classes, embedding_size)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = np.repeat(np.arange(nrof_classes), nrof_images_per_class)
+    emb_array = centers[labels] + rng.randn(len(labels), embedding_size) * spread / np.sqrt(embedding_size)
+    emb_array /= np.linalg.norm(emb_array, axis=1, keepdims=True)
+    return emb_array.astype(np.float32), labels
+
+def split(labels, nrof_test_images_per_class, rng):
+    """Boolean test mask holding out up to nrof_test_images_per_class images of every class"""
+    test = np.zeros(len(labels), dtype=bool)
+    for label in np.unique(labels):
+        indices = rng.permutation(np.where(labels == label)[0])
+        test[indices[:min(nrof_test_images_per_class, len(indices) - 1)]] = True
+    return test
+
+def benchmark(emb_array, labels, args):
+    rng = np.random.RandomState(args.seed)
+    nrof_classes = int(np.max(labels)) + 1
+    class_names = ['class %d' % i for i in range(nrof_classes)]
+    paths = np.array(['image_%d' % i for i in range(len(labels))])
+    test = split(labels, args.nrof_test_images_per_class, rng)
+
+    # The last class joins in the second update; nrof_new_images of the others arrive in the first
+    train = np.where(~test & (labels != nrof_classes - 1))[0]
+    new_class = np.where(~test & (labels == nrof_classes - 1))[0]
+    order = rng.permutation(train)
+    initial, added = np.sort(order[args.nrof_new_images:]), np.sort(order[:args.nrof_new_images])
+
+    print('%d classes, %d training images, %d test images' % (nrof_classes, np.sum(~test), np.sum(test)))
+    print('%-11s %10s %12s %12s %9s' % ('backend', 'fit', 'update', 'new class', 'accuracy'))
+    for backend in args.backends:
+        classifier = face_classifier.FaceClassifier(backend, seed=args.seed)
+        start_time = time.time()
+        classifier.fit(emb_array[initial], labels[initial], class_names, paths[initial])
+        fit_time = time.time() - start_time
+
+        start_time = time.time()
+        classifier.update(emb_array[added], labels[added], class_names, paths[added])
+        update_time = time.time() - start_time
+
+        start_time = time.time()
+        classifier.update(emb_array[new_class], labels[new_class], class_names, paths[new_class])
+        new_class_time = time.time() - start_time
+
+        predictions = np.argmax(classifier.predict_proba(emb_array[test]), axis=1)
+        accuracy = np.mean(np.array(classifier.class_names)[predictions] == np.array(class_names)[labels[test]])
+        print('%-11s %9.3fs %11.3fs %11.3fs %9.3f' % (backend, fit_time, update_time, new_class_time, accuracy))
+
+def main(args):
+    warnings.simplefilter('ignore')
+    if args.classifier_filename:
+        classifier = face_classifier.load_classifier(args.classifier_filename)
+        if not classifier.has_embeddings:
+            raise ValueError('"%s" holds no embeddings; train it again with classifier.py' % args.classifier_filename)
+        benchmark(classifier.emb_array, classifier.labels, args)
+        return
+    rng = np.random.RandomState(args.seed)
+    for nrof_classes in args.nrof_classes:
+        emb_array, labels = synthetic_embeddings(nrof_classes, args.nrof_images_per_class, args.embedding_size, args.spread, rng)
+        benchmark(emb_array, labels, args)
+        print('')
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument('--classifier_filename', type=str,
+        help='Benchmark on the embeddings stored in this classifier file instead of synthetic ones.', default='')
+    parser.add_argument('--backends', type=str, nargs='+', choices=face_classifier.BACKENDS,
+        help='Classifier backends to compare.', default=list(face_classifier.BACKENDS))
+    parser.add_argument('--nrof_classes', type=int, nargs='+',
+        help='Numbers of classes of the synthetic datasets.', default=[40, 200, 600])
+    parser.add_argument('--nrof_images_per_class', type=int,
+        help='Number of images per class of the synthetic datasets.', default=20)
+    parser.add_argument('--embedding_size', type=int,
+        help='Dimensionality of the synthetic embeddings.', default=512)
+    parser.add_argument('--spread', type=float,
+        help='Distance of the synthetic embeddings from their class centre, before normalisation.', default=4.0)
+    parser.add_argument('--nrof_test_images_per_class', type=int,
+        help='Number of images per class held out for measuring accuracy.', default=5)
+    parser.add_argument('--nrof_new_images', type=int,
+        help='Number of images of existing classes added by the first update.', default=20)
+    parser.add_argument('--seed', type=int,
+        help='Random seed.', default=666)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
@@ -0,0 +1,160 @@
+"""Images/sec of the tf.data input pipeline compared to the FIFOQueue/queue-runner pipeline.
+
+Both pipelines are fed the same image paths and control flags and drained
+batch by batch without running a model, so the numbers show how fast each
+can read, decode and preprocess images on this machine.
+
+Usage:
+    python benchmark_input_pipeline.py ~/datasets/lfw/lfw_mtcnnpy_160 --nrof_batches 200 --random_flip
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.python.ops import data_flow_ops
+import facenet
+
+def queue_pipeline(image_size, nrof_preprocess_threads):
+    image_paths_placeholder = tf.placeholder(tf.string, shape=(None,1), name='image_paths')
+    labels_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='labels')
+    control_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='control')
+    batch_size_placeholder = tf.placeholder(tf.int32, name='batch_size')
+    input_queue = data_flow_ops.FIFOQueue(capacity=2000000,
+                                dtypes=[tf.string, tf.int32, tf.int32],
+                                shapes=[(1,), (1,), (1,)],
+                                shared_name=None, name=None)
+    enqueue_op = input_queue.enqueue_many([image_paths_placeholder, labels_placeholder, control_placeholder], name='enqueue_op')
+    image_batch, label_batch = facenet.create_input_pipeline(input_queue, image_size, nrof_preprocess_threads, batch_size_placeholder)
+    return image_paths_placeholder, labels_placeholder, control_placeholder, batch_size_placeholder, enqueue_op, image_batch, label_batch
+
+def dataset_pipeline(image_size, nrof_preprocess_threads, cache_file):
+    image_paths_placeholder = tf.placeholder(tf.string, shape=(None,1), name='image_paths')
+    labels_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='labels')
+    control_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='control')
+    batch_size_placeholder = tf.placeholder(tf.int32, name='batch_size')
+    image_batch, label_batch, init_op = facenet.create_dataset_pipeline(image_paths_placeholder, labels_placeholder,
+        control_placeholder, batch_size_placeholder, image_size, nrof_preprocess_threads, cache_file)
+    return image_paths_placeholder, labels_placeholder, control_placeholder, batch_size_placeholder, init_op, image_batch, label_batch
+
+def run_benchmark(name, build, image_paths, control_value, args, finish_pass=False):
+    """Feeds the paths once per pass and returns the images/sec of every timed pass"""
+    nrof_images = len(image_paths)
+    image_size = (args.image_size, args.image_size)
+    with tf.Graph().as_default():
+        tf.set_random_seed(args.seed)
+        (image_paths_placeholder, labels_placeholder, control_placeholder, batch_size_placeholder,
+            feed_op, image_batch, label_batch) = build(image_size)
+        feed_dict = {image_paths_placeholder: np.expand_dims(np.array(image_paths), 1),
+                     labels_placeholder: np.expand_dims(np.arange(nrof_images, dtype=np.int32), 1),
+                     control_placeholder: np.full((nrof_images, 1), control_value, np.int32),
+                     batch_size_placeholder: args.batch_size}
+        with tf.Session() as sess:
+            coord = tf.train.Coordinator()
+            threads = tf.train.start_queue_runners(coord=coord, sess=sess)
+            rates = []
+            for pass_index in range(args.nrof_warmup_passes + args.nrof_passes):
+                sess.run(feed_op, feed_dict=feed_dict)
+                start_time = time.time()
+                for _ in range(args.nrof_batches):
+                    sess.run([image_batch, label_batch], feed_dict={batch_size_placeholder: args.batch_size})
+                rate = args.nrof_batches * args.batch_size / (time.time() - start_time)
+                if finish_pass:
+                    facenet.finish_dataset_pass(sess, label_batch)
+                if pass_index >= args.nrof_warmup_passes:
+                    rates.append(rate)
+                print('%s pass %d: %.1f images/sec' % (name, pass_index+1, rate))
+            coord.request_stop()
+            coord.join(threads, stop_grace_period_secs=5)
+    return rates
+
+def main(args):
+    np.random.seed(seed=args.seed)
+    dataset = facenet.get_dataset(os.path.expanduser(args.data_dir))
+    image_list, _ = facenet.get_image_paths_and_labels(dataset)
+    nrof_images = args.nrof_batches * args.batch_size
+    assert len(image_list)>0, 'The data directory should contain images'
+    # Repeat the image list if needed so that every pass reads the same nrof_images paths
+    image_paths = list(np.resize(np.random.permutation(image_list), nrof_images))
+
+    control_value = (facenet.RANDOM_ROTATE * args.random_rotate + facenet.RANDOM_CROP * args.random_crop +
+        facenet.RANDOM_FLIP * args.random_flip + facenet.FIXED_STANDARDIZATION * args.use_fixed_image_standardization)
+    cache_file = facenet.dataset_cache_file(os.path.expanduser(args.cache_dir), image_paths) if args.cache_dir else None
+
+    results = {}
+    if not args.skip_queue:
+        results['queue'] = run_benchmark('queue', lambda image_size: queue_pipeline(image_size, args.nrof_queue_threads),
+            image_paths, control_value, args)
+    results['tf.data'] = run_benchmark('tf.data', lambda image_size: dataset_pipeline(image_size, args.nrof_preprocess_threads, cache_file),
+        image_paths, control_value, args, finish_pass=True)
+
+    print('')
+    for name, rates in results.items():
+        print('%-8s %8.1f images/sec (min %.1f, max %.1f over %d passes)' % (name, np.mean(rates), np.min(rates), np.max(rates), len(rates)))
+    if 'queue' in results:
+        print('Speedup: %.2fx' % (np.mean(results['tf.data']) / np.mean(results['queue'])))
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument('data_dir', type=str,
+        help='Path to the data directory containing aligned face patches.')
+    parser.add_argument('--image_size', type=int,
+        help='Image size (height, width) in pixels.', default=160)
+    parser.add_argument('--batch_size', type=int,
+        help='Number of images to process in a batch.', default=90)
+    parser.add_argument('--nrof_batches', type=int,
+        help='Number of batches per timed pass.', default=100)
+    parser.add_argument('--nrof_passes', type=int,
+        help='Number of timed passes per pipeline.', default=3)
+    parser.add_argument('--nrof_warmup_passes', type=int,
+        help='Number of untimed passes run first (they also fill the cache when --cache_dir is set).', default=1)
+    parser.add_argument('--nrof_queue_threads', type=int,
+        help='Number of preprocessing threads of the queue pipeline.', default=4)
+    parser.add_argument('--nrof_preprocess_threads', type=int,
+        help='Number of parallel preprocessing calls of the tf.data pipeline. Tuned automatically if not set.', default=None)
+    parser.add_argument('--cache_dir', type=str,
+        help='Cache the image files of the tf.data pipeline in this directory.', default='')
+    parser.add_argument('--skip_queue', 
+        help='Only benchmark the tf.data pipeline.', action='store_true')
+    parser.add_argument('--random_rotate', 
+        help='Performs random rotations of training images.', action='store_true')
+    parser.add_argument('--random_crop', 
+        help='Performs random cropping of training images.', action='store_true')
+    parser.add_argument('--random_flip', 
+        help='Performs random horizontal flipping of training images.', action='store_true')
+    parser.add_argument('--use_fixed_image_standardization', 
+        help='Performs fixed standardization of images.', action='store_true')
+    parser.add_argument('--seed', type=int,
+        help='Random seed.', default=666)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
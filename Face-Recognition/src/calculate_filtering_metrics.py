@@ -1,4 +1,9 @@
 """Calculate filtering metrics for a dataset and store in a .hdf file.
+
+Besides the distance of every image to its class centre (read by
+train_softmax.py --filter_filename) it flags likely mislabeled images,
+those closer to another class centre than to their own, and with
+--quarantine_dir moves them and extreme outliers out of the dataset.
 """
 # MIT License
 # 
@@ -30,85 +35,82 @@ import tensorflow as tf
 import numpy as np
 import argparse
 import facenet
+import dataset_cleaning
+import json
 import os
 import sys
 import time
 import h5py
-import math
-from tensorflow.python.platform import gfile
-from six import iteritems
 
 def main(args):
     dataset = facenet.get_dataset(args.dataset_dir)
-  
+    image_list, label_list = facenet.get_image_paths_and_labels(dataset)
+    nrof_images = len(image_list)
+    nrof_classes = len(dataset)
+    class_names = [cls.name for cls in dataset]
+    label_array = np.array(label_list, dtype=np.int64)
+
     with tf.Graph().as_default():
-      
-        # Get a list of image paths and their labels
-        image_list, label_list = facenet.get_image_paths_and_labels(dataset)
-        nrof_images = len(image_list)
-        image_indices = range(nrof_images)
 
-        image_batch, label_batch = facenet.read_and_augment_data(image_list,
-            image_indices, args.image_size, args.batch_size, None, 
-            False, False, False, nrof_preprocess_threads=4, shuffle=False)
-        
-        model_exp = os.path.expanduser(args.model_file)
-        with gfile.FastGFile(model_exp,'rb') as f:
-            graph_def = tf.GraphDef()
-            graph_def.ParseFromString(f.read())
-            input_map={'input':image_batch, 'phase_train':False}
-            tf.import_graph_def(graph_def, input_map=input_map, name='net')
-        
-        embeddings = tf.get_default_graph().get_tensor_by_name("net/embeddings:0")
+        with tf.compat.v1.Session() as sess:
+
+            facenet.load_model(args.model_file)
+            images_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("input:0")
+            embeddings = tf.compat.v1.get_default_graph().get_tensor_by_name("embeddings:0")
+            phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
 
-        with tf.Session() as sess:
-            tf.train.start_queue_runners(sess=sess)
-                
+            # Embeddings are written in place into one preallocated array
             embedding_size = int(embeddings.get_shape()[1])
-            nrof_batches = int(math.ceil(nrof_images / args.batch_size))
-            nrof_classes = len(dataset)
-            label_array = np.array(label_list)
-            class_names = [cls.name for cls in dataset]
-            nrof_examples_per_class = [ len(cls.image_paths) for cls in dataset ]
-            class_variance = np.zeros((nrof_classes,))
-            class_center = np.zeros((nrof_classes,embedding_size))
-            distance_to_center = np.ones((len(label_list),))*np.NaN
-            emb_array = np.zeros((0,embedding_size))
-            idx_array = np.zeros((0,), dtype=np.int32)
-            lab_array = np.zeros((0,), dtype=np.int32)
-            index_arr = np.append(0, np.cumsum(nrof_examples_per_class))
-            for i in range(nrof_batches):
+            emb_array = np.zeros((nrof_images, embedding_size), dtype=np.float32)
+            loader = facenet.prefetch_data(image_list, args.batch_size, False, False, args.image_size,
+                depth=args.prefetch_depth, nrof_threads=args.nrof_loader_threads)
+            for i, images in enumerate(loader):
                 t = time.time()
-                emb, idx = sess.run([embeddings, label_batch])
-                emb_array = np.append(emb_array, emb, axis=0)
-                idx_array = np.append(idx_array, idx, axis=0)
-                lab_array = np.append(lab_array, label_array[idx], axis=0)
-                for cls in set(lab_array):
-                    cls_idx = np.where(lab_array==cls)[0]
-                    if cls_idx.shape[0]==nrof_examples_per_class[cls]:
-                        # We have calculated all the embeddings for this class
-                        i2 = np.argsort(idx_array[cls_idx])
-                        emb_class = emb_array[cls_idx,:]
-                        emb_sort = emb_class[i2,:]
-                        center = np.mean(emb_sort, axis=0)
-                        diffs = emb_sort - center
-                        dists_sqr = np.sum(np.square(diffs), axis=1)
-                        class_variance[cls] = np.mean(dists_sqr)
-                        class_center[cls,:] = center
-                        distance_to_center[index_arr[cls]:index_arr[cls+1]] = np.sqrt(dists_sqr)
-                        emb_array = np.delete(emb_array, cls_idx, axis=0)
-                        idx_array = np.delete(idx_array, cls_idx, axis=0)
-                        lab_array = np.delete(lab_array, cls_idx, axis=0)
-
-                        
+                start_index = i*args.batch_size
+                end_index = start_index + len(images)
+                feed_dict = { images_placeholder:images, phase_train_placeholder:False }
+                emb_array[start_index:end_index,:] = sess.run(embeddings, feed_dict=feed_dict)
                 print('Batch %d in %.3f seconds' % (i, time.time()-t))
-                
-            print('Writing filtering data to %s' % args.data_file_name)
-            mdict = {'class_names':class_names, 'image_list':image_list, 'label_list':label_list, 'distance_to_center':distance_to_center }
-            with h5py.File(args.data_file_name, 'w') as f:
-                for key, value in iteritems(mdict):
-                    f.create_dataset(key, data=value)
-                        
+            print(loader.summary())
+
+    metrics = dataset_cleaning.filtering_metrics(emb_array, label_array, nrof_classes)
+    quarantine = dataset_cleaning.select_for_quarantine(metrics, label_array,
+        args.outlier_threshold, args.min_nrof_images_per_class)
+    print('Likely mislabeled images: %d' % np.sum(metrics['mislabeled']))
+    print('Images flagged for quarantine: %d' % np.sum(quarantine))
+
+    print('Writing filtering data to %s' % args.data_file_name)
+    string_dtype = h5py.string_dtype()
+    with h5py.File(args.data_file_name, 'w') as f:
+        f.create_dataset('class_names', data=np.array(class_names, dtype=object), dtype=string_dtype)
+        f.create_dataset('image_list', data=np.array(image_list, dtype=object), dtype=string_dtype)
+        f.create_dataset('label_list', data=label_array)
+        f.create_dataset('quarantine', data=quarantine)
+        for key in ('distance_to_center', 'class_variance', 'class_center', 'outlier_score',
+                    'nearest_other_class', 'nearest_other_distance', 'mislabeled'):
+            f.create_dataset(key, data=metrics[key])
+
+    if args.report:
+        flagged = []
+        for index in np.where(metrics['mislabeled'] | quarantine)[0]:
+            flagged.append({
+                'image': image_list[index],
+                'class': class_names[label_array[index]],
+                'distance_to_center': round(float(metrics['distance_to_center'][index]), 4),
+                'outlier_score': round(float(metrics['outlier_score'][index]), 3),
+                'mislabeled': bool(metrics['mislabeled'][index]),
+                'closest_other_class': class_names[metrics['nearest_other_class'][index]] if metrics['mislabeled'][index] else None,
+                'quarantine': bool(quarantine[index]),
+            })
+        with open(args.report, 'w') as f:
+            json.dump(flagged, f, indent=2)
+        print('Wrote report of %d flagged images to %s' % (len(flagged), args.report))
+
+    if args.quarantine_dir:
+        moved = dataset_cleaning.quarantine_images(image_list, label_array, class_names, quarantine,
+            os.path.expanduser(args.quarantine_dir))
+        print('Moved %d images to %s' % (len(moved), args.quarantine_dir))
+
 def parse_arguments(argv):
     parser = argparse.ArgumentParser()
     
@@ -122,6 +124,18 @@ def parse_arguments(argv):
         help='Image size.', default=160)
     parser.add_argument('--batch_size', type=int,
         help='Number of images to process in a batch.', default=90)
+    parser.add_argument('--prefetch_depth', type=int,
+        help='Number of batches decoded ahead of the one running through the model.', default=2)
+    parser.add_argument('--nrof_loader_threads', type=int,
+        help='Number of threads decoding images.', default=4)
+    parser.add_argument('--outlier_threshold', type=float,
+        help='Quarantine images this many standard deviations further from their class centre than average.', default=3.0)
+    parser.add_argument('--min_nrof_images_per_class', type=int,
+        help='Never quarantine a class below this number of images.', default=2)
+    parser.add_argument('--quarantine_dir', type=str,
+        help='Move flagged images into this directory (one sub-directory per class). Nothing is moved if omitted.', default=None)
+    parser.add_argument('--report', type=str,
+        help='Optional JSON file listing the flagged images.', default=None)
     return parser.parse_args(argv)
 
 if __name__ == '__main__':
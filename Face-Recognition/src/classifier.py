@@ -32,9 +32,8 @@ import argparse
 import facenet
 import os
 import sys
-import math
-import pickle
-from sklearn.svm import SVC
+import face_classifier
+import open_set
 
 def main(args):
   
@@ -74,52 +73,78 @@ def main(args):
             phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
             embedding_size = embeddings.get_shape()[1]
             
+            classifier_filename_exp = os.path.expanduser(args.classifier_filename)
+            class_names = [ cls.name.replace('_', ' ') for cls in dataset]
+
+            # An incremental update only needs the embeddings of images the stored classifier has not seen
+            previous = None
+            emb_paths, emb_labels = paths, labels
+            if args.mode=='TRAIN' and args.incremental and os.path.exists(classifier_filename_exp):
+                previous = face_classifier.load_classifier(classifier_filename_exp)
+                if not previous.has_embeddings or previous.backend != args.classifier_backend:
+                    print('Classifier in "%s" cannot be updated with the %s backend, training a new one' %
+                        (classifier_filename_exp, args.classifier_backend))
+                    previous = None
+                else:
+                    seen = set(previous.image_paths)
+                    emb_paths = [path for path in paths if path not in seen]
+                    emb_labels = [label for path, label in zip(paths, labels) if path not in seen]
+                    print('Number of new images: %d' % len(emb_paths))
+            
             # Run forward pass to calculate embeddings
             print('Calculating features for images')
-            nrof_images = len(paths)
-            nrof_batches_per_epoch = int(math.ceil(1.0*nrof_images / args.batch_size))
+            nrof_images = len(emb_paths)
             emb_array = np.zeros((nrof_images, embedding_size))
-            for i in range(nrof_batches_per_epoch):
-                start_index = i*args.batch_size
-                end_index = min((i+1)*args.batch_size, nrof_images)
-                paths_batch = paths[start_index:end_index]
-                images = facenet.load_data(paths_batch, False, False, args.image_size)
-                feed_dict = { images_placeholder:images, phase_train_placeholder:False }
-                emb_array[start_index:end_index,:] = sess.run(embeddings, feed_dict=feed_dict)
-            
-            classifier_filename_exp = os.path.expanduser(args.classifier_filename)
+            if nrof_images > 0:
+                loader = facenet.prefetch_data(emb_paths, args.batch_size, False, False, args.image_size,
+                    depth=args.prefetch_depth, nrof_threads=args.nrof_loader_threads)
+                for i, images in enumerate(loader):
+                    start_index = i*args.batch_size
+                    end_index = start_index + len(images)
+                    feed_dict = { images_placeholder:images, phase_train_placeholder:False }
+                    emb_array[start_index:end_index,:] = sess.run(embeddings, feed_dict=feed_dict)
+                print(loader.summary())
 
             if (args.mode=='TRAIN'):
                 # Train classifier
                 print('Training classifier')
-                model = SVC(kernel='linear', probability=True)
-                model.fit(emb_array, labels)
-            
-                # Create a list of class names
-                class_names = [ cls.name.replace('_', ' ') for cls in dataset]
+                if previous is None:
+                    classifier = face_classifier.FaceClassifier(args.classifier_backend, seed=args.seed)
+                    classifier.fit(emb_array, emb_labels, class_names, emb_paths)
+                else:
+                    classifier = previous.update(emb_array, emb_labels, class_names, emb_paths, current_paths=paths)
+                print('Classifier %s (%s) in %.2f seconds' % (classifier.metadata['last_training'],
+                    classifier.backend, classifier.metadata['training_seconds']))
+
+                if args.open_set_far > 0:
+                    print('Calibrating open-set thresholds')
+                    open_set.calibrate(classifier, args.open_set_far, args.nrof_calibration_folds, args.seed)
 
                 # Saving classifier model
-                with open(classifier_filename_exp, 'wb') as outfile:
-                    pickle.dump((model, class_names), outfile)
+                classifier.save(classifier_filename_exp, keep_embeddings=not args.skip_embeddings)
                 print('Saved classifier model to file "%s"' % classifier_filename_exp)
                 
             elif (args.mode=='CLASSIFY'):
                 # Classify images
                 print('Testing classifier')
-                with open(classifier_filename_exp, 'rb') as infile:
-                    (model, class_names) = pickle.load(infile)
+                classifier = face_classifier.load_classifier(classifier_filename_exp)
+                dataset_class_names = class_names
+                class_names = classifier.class_names
 
                 print('Loaded classifier model from file "%s"' % classifier_filename_exp)
 
-                predictions = model.predict_proba(emb_array)
-                best_class_indices = np.argmax(predictions, axis=1)
-                best_class_probabilities = predictions[np.arange(len(best_class_indices)), best_class_indices]
+                scores = open_set.scores(classifier, emb_array)
+                best_class_indices = scores['best_class_indices']
+                best_class_probabilities = scores['probability']
+                accepted = open_set.accept(scores, open_set.thresholds(classifier))
                 
                 for i in range(len(best_class_indices)):
-                    print('%4d  %s: %.3f' % (i, class_names[best_class_indices[i]], best_class_probabilities[i]))
+                    print('%4d  %s: %.3f%s' % (i, class_names[best_class_indices[i]], best_class_probabilities[i],
+                        '' if accepted[i] else ' (rejected as unknown)'))
                     
-                accuracy = np.mean(np.equal(best_class_indices, labels))
+                accuracy = np.mean(np.equal(np.array(class_names)[best_class_indices], np.array(dataset_class_names)[labels]))
                 print('Accuracy: %.3f' % accuracy)
+                print('Accepted: %.3f' % np.mean(accepted))
                 
             
 def split_dataset(dataset, min_nrof_images_per_class, nrof_train_images_per_class):
@@ -142,12 +167,24 @@ def parse_arguments(argv):
         help='Indicates if a new classifier should be trained or a classification ' + 
         'model should be used for classification', default='CLASSIFY')
     parser.add_argument('data_dir', type=str,
-        help='Path to the data directory containing aligned LFW face patches.')
+        help='Path to the data directory containing aligned LFW face patches, or a dataset packed by packed_dataset.py.')
     parser.add_argument('model', type=str, 
         help='Could be either a directory containing the meta_file and ckpt_file or a model protobuf (.pb) file')
     parser.add_argument('classifier_filename', 
         help='Classifier model file name as a pickle (.pkl) file. ' + 
         'For training this is the output and for classification this is an input.')
+    parser.add_argument('--classifier_backend', type=str, choices=face_classifier.BACKENDS,
+        help='Classifier to train, see face_classifier.py. sgd and logistic can be updated incrementally.', default='svc')
+    parser.add_argument('--incremental', 
+        help='Update the classifier in classifier_filename with the images added to or removed from data_dir ' +
+        'since it was trained, computing embeddings only for the new images.', action='store_true')
+    parser.add_argument('--open_set_far', type=float,
+        help='Calibrate thresholds rejecting unknown faces at this false accept rate and store them with the classifier. ' +
+        'Zero keeps the previous thresholds.', default=0.0)
+    parser.add_argument('--nrof_calibration_folds', type=int,
+        help='Number of folds of classes held out as unknown people during open-set calibration.', default=5)
+    parser.add_argument('--skip_embeddings', 
+        help='Do not store the training embeddings in the classifier file; it can then not be updated incrementally.', action='store_true')
     parser.add_argument('--use_split_dataset', 
         help='Indicates that the dataset specified by data_dir should be split into a training and test set. ' +  
         'Otherwise a separate test set can be specified using the test_data_dir option.', action='store_true')
@@ -163,6 +200,10 @@ def parse_arguments(argv):
         help='Only include classes with at least this number of images in the dataset', default=20)
     parser.add_argument('--nrof_train_images_per_class', type=int,
         help='Use this number of images from each class for training and the rest for testing', default=10)
+    parser.add_argument('--prefetch_depth', type=int,
+        help='Number of batches decoded ahead of the one running through the model.', default=2)
+    parser.add_argument('--nrof_loader_threads', type=int,
+        help='Number of threads decoding images.', default=4)
     
     return parser.parse_args(argv)
 
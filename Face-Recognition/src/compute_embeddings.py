@@ -0,0 +1,120 @@
+"""Compute the embeddings of an aligned dataset once and cache them in a .npz file.
+
+The cache holds the embeddings with their labels, class names and image paths,
+the model they came from and the measured embedding throughput. Running the
+script again with the same model only computes embeddings for images that are
+not in the cache yet. identification.py reads the cache.
+"""
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+import numpy as np
+import argparse
+import facenet
+import os
+import sys
+import time
+
+def read_cache(filename, model):
+    """(embeddings by image path, images_per_second) of the cache file, if it exists and was computed with model"""
+    if not os.path.exists(filename):
+        return {}, 0.0
+    with np.load(filename, allow_pickle=False) as data:
+        if str(data['model']) != model:
+            print('Cache "%s" was computed with another model, recomputing all embeddings' % filename)
+            return {}, 0.0
+        return dict(zip(data['image_paths'], data['emb_array'])), float(data['images_per_second'])
+
+def main(args):
+    dataset = facenet.get_dataset(args.data_dir)
+    image_list, label_list = facenet.get_image_paths_and_labels(dataset)
+    model = os.path.abspath(os.path.expanduser(args.model))
+    output_file = os.path.expanduser(args.output_file)
+    cached, images_per_second = ({}, 0.0) if args.recompute else read_cache(output_file, model)
+    missing = [path for path in image_list if path not in cached]
+    print('Number of classes: %d' % len(dataset))
+    print('Number of images: %d (%d cached)' % (len(image_list), len(image_list) - len(missing)))
+
+    if missing:
+        with tf.Graph().as_default():
+
+            with tf.compat.v1.Session() as sess:
+
+                facenet.load_model(args.model)
+                images_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("input:0")
+                embeddings = tf.compat.v1.get_default_graph().get_tensor_by_name("embeddings:0")
+                phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
+
+                embedding_size = int(embeddings.get_shape()[1])
+                emb_array = np.zeros((len(missing), embedding_size), dtype=np.float32)
+                loader = facenet.prefetch_data(missing, args.batch_size, False, False, args.image_size,
+                    depth=args.prefetch_depth, nrof_threads=args.nrof_loader_threads)
+                start_time = time.time()
+                for i, images in enumerate(loader):
+                    start_index = i*args.batch_size
+                    end_index = start_index + len(images)
+                    feed_dict = { images_placeholder:images, phase_train_placeholder:False }
+                    emb_array[start_index:end_index,:] = sess.run(embeddings, feed_dict=feed_dict)
+                images_per_second = len(missing) / (time.time() - start_time)
+                print(loader.summary())
+                print('Embedding throughput: %.1f images/sec' % images_per_second)
+        cached.update(zip(missing, emb_array))
+
+    tmp_file = output_file + '.tmp.npz'
+    np.savez(tmp_file,
+        emb_array=np.stack([cached[path] for path in image_list]),
+        labels=np.array(label_list, dtype=np.int64),
+        class_names=np.array([cls.name for cls in dataset]),
+        image_paths=np.array(image_list),
+        model=np.array(model),
+        images_per_second=np.array(images_per_second))
+    os.replace(tmp_file, output_file)
+    print('Embeddings written to "%s"' % output_file)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument('data_dir', type=str,
+        help='Path to the data directory containing aligned face patches, or a dataset packed by packed_dataset.py.')
+    parser.add_argument('model', type=str, 
+        help='Could be either a directory containing the meta_file and ckpt_file or a model protobuf (.pb) file')
+    parser.add_argument('output_file', type=str,
+        help='The .npz file the embeddings are cached in.')
+    parser.add_argument('--recompute', 
+        help='Compute the embeddings of all images even if they are cached.', action='store_true')
+    parser.add_argument('--batch_size', type=int,
+        help='Number of images to process in a batch.', default=90)
+    parser.add_argument('--image_size', type=int,
+        help='Image size (height, width) in pixels.', default=160)
+    parser.add_argument('--prefetch_depth', type=int,
+        help='Number of batches decoded ahead of the one running through the model.', default=2)
+    parser.add_argument('--nrof_loader_threads', type=int,
+        help='Number of threads decoding images.', default=4)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
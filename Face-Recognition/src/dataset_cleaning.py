@@ -0,0 +1,131 @@
+"""Embedding-space dataset cleaning: per-class centroids, outlier scores and likely mislabeled images.
+
+All metrics are computed in one vectorised pass over a preallocated
+(nrof_images, embedding_size) array; calculate_filtering_metrics.py fills
+that array from the model and uses these functions to report on, and
+optionally quarantine, suspicious images before a classifier is trained.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import shutil
+import numpy as np
+
+def class_centroids(emb_array, labels, nrof_classes):
+    """(centers, counts): mean embedding and number of images of every class"""
+    labels = np.asarray(labels)
+    counts = np.bincount(labels, minlength=nrof_classes)
+    sums = np.zeros((nrof_classes, emb_array.shape[1]), dtype=np.float64)
+    np.add.at(sums, labels, emb_array)
+    centers = sums / np.maximum(counts, 1)[:, np.newaxis]
+    return centers, counts
+
+def squared_distances(emb_array, centers):
+    """(nrof_images, nrof_classes) squared euclidean distances, without materialising the differences"""
+    emb_sqr = np.sum(np.square(emb_array), axis=1)[:, np.newaxis]
+    cen_sqr = np.sum(np.square(centers), axis=1)[np.newaxis, :]
+    return np.maximum(emb_sqr - 2.0 * emb_array.dot(centers.T) + cen_sqr, 0.0)
+
+def filtering_metrics(emb_array, labels, nrof_classes):
+    """Distance-to-centre, outlier and mislabel metrics for every image.
+
+    distance_to_center is measured to the image's own class centre as in
+    the original filtering script. The mislabel test compares the
+    leave-one-out own centre (the centre without the image itself, so a
+    class cannot vouch for its own outlier) to the nearest other class
+    centre. outlier_score is the distance to the own centre in standard
+    deviations above the class mean.
+    """
+    emb_array = np.asarray(emb_array, dtype=np.float64)
+    labels = np.asarray(labels)
+    nrof_images = emb_array.shape[0]
+    rows = np.arange(nrof_images)
+
+    centers, counts = class_centroids(emb_array, labels, nrof_classes)
+    dists_sqr = squared_distances(emb_array, centers)
+    own_sqr = dists_sqr[rows, labels]
+    distance_to_center = np.sqrt(own_sqr)
+
+    class_variance = np.bincount(labels, weights=own_sqr, minlength=nrof_classes) / np.maximum(counts, 1)
+    class_mean = np.bincount(labels, weights=distance_to_center, minlength=nrof_classes) / np.maximum(counts, 1)
+    # class_variance is the mean squared distance to the centre, the second moment of distance_to_center
+    class_std = np.sqrt(np.maximum(class_variance - np.square(class_mean), 0.0))
+    outlier_score = (distance_to_center - class_mean[labels]) / np.maximum(class_std[labels], 1e-12)
+
+    # Removing the image from its own centre moves that centre away by a factor n/(n-1)
+    own_count = counts[labels]
+    loo_scale = np.where(own_count > 1, own_count / np.maximum(own_count - 1.0, 1.0), np.inf)
+    loo_distance = distance_to_center * loo_scale
+
+    other_sqr = dists_sqr.copy()
+    other_sqr[rows, labels] = np.inf
+    other_sqr[:, counts == 0] = np.inf
+    nearest_other_class = np.argmin(other_sqr, axis=1) if nrof_classes > 1 else np.full(nrof_images, -1)
+    nearest_other_distance = np.sqrt(other_sqr[rows, nearest_other_class]) if nrof_classes > 1 else np.full(nrof_images, np.inf)
+    mislabeled = (nearest_other_distance < loo_distance) & np.isfinite(loo_distance)
+
+    return {
+        'class_center': centers,
+        'class_variance': class_variance,
+        'distance_to_center': distance_to_center,
+        'outlier_score': outlier_score,
+        'nearest_other_class': nearest_other_class,
+        'nearest_other_distance': nearest_other_distance,
+        'mislabeled': mislabeled,
+    }
+
+def select_for_quarantine(metrics, labels, outlier_threshold=3.0, min_nrof_images_per_class=2):
+    """Boolean mask of images to quarantine: mislabeled ones, plus outliers above outlier_threshold.
+
+    Worst images go first, and a class is never reduced below
+    min_nrof_images_per_class.
+    """
+    labels = np.asarray(labels)
+    flagged = metrics['mislabeled'] | (metrics['outlier_score'] > outlier_threshold)
+    severity = np.where(metrics['mislabeled'], np.inf, metrics['outlier_score'])
+
+    quarantine = np.zeros(labels.shape[0], dtype=bool)
+    remaining = np.bincount(labels)
+    for index in np.argsort(-severity, kind='stable'):
+        if not flagged[index]:
+            break
+        if remaining[labels[index]] > min_nrof_images_per_class:
+            quarantine[index] = True
+            remaining[labels[index]] -= 1
+    return quarantine
+
+def quarantine_images(image_list, label_list, class_names, mask, quarantine_dir):
+    """Move the masked images to quarantine_dir/<class>/; returns the new paths"""
+    moved = []
+    for index in np.where(mask)[0]:
+        target_dir = os.path.join(quarantine_dir, class_names[label_list[index]])
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        target = os.path.join(target_dir, os.path.basename(image_list[index]))
+        shutil.move(image_list[index], target)
+        moved.append(target)
+    return moved
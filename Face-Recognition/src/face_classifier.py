@@ -0,0 +1,272 @@
+"""Face classifier backends with incremental updates and a versioned file format.
+
+A FaceClassifier wraps one of the scikit-learn backends in BACKENDS together
+with the class names and the embeddings it was trained on. Keeping the
+embeddings lets classifier.py update a trained model with only the images
+added since the last run: their embeddings are computed, images that left the
+dataset are dropped, and the sgd and logistic backends continue from their
+previous coefficients instead of starting over. The svc and linear_svc backends
+are refitted on the stored embeddings, which still skips the forward pass over
+the whole dataset.
+
+Classifiers are saved as a pickled dict with a format name and version (see
+save/load_classifier) rather than as a (model, class_names) tuple; such legacy
+files can still be loaded. The dict also carries the open-set thresholds
+calibrated for the classifier (see open_set.py).
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import time
+import pickle
+import numpy as np
+
+FORMAT_NAME = 'facenet-classifier'
+FORMAT_VERSION = 1
+
+# svc:        the original SVC(kernel='linear', probability=True), refitted from scratch
+# linear_svc: LinearSVC with sigmoid calibration, refitted from scratch
+# sgd:        logistic loss SGDClassifier, updated with partial_fit
+# logistic:   multinomial LogisticRegression, warm started from the previous coefficients
+BACKENDS = ('svc', 'linear_svc', 'sgd', 'logistic')
+INCREMENTAL_BACKENDS = ('sgd', 'logistic')
+
+def create_model(backend, seed=666):
+    """Untrained scikit-learn estimator of a backend"""
+    if backend == 'svc':
+        from sklearn.svm import SVC
+        return SVC(kernel='linear', probability=True)
+    elif backend == 'linear_svc':
+        from sklearn.svm import LinearSVC
+        from sklearn.calibration import CalibratedClassifierCV
+        return CalibratedClassifierCV(LinearSVC(C=1.0), cv=3)
+    elif backend == 'sgd':
+        from sklearn.linear_model import SGDClassifier
+        return SGDClassifier(loss='log_loss', alpha=1e-4, max_iter=50, tol=1e-4, random_state=seed)
+    elif backend == 'logistic':
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(C=100.0, max_iter=500, warm_start=True)
+    raise ValueError('Unknown classifier backend "%s"' % backend)
+
+class FaceClassifier(object):
+    """A trained backend, the class names its labels index and the (path, embedding, label) rows it was fitted on"""
+
+    def __init__(self, backend='svc', seed=666):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown classifier backend "%s"' % backend)
+        self.backend = backend
+        self.seed = seed
+        self.model = None
+        self.class_names = []
+        self.image_paths = []
+        self.emb_array = None
+        self.labels = np.zeros((0,), dtype=np.int64)
+        self.metadata = {}
+        self.open_set = {}
+
+    @property
+    def incremental(self):
+        return self.backend in INCREMENTAL_BACKENDS
+
+    @property
+    def has_embeddings(self):
+        return self.emb_array is not None
+
+    def predict_proba(self, emb_array):
+        """(nrof_images, len(class_names)) probabilities; columns follow class_names"""
+        proba = self.model.predict_proba(emb_array)
+        classes = self.model.classes_
+        if proba.shape[1] == len(self.class_names) and np.array_equal(classes, np.arange(len(self.class_names))):
+            return proba
+        full = np.zeros((proba.shape[0], len(self.class_names)), dtype=proba.dtype)
+        full[:, classes] = proba
+        return full
+
+    def _class_indices(self, labels, class_names):
+        """Map labels indexing class_names to indices of self.class_names, appending names not seen before"""
+        index = dict((name, i) for i, name in enumerate(self.class_names))
+        mapping = np.zeros(len(class_names), dtype=np.int64)
+        for i, name in enumerate(class_names):
+            if name not in index:
+                index[name] = len(self.class_names)
+                self.class_names.append(name)
+            mapping[i] = index[name]
+        return mapping[np.asarray(labels, dtype=np.int64)]
+
+    def fit(self, emb_array, labels, class_names, image_paths=None):
+        """Train from scratch on emb_array, labels being indices into class_names"""
+        self.class_names = []
+        self.labels = self._class_indices(labels, class_names)
+        self.emb_array = np.asarray(emb_array, dtype=np.float32)
+        self.image_paths = list(image_paths) if image_paths is not None else []
+        start_time = time.time()
+        self.model = create_model(self.backend, self.seed)
+        self.model.fit(self.emb_array, self.labels)
+        self._record('fit', time.time() - start_time, len(self.labels))
+        return self
+
+    def update(self, emb_array, labels, class_names, image_paths, current_paths=None, nrof_epochs=5):
+        """Add the images in image_paths and drop stored images missing from current_paths.
+
+        Only the embeddings of the added images are needed. New class names
+        are appended to class_names. The sgd backend takes partial_fit steps
+        over the new images mixed with an equal number of stored ones as long
+        as no class was added or images removed; otherwise, and for the
+        logistic backend, the model is refitted on all stored embeddings
+        starting from its previous coefficients. svc and linear_svc are
+        refitted from scratch.
+        """
+        if self.model is None or not self.has_embeddings:
+            raise ValueError('update needs a classifier trained with its embeddings; fit it first')
+        start_time = time.time()
+        nrof_classes = len(self.class_names)
+        new_labels = self._class_indices(labels, class_names)
+        new_emb = np.asarray(emb_array, dtype=np.float32).reshape(-1, self.emb_array.shape[1])
+
+        keep = np.ones(len(self.labels), dtype=bool)
+        if current_paths is not None:
+            current = set(current_paths)
+            keep = np.array([path in current for path in self.image_paths], dtype=bool)
+        nrof_removed = int(np.sum(~keep))
+        if nrof_removed:
+            self.emb_array = self.emb_array[keep]
+            self.labels = self.labels[keep]
+            self.image_paths = [path for path, k in zip(self.image_paths, keep) if k]
+
+        old_emb, old_labels = self.emb_array, self.labels
+        self.emb_array = np.concatenate([old_emb, new_emb])
+        self.labels = np.concatenate([old_labels, new_labels])
+        self.image_paths = self.image_paths + list(image_paths)
+
+        same_classes = np.array_equal(np.unique(self.labels), self.model.classes_)
+        if self.backend == 'sgd' and same_classes and not nrof_removed and len(new_labels) > 0:
+            rng = np.random.RandomState(self.seed + len(self.labels))
+            for _ in range(nrof_epochs):
+                replay = rng.choice(len(old_labels), min(len(old_labels), len(new_labels)), replace=False)
+                emb = np.concatenate([new_emb, old_emb[replay]])
+                lab = np.concatenate([new_labels, old_labels[replay]])
+                order = rng.permutation(len(lab))
+                self.model.partial_fit(emb[order], lab[order])
+            mode = 'partial_fit'
+        elif self.incremental:
+            self._warm_start_fit()
+            mode = 'warm_start'
+        else:
+            self.model = create_model(self.backend, self.seed)
+            self.model.fit(self.emb_array, self.labels)
+            mode = 'refit'
+        self._record(mode, time.time() - start_time, len(new_labels), nrof_removed=nrof_removed,
+                     nrof_new_classes=len(self.class_names) - nrof_classes)
+        return self
+
+    def _warm_start_fit(self):
+        """Refit on all stored embeddings, initialised from the previous coefficients of the classes still present"""
+        classes = np.unique(self.labels)
+        old_classes = self.model.classes_
+        coef, intercept = self.model.coef_, self.model.intercept_
+        if len(classes) <= 2 or len(old_classes) <= 2:
+            # Binary models have a single coefficient row that cannot be split per class
+            self.model = create_model(self.backend, self.seed)
+            self.model.fit(self.emb_array, self.labels)
+            return
+        rows = np.searchsorted(old_classes, classes)
+        found = (rows < len(old_classes)) & (old_classes[np.minimum(rows, len(old_classes)-1)] == classes)
+        coef_init = np.zeros((len(classes), coef.shape[1]), dtype=np.float64)
+        intercept_init = np.full(len(classes), np.min(intercept), dtype=np.float64)
+        coef_init[found] = coef[rows[found]]
+        intercept_init[found] = intercept[rows[found]]
+        if self.backend == 'sgd':
+            self.model.fit(self.emb_array, self.labels, coef_init=coef_init, intercept_init=intercept_init)
+        else:
+            self.model.coef_ = coef_init
+            self.model.intercept_ = intercept_init
+            self.model.classes_ = classes
+            self.model.fit(self.emb_array, self.labels)
+
+    def _record(self, mode, seconds, nrof_images, **extra):
+        self.metadata.update(extra)
+        self.metadata.update({
+            'last_training': mode,
+            'training_seconds': seconds,
+            'nrof_trained_images': nrof_images,
+            'nrof_images': len(self.labels),
+            'nrof_classes': len(self.class_names),
+            'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'nrof_updates': 0 if mode == 'fit' else self.metadata.get('nrof_updates', 0) + 1,
+        })
+
+    def to_state(self, keep_embeddings=True):
+        return {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'backend': self.backend,
+            'seed': self.seed,
+            'model': self.model,
+            'class_names': list(self.class_names),
+            'image_paths': list(self.image_paths) if keep_embeddings else [],
+            'emb_array': self.emb_array if keep_embeddings else None,
+            'labels': self.labels if keep_embeddings else np.zeros((0,), dtype=np.int64),
+            'metadata': dict(self.metadata),
+            'open_set': dict(self.open_set),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        classifier = cls(state['backend'], state.get('seed', 666))
+        classifier.model = state['model']
+        classifier.class_names = list(state['class_names'])
+        classifier.image_paths = list(state.get('image_paths', []))
+        classifier.emb_array = state.get('emb_array')
+        classifier.labels = np.asarray(state.get('labels', []), dtype=np.int64)
+        classifier.metadata = dict(state.get('metadata', {}))
+        classifier.open_set = dict(state.get('open_set', {}))
+        return classifier
+
+    def save(self, filename, keep_embeddings=True):
+        """Write the classifier to filename, replacing any previous file atomically"""
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as outfile:
+            pickle.dump(self.to_state(keep_embeddings), outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, filename)
+
+def load_classifier(filename):
+    """FaceClassifier from a file written by FaceClassifier.save or a legacy (model, class_names) pickle"""
+    with open(filename, 'rb') as infile:
+        state = pickle.load(infile)
+    if isinstance(state, tuple):
+        model, class_names = state
+        classifier = FaceClassifier('svc')
+        classifier.model = model
+        classifier.class_names = list(class_names)
+        classifier.metadata = {'legacy_format': True}
+        return classifier
+    if not isinstance(state, dict) or state.get('format') != FORMAT_NAME:
+        raise ValueError('"%s" is not a classifier file' % filename)
+    if state['version'] > FORMAT_VERSION:
+        raise ValueError('Classifier file "%s" has format version %d, this code reads up to %d' %
+                         (filename, state['version'], FORMAT_VERSION))
+    return FaceClassifier.from_state(state)
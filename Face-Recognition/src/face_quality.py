@@ -0,0 +1,265 @@
+"""Face image quality scoring and selection of the best, most diverse enrollment images.
+
+Each face gets a score in [0, 1] from its sharpness (variance of the Laplacian),
+its size and its head pose estimated from the five MTCNN landmarks. Redundancy is
+judged in embedding space: among images scoring well, a frame that is nearly
+identical to one already kept (as consecutive captures from capture.py are) adds
+nothing, so only the top-K diverse images per person are kept.
+
+Pruning an existing dataset moves the rest into a quarantine directory:
+    python face_quality.py ../Dataset/FaceData/raw ../Models/20180402-114759.pb --top_k 20 --dry_run
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import numpy as np
+
+# Reference values at which a component reaches full marks
+SHARPNESS_REF = 150.0   # Laplacian variance of a crisp 160x160 face crop
+FACE_SIZE_REF = 160.0   # face box side in pixels, the classifier's input size
+MAX_YAW = 0.5           # nose offset from the eye midpoint, in inter-eye distances
+MAX_PITCH = 0.5         # deviation of the eye-nose / nose-mouth height ratio from 1
+MAX_ROLL = 30.0         # degrees of eye-line tilt
+
+WEIGHTS = (0.4, 0.25, 0.35)  # sharpness, size, pose
+
+def laplacian_variance(gray):
+    """Variance of the 4-neighbour Laplacian of a 2-D image; low values mean blur"""
+    gray = np.asarray(gray, dtype=np.float64)
+    if gray.ndim == 3:
+        gray = gray.mean(axis=2)
+    lap = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]) - 4.0 * gray[1:-1, 1:-1]
+    return float(lap.var()) if lap.size else 0.0
+
+def pose_from_landmarks(points):
+    """(yaw, pitch, roll) from MTCNN points.
+
+    points is one column of detect_face's points output, i.e. 10 values
+    (x of left eye, right eye, nose, left mouth, right mouth, then the
+    five y values), or an array of shape (10, n) for n faces. Yaw and
+    pitch are unitless offsets (0 is frontal), roll is in degrees.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    xs, ys = points[0:5], points[5:10]
+
+    eye_dx = xs[1] - xs[0]
+    eye_dy = ys[1] - ys[0]
+    eye_distance = np.maximum(np.hypot(eye_dx, eye_dy), 1e-6)
+    roll = np.degrees(np.arctan2(eye_dy, eye_dx))
+
+    eye_mid_x = (xs[0] + xs[1]) / 2.0
+    eye_mid_y = (ys[0] + ys[1]) / 2.0
+    mouth_mid_y = (ys[3] + ys[4]) / 2.0
+    yaw = (xs[2] - eye_mid_x) / eye_distance
+
+    upper = ys[2] - eye_mid_y
+    lower = np.maximum(mouth_mid_y - ys[2], 1e-6)
+    pitch = upper / lower - 1.0
+    return yaw, pitch, roll
+
+def quality_score(sharpness, face_size, yaw=0.0, pitch=0.0, roll=0.0):
+    """Weighted quality in [0, 1]; every argument may be a scalar or an array"""
+    sharp_term = np.clip(np.asarray(sharpness, dtype=np.float64) / SHARPNESS_REF, 0.0, 1.0)
+    size_term = np.clip(np.asarray(face_size, dtype=np.float64) / FACE_SIZE_REF, 0.0, 1.0)
+    pose_term = (np.clip(1.0 - np.abs(yaw) / MAX_YAW, 0.0, 1.0)
+                 * np.clip(1.0 - np.abs(pitch) / MAX_PITCH, 0.0, 1.0)
+                 * np.clip(1.0 - np.abs(roll) / MAX_ROLL, 0.0, 1.0))
+    w_sharp, w_size, w_pose = WEIGHTS
+    return w_sharp * sharp_term + w_size * size_term + w_pose * pose_term
+
+def select_diverse(embeddings, scores, top_k, max_similarity=0.9):
+    """Indices of up to top_k images, best first, skipping near-duplicates.
+
+    Greedy over images in descending score order: an image is kept unless
+    its cosine similarity to an already kept one exceeds max_similarity.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if scores.size == 0 or top_k <= 0:
+        return []
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings = embeddings / np.maximum(norms, 1e-12)
+
+    nearest = np.full(scores.shape[0], -np.inf)
+    selected = []
+    for index in np.argsort(-scores, kind='stable'):
+        if nearest[index] > max_similarity:
+            continue
+        selected.append(int(index))
+        if len(selected) == top_k:
+            break
+        np.maximum(nearest, embeddings @ embeddings[index], out=nearest)
+    return selected
+
+def score_faces(paths, pnet, rnet, onet, image_size, margin, batch_size, embed):
+    """Detect, measure and embed each image; returns (records, embeddings) for the faces found"""
+    import imageio
+    import align.detect_face
+    import facenet
+    from PIL import Image
+
+    minsize = 20
+    threshold = [0.6, 0.7, 0.7]
+    factor = 0.709
+
+    records = []
+    crops = []
+    for path in paths:
+        try:
+            img = imageio.imread(path)
+        except (IOError, ValueError, IndexError) as e:
+            print('%s: %s' % (path, e))
+            continue
+        if img.ndim < 2:
+            continue
+        if img.ndim == 2:
+            img = facenet.to_rgb(img)
+        img = img[:, :, 0:3]
+
+        bounding_boxes, points = align.detect_face.detect_face(img, minsize, pnet, rnet, onet, threshold, factor)
+        if bounding_boxes.shape[0] == 0:
+            records.append({'path': path, 'face': False})
+            continue
+
+        sizes = (bounding_boxes[:, 2] - bounding_boxes[:, 0]) * (bounding_boxes[:, 3] - bounding_boxes[:, 1])
+        best = int(np.argmax(sizes))
+        det = bounding_boxes[best, 0:4]
+        img_size = np.asarray(img.shape)[0:2]
+        bb = np.zeros(4, dtype=np.int32)
+        bb[0] = np.maximum(det[0] - margin / 2, 0)
+        bb[1] = np.maximum(det[1] - margin / 2, 0)
+        bb[2] = np.minimum(det[2] + margin / 2, img_size[1])
+        bb[3] = np.minimum(det[3] + margin / 2, img_size[0])
+        cropped = np.asarray(Image.fromarray(img[bb[1]:bb[3], bb[0]:bb[2], :]).resize((image_size, image_size), Image.BILINEAR))
+
+        yaw, pitch, roll = pose_from_landmarks(points[:, best])
+        sharpness = laplacian_variance(cropped)
+        face_size = float(min(det[2] - det[0], det[3] - det[1]))
+        records.append({
+            'path': path,
+            'face': True,
+            'sharpness': round(sharpness, 1),
+            'face_size': round(face_size, 1),
+            'yaw': round(float(yaw), 3),
+            'pitch': round(float(pitch), 3),
+            'roll': round(float(roll), 1),
+            'score': round(float(quality_score(sharpness, face_size, yaw, pitch, roll)), 4),
+        })
+        crops.append(facenet.prewhiten(cropped))
+
+    embeddings = np.zeros((len(crops), 0))
+    if crops:
+        parts = []
+        for start in range(0, len(crops), batch_size):
+            parts.append(embed(np.stack(crops[start:start + batch_size])))
+        embeddings = np.concatenate(parts)
+    return records, embeddings
+
+def main(args):
+    import tensorflow as tf
+    import facenet
+    import align.detect_face
+
+    dataset = facenet.get_dataset(args.data_dir)
+    quarantine_dir = os.path.expanduser(args.quarantine_dir or os.path.normpath(args.data_dir) + '_pruned')
+    report = {}
+
+    with tf.Graph().as_default():
+        with tf.compat.v1.Session() as sess:
+            pnet, rnet, onet = align.detect_face.create_mtcnn(sess, None)
+            facenet.load_model(args.model)
+            images_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("input:0")
+            embeddings = tf.compat.v1.get_default_graph().get_tensor_by_name("embeddings:0")
+            phase_train_placeholder = tf.compat.v1.get_default_graph().get_tensor_by_name("phase_train:0")
+
+            def embed(batch):
+                return sess.run(embeddings, feed_dict={images_placeholder: batch, phase_train_placeholder: False})
+
+            for cls in dataset:
+                records, emb = score_faces(cls.image_paths, pnet, rnet, onet,
+                                           args.image_size, args.margin, args.batch_size, embed)
+                faces = [r for r in records if r['face']]
+                scores = np.array([r['score'] for r in faces])
+                keep = set(select_diverse(emb, scores, args.top_k, args.max_similarity)) if faces else set()
+                for i, record in enumerate(faces):
+                    record['keep'] = i in keep and record['score'] >= args.min_score
+                for record in records:
+                    record.setdefault('keep', False)
+
+                nrof_kept = sum(r['keep'] for r in records)
+                print('%s: keeping %d of %d images' % (cls.name, nrof_kept, len(records)))
+                report[cls.name] = records
+
+                if not args.dry_run:
+                    for record in records:
+                        if record['keep']:
+                            continue
+                        target_dir = os.path.join(quarantine_dir, cls.name)
+                        if not os.path.exists(target_dir):
+                            os.makedirs(target_dir)
+                        shutil.move(record['path'], os.path.join(target_dir, os.path.basename(record['path'])))
+
+    report_path = os.path.expanduser(args.report) if args.report else os.path.join(os.path.expanduser(args.data_dir), 'quality_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('Wrote quality report to %s' % report_path)
+    if not args.dry_run:
+        print('Pruned images moved to %s' % quarantine_dir)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('data_dir', type=str,
+        help='Dataset directory with one sub-directory of face images per person.')
+    parser.add_argument('model', type=str,
+        help='Could be either a directory containing the meta_file and ckpt_file or a model protobuf (.pb) file')
+    parser.add_argument('--top_k', type=int,
+        help='Number of images to keep per person.', default=20)
+    parser.add_argument('--min_score', type=float,
+        help='Images scoring below this are pruned even if fewer than top_k remain.', default=0.3)
+    parser.add_argument('--max_similarity', type=float,
+        help='Cosine similarity above which an image counts as a near-duplicate of one already kept.', default=0.9)
+    parser.add_argument('--image_size', type=int,
+        help='Image size (height, width) in pixels.', default=160)
+    parser.add_argument('--margin', type=int,
+        help='Margin for the crop around the bounding box (height, width) in pixels.', default=32)
+    parser.add_argument('--batch_size', type=int,
+        help='Number of images to process in a batch.', default=90)
+    parser.add_argument('--quarantine_dir', type=str,
+        help='Where pruned images are moved (default: <data_dir>_pruned).', default=None)
+    parser.add_argument('--report', type=str,
+        help='Path of the JSON report (default: <data_dir>/quality_report.json).', default=None)
+    parser.add_argument('--dry_run',
+        help='Only score and write the report, do not move any files.', action='store_true')
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
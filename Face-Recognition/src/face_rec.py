@@ -5,10 +5,12 @@ from __future__ import print_function
 import tensorflow as tf
 import argparse
 import facenet
+import image_normalization
 import os
 import sys
 import math
-import pickle
+import face_classifier
+import open_set
 import align.detect_face
 import numpy as np
 import cv2
@@ -32,8 +34,10 @@ def main():
     FACENET_MODEL_PATH = 'Models/20180402-114759.pb'
 
     # Load model da train de nhan dien khuon mat - thuc chat la classifier
-    with open(CLASSIFIER_PATH, 'rb') as file:
-        model, class_names = pickle.load(file)
+    model = face_classifier.load_classifier(CLASSIFIER_PATH)
+    class_names = model.class_names
+    # Calibrated open-set thresholds if the classifier has them, otherwise only the old probability cut
+    thresholds = open_set.thresholds(model, min_probability=0.5)
     print("Custom Classifier, Successfully loaded")
 
     with tf.Graph().as_default():
@@ -86,16 +90,15 @@ def main():
                             cropped = frame[bb[i][1]:bb[i][3], bb[i][0]:bb[i][2], :]
                             scaled = cv2.resize(cropped, (INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE),
                                                 interpolation=cv2.INTER_CUBIC)
-                            scaled = facenet.prewhiten(scaled)
-                            scaled_reshape = scaled.reshape(-1, INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE, 3)
+                            scaled_reshape = image_normalization.prewhiten_batch(scaled[np.newaxis])
                             feed_dict = {images_placeholder: scaled_reshape, phase_train_placeholder: False}
                             emb_array = sess.run(embeddings, feed_dict=feed_dict)
                             
                             # Dua vao model de classifier
-                            predictions = model.predict_proba(emb_array)
-                            best_class_indices = np.argmax(predictions, axis=1)
-                            best_class_probabilities = predictions[
-                                np.arange(len(best_class_indices)), best_class_indices]
+                            scores = open_set.scores(model, emb_array)
+                            accepted = open_set.accept(scores, thresholds)[0]
+                            best_class_indices = scores['best_class_indices']
+                            best_class_probabilities = scores['probability']
                             
                             # Lay ra ten va ty le % cua class co ty le cao nhat
                             best_name = class_names[best_class_indices[0]]
@@ -106,11 +109,11 @@ def main():
                             text_x = bb[i][0]
                             text_y = bb[i][3] + 20
 
-                            # Neu ty le nhan dang > 0.5 thi hien thi ten
-                            if best_class_probabilities > 0.5:
+                            # Neu vuot qua cac nguong open-set thi hien thi ten
+                            if accepted:
                                 name = class_names[best_class_indices[0]]
                             else:
-                                # Con neu <=0.5 thi hien thi Unknow
+                                # Con neu khong thi hien thi Unknow
                                 name = "Unknown"
                                 
                             # Viet text len tren frame    
@@ -9,11 +9,13 @@ from imutils.video import VideoStream
 
 import argparse
 import facenet
+import image_normalization
 import imutils
 import os
 import sys
 import math
-import pickle
+import face_classifier
+import open_set
 import align.detect_face
 import numpy as np
 import cv2
@@ -36,8 +38,10 @@ def main():
     FACENET_MODEL_PATH = 'Models/20180402-114759.pb'
 
     # Load The Custom Classifier
-    with open(CLASSIFIER_PATH, 'rb') as file:
-        model, class_names = pickle.load(file)
+    model = face_classifier.load_classifier(CLASSIFIER_PATH)
+    class_names = model.class_names
+    # Calibrated open-set thresholds if the classifier has them, otherwise only the old probability cut
+    thresholds = open_set.thresholds(model, min_probability=0.8)
     print("Custom Classifier, Successfully loaded")
 
     with tf.Graph().as_default():
@@ -92,22 +96,21 @@ def main():
                                 cropped = frame[bb[i][1]:bb[i][3], bb[i][0]:bb[i][2], :]
                                 scaled = cv2.resize(cropped, (INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE),
                                                     interpolation=cv2.INTER_CUBIC)
-                                scaled = facenet.prewhiten(scaled)
-                                scaled_reshape = scaled.reshape(-1, INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE, 3)
+                                scaled_reshape = image_normalization.prewhiten_batch(scaled[np.newaxis])
                                 feed_dict = {images_placeholder: scaled_reshape, phase_train_placeholder: False}
                                 emb_array = sess.run(embeddings, feed_dict=feed_dict)
 
-                                predictions = model.predict_proba(emb_array)
-                                best_class_indices = np.argmax(predictions, axis=1)
-                                best_class_probabilities = predictions[
-                                    np.arange(len(best_class_indices)), best_class_indices]
+                                scores = open_set.scores(model, emb_array)
+                                accepted = open_set.accept(scores, thresholds)[0]
+                                best_class_indices = scores['best_class_indices']
+                                best_class_probabilities = scores['probability']
                                 best_name = class_names[best_class_indices[0]]
                                 print("Name: {}, Probability: {}".format(best_name, best_class_probabilities))
 
 
 
-                                #ngưỡng chính xác là 0.8: khi lớn hơn 0.8 thì mới coi là chính xác
-                                if best_class_probabilities > 0.8:
+                                #chỉ coi là chính xác khi vượt qua các ngưỡng open-set (mặc định xác suất > 0.8)
+                                if accepted:
                                     cv2.rectangle(frame, (bb[i][0], bb[i][1]), (bb[i][2], bb[i][3]), (0, 255, 0), 2)
                                     text_x = bb[i][0]
                                     text_y = bb[i][3] + 20
@@ -8,10 +8,12 @@ from flask_cors import CORS, cross_origin
 import tensorflow as tf
 import argparse
 import facenet
+import image_normalization
 import os
 import sys
 import math
-import pickle
+import face_classifier
+import open_set
 import align.detect_face
 import numpy as np
 import cv2
@@ -28,8 +30,10 @@ CLASSIFIER_PATH = '../Models/facemodel.pkl'
 FACENET_MODEL_PATH = '../Models/20180402-114759.pb'
 
 # Load The Custom Classifier
-with open(CLASSIFIER_PATH, 'rb') as file:
-    model, class_names = pickle.load(file)
+model = face_classifier.load_classifier(CLASSIFIER_PATH)
+class_names = model.class_names
+# Calibrated open-set thresholds if the classifier has them, otherwise only the old probability cut
+thresholds = open_set.thresholds(model, min_probability=0.8)
 print("Custom Classifier, Successfully loaded")
 
 tf.Graph().as_default()
@@ -93,18 +97,17 @@ def upload_img_file():
                 #cropped = frame[bb[i][1]:bb[i][3], bb[i][0]:bb[i][2], :]
                 scaled = cv2.resize(cropped, (INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE),
                                     interpolation=cv2.INTER_CUBIC)
-                scaled = facenet.prewhiten(scaled)
-                scaled_reshape = scaled.reshape(-1, INPUT_IMAGE_SIZE, INPUT_IMAGE_SIZE, 3)
+                scaled_reshape = image_normalization.prewhiten_batch(scaled[np.newaxis])
                 feed_dict = {images_placeholder: scaled_reshape, phase_train_placeholder: False}
                 emb_array = sess.run(embeddings, feed_dict=feed_dict)
-                predictions = model.predict_proba(emb_array)
-                best_class_indices = np.argmax(predictions, axis=1)
-                best_class_probabilities = predictions[
-                    np.arange(len(best_class_indices)), best_class_indices]
+                scores = open_set.scores(model, emb_array)
+                accepted = open_set.accept(scores, thresholds)[0]
+                best_class_indices = scores['best_class_indices']
+                best_class_probabilities = scores['probability']
                 best_name = class_names[best_class_indices[0]]
                 print("Name: {}, Probability: {}".format(best_name, best_class_probabilities))
 
-                if best_class_probabilities > 0.8:
+                if accepted:
                     name = class_names[best_class_indices[0]]
                 else:
                     name = "Unknown"
@@ -28,18 +28,22 @@ from __future__ import division
 from __future__ import print_function
 
 import os
+import hashlib
 from subprocess import Popen, PIPE
 import tensorflow as tf
 import numpy as np
 from scipy import misc
-from sklearn.model_selection import KFold
-from scipy import interpolate
 from tensorflow.python.training import training
 import random
 import re
 from tensorflow.python.platform import gfile
 import math
 from six import iteritems
+import imageio
+import packed_dataset
+import image_normalization
+import pair_evaluation
+from batch_loader import BatchLoader
 
 def triplet_loss(anchor, positive, negative, alpha):
     """Calculate the triplet loss according to the FaceNet paper
@@ -108,24 +112,7 @@ def create_input_pipeline(input_queue, image_size, nrof_preprocess_threads, batc
         for filename in tf.unstack(filenames):
             file_contents = tf.read_file(filename)
             image = tf.image.decode_image(file_contents, 3)
-            image = tf.cond(get_control_flag(control[0], RANDOM_ROTATE),
-                            lambda:tf.py_func(random_rotate_image, [image], tf.uint8), 
-                            lambda:tf.identity(image))
-            image = tf.cond(get_control_flag(control[0], RANDOM_CROP), 
-                            lambda:tf.random_crop(image, image_size + (3,)), 
-                            lambda:tf.image.resize_image_with_crop_or_pad(image, image_size[0], image_size[1]))
-            image = tf.cond(get_control_flag(control[0], RANDOM_FLIP),
-                            lambda:tf.image.random_flip_left_right(image),
-                            lambda:tf.identity(image))
-            image = tf.cond(get_control_flag(control[0], FIXED_STANDARDIZATION),
-                            lambda:(tf.cast(image, tf.float32) - 127.5)/128.0,
-                            lambda:tf.image.per_image_standardization(image))
-            image = tf.cond(get_control_flag(control[0], FLIP),
-                            lambda:tf.image.flip_left_right(image),
-                            lambda:tf.identity(image))
-            #pylint: disable=no-member
-            image.set_shape(image_size + (3,))
-            images.append(image)
+            images.append(preprocess_image(image, control[0], image_size))
         images_and_labels_list.append([images, label])
 
     image_batch, label_batch = tf.train.batch_join(
@@ -136,6 +123,83 @@ def create_input_pipeline(input_queue, image_size, nrof_preprocess_threads, batc
     
     return image_batch, label_batch
 
+def preprocess_image(image, control, image_size):
+    image = tf.cond(get_control_flag(control, RANDOM_ROTATE),
+                    lambda:tf.py_func(random_rotate_image, [image], tf.uint8), 
+                    lambda:tf.identity(image))
+    image = tf.cond(get_control_flag(control, RANDOM_CROP), 
+                    lambda:tf.random_crop(image, image_size + (3,)), 
+                    lambda:tf.image.resize_image_with_crop_or_pad(image, image_size[0], image_size[1]))
+    image = tf.cond(get_control_flag(control, RANDOM_FLIP),
+                    lambda:tf.image.random_flip_left_right(image),
+                    lambda:tf.identity(image))
+    image = tf.cond(get_control_flag(control, FIXED_STANDARDIZATION),
+                    lambda:(tf.cast(image, tf.float32) - 127.5)/128.0,
+                    lambda:tf.image.per_image_standardization(image))
+    image = tf.cond(get_control_flag(control, FLIP),
+                    lambda:tf.image.flip_left_right(image),
+                    lambda:tf.identity(image))
+    #pylint: disable=no-member
+    image.set_shape(image_size + (3,))
+    return image
+
+def create_dataset_pipeline(image_paths_placeholder, labels_placeholder, control_placeholder, batch_size_placeholder,
+                            image_size, nrof_preprocess_threads=None, cache_file=None, packed=False):
+    """tf.data replacement for create_input_pipeline.
+
+    Instead of an enqueue op this returns (image_batch, label_batch, init_op):
+    run init_op feeding the paths, labels, control flags and batch size, then
+    each run of the batches yields the next batch_size examples in feed order
+    (the final batch may be smaller). Files are read and decoded by a parallel
+    map, autotuned unless nrof_preprocess_threads is given, and batches are
+    prefetched while the model runs. With cache_file the raw file contents are
+    cached to that local file on the first pass and read from it afterwards,
+    so it must only be used for feeds that always list the same paths in the
+    same order (see dataset_cache_file). With packed the fed paths may be image
+    keys of a packed dataset (see packed_dataset.py), which are read from the
+    memory-mapped shards without any decoding; ordinary paths are still
+    accepted and cache_file is ignored.
+    """
+    num_parallel_calls = nrof_preprocess_threads or tf.data.experimental.AUTOTUNE
+    dataset = tf.data.Dataset.from_tensor_slices(tf.reshape(image_paths_placeholder, [-1]))
+    if packed:
+        def read_packed_image(key):
+            image = tf.py_func(packed_dataset.read_image, [key], tf.uint8, stateful=False)
+            image.set_shape((None, None, 3))
+            return image
+        dataset = dataset.map(read_packed_image, num_parallel_calls=num_parallel_calls)
+    else:
+        dataset = dataset.map(tf.read_file, num_parallel_calls=num_parallel_calls)
+        if cache_file:
+            dataset = dataset.cache(cache_file)
+        dataset = dataset.map(lambda file_contents: tf.image.decode_image(file_contents, 3), num_parallel_calls=num_parallel_calls)
+    labels = tf.data.Dataset.from_tensor_slices(tf.reshape(labels_placeholder, [-1]))
+    control = tf.data.Dataset.from_tensor_slices(tf.reshape(control_placeholder, [-1]))
+    dataset = tf.data.Dataset.zip((dataset, labels, control))
+    dataset = dataset.map(lambda image, label, control: (preprocess_image(image, control, image_size), label),
+                          num_parallel_calls=num_parallel_calls)
+    dataset = dataset.batch(tf.cast(batch_size_placeholder, tf.int64))
+    dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+
+    iterator = tf.compat.v1.data.make_initializable_iterator(dataset)
+    image_batch, label_batch = iterator.get_next()
+    return image_batch, label_batch, iterator.initializer
+
+def finish_dataset_pass(sess, batch_tensor):
+    """Reads past the last batch of a fully consumed feed so that a cache_file written during the pass is finalized"""
+    try:
+        sess.run(batch_tensor)
+    except tf.errors.OutOfRangeError:
+        return True
+    return False
+
+def dataset_cache_file(cache_dir, image_paths):
+    """Cache file name for create_dataset_pipeline, unique to this exact list of paths"""
+    digest = hashlib.sha1('\n'.join(image_paths).encode('utf-8')).hexdigest()
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    return os.path.join(cache_dir, 'images_%s.tfcache' % digest[:16])
+
 def get_control_flag(control, field):
     return tf.equal(tf.mod(tf.floor_div(control, field), 2), 1)
   
@@ -240,21 +304,35 @@ def to_rgb(img):
     ret[:, :, 0] = ret[:, :, 1] = ret[:, :, 2] = img
     return ret
   
+def load_image(image_path, do_random_crop, do_random_flip, image_size, do_prewhiten=True):
+    if packed_dataset.is_image_key(image_path):
+        img = packed_dataset.read_image(image_path)
+    else:
+        img = imageio.imread(image_path)
+    if img.ndim == 2:
+        img = to_rgb(img)
+    if do_prewhiten:
+        img = image_normalization.prewhiten_image(img)
+    img = crop(img, do_random_crop, image_size)
+    img = flip(img, do_random_flip)
+    return img
+
 def load_data(image_paths, do_random_crop, do_random_flip, image_size, do_prewhiten=True):
     nrof_samples = len(image_paths)
-    images = np.zeros((nrof_samples, image_size, image_size, 3))
+    images = np.zeros((nrof_samples, image_size, image_size, 3), dtype=np.float32)
     for i in range(nrof_samples):
-        import imageio
-        img = imageio.imread(image_paths[i])
-        if img.ndim == 2:
-            img = to_rgb(img)
-        if do_prewhiten:
-            img = prewhiten(img)
-        img = crop(img, do_random_crop, image_size)
-        img = flip(img, do_random_flip)
-        images[i,:,:,:] = img
+        images[i,:,:,:] = load_image(image_paths[i], do_random_crop, do_random_flip, image_size, do_prewhiten)
     return images
 
+def prefetch_data(image_paths, batch_size, do_random_crop, do_random_flip, image_size, do_prewhiten=True, depth=2, nrof_threads=4):
+    """Batches of load_data for image_paths in order, decoded on nrof_threads threads up to depth batches ahead.
+
+    Each yielded batch is only valid until the next one is requested (see batch_loader.BatchLoader).
+    """
+    def load(image_path):
+        return load_image(image_path, do_random_crop, do_random_flip, image_size, do_prewhiten)
+    return BatchLoader(image_paths, batch_size, load, (image_size, image_size, 3), depth, nrof_threads)
+
 def get_label_batch(label_data, batch_size, batch_index):
     nrof_examples = np.size(label_data, 0)
     j = batch_index*batch_size % nrof_examples
@@ -318,6 +396,9 @@ class ImageClass():
 def get_dataset(path, has_class_directories=True):
     dataset = []
     path_exp = os.path.expanduser(path)
+    if packed_dataset.is_packed_dataset(path_exp):
+        packed = packed_dataset.open_packed_dataset(path_exp)
+        return [ImageClass(class_name, image_keys) for class_name, image_keys in packed.class_image_keys()]
     classes = [path for path in os.listdir(path_exp) \
                     if os.path.isdir(os.path.join(path_exp, path))]
     classes.sort()
@@ -407,114 +488,30 @@ def get_model_filenames(model_dir):
     return meta_file, ckpt_file
   
 def distance(embeddings1, embeddings2, distance_metric=0):
-    if distance_metric==0:
-        # Euclidian distance
-        diff = np.subtract(embeddings1, embeddings2)
-        dist = np.sum(np.square(diff),1)
-    elif distance_metric==1:
-        # Distance based on cosine similarity
-        dot = np.sum(np.multiply(embeddings1, embeddings2), axis=1)
-        norm = np.linalg.norm(embeddings1, axis=1) * np.linalg.norm(embeddings2, axis=1)
-        similarity = dot / norm
-        dist = np.arccos(similarity) / math.pi
-    else:
-        raise 'Undefined distance metric %d' % distance_metric 
-        
-    return dist
+    return pair_evaluation.distance(embeddings1, embeddings2, distance_metric)
 
 def calculate_roc(thresholds, embeddings1, embeddings2, actual_issame, nrof_folds=10, distance_metric=0, subtract_mean=False):
-    assert(embeddings1.shape[0] == embeddings2.shape[0])
-    assert(embeddings1.shape[1] == embeddings2.shape[1])
-    nrof_pairs = min(len(actual_issame), embeddings1.shape[0])
-    nrof_thresholds = len(thresholds)
-    k_fold = KFold(n_splits=nrof_folds, shuffle=False)
-    
-    tprs = np.zeros((nrof_folds,nrof_thresholds))
-    fprs = np.zeros((nrof_folds,nrof_thresholds))
-    accuracy = np.zeros((nrof_folds))
-    
-    indices = np.arange(nrof_pairs)
-    
-    for fold_idx, (train_set, test_set) in enumerate(k_fold.split(indices)):
-        if subtract_mean:
-            mean = np.mean(np.concatenate([embeddings1[train_set], embeddings2[train_set]]), axis=0)
-        else:
-          mean = 0.0
-        dist = distance(embeddings1-mean, embeddings2-mean, distance_metric)
-        
-        # Find the best threshold for the fold
-        acc_train = np.zeros((nrof_thresholds))
-        for threshold_idx, threshold in enumerate(thresholds):
-            _, _, acc_train[threshold_idx] = calculate_accuracy(threshold, dist[train_set], actual_issame[train_set])
-        best_threshold_index = np.argmax(acc_train)
-        for threshold_idx, threshold in enumerate(thresholds):
-            tprs[fold_idx,threshold_idx], fprs[fold_idx,threshold_idx], _ = calculate_accuracy(threshold, dist[test_set], actual_issame[test_set])
-        _, _, accuracy[fold_idx] = calculate_accuracy(thresholds[best_threshold_index], dist[test_set], actual_issame[test_set])
-          
-        tpr = np.mean(tprs,0)
-        fpr = np.mean(fprs,0)
-    return tpr, fpr, accuracy
+    """All thresholds of a fold are evaluated at once, see pair_evaluation.py"""
+    return pair_evaluation.calculate_roc(thresholds, embeddings1, embeddings2, actual_issame,
+        nrof_folds=nrof_folds, distance_metric=distance_metric, subtract_mean=subtract_mean)
 
 def calculate_accuracy(threshold, dist, actual_issame):
-    predict_issame = np.less(dist, threshold)
-    tp = np.sum(np.logical_and(predict_issame, actual_issame))
-    fp = np.sum(np.logical_and(predict_issame, np.logical_not(actual_issame)))
-    tn = np.sum(np.logical_and(np.logical_not(predict_issame), np.logical_not(actual_issame)))
-    fn = np.sum(np.logical_and(np.logical_not(predict_issame), actual_issame))
-  
-    tpr = 0 if (tp+fn==0) else float(tp) / float(tp+fn)
-    fpr = 0 if (fp+tn==0) else float(fp) / float(fp+tn)
-    acc = float(tp+tn)/dist.size
-    return tpr, fpr, acc
+    tpr, fpr, acc = pair_evaluation.SortedPairs.from_pairs(dist, actual_issame).accuracy([threshold])
+    return tpr[0], fpr[0], acc[0]
 
-
-  
 def calculate_val(thresholds, embeddings1, embeddings2, actual_issame, far_target, nrof_folds=10, distance_metric=0, subtract_mean=False):
-    assert(embeddings1.shape[0] == embeddings2.shape[0])
-    assert(embeddings1.shape[1] == embeddings2.shape[1])
-    nrof_pairs = min(len(actual_issame), embeddings1.shape[0])
-    nrof_thresholds = len(thresholds)
-    k_fold = KFold(n_splits=nrof_folds, shuffle=False)
-    
-    val = np.zeros(nrof_folds)
-    far = np.zeros(nrof_folds)
-    
-    indices = np.arange(nrof_pairs)
-    
-    for fold_idx, (train_set, test_set) in enumerate(k_fold.split(indices)):
-        if subtract_mean:
-            mean = np.mean(np.concatenate([embeddings1[train_set], embeddings2[train_set]]), axis=0)
-        else:
-          mean = 0.0
-        dist = distance(embeddings1-mean, embeddings2-mean, distance_metric)
-      
-        # Find the threshold that gives FAR = far_target
-        far_train = np.zeros(nrof_thresholds)
-        for threshold_idx, threshold in enumerate(thresholds):
-            _, far_train[threshold_idx] = calculate_val_far(threshold, dist[train_set], actual_issame[train_set])
-        if np.max(far_train)>=far_target:
-            f = interpolate.interp1d(far_train, thresholds, kind='slinear')
-            threshold = f(far_target)
-        else:
-            threshold = 0.0
-    
-        val[fold_idx], far[fold_idx] = calculate_val_far(threshold, dist[test_set], actual_issame[test_set])
-  
-    val_mean = np.mean(val)
-    far_mean = np.mean(far)
-    val_std = np.std(val)
-    return val_mean, val_std, far_mean
+    """All thresholds of a fold are evaluated at once, see pair_evaluation.py"""
+    return pair_evaluation.calculate_val(thresholds, embeddings1, embeddings2, actual_issame, far_target,
+        nrof_folds=nrof_folds, distance_metric=distance_metric, subtract_mean=subtract_mean)
 
+def calculate_val_threshold(thresholds, dist, actual_issame, far_target):
+    """Distance threshold at which the false accept rate of the pairs reaches far_target, interpolated between thresholds"""
+    _, far = pair_evaluation.SortedPairs.from_pairs(dist, actual_issame).val_far(thresholds)
+    return pair_evaluation.threshold_at_far(thresholds, far, far_target)
 
 def calculate_val_far(threshold, dist, actual_issame):
-    predict_issame = np.less(dist, threshold)
-    true_accept = np.sum(np.logical_and(predict_issame, actual_issame))
-    false_accept = np.sum(np.logical_and(predict_issame, np.logical_not(actual_issame)))
-    n_same = np.sum(actual_issame)
-    n_diff = np.sum(np.logical_not(actual_issame))
-    val = float(true_accept) / float(n_same)
-    far = float(false_accept) / float(n_diff)
-    return val, far
+    val, far = pair_evaluation.SortedPairs.from_pairs(dist, actual_issame).val_far([threshold])
+    return val[0], far[0]
 
 def store_revision_info(src_path, output_dir, arg_string):
     try:
@@ -69,24 +69,26 @@ def main(args):
         train_set = facenet.get_dataset(args.data_dir)
         image_list, _ = facenet.get_image_paths_and_labels(train_set)
         
-        # Create the input queue
-        input_queue = tf.train.string_input_producer(image_list, shuffle=True)
+        # Create the input pipeline
+        num_parallel_calls = args.nrof_preprocess_threads or tf.data.experimental.AUTOTUNE
+        dataset = tf.data.Dataset.from_tensor_slices(image_list)
+        if args.cache_dir:
+            # The cache replays the first pass in its order, so shuffle the file contents in a bounded buffer afterwards
+            dataset = dataset.map(tf.read_file, num_parallel_calls=num_parallel_calls)
+            dataset = dataset.cache(facenet.dataset_cache_file(os.path.expanduser(args.cache_dir), image_list))
+            dataset = dataset.shuffle(min(len(image_list), 100*args.batch_size)).repeat()
+        else:
+            dataset = dataset.shuffle(len(image_list)).repeat()
+            dataset = dataset.map(tf.read_file, num_parallel_calls=num_parallel_calls)
     
-        nrof_preprocess_threads = 4
-        image_per_thread = []
-        for _ in range(nrof_preprocess_threads):
-            file_contents = tf.read_file(input_queue.dequeue())
+        def preprocess(file_contents):
             image = tf.image.decode_image(file_contents, channels=3)
             image = tf.image.resize_image_with_crop_or_pad(image, args.input_image_size, args.input_image_size)
             image.set_shape((args.input_image_size, args.input_image_size, 3))
-            image = tf.cast(image, tf.float32)
-            #pylint: disable=no-member
-            image_per_thread.append([image])
-    
-        images = tf.train.batch_join(
-            image_per_thread, batch_size=args.batch_size,
-            capacity=4 * nrof_preprocess_threads * args.batch_size,
-            allow_smaller_final_batch=False)
+            return tf.cast(image, tf.float32)
+        dataset = dataset.map(preprocess, num_parallel_calls=num_parallel_calls)
+        dataset = dataset.batch(args.batch_size, drop_remainder=True).prefetch(tf.data.experimental.AUTOTUNE)
+        images = tf.compat.v1.data.make_one_shot_iterator(dataset).get_next()
         
         # Normalize
         images_norm = (images-img_mean) / img_stddev
@@ -166,8 +168,6 @@ def main(args):
         sess = tf.Session(config=tf.ConfigProto(gpu_options=gpu_options, log_device_placement=False))
         sess.run(tf.global_variables_initializer())
         sess.run(tf.local_variables_initializer())
-        coord = tf.train.Coordinator()
-        tf.train.start_queue_runners(coord=coord, sess=sess)
 
         with sess.as_default():
             
@@ -276,6 +276,10 @@ def parse_arguments(argv):
         help='Kullback-Leibler divergence loss factor.', default=1.0)
     parser.add_argument('--beta', type=float,
         help='Reconstruction loss factor.', default=0.5)
+    parser.add_argument('--nrof_preprocess_threads', type=int,
+        help='Number of parallel image reading and preprocessing calls. Tuned automatically if not set.', default=None)
+    parser.add_argument('--cache_dir', type=str,
+        help='Directory where the training image files are cached on the first pass so later epochs read one local file.', default='')
     
     return parser.parse_args(argv)
   
@@ -0,0 +1,268 @@
+"""1:N identification benchmark on cached embeddings.
+
+compute_embeddings.py runs the model once over an aligned dataset and caches
+the embeddings; everything here works on that cache, so sweeping the gallery
+size is cheap. Identities with at least two images are enrolled (a template
+is the normalised mean of up to nrof_enroll_images of their images) and their
+other images are mated probes; a separate set of identities is never enrolled
+and provides non-mated probes. The gallery grows with distractor identities
+from the rest of the dataset, optionally padded with random synthetic
+templates to reach sizes larger than the dataset.
+
+For every gallery size the benchmark reports rank-1 and rank-5 accuracy of the
+mated probes, TAR at fixed FAR between probes and gallery templates, FNIR at
+fixed FPIR for open-set search with the non-mated probes, and the latency of a
+single search and the throughput of batched searches.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+import json
+import argparse
+import numpy as np
+import pair_evaluation
+
+SEARCH_CHUNK_SIZE = 256
+
+def normalize(x):
+    return x / np.maximum(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12)
+
+def load_embeddings(filename):
+    """The arrays and metadata written by compute_embeddings.py"""
+    with np.load(filename, allow_pickle=False) as data:
+        return dict((key, data[key]) for key in data.files)
+
+def build_benchmark(emb_array, labels, nrof_mated, nrof_nonmated, nrof_enroll_images=5, seed=666):
+    """Split a dataset into mated templates and probes, non-mated probes and distractor templates.
+
+    Returns a dict of 'mated_templates' (one per mated identity),
+    'mated_probes' with 'probe_mates' (the index of each probe's template),
+    'nonmated_probes' and 'distractor_templates'.
+    """
+    rng = np.random.RandomState(seed)
+    emb_array = normalize(np.asarray(emb_array, dtype=np.float32))
+    labels = np.asarray(labels)
+    identities, counts = np.unique(labels, return_counts=True)
+    order = rng.permutation(len(identities))
+    eligible = order[counts[order] >= 2]
+    mated = eligible[:nrof_mated]
+    remaining = np.setdiff1d(order, mated, assume_unique=True)
+    remaining = remaining[rng.permutation(len(remaining))]
+    nonmated, distractors = remaining[:nrof_nonmated], remaining[nrof_nonmated:]
+    by_identity = dict((identity, rng.permutation(np.where(labels == identity)[0])) for identity in identities)
+
+    def template(images):
+        return normalize(np.mean(emb_array[images[:nrof_enroll_images]], axis=0))
+
+    mated_templates, mated_probes, probe_mates = [], [], []
+    for i, identity in enumerate(identities[mated]):
+        images = by_identity[identity]
+        nrof_enroll = min(nrof_enroll_images, len(images) - 1)
+        mated_templates.append(template(images[:nrof_enroll]))
+        mated_probes.append(emb_array[images[nrof_enroll:]])
+        probe_mates.append(np.full(len(images) - nrof_enroll, i))
+    embedding_size = emb_array.shape[1]
+    stack = lambda arrays: np.stack(arrays) if arrays else np.zeros((0, embedding_size), np.float32)
+    concat = lambda arrays: np.concatenate(arrays) if arrays else np.zeros((0, embedding_size), np.float32)
+    return {
+        'mated_templates': stack(mated_templates),
+        'mated_probes': concat(mated_probes),
+        'probe_mates': np.concatenate(probe_mates) if probe_mates else np.zeros((0,), np.int64),
+        'nonmated_probes': concat([emb_array[by_identity[identity]] for identity in identities[nonmated]]),
+        'distractor_templates': stack([template(by_identity[identity]) for identity in identities[distractors]]),
+    }
+
+def synthetic_templates(nrof_templates, embedding_size, seed=666):
+    """Random unit vectors; they are not faces, so only latency is fully meaningful for galleries padded with them"""
+    rng = np.random.RandomState(seed)
+    return normalize(rng.randn(nrof_templates, embedding_size).astype(np.float32))
+
+def search(gallery, probes, k=5, chunk_size=SEARCH_CHUNK_SIZE):
+    """(indices, similarities) of the k most similar gallery templates of every probe, best first"""
+    k = min(k, gallery.shape[0])
+    indices = np.zeros((probes.shape[0], k), dtype=np.int64)
+    similarities = np.zeros((probes.shape[0], k), dtype=np.float32)
+    for start in range(0, probes.shape[0], chunk_size):
+        sim = probes[start:start+chunk_size].dot(gallery.T)
+        top = np.argpartition(-sim, k-1, axis=1)[:, :k] if k < sim.shape[1] else np.tile(np.arange(k), (sim.shape[0], 1))
+        top_sim = np.take_along_axis(sim, top, axis=1)
+        best_first = np.argsort(-top_sim, axis=1, kind='stable')
+        indices[start:start+chunk_size] = np.take_along_axis(top, best_first, axis=1)
+        similarities[start:start+chunk_size] = np.take_along_axis(top_sim, best_first, axis=1)
+    return indices, similarities
+
+def tar_at_far(probes, probe_mates, gallery, far_targets, nrof_impostors_per_probe=1000, seed=666):
+    """TAR at each FAR of probe-template comparisons, thresholds set as in facenet.calculate_val.
+
+    Each probe is compared to its mate and to up to nrof_impostors_per_probe
+    random other templates.
+    """
+    rng = np.random.RandomState(seed)
+    nrof_impostors = min(nrof_impostors_per_probe, gallery.shape[0] - 1)
+    impostors = rng.randint(0, gallery.shape[0] - 1, size=(len(probe_mates), nrof_impostors))
+    impostors += impostors >= probe_mates[:, np.newaxis]  # skip the mate
+    genuine_sim = np.zeros(len(probe_mates), dtype=np.float32)
+    impostor_sim = np.zeros((len(probe_mates), nrof_impostors), dtype=np.float32)
+    for start in range(0, len(probe_mates), SEARCH_CHUNK_SIZE):
+        end = start + SEARCH_CHUNK_SIZE
+        sim = probes[start:end].dot(gallery.T)
+        genuine_sim[start:end] = sim[np.arange(sim.shape[0]), probe_mates[start:end]]
+        impostor_sim[start:end] = np.take_along_axis(sim, impostors[start:end], axis=1)
+    # Squared euclidean distance between unit vectors
+    dist = 2.0 - 2.0 * np.concatenate([genuine_sim, impostor_sim.ravel()]).astype(np.float64)
+    issame = np.concatenate([np.ones(len(genuine_sim), dtype=bool), np.zeros(impostor_sim.size, dtype=bool)])
+    pairs = pair_evaluation.SortedPairs.from_pairs(dist, issame)
+    thresholds = np.arange(0, 4, 0.001)
+    _, far = pairs.val_far(thresholds)
+    tars = []
+    for far_target in far_targets:
+        threshold = pair_evaluation.threshold_at_far(thresholds, far, far_target)
+        tars.append(float(pairs.val_far([threshold])[0][0]))
+    return tars
+
+def fnir_at_fpir(mated_top, mated_similarity, probe_mates, nonmated_similarity, fpir_targets):
+    """FNIR of open-set search at the similarity thresholds where non-mated probes are accepted at each FPIR.
+
+    A mated probe counts as a hit only if its mate is ranked first and passes
+    the threshold.
+    """
+    nonmated_sorted = np.sort(nonmated_similarity)[::-1]
+    hits = mated_top == probe_mates
+    fnirs = []
+    for fpir_target in fpir_targets:
+        index = int(np.floor(fpir_target * len(nonmated_sorted)))
+        threshold = nonmated_sorted[index] if index < len(nonmated_sorted) else -np.inf
+        fnirs.append(float(1.0 - np.mean(hits & (mated_similarity > threshold))))
+    return fnirs
+
+def evaluate_gallery(benchmark, gallery_size, args):
+    mated = benchmark['mated_templates']
+    nrof_distractors = gallery_size - mated.shape[0]
+    gallery = np.concatenate([mated, benchmark['distractor_templates'][:nrof_distractors]])
+    nrof_synthetic = gallery_size - gallery.shape[0]
+    if nrof_synthetic:
+        gallery = np.concatenate([gallery, synthetic_templates(nrof_synthetic, gallery.shape[1], args.seed)])
+    gallery = np.ascontiguousarray(gallery, dtype=np.float32)
+    probes, probe_mates = benchmark['mated_probes'], benchmark['probe_mates']
+    ranks = sorted(set(args.ranks))
+
+    start_time = time.time()
+    top, similarity = search(gallery, probes, k=max(ranks))
+    nrof_searches = len(probes)
+    if len(benchmark['nonmated_probes']):
+        _, nonmated_similarity = search(gallery, benchmark['nonmated_probes'], k=1)
+        nrof_searches += len(benchmark['nonmated_probes'])
+    throughput = nrof_searches / (time.time() - start_time)
+
+    latencies = []
+    for probe in probes[:args.nrof_latency_probes]:
+        start_time = time.time()
+        search(gallery, probe[np.newaxis], k=max(ranks))
+        latencies.append(time.time() - start_time)
+
+    result = {
+        'gallery_size': gallery_size,
+        'nrof_synthetic_templates': nrof_synthetic,
+        'nrof_mated_probes': len(probes),
+        'nrof_nonmated_probes': len(benchmark['nonmated_probes']),
+        'search_latency_ms': 1e3 * float(np.median(latencies)),
+        'search_latency_p95_ms': 1e3 * float(np.percentile(latencies, 95)),
+        'searches_per_second': throughput,
+    }
+    for rank in ranks:
+        result['rank%d' % rank] = float(np.mean(np.any(top[:, :rank] == probe_mates[:, np.newaxis], axis=1)))
+    tars = tar_at_far(probes, probe_mates, gallery, args.far_targets, args.nrof_impostors_per_probe, args.seed)
+    for far_target, tar in zip(args.far_targets, tars):
+        result['tar@far=%g' % far_target] = tar
+    if len(benchmark['nonmated_probes']):
+        fnirs = fnir_at_fpir(top[:, 0], similarity[:, 0], probe_mates, nonmated_similarity[:, 0], args.fpir_targets)
+        for fpir_target, fnir in zip(args.fpir_targets, fnirs):
+            result['fnir@fpir=%g' % fpir_target] = fnir
+    return result
+
+def main(args):
+    data = load_embeddings(args.embeddings_file)
+    if 'images_per_second' in data:
+        print('Embeddings: %d images, computed at %.1f images/sec' % (len(data['labels']), float(data['images_per_second'])))
+    benchmark = build_benchmark(data['emb_array'], data['labels'], args.nrof_mated, args.nrof_nonmated,
+        args.nrof_enroll_images, args.seed)
+    nrof_mated = benchmark['mated_templates'].shape[0]
+    nrof_real = nrof_mated + benchmark['distractor_templates'].shape[0]
+    print('Mated identities: %d (%d probes), non-mated probes: %d, distractor identities: %d' % (nrof_mated,
+        len(benchmark['probe_mates']), len(benchmark['nonmated_probes']), benchmark['distractor_templates'].shape[0]))
+
+    results = []
+    for gallery_size in args.gallery_sizes:
+        if gallery_size < nrof_mated:
+            print('Skipping gallery size %d: smaller than the %d mated identities' % (gallery_size, nrof_mated))
+            continue
+        if gallery_size > nrof_real and not args.synthetic_distractors:
+            print('Skipping gallery size %d: the dataset has %d identities (see --synthetic_distractors)' % (gallery_size, nrof_real))
+            continue
+        result = evaluate_gallery(benchmark, gallery_size, args)
+        results.append(result)
+        print(', '.join('%s: %s' % (key, ('%.4f' % value) if isinstance(value, float) else value) for key, value in result.items()))
+
+    if args.output_file:
+        with open(args.output_file, 'w') as f:
+            json.dump({'embeddings_file': args.embeddings_file, 'results': results}, f, indent=2)
+        print('Results written to "%s"' % args.output_file)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument('embeddings_file', type=str,
+        help='Embeddings cached by compute_embeddings.py.')
+    parser.add_argument('--gallery_sizes', type=int, nargs='+',
+        help='Numbers of enrolled identities to evaluate.', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--nrof_mated', type=int,
+        help='Number of enrolled identities whose other images are used as probes.', default=100)
+    parser.add_argument('--nrof_nonmated', type=int,
+        help='Number of identities that are never enrolled and are searched as non-mated probes.', default=100)
+    parser.add_argument('--nrof_enroll_images', type=int,
+        help='Maximum number of images averaged into the template of an identity.', default=5)
+    parser.add_argument('--synthetic_distractors', 
+        help='Pad galleries larger than the dataset with random templates. Accuracy is then only indicative; latency stays valid.', action='store_true')
+    parser.add_argument('--ranks', type=int, nargs='+',
+        help='Ranks at which identification accuracy is reported.', default=[1, 5])
+    parser.add_argument('--far_targets', type=float, nargs='+',
+        help='False accept rates at which TAR is reported.', default=[1e-3, 1e-4])
+    parser.add_argument('--fpir_targets', type=float, nargs='+',
+        help='False positive identification rates at which FNIR is reported.', default=[0.01, 0.1])
+    parser.add_argument('--nrof_impostors_per_probe', type=int,
+        help='Number of random non-mate templates compared to each probe for TAR@FAR.', default=1000)
+    parser.add_argument('--nrof_latency_probes', type=int,
+        help='Number of single-probe searches timed per gallery size.', default=100)
+    parser.add_argument('--output_file', type=str,
+        help='Write the results to this JSON file.', default='')
+    parser.add_argument('--seed', type=int,
+        help='Random seed.', default=666)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
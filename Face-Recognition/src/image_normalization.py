@@ -0,0 +1,140 @@
+"""Batch image standardisation kernels for the FaceNet input.
+
+prewhiten_batch normalises a whole (N, H, W, C) batch of faces in one
+vectorised pass instead of calling facenet.prewhiten once per face. Statistics
+of uint8 batches are taken from exact integer sums; the result is written as
+float32 straight into the output buffer, which can be the input itself when it
+is already float32. fixed_standardization is the (x - 127.5) / 128 variant
+used by models trained with --use_fixed_image_standardization.
+
+Run this module to compare it with the per-image prewhiten at batch sizes
+1 to 256.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import sys
+import time
+import argparse
+import numpy as np
+
+def _output_buffer(images, out):
+    if out is None:
+        return np.empty(images.shape, dtype=np.float32)
+    if out.shape != images.shape or out.dtype != np.float32 or not out.flags.c_contiguous:
+        raise ValueError('out must be a contiguous float32 array of shape %s' % (images.shape,))
+    return out
+
+def prewhiten_batch(images, out=None):
+    """Per-image (x - mean) / max(std, 1/sqrt(x.size)) of an (N, H, W, C) batch, as float32.
+
+    Matches facenet.prewhiten applied to every image. Pass out=images to
+    normalise a contiguous float32 batch in place.
+    """
+    images = np.asarray(images)
+    nrof_images = images.shape[0]
+    out = _output_buffer(images, out)
+    src = images.reshape(nrof_images, -1)
+    flat = out.reshape(nrof_images, -1)
+    size = src.shape[1]
+
+    if np.issubdtype(images.dtype, np.integer):
+        # Exact sums: 8 bit pixels cannot overflow int64 for any realistic image size
+        sums = src.sum(axis=1, dtype=np.int64)
+        sq_sums = np.einsum('ij,ij->i', src, src, dtype=np.int64, casting='unsafe')
+        mean = sums / size
+        var = np.maximum(sq_sums / size - np.square(mean), 0.0)
+        np.subtract(src, mean.astype(np.float32)[:, np.newaxis], out=flat, casting='unsafe')
+    else:
+        if flat is not src and not np.shares_memory(flat, src):
+            np.copyto(flat, src, casting='unsafe')
+        mean = flat.mean(axis=1, dtype=np.float64)
+        flat -= mean.astype(np.float32)[:, np.newaxis]
+        var = np.einsum('ij,ij->i', flat, flat, dtype=np.float64) / size
+
+    std_adj = np.maximum(np.sqrt(var), 1.0/np.sqrt(size))
+    flat *= (1.0/std_adj).astype(np.float32)[:, np.newaxis]
+    return out
+
+def prewhiten_image(image, out=None):
+    """prewhiten_batch for a single (H, W, C) image"""
+    image = np.asarray(image)
+    return prewhiten_batch(image[np.newaxis], None if out is None else out[np.newaxis])[0]
+
+def fixed_standardization(images, out=None):
+    """(x - 127.5) / 128 of an image or batch, as float32; out=images works in place for float32 input"""
+    images = np.asarray(images)
+    out = _output_buffer(images, out)
+    np.subtract(images, np.float32(127.5), out=out, casting='unsafe')
+    out *= np.float32(1.0/128.0)
+    return out
+
+def _legacy_prewhiten(x):
+    mean = np.mean(x)
+    std = np.std(x)
+    std_adj = np.maximum(std, 1.0/np.sqrt(x.size))
+    return np.multiply(np.subtract(x, mean), 1/std_adj)
+
+def _time(fn, nrof_repeats):
+    start_time = time.time()
+    for _ in range(nrof_repeats):
+        fn()
+    return (time.time() - start_time) / nrof_repeats
+
+def main(args):
+    np.random.seed(seed=args.seed)
+    batch_sizes = [1 << i for i in range(args.max_batch_size.bit_length()) if 1 << i <= args.max_batch_size]
+    print('%6s %12s %12s %12s %8s %10s' % ('batch', 'per-image', 'batch', 'batch fp32', 'speedup', 'max diff'))
+    for batch_size in batch_sizes:
+        images = np.random.randint(0, 256, size=(batch_size, args.image_size, args.image_size, 3)).astype(np.uint8)
+        buf = np.empty(images.shape, dtype=np.float32)
+        float_images = images.astype(np.float32)
+
+        legacy = _time(lambda: np.stack([_legacy_prewhiten(img) for img in images]), args.nrof_repeats)
+        batch = _time(lambda: prewhiten_batch(images, out=buf), args.nrof_repeats)
+        def in_place():
+            np.copyto(buf, float_images)
+            prewhiten_batch(buf, out=buf)
+        batch_fp32 = _time(in_place, args.nrof_repeats)
+
+        diff = np.max(np.abs(prewhiten_batch(images) - np.stack([_legacy_prewhiten(img) for img in images])))
+        print('%6d %10.3fms %10.3fms %10.3fms %7.2fx %10.2e' % (batch_size, legacy*1e3, batch*1e3, batch_fp32*1e3, legacy/batch, diff))
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+    
+    parser.add_argument('--image_size', type=int,
+        help='Image size (height, width) in pixels.', default=160)
+    parser.add_argument('--max_batch_size', type=int,
+        help='Largest batch size; batch sizes are the powers of two up to it.', default=256)
+    parser.add_argument('--nrof_repeats', type=int,
+        help='Number of timed runs per batch size.', default=10)
+    parser.add_argument('--seed', type=int,
+        help='Random seed.', default=666)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
@@ -30,6 +30,7 @@ from __future__ import print_function
 import os
 import numpy as np
 import facenet
+import packed_dataset
 
 def evaluate(embeddings, actual_issame, nrof_folds=10, distance_metric=0, subtract_mean=False):
     # Calculate evaluation metrics
@@ -47,16 +48,23 @@ def get_paths(lfw_dir, pairs):
     nrof_skipped_pairs = 0
     path_list = []
     issame_list = []
+    packed = None
+    if packed_dataset.is_packed_dataset(lfw_dir):
+        packed = packed_dataset.open_packed_dataset(os.path.expanduser(lfw_dir))
     for pair in pairs:
         if len(pair) == 3:
-            path0 = add_extension(os.path.join(lfw_dir, pair[0], pair[0] + '_' + '%04d' % int(pair[1])))
-            path1 = add_extension(os.path.join(lfw_dir, pair[0], pair[0] + '_' + '%04d' % int(pair[2])))
+            path0 = get_image_path(lfw_dir, pair[0], pair[1], packed)
+            path1 = get_image_path(lfw_dir, pair[0], pair[2], packed)
             issame = True
         elif len(pair) == 4:
-            path0 = add_extension(os.path.join(lfw_dir, pair[0], pair[0] + '_' + '%04d' % int(pair[1])))
-            path1 = add_extension(os.path.join(lfw_dir, pair[2], pair[2] + '_' + '%04d' % int(pair[3])))
+            path0 = get_image_path(lfw_dir, pair[0], pair[1], packed)
+            path1 = get_image_path(lfw_dir, pair[2], pair[3], packed)
             issame = False
-        if os.path.exists(path0) and os.path.exists(path1):    # Only add the pair if both paths exist
+        if packed is not None:
+            exists = path0 is not None and path1 is not None
+        else:
+            exists = os.path.exists(path0) and os.path.exists(path1)
+        if exists:    # Only add the pair if both paths exist
             path_list += (path0,path1)
             issame_list.append(issame)
         else:
@@ -65,6 +73,13 @@ def get_paths(lfw_dir, pairs):
         print('Skipped %d image pairs' % nrof_skipped_pairs)
     
     return path_list, issame_list
+
+def get_image_path(lfw_dir, name, number, packed=None):
+    """Path of an LFW image, or its key (None if missing) when lfw_dir is a packed dataset"""
+    relative_path = os.path.join(name, name + '_' + '%04d' % int(number))
+    if packed is not None:
+        return packed.find(relative_path)
+    return add_extension(os.path.join(lfw_dir, relative_path))
   
 def add_extension(path):
     if os.path.exists(path+'.jpg'):
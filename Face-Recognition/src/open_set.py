@@ -0,0 +1,199 @@
+"""Open-set decision layer: reject faces of people who are not in the gallery.
+
+A classifier always returns its most probable class, so a stranger would be
+recognised as some student. An identification is only accepted here when the
+probe is close enough to the gallery images of that class (the embeddings kept
+in the classifier file, see face_classifier.py), the class probability is high
+enough and the margin over the runner-up class is large enough.
+
+The thresholds are calibrated per deployment by classifier.py: classes are held
+out in folds, a classifier of the same backend is trained on the rest, and the
+held out images (impostors) and one held out image of each remaining class
+(genuine probes) are scored. Each threshold is set to the score at which
+impostors are accepted at the target false accept rate, using
+pair_evaluation, and is stored with the classifier. Galleries too small to
+hold out classes and genuine probes keep the accept-all defaults.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import warnings
+import numpy as np
+import pair_evaluation
+
+# Smallest gallery heldout_scores can hold classes out of
+MIN_CALIBRATION_CLASSES = 3
+MAX_VAL_FOLDS = 10
+
+# Classifiers without calibrated thresholds accept every identification
+DEFAULT_THRESHOLDS = {
+    'max_distance': np.inf,
+    'min_probability': 0.0,
+    'min_margin': 0.0,
+}
+
+def thresholds(classifier, **defaults):
+    """The thresholds stored with classifier; the keyword arguments, then DEFAULT_THRESHOLDS, fill in the rest"""
+    result = dict(DEFAULT_THRESHOLDS, **defaults)
+    if classifier.open_set and classifier.open_set.get('thresholds'):
+        result.update(classifier.open_set['thresholds'])
+    return result
+
+def nearest_gallery(gallery, gallery_labels, emb_array, classes):
+    """(squared distances, indices) of the gallery image of classes[i] closest to emb_array[i]"""
+    gallery_sqr = np.sum(np.square(gallery), axis=1)
+    dists = gallery_sqr[np.newaxis, :] - 2.0 * emb_array.dot(gallery.T) + np.sum(np.square(emb_array), axis=1)[:, np.newaxis]
+    dists = np.where(gallery_labels[np.newaxis, :] == np.asarray(classes)[:, np.newaxis], np.maximum(dists, 0.0), np.inf)
+    indices = np.argmin(dists, axis=1)
+    return dists[np.arange(len(indices)), indices], indices
+
+def scores(classifier, emb_array):
+    """Predicted class, probability, margin to the runner-up and gallery distance of every embedding.
+
+    gallery_distance is NaN when the classifier holds no embeddings.
+    """
+    emb_array = np.asarray(emb_array, dtype=np.float32)
+    proba = classifier.predict_proba(emb_array)
+    best_class_indices = np.argmax(proba, axis=1)
+    rows = np.arange(len(best_class_indices))
+    probability = proba[rows, best_class_indices]
+    runner_up = np.partition(proba, -2, axis=1)[:, -2] if proba.shape[1] > 1 else np.zeros(len(rows))
+    if classifier.has_embeddings and len(rows):
+        distance, nearest = nearest_gallery(classifier.emb_array, classifier.labels, emb_array, best_class_indices)
+    else:
+        distance, nearest = np.full(len(rows), np.nan), np.full(len(rows), -1)
+    return {
+        'best_class_indices': best_class_indices,
+        'probability': probability,
+        'margin': probability - runner_up,
+        'gallery_distance': distance,
+        'nearest_gallery_index': nearest,
+    }
+
+def accept(scores, thresholds):
+    """Boolean mask of the identifications that pass every threshold"""
+    distance_ok = ~(scores['gallery_distance'] >= thresholds['max_distance'])  # NaN: no gallery to check against
+    return distance_ok & (scores['probability'] >= thresholds['min_probability']) & (scores['margin'] >= thresholds['min_margin'])
+
+def heldout_scores(classifier, nrof_folds=5, seed=666):
+    """Scores of held out probes for calibration, in random order.
+
+    Every class is held out in one of nrof_folds folds; its images are
+    impostor probes for a classifier trained on the other classes, which
+    also provide one held out genuine probe each. Returns the scores dict
+    of all probes plus 'probes' (the probe embeddings), 'nearest' (their
+    nearest gallery embedding of the predicted class) and 'issame' (genuine
+    probes identified as their own class).
+    """
+    rng = np.random.RandomState(seed)
+    emb_array, labels = classifier.emb_array, classifier.labels
+    classes = np.unique(labels)
+    nrof_folds = min(nrof_folds, len(classes))
+    if len(classes) < MIN_CALIBRATION_CLASSES:
+        raise ValueError('Open-set calibration needs at least %d classes, got %d' % (MIN_CALIBRATION_CLASSES, len(classes)))
+    fold_of_class = rng.permutation(len(classes)) % nrof_folds
+
+    results = []
+    for fold in range(nrof_folds):
+        unknown = np.isin(labels, classes[fold_of_class == fold])
+        genuine = np.zeros(len(labels), dtype=bool)
+        for label in classes[fold_of_class != fold]:
+            indices = np.where(labels == label)[0]
+            if len(indices) > 1:
+                genuine[rng.choice(indices)] = True
+        train = ~unknown & ~genuine
+        heldout = type(classifier)(classifier.backend, seed=classifier.seed)
+        heldout.fit(emb_array[train], labels[train], classifier.class_names)
+        probes = np.where(genuine | unknown)[0]
+        fold_scores = scores(heldout, emb_array[probes])
+        fold_scores['probes'] = emb_array[probes]
+        fold_scores['nearest'] = heldout.emb_array[fold_scores['nearest_gallery_index']]
+        fold_scores['issame'] = genuine[probes] & (fold_scores['best_class_indices'] == labels[probes])
+        results.append(fold_scores)
+
+    merged = dict((key, np.concatenate([r[key] for r in results])) for key in results[0])
+    order = rng.permutation(len(merged['issame']))
+    return dict((key, value[order]) for key, value in merged.items())
+
+def calibrate(classifier, far_target, nrof_folds=5, seed=666):
+    """Store thresholds at which held out impostors are accepted at far_target in classifier.open_set.
+
+    When the gallery has too few classes or too few genuine probes the
+    classifier keeps DEFAULT_THRESHOLDS, with a warning, instead of failing
+    the training. Returns the thresholds in effect.
+    """
+    nrof_classes = len(np.unique(classifier.labels))
+    if nrof_classes < MIN_CALIBRATION_CLASSES:
+        return _skip_calibration(classifier, 'it needs at least %d classes, got %d' % (MIN_CALIBRATION_CLASSES, nrof_classes))
+
+    heldout = heldout_scores(classifier, nrof_folds=nrof_folds, seed=seed)
+    issame = heldout['issame']
+    nrof_genuine, nrof_impostor = int(np.sum(issame)), int(np.sum(~issame))
+    print('Calibration probes: %d genuine, %d impostor' % (nrof_genuine, nrof_impostor))
+    if nrof_genuine < 2 or nrof_impostor < 1:
+        return _skip_calibration(classifier, 'it needs at least 2 genuine and 1 impostor probes, got %d and %d' %
+            (nrof_genuine, nrof_impostor))
+
+    def threshold_at_far(thresholds, dist):
+        _, far = pair_evaluation.SortedPairs.from_pairs(dist, issame).val_far(thresholds)
+        return pair_evaluation.threshold_at_far(thresholds, far, far_target)
+
+    # Gallery distance: every probe paired with its nearest gallery image of the predicted class
+    distance_thresholds = np.arange(0, 4, 0.001)
+    val, val_std, far = pair_evaluation.calculate_val(distance_thresholds, heldout['probes'], heldout['nearest'], issame,
+        far_target, nrof_folds=min(MAX_VAL_FOLDS, nrof_genuine), distance_metric=0)
+    max_distance = threshold_at_far(distance_thresholds, heldout['gallery_distance'])
+    print('Gallery distance: VAL=%2.5f+-%2.5f @ FAR=%2.5f, threshold %.3f' % (val, val_std, far, max_distance))
+
+    # Probability and margin, as distances that are small for accepted probes
+    score_thresholds = np.arange(0, 1.002, 0.001)
+    min_probability = 1.0 - threshold_at_far(score_thresholds, 1.0 - heldout['probability'])
+    min_margin = 1.0 - threshold_at_far(score_thresholds, 1.0 - heldout['margin'])
+    calibrated = {
+        'max_distance': float(max_distance),
+        'min_probability': float(min_probability),
+        'min_margin': float(min_margin),
+    }
+    accepted = accept(heldout, calibrated)
+    val_combined = np.mean(accepted[issame])
+    far_combined = np.mean(accepted[~issame])
+    print('Probability threshold %.3f, margin threshold %.3f' % (min_probability, min_margin))
+    print('Combined on calibration probes: VAL=%2.5f @ FAR=%2.5f' % (val_combined, far_combined))
+
+    classifier.open_set = {
+        'thresholds': calibrated,
+        'far_target': far_target,
+        'val': float(val_combined),
+        'far': float(far_combined),
+        'nrof_genuine': nrof_genuine,
+        'nrof_impostor': nrof_impostor,
+    }
+    return calibrated
+
+def _skip_calibration(classifier, reason):
+    warnings.warn('Open-set calibration skipped because %s; unknown faces will not be rejected' % reason)
+    classifier.open_set = {}
+    return dict(DEFAULT_THRESHOLDS)
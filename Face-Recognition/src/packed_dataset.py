@@ -0,0 +1,321 @@
+"""Pre-packed, sharded dataset format for aligned faces.
+
+Packing converts a directory with one sub-directory of aligned face images per
+person into a few large shards of fixed-shape uint8 images plus an index.json
+holding the class names, the label and original relative path of every image
+and the shard layout. Images of a class are stored next to each other, so
+reading a class or a whole epoch is sequential large-block I/O, and nothing
+has to be decoded again.
+
+Two shard formats are written:
+  npy       (count, height, width, 3) uint8 .npy files, read through np.load(mmap_mode='r')
+  tfrecord  TFRecord files whose records are the raw height*width*3 image bytes.
+            Records have a fixed length, so they are memory-mapped at computed
+            offsets as well, and tf.data.TFRecordDataset + tf.io.decode_raw can
+            stream them.
+
+Images of a packed dataset are addressed by keys "<pack_dir>#<index>".
+facenet.get_dataset returns such keys for a packed directory, so the tools that
+take image paths (classifier.py, train_softmax.py, train_tripletloss.py,
+validate_on_lfw.py) read packed datasets unchanged.
+
+    python packed_dataset.py ../Dataset/FaceData/processed ../Dataset/FaceData/packed --format npy
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import imageio
+import numpy as np
+
+INDEX_FILENAME = 'index.json'
+FORMATS = ('npy', 'tfrecord')
+KEY_SEPARATOR = '#'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# TFRecord framing: uint64 length + uint32 length crc before the data, uint32 data crc after it
+TFRECORD_HEADER_SIZE = 12
+TFRECORD_FOOTER_SIZE = 4
+
+def is_packed_dataset(path):
+    return os.path.isfile(os.path.join(os.path.expanduser(path), INDEX_FILENAME))
+
+def image_key(pack_dir, index):
+    return '%s%s%d' % (pack_dir, KEY_SEPARATOR, index)
+
+def parse_image_key(key):
+    """(pack_dir, index) of a packed image key, or None for an ordinary file path"""
+    if isinstance(key, bytes):
+        key = key.decode('utf-8')
+    pack_dir, separator, index = key.rpartition(KEY_SEPARATOR)
+    if not separator or not index.isdigit():
+        return None
+    if pack_dir not in _open_datasets and not is_packed_dataset(pack_dir):
+        return None
+    return pack_dir, int(index)
+
+def is_image_key(path):
+    return parse_image_key(path) is not None
+
+def center_crop_or_pad(image, image_size):
+    """Numpy counterpart of tf.image.resize_image_with_crop_or_pad for a square image_size"""
+    height, width = image.shape[:2]
+    top, left = max((height - image_size) // 2, 0), max((width - image_size) // 2, 0)
+    image = image[top:top + image_size, left:left + image_size]
+    if image.shape[0] == image_size and image.shape[1] == image_size:
+        return image
+    padded = np.zeros((image_size, image_size, 3), dtype=image.dtype)
+    top, left = (image_size - image.shape[0]) // 2, (image_size - image.shape[1]) // 2
+    padded[top:top + image.shape[0], left:left + image.shape[1]] = image
+    return padded
+
+def read_rgb(path):
+    img = np.asarray(imageio.imread(path))
+    if img.ndim == 2:
+        img = np.repeat(img[:, :, np.newaxis], 3, axis=2)
+    return img[:, :, :3].astype(np.uint8, copy=False)
+
+def list_class_images(data_dir):
+    """[(class_name, [image paths])] sorted by class and file name"""
+    classes = []
+    for class_name in sorted(os.listdir(data_dir)):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        images = sorted(name for name in os.listdir(class_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        classes.append((class_name, [os.path.join(class_dir, name) for name in images]))
+    return classes
+
+def shard_filename(fmt, shard_index, nrof_shards):
+    return 'images-%05d-of-%05d.%s' % (shard_index, nrof_shards, fmt)
+
+def pack_dataset(data_dir, output_dir, fmt='npy', image_size=None, images_per_shard=4096, nrof_threads=4):
+    """Packs data_dir into output_dir; returns the index that is written to index.json.
+
+    All images are center cropped or padded to image_size (by default the size
+    of the first image). index.json is written last, so an interrupted run
+    never leaves a directory that looks packed.
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown packed dataset format "%s"' % fmt)
+    data_dir = os.path.expanduser(data_dir)
+    output_dir = os.path.expanduser(output_dir)
+    classes = list_class_images(data_dir)
+    labels, paths = [], []
+    for label, (_, class_paths) in enumerate(classes):
+        labels += [label] * len(class_paths)
+        paths += class_paths
+    if not paths:
+        raise ValueError('No images found in %s' % data_dir)
+    if image_size is None:
+        image_size = read_rgb(paths[0]).shape[0]
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    nrof_images = len(paths)
+    nrof_shards = int(np.ceil(nrof_images / images_per_shard))
+    shards = []
+    nrof_resized = 0
+
+    def load(path):
+        image = read_rgb(path)
+        resized = image.shape[0] != image_size or image.shape[1] != image_size
+        return (center_crop_or_pad(image, image_size) if resized else image), resized
+
+    with ThreadPoolExecutor(max_workers=nrof_threads) as executor:
+        for shard_index in range(nrof_shards):
+            start = shard_index * images_per_shard
+            shard_paths = paths[start:start + images_per_shard]
+            filename = shard_filename(fmt, shard_index, nrof_shards)
+            writer = _ShardWriter(os.path.join(output_dir, filename), fmt, len(shard_paths), image_size)
+            for image, resized in executor.map(load, shard_paths):
+                writer.write(image)
+                nrof_resized += resized
+            writer.close()
+            shards.append({'file': filename, 'count': len(shard_paths)})
+            print('Wrote %s (%d/%d images)' % (filename, start + len(shard_paths), nrof_images))
+
+    if nrof_resized:
+        print('Cropped or padded %d images to %dx%d' % (nrof_resized, image_size, image_size))
+    index = {
+        'format': fmt,
+        'image_shape': [image_size, image_size, 3],
+        'classes': [class_name for class_name, _ in classes],
+        'shards': shards,
+        'labels': labels,
+        'paths': [os.path.relpath(path, data_dir) for path in paths],
+    }
+    with open(os.path.join(output_dir, INDEX_FILENAME), 'w') as f:
+        json.dump(index, f)
+    return index
+
+class _ShardWriter(object):
+
+    def __init__(self, filename, fmt, count, image_size):
+        self.fmt = fmt
+        self.tmp_filename = filename + '.tmp'
+        self.filename = filename
+        self.position = 0
+        if fmt == 'npy':
+            self.array = np.lib.format.open_memmap(self.tmp_filename, mode='w+', dtype=np.uint8,
+                                                   shape=(count, image_size, image_size, 3))
+        else:
+            import tensorflow as tf
+            self.writer = tf.io.TFRecordWriter(self.tmp_filename)
+
+    def write(self, image):
+        if self.fmt == 'npy':
+            self.array[self.position] = image
+        else:
+            self.writer.write(np.ascontiguousarray(image).tobytes())
+        self.position += 1
+
+    def close(self):
+        if self.fmt == 'npy':
+            self.array.flush()
+            del self.array
+        else:
+            self.writer.close()
+        os.rename(self.tmp_filename, self.filename)
+
+class PackedDataset(object):
+    """Random and sequential access to the images of a packed dataset"""
+
+    def __init__(self, pack_dir):
+        self.pack_dir = pack_dir
+        with open(os.path.join(os.path.expanduser(pack_dir), INDEX_FILENAME)) as f:
+            index = json.load(f)
+        self.format = index['format']
+        self.image_shape = tuple(index['image_shape'])
+        self.class_names = index['classes']
+        self.labels = np.asarray(index['labels'], dtype=np.int32)
+        self.paths = index['paths']
+        self.shards = index['shards']
+        self.shard_starts = np.cumsum([0] + [shard['count'] for shard in self.shards])
+        self._arrays = [None] * len(self.shards)
+        self._path_index = None
+
+    def __len__(self):
+        return len(self.labels)
+
+    def shard_array(self, shard_index):
+        """(count, height, width, 3) uint8 memory-mapped view of one shard"""
+        if self._arrays[shard_index] is None:
+            shard = self.shards[shard_index]
+            filename = os.path.join(os.path.expanduser(self.pack_dir), shard['file'])
+            if self.format == 'npy':
+                array = np.load(filename, mmap_mode='r')
+            else:
+                image_bytes = int(np.prod(self.image_shape))
+                record_size = TFRECORD_HEADER_SIZE + image_bytes + TFRECORD_FOOTER_SIZE
+                records = np.memmap(filename, dtype=np.uint8, mode='r', shape=(shard['count'], record_size))
+                array = records[:, TFRECORD_HEADER_SIZE:TFRECORD_HEADER_SIZE + image_bytes].reshape((-1,) + self.image_shape)
+            self._arrays[shard_index] = array
+        return self._arrays[shard_index]
+
+    def image(self, index):
+        shard_index = int(np.searchsorted(self.shard_starts, index, side='right')) - 1
+        return np.array(self.shard_array(shard_index)[index - self.shard_starts[shard_index]])
+
+    def images(self, indices):
+        """uint8 (len(indices), height, width, 3) array, read shard by shard in ascending order"""
+        indices = np.asarray(indices, dtype=np.int64)
+        result = np.empty((len(indices),) + self.image_shape, dtype=np.uint8)
+        shard_indices = np.searchsorted(self.shard_starts, indices, side='right') - 1
+        for shard_index in np.unique(shard_indices):
+            rows = np.where(shard_indices == shard_index)[0]
+            offsets = indices[rows] - self.shard_starts[shard_index]
+            order = np.argsort(offsets, kind='stable')
+            result[rows[order]] = self.shard_array(shard_index)[offsets[order]]
+        return result
+
+    def class_image_keys(self):
+        """[(class_name, [image keys])] in class order"""
+        keys = [[] for _ in self.class_names]
+        for index, label in enumerate(self.labels):
+            keys[label].append(image_key(self.pack_dir, index))
+        return list(zip(self.class_names, keys))
+
+    def find(self, relative_path):
+        """Image key of an original relative path, with or without its file extension, or None"""
+        if self._path_index is None:
+            self._path_index = {}
+            for index, path in enumerate(self.paths):
+                self._path_index[path] = index
+                self._path_index.setdefault(os.path.splitext(path)[0], index)
+        index = self._path_index.get(os.path.normpath(relative_path))
+        return None if index is None else image_key(self.pack_dir, index)
+
+_open_datasets = {}
+_open_lock = threading.Lock()
+
+def open_packed_dataset(pack_dir):
+    """Shared PackedDataset for pack_dir; shard memory maps are opened once per process"""
+    with _open_lock:
+        if pack_dir not in _open_datasets:
+            _open_datasets[pack_dir] = PackedDataset(pack_dir)
+        return _open_datasets[pack_dir]
+
+def read_image(path):
+    """uint8 RGB image for a packed image key, or decoded from an ordinary image file"""
+    if isinstance(path, bytes):
+        path = path.decode('utf-8')
+    parsed = parse_image_key(path)
+    if parsed is None:
+        return read_rgb(path)
+    pack_dir, index = parsed
+    return open_packed_dataset(pack_dir).image(index)
+
+def main(args):
+    index = pack_dataset(args.data_dir, args.output_dir, args.format, args.image_size,
+                         args.images_per_shard, args.nrof_threads)
+    print('Packed %d images of %d classes into %d %s shards in %s' % (len(index['labels']), len(index['classes']),
+        len(index['shards']), index['format'], args.output_dir))
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('data_dir', type=str,
+        help='Directory with one sub-directory of aligned face images per person.')
+    parser.add_argument('output_dir', type=str,
+        help='Directory where the shards and index.json are written.')
+    parser.add_argument('--format', type=str, choices=FORMATS,
+        help='Shard format.', default='npy')
+    parser.add_argument('--image_size', type=int,
+        help='Images are center cropped or padded to this size (default: the size of the first image).', default=None)
+    parser.add_argument('--images_per_shard', type=int,
+        help='Number of images in each shard.', default=4096)
+    parser.add_argument('--nrof_threads', type=int,
+        help='Number of threads reading and decoding the source images.', default=4)
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    main(parse_arguments(sys.argv[1:]))
@@ -0,0 +1,176 @@
+"""Threshold sweeps over face verification pairs, evaluated for all thresholds at once.
+
+The pair distances are sorted once and a cumulative sum of the genuine pairs
+along that order gives the true and false accepts at every threshold with one
+searchsorted, instead of four boolean reductions per threshold. The k-fold
+subsets keep the global order, so without subtract_mean all folds share a
+single O(n log n) sort and a single distance computation.
+facenet.calculate_roc, calculate_val and their helpers are thin wrappers
+around these functions and give identical results.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+import numpy as np
+from sklearn.model_selection import KFold
+from scipy import interpolate
+
+def distance(embeddings1, embeddings2, distance_metric=0):
+    if distance_metric==0:
+        # Euclidian distance
+        diff = np.subtract(embeddings1, embeddings2)
+        dist = np.sum(np.square(diff),1)
+    elif distance_metric==1:
+        # Distance based on cosine similarity
+        dot = np.sum(np.multiply(embeddings1, embeddings2), axis=1)
+        norm = np.linalg.norm(embeddings1, axis=1) * np.linalg.norm(embeddings2, axis=1)
+        similarity = dot / norm
+        dist = np.arccos(similarity) / math.pi
+    else:
+        raise ValueError('Undefined distance metric %d' % distance_metric)
+        
+    return dist
+
+class SortedPairs(object):
+    """Pair distances in ascending order with the running number of genuine pairs"""
+
+    def __init__(self, sorted_dist, sorted_issame):
+        self.dist = sorted_dist
+        self.cum_same = np.concatenate([[0], np.cumsum(sorted_issame, dtype=np.int64)])
+        self.nrof_same = int(self.cum_same[-1])
+        self.nrof_diff = len(sorted_dist) - self.nrof_same
+
+    @classmethod
+    def from_pairs(cls, dist, actual_issame, indices=None, order=None):
+        """The pairs in indices (all if None); order is np.argsort(dist) if already computed"""
+        dist = np.asarray(dist)
+        actual_issame = np.asarray(actual_issame, dtype=bool)
+        if order is None:
+            order = np.argsort(dist, kind='stable')
+        if indices is not None:
+            in_subset = np.zeros(len(dist), dtype=bool)
+            in_subset[indices] = True
+            order = order[in_subset[order]]
+        return cls(dist[order], actual_issame[order])
+
+    def counts(self, thresholds):
+        """(true accepts, false accepts) at each threshold, a pair being accepted when dist < threshold"""
+        thresholds = np.asarray(thresholds)
+        # Compare in the dtype np.less(dist, threshold) uses for a single threshold
+        largest = thresholds.flat[np.argmax(np.abs(thresholds))] if thresholds.size else 0.0
+        dtype = np.result_type(self.dist, largest)
+        accepted = np.searchsorted(self.dist.astype(dtype, copy=False), thresholds.astype(dtype), side='left')
+        tp = self.cum_same[accepted]
+        return tp, accepted - tp
+
+    def accuracy(self, thresholds):
+        """(tpr, fpr, acc) at each threshold"""
+        tp, fp = self.counts(thresholds)
+        tn = self.nrof_diff - fp
+        tpr = tp / float(self.nrof_same) if self.nrof_same else np.zeros(tp.shape)
+        fpr = fp / float(self.nrof_diff) if self.nrof_diff else np.zeros(fp.shape)
+        acc = (tp + tn) / float(len(self.dist))
+        return tpr, fpr, acc
+
+    def val_far(self, thresholds):
+        """(val, far) at each threshold; zero where the pairs have no genuine (val) or no impostor (far) pair"""
+        tp, fp = self.counts(thresholds)
+        val = tp / float(self.nrof_same) if self.nrof_same else np.zeros(tp.shape)
+        far = fp / float(self.nrof_diff) if self.nrof_diff else np.zeros(fp.shape)
+        return val, far
+
+def threshold_at_far(thresholds, far, far_target):
+    """Threshold at which far (the FAR at each threshold) reaches far_target, interpolated between thresholds"""
+    if np.max(far)>=far_target:
+        # Interpolate over distinct FAR values; recent scipy rejects duplicate x values
+        far_unique, first_index = np.unique(far, return_index=True)
+        if len(far_unique) == 1:
+            return thresholds[first_index[0]]
+        f = interpolate.interp1d(far_unique, np.asarray(thresholds)[first_index], kind='slinear')
+        return f(far_target)
+    return 0.0
+
+def fold_pairs(embeddings1, embeddings2, actual_issame, nrof_folds=10, distance_metric=0, subtract_mean=False):
+    """(train, test) SortedPairs of every fold of an unshuffled k-fold split of the pairs"""
+    assert(embeddings1.shape[0] == embeddings2.shape[0])
+    assert(embeddings1.shape[1] == embeddings2.shape[1])
+    nrof_pairs = min(len(actual_issame), embeddings1.shape[0])
+    k_fold = KFold(n_splits=nrof_folds, shuffle=False)
+    actual_issame = np.asarray(actual_issame, dtype=bool)
+    
+    indices = np.arange(nrof_pairs)
+    dist = None
+    
+    for train_set, test_set in k_fold.split(indices):
+        if subtract_mean:
+            mean = np.mean(np.concatenate([embeddings1[train_set], embeddings2[train_set]]), axis=0)
+        else:
+            mean = 0.0
+        if subtract_mean or dist is None:
+            dist = distance(embeddings1-mean, embeddings2-mean, distance_metric)
+            order = np.argsort(dist, kind='stable')
+        yield (SortedPairs.from_pairs(dist, actual_issame, train_set, order),
+               SortedPairs.from_pairs(dist, actual_issame, test_set, order))
+
+def calculate_roc(thresholds, embeddings1, embeddings2, actual_issame, nrof_folds=10, distance_metric=0, subtract_mean=False):
+    """(tpr, fpr, accuracy): mean test ROC over the folds, and the test accuracy at each fold's best training threshold"""
+    thresholds = np.asarray(thresholds)
+    nrof_thresholds = len(thresholds)
+    tprs = np.zeros((nrof_folds,nrof_thresholds))
+    fprs = np.zeros((nrof_folds,nrof_thresholds))
+    accuracy = np.zeros((nrof_folds))
+    
+    folds = fold_pairs(embeddings1, embeddings2, actual_issame, nrof_folds, distance_metric, subtract_mean)
+    for fold_idx, (train, test) in enumerate(folds):
+        # Find the best threshold for the fold
+        _, _, acc_train = train.accuracy(thresholds)
+        best_threshold_index = np.argmax(acc_train)
+        tprs[fold_idx,:], fprs[fold_idx,:], acc_test = test.accuracy(thresholds)
+        accuracy[fold_idx] = acc_test[best_threshold_index]
+          
+    tpr = np.mean(tprs,0)
+    fpr = np.mean(fprs,0)
+    return tpr, fpr, accuracy
+
+def calculate_val(thresholds, embeddings1, embeddings2, actual_issame, far_target, nrof_folds=10, distance_metric=0, subtract_mean=False):
+    """(val_mean, val_std, far_mean) on the test folds at the training threshold giving FAR = far_target"""
+    thresholds = np.asarray(thresholds)
+    val = np.zeros(nrof_folds)
+    far = np.zeros(nrof_folds)
+    
+    folds = fold_pairs(embeddings1, embeddings2, actual_issame, nrof_folds, distance_metric, subtract_mean)
+    for fold_idx, (train, test) in enumerate(folds):
+        # Find the threshold that gives FAR = far_target
+        _, far_train = train.val_far(thresholds)
+        threshold = threshold_at_far(thresholds, far_train, far_target)
+        val_test, far_test = test.val_far([threshold])
+        val[fold_idx], far[fold_idx] = val_test[0], far_test[0]
+  
+    val_mean = np.mean(val)
+    far_mean = np.mean(far)
+    val_std = np.std(val)
+    return val_mean, val_std, far_mean
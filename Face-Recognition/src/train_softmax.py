@@ -37,12 +37,10 @@ import importlib
 import argparse
 import facenet
 import lfw
+import packed_dataset
 import h5py
 import math
 import tensorflow.contrib.slim as slim
-from tensorflow.python.ops import data_flow_ops
-from tensorflow.python.framework import ops
-from tensorflow.python.ops import array_ops
 
 def main(args):
   
@@ -104,13 +102,11 @@ def main(args):
         
         val_image_list, val_label_list = facenet.get_image_paths_and_labels(val_set)
 
-        # Create a queue that produces indices into the image_list and label_list 
-        labels = ops.convert_to_tensor(label_list, dtype=tf.int32)
-        range_size = array_ops.shape(labels)[0]
-        index_queue = tf.train.range_input_producer(range_size, num_epochs=None,
-                             shuffle=True, seed=None, capacity=32)
-        
-        index_dequeue_op = index_queue.dequeue_many(args.batch_size*args.epoch_size, 'index_dequeue')
+        # Produce indices into the image_list and label_list, reshuffled every pass over the list
+        range_size = len(label_list)
+        index_dataset = tf.data.Dataset.range(range_size).shuffle(range_size).repeat()
+        index_dataset = index_dataset.batch(args.batch_size*args.epoch_size)
+        index_dequeue_op = tf.compat.v1.data.make_one_shot_iterator(index_dataset).get_next('index_dequeue')
         
         learning_rate_placeholder = tf.placeholder(tf.float32, name='learning_rate')
         batch_size_placeholder = tf.placeholder(tf.int32, name='batch_size')
@@ -119,13 +115,9 @@ def main(args):
         labels_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='labels')
         control_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='control')
         
-        nrof_preprocess_threads = 4
-        input_queue = data_flow_ops.FIFOQueue(capacity=2000000,
-                                    dtypes=[tf.string, tf.int32, tf.int32],
-                                    shapes=[(1,), (1,), (1,)],
-                                    shared_name=None, name=None)
-        enqueue_op = input_queue.enqueue_many([image_paths_placeholder, labels_placeholder, control_placeholder], name='enqueue_op')
-        image_batch, label_batch = facenet.create_input_pipeline(input_queue, image_size, nrof_preprocess_threads, batch_size_placeholder)
+        packed = packed_dataset.is_packed_dataset(args.data_dir) or bool(args.lfw_dir and packed_dataset.is_packed_dataset(args.lfw_dir))
+        image_batch, label_batch, input_init_op = facenet.create_dataset_pipeline(image_paths_placeholder, labels_placeholder,
+            control_placeholder, batch_size_placeholder, image_size, args.nrof_preprocess_threads, packed=packed)
 
         image_batch = tf.identity(image_batch, 'image_batch')
         image_batch = tf.identity(image_batch, 'input')
@@ -192,8 +184,6 @@ def main(args):
         sess.run(tf.global_variables_initializer())
         sess.run(tf.local_variables_initializer())
         summary_writer = tf.summary.FileWriter(log_dir, sess.graph)
-        coord = tf.train.Coordinator()
-        tf.train.start_queue_runners(coord=coord, sess=sess)
 
         with sess.as_default():
 
@@ -227,7 +217,7 @@ def main(args):
                 step = sess.run(global_step, feed_dict=None)
                 # Train for one epoch
                 t = time.time()
-                cont = train(args, sess, epoch, image_list, label_list, index_dequeue_op, enqueue_op, image_paths_placeholder, labels_placeholder,
+                cont = train(args, sess, epoch, image_list, label_list, index_dequeue_op, input_init_op, image_paths_placeholder, labels_placeholder,
                     learning_rate_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, global_step, 
                     total_loss, train_op, summary_op, summary_writer, regularization_losses, args.learning_rate_schedule_file,
                     stat, cross_entropy_mean, accuracy, learning_rate,
@@ -239,7 +229,7 @@ def main(args):
                   
                 t = time.time()
                 if len(val_image_list)>0 and ((epoch-1) % args.validate_every_n_epochs == args.validate_every_n_epochs-1 or epoch==args.max_nrof_epochs):
-                    validate(args, sess, epoch, val_image_list, val_label_list, enqueue_op, image_paths_placeholder, labels_placeholder, control_placeholder,
+                    validate(args, sess, epoch, val_image_list, val_label_list, input_init_op, image_paths_placeholder, labels_placeholder, control_placeholder,
                         phase_train_placeholder, batch_size_placeholder, 
                         stat, total_loss, regularization_losses, cross_entropy_mean, accuracy, args.validate_every_n_epochs, args.use_fixed_image_standardization)
                 stat['time_validate'][epoch-1] = time.time() - t
@@ -250,7 +240,7 @@ def main(args):
                 # Evaluate on LFW
                 t = time.time()
                 if args.lfw_dir:
-                    evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, 
+                    evaluate(sess, input_init_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, 
                         embeddings, label_batch, lfw_paths, actual_issame, args.lfw_batch_size, args.lfw_nrof_folds, log_dir, step, summary_writer, stat, epoch, 
                         args.lfw_distance_metric, args.lfw_subtract_mean, args.lfw_use_flipped_images, args.use_fixed_image_standardization)
                 stat['time_evaluate'][epoch-1] = time.time() - t
@@ -274,7 +264,7 @@ def filter_dataset(dataset, data_filename, percentile, min_nrof_images_per_class
     with h5py.File(data_filename,'r') as f:
         distance_to_center = np.array(f.get('distance_to_center'))
         label_list = np.array(f.get('label_list'))
-        image_list = np.array(f.get('image_list'))
+        image_list = [ p.decode('utf-8') if isinstance(p, bytes) else p for p in f.get('image_list')[()] ]
         distance_to_center_threshold = find_threshold(distance_to_center, percentile)
         indices = np.where(distance_to_center>=distance_to_center_threshold)[0]
         filtered_dataset = dataset
@@ -293,7 +283,7 @@ def filter_dataset(dataset, data_filename, percentile, min_nrof_images_per_class
 
     return filtered_dataset
   
-def train(args, sess, epoch, image_list, label_list, index_dequeue_op, enqueue_op, image_paths_placeholder, labels_placeholder, 
+def train(args, sess, epoch, image_list, label_list, index_dequeue_op, input_init_op, image_paths_placeholder, labels_placeholder, 
       learning_rate_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, step, 
       loss, train_op, summary_op, summary_writer, reg_losses, learning_rate_schedule_file, 
       stat, cross_entropy_mean, accuracy, 
@@ -312,18 +302,19 @@ def train(args, sess, epoch, image_list, label_list, index_dequeue_op, enqueue_o
     label_epoch = np.array(label_list)[index_epoch]
     image_epoch = np.array(image_list)[index_epoch]
     
-    # Enqueue one epoch of image paths and labels
+    # Feed one epoch of image paths and labels to the input pipeline
     labels_array = np.expand_dims(np.array(label_epoch),1)
     image_paths_array = np.expand_dims(np.array(image_epoch),1)
     control_value = facenet.RANDOM_ROTATE * random_rotate + facenet.RANDOM_CROP * random_crop + facenet.RANDOM_FLIP * random_flip + facenet.FIXED_STANDARDIZATION * use_fixed_image_standardization
     control_array = np.ones_like(labels_array) * control_value
-    sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array})
+    sess.run(input_init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array,
+        batch_size_placeholder: args.batch_size})
 
     # Training loop
     train_time = 0
     while batch_number < args.epoch_size:
         start_time = time.time()
-        feed_dict = {learning_rate_placeholder: lr, phase_train_placeholder:True, batch_size_placeholder:args.batch_size}
+        feed_dict = {learning_rate_placeholder: lr, phase_train_placeholder:True}
         tensor_list = [loss, train_op, step, reg_losses, prelogits, cross_entropy_mean, learning_rate, prelogits_norm, accuracy, prelogits_center_loss]
         if batch_number % 100 == 0:
             loss_, _, step_, reg_losses_, prelogits_, cross_entropy_mean_, lr_, prelogits_norm_, accuracy_, center_loss_, summary_str = sess.run(tensor_list + [summary_op], feed_dict=feed_dict)
@@ -353,7 +344,7 @@ def train(args, sess, epoch, image_list, label_list, index_dequeue_op, enqueue_o
     summary_writer.add_summary(summary, global_step=step_)
     return True
 
-def validate(args, sess, epoch, image_list, label_list, enqueue_op, image_paths_placeholder, labels_placeholder, control_placeholder,
+def validate(args, sess, epoch, image_list, label_list, input_init_op, image_paths_placeholder, labels_placeholder, control_placeholder,
              phase_train_placeholder, batch_size_placeholder, 
              stat, loss, regularization_losses, cross_entropy_mean, accuracy, validate_every_n_epochs, use_fixed_image_standardization):
   
@@ -362,11 +353,12 @@ def validate(args, sess, epoch, image_list, label_list, enqueue_op, image_paths_
     nrof_batches = len(label_list) // args.lfw_batch_size
     nrof_images = nrof_batches * args.lfw_batch_size
     
-    # Enqueue one epoch of image paths and labels
+    # Feed one epoch of image paths and labels to the input pipeline
     labels_array = np.expand_dims(np.array(label_list[:nrof_images]),1)
     image_paths_array = np.expand_dims(np.array(image_list[:nrof_images]),1)
     control_array = np.ones_like(labels_array, np.int32)*facenet.FIXED_STANDARDIZATION * use_fixed_image_standardization
-    sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array})
+    sess.run(input_init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array,
+        batch_size_placeholder: args.lfw_batch_size})
 
     loss_array = np.zeros((nrof_batches,), np.float32)
     xent_array = np.zeros((nrof_batches,), np.float32)
@@ -375,7 +367,7 @@ def validate(args, sess, epoch, image_list, label_list, enqueue_op, image_paths_
     # Training loop
     start_time = time.time()
     for i in range(nrof_batches):
-        feed_dict = {phase_train_placeholder:False, batch_size_placeholder:args.lfw_batch_size}
+        feed_dict = {phase_train_placeholder:False}
         loss_, cross_entropy_mean_, accuracy_ = sess.run([loss, cross_entropy_mean, accuracy], feed_dict=feed_dict)
         loss_array[i], xent_array[i], accuracy_array[i] = (loss_, cross_entropy_mean_, accuracy_)
         if i % 10 == 9:
@@ -394,13 +386,13 @@ def validate(args, sess, epoch, image_list, label_list, enqueue_op, image_paths_
           (epoch, duration, np.mean(loss_array), np.mean(xent_array), np.mean(accuracy_array)))
 
 
-def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, 
+def evaluate(sess, input_init_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder, 
         embeddings, labels, image_paths, actual_issame, batch_size, nrof_folds, log_dir, step, summary_writer, stat, epoch, distance_metric, subtract_mean, use_flipped_images, use_fixed_image_standardization):
     start_time = time.time()
     # Run forward pass to calculate embeddings
     print('Runnning forward pass on LFW images')
     
-    # Enqueue one epoch of image paths and labels
+    # Feed one epoch of image paths and labels to the input pipeline
     nrof_embeddings = len(actual_issame)*2  # nrof_pairs * nrof_images_per_pair
     nrof_flips = 2 if use_flipped_images else 1
     nrof_images = nrof_embeddings * nrof_flips
@@ -412,7 +404,8 @@ def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phas
     if use_flipped_images:
         # Flip every second image
         control_array += (labels_array % 2)*facenet.FLIP
-    sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array})
+    sess.run(input_init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array,
+        batch_size_placeholder: batch_size})
     
     embedding_size = int(embeddings.get_shape()[1])
     assert nrof_images % batch_size == 0, 'The number of LFW images must be an integer multiple of the LFW batch size'
@@ -420,7 +413,7 @@ def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phas
     emb_array = np.zeros((nrof_images, embedding_size))
     lab_array = np.zeros((nrof_images,))
     for i in range(nrof_batches):
-        feed_dict = {phase_train_placeholder:False, batch_size_placeholder:batch_size}
+        feed_dict = {phase_train_placeholder:False}
         emb, lab = sess.run([embeddings, labels], feed_dict=feed_dict)
         lab_array[lab] = lab
         emb_array[lab, :] = emb
@@ -489,7 +482,7 @@ def parse_arguments(argv):
     parser.add_argument('--pretrained_model', type=str,
         help='Load a pretrained model before training starts.')
     parser.add_argument('--data_dir', type=str,
-        help='Path to the data directory containing aligned face patches.',
+        help='Path to the data directory containing aligned face patches, or a dataset packed by packed_dataset.py.',
         default='~/datasets/casia/casia_maxpy_mtcnnalign_182_160')
     parser.add_argument('--model_def', type=str,
         help='Model definition. Points to a module containing the definition of the inference graph.', default='models.inception_resnet_v1')
@@ -540,7 +533,7 @@ def parse_arguments(argv):
     parser.add_argument('--seed', type=int,
         help='Random seed.', default=666)
     parser.add_argument('--nrof_preprocess_threads', type=int,
-        help='Number of preprocessing (data loading and augmentation) threads.', default=4)
+        help='Number of parallel preprocessing (data loading and augmentation) calls. Tuned automatically if not set.', default=None)
     parser.add_argument('--log_histograms', 
         help='Enables logging of weight/bias histograms in tensorboard.', action='store_true')
     parser.add_argument('--learning_rate_schedule_file', type=str,
@@ -562,7 +555,7 @@ def parse_arguments(argv):
     parser.add_argument('--lfw_pairs', type=str,
         help='The file containing the pairs to use for validation.', default='data/pairs.txt')
     parser.add_argument('--lfw_dir', type=str,
-        help='Path to the data directory containing aligned face patches.', default='')
+        help='Path to the data directory containing aligned face patches, or a dataset packed by packed_dataset.py.', default='')
     parser.add_argument('--lfw_batch_size', type=int,
         help='Number of images to process in a batch in the LFW test set.', default=100)
     parser.add_argument('--lfw_nrof_folds', type=int,
@@ -38,10 +38,9 @@ import itertools
 import argparse
 import facenet
 import lfw
+import packed_dataset
+import triplet_selection
 
-from tensorflow.python.ops import data_flow_ops
-
-from six.moves import xrange  # @UnresolvedImport
 
 def main(args):
   
@@ -92,38 +91,12 @@ def main(args):
         image_paths_placeholder = tf.placeholder(tf.string, shape=(None,3), name='image_paths')
         labels_placeholder = tf.placeholder(tf.int64, shape=(None,3), name='labels')
         
-        input_queue = data_flow_ops.FIFOQueue(capacity=100000,
-                                    dtypes=[tf.string, tf.int64],
-                                    shapes=[(3,), (3,)],
-                                    shared_name=None, name=None)
-        enqueue_op = input_queue.enqueue_many([image_paths_placeholder, labels_placeholder])
+        control_placeholder = tf.placeholder(tf.int32, shape=(None,3), name='control')
         
-        nrof_preprocess_threads = 4
-        images_and_labels = []
-        for _ in range(nrof_preprocess_threads):
-            filenames, label = input_queue.dequeue()
-            images = []
-            for filename in tf.unstack(filenames):
-                file_contents = tf.read_file(filename)
-                image = tf.image.decode_image(file_contents, channels=3)
-                
-                if args.random_crop:
-                    image = tf.random_crop(image, [args.image_size, args.image_size, 3])
-                else:
-                    image = tf.image.resize_image_with_crop_or_pad(image, args.image_size, args.image_size)
-                if args.random_flip:
-                    image = tf.image.random_flip_left_right(image)
-    
-                #pylint: disable=no-member
-                image.set_shape((args.image_size, args.image_size, 3))
-                images.append(tf.image.per_image_standardization(image))
-            images_and_labels.append([images, label])
-    
-        image_batch, labels_batch = tf.train.batch_join(
-            images_and_labels, batch_size=batch_size_placeholder, 
-            shapes=[(args.image_size, args.image_size, 3), ()], enqueue_many=True,
-            capacity=4 * nrof_preprocess_threads * args.batch_size,
-            allow_smaller_final_batch=True)
+        image_size = (args.image_size, args.image_size)
+        packed = packed_dataset.is_packed_dataset(args.data_dir) or bool(args.lfw_dir and packed_dataset.is_packed_dataset(args.lfw_dir))
+        image_batch, labels_batch, input_init_op = facenet.create_dataset_pipeline(image_paths_placeholder, labels_placeholder,
+            control_placeholder, batch_size_placeholder, image_size, packed=packed)
         image_batch = tf.identity(image_batch, 'image_batch')
         image_batch = tf.identity(image_batch, 'input')
         labels_batch = tf.identity(labels_batch, 'label_batch')
@@ -165,8 +138,6 @@ def main(args):
         sess.run(tf.local_variables_initializer(), feed_dict={phase_train_placeholder:True})
 
         summary_writer = tf.summary.FileWriter(log_dir, sess.graph)
-        coord = tf.train.Coordinator()
-        tf.train.start_queue_runners(coord=coord, sess=sess)
 
         with sess.as_default():
 
@@ -180,8 +151,8 @@ def main(args):
                 step = sess.run(global_step, feed_dict=None)
                 epoch = step // args.epoch_size
                 # Train for one epoch
-                train(args, sess, train_set, epoch, image_paths_placeholder, labels_placeholder, labels_batch,
-                    batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, enqueue_op, input_queue, global_step, 
+                train(args, sess, train_set, epoch, image_paths_placeholder, labels_placeholder, control_placeholder, labels_batch,
+                    batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, input_init_op, global_step, 
                     embeddings, total_loss, train_op, summary_op, summary_writer, args.learning_rate_schedule_file,
                     args.embedding_size, anchor, positive, negative, triplet_loss)
 
@@ -190,15 +161,15 @@ def main(args):
 
                 # Evaluate on LFW
                 if args.lfw_dir:
-                    evaluate(sess, lfw_paths, embeddings, labels_batch, image_paths_placeholder, labels_placeholder, 
-                            batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, enqueue_op, actual_issame, args.batch_size, 
+                    evaluate(sess, lfw_paths, embeddings, labels_batch, image_paths_placeholder, labels_placeholder, control_placeholder,
+                            batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, input_init_op, actual_issame, args.batch_size, 
                             args.lfw_nrof_folds, log_dir, step, summary_writer, args.embedding_size)
 
     return model_dir
 
 
-def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholder, labels_batch,
-          batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, enqueue_op, input_queue, global_step, 
+def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholder, control_placeholder, labels_batch,
+          batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, input_init_op, global_step, 
           embeddings, loss, train_op, summary_op, summary_writer, learning_rate_schedule_file,
           embedding_size, anchor, positive, negative, triplet_loss):
     batch_number = 0
@@ -207,6 +178,7 @@ def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholde
         lr = args.learning_rate
     else:
         lr = facenet.get_learning_rate_from_file(learning_rate_schedule_file, epoch)
+    control_value = facenet.RANDOM_CROP * args.random_crop + facenet.RANDOM_FLIP * args.random_flip
     while batch_number < args.epoch_size:
         # Sample people randomly from the dataset
         image_paths, num_per_class = sample_people(dataset, args.people_per_batch, args.images_per_person)
@@ -216,20 +188,20 @@ def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholde
         nrof_examples = args.people_per_batch * args.images_per_person
         labels_array = np.reshape(np.arange(nrof_examples),(-1,3))
         image_paths_array = np.reshape(np.expand_dims(np.array(image_paths),1), (-1,3))
-        sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array})
+        control_array = np.ones_like(labels_array, np.int32) * control_value
+        sess.run(input_init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array,
+            control_placeholder: control_array, batch_size_placeholder: args.batch_size})
         emb_array = np.zeros((nrof_examples, embedding_size))
         nrof_batches = int(np.ceil(nrof_examples / args.batch_size))
         for i in range(nrof_batches):
-            batch_size = min(nrof_examples-i*args.batch_size, args.batch_size)
-            emb, lab = sess.run([embeddings, labels_batch], feed_dict={batch_size_placeholder: batch_size, 
-                learning_rate_placeholder: lr, phase_train_placeholder: True})
+            emb, lab = sess.run([embeddings, labels_batch], feed_dict={learning_rate_placeholder: lr, phase_train_placeholder: True})
             emb_array[lab,:] = emb
         print('%.3f' % (time.time()-start_time))
 
         # Select triplets based on the embeddings
         print('Selecting suitable triplets for training')
         triplets, nrof_random_negs, nrof_triplets = select_triplets(emb_array, num_per_class, 
-            image_paths, args.people_per_batch, args.alpha)
+            image_paths, args.people_per_batch, args.alpha, strategy=args.triplet_strategy)
         selection_time = time.time() - start_time
         print('(nrof_random_negs, nrof_triplets) = (%d, %d): time=%.3f seconds' % 
             (nrof_random_negs, nrof_triplets, selection_time))
@@ -239,7 +211,9 @@ def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholde
         triplet_paths = list(itertools.chain(*triplets))
         labels_array = np.reshape(np.arange(len(triplet_paths)),(-1,3))
         triplet_paths_array = np.reshape(np.expand_dims(np.array(triplet_paths),1), (-1,3))
-        sess.run(enqueue_op, {image_paths_placeholder: triplet_paths_array, labels_placeholder: labels_array})
+        control_array = np.ones_like(labels_array, np.int32) * control_value
+        sess.run(input_init_op, {image_paths_placeholder: triplet_paths_array, labels_placeholder: labels_array,
+            control_placeholder: control_array, batch_size_placeholder: args.batch_size})
         nrof_examples = len(triplet_paths)
         train_time = 0
         i = 0
@@ -249,8 +223,7 @@ def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholde
         step = 0
         while i < nrof_batches:
             start_time = time.time()
-            batch_size = min(nrof_examples-i*args.batch_size, args.batch_size)
-            feed_dict = {batch_size_placeholder: batch_size, learning_rate_placeholder: lr, phase_train_placeholder: True}
+            feed_dict = {learning_rate_placeholder: lr, phase_train_placeholder: True}
             err, _, step, emb, lab = sess.run([loss, train_op, global_step, embeddings, labels_batch], feed_dict=feed_dict)
             emb_array[lab,:] = emb
             loss_array[i] = err
@@ -268,46 +241,22 @@ def train(args, sess, dataset, epoch, image_paths_placeholder, labels_placeholde
         summary_writer.add_summary(summary, step)
     return step
   
-def select_triplets(embeddings, nrof_images_per_class, image_paths, people_per_batch, alpha):
+def select_triplets(embeddings, nrof_images_per_class, image_paths, people_per_batch, alpha, strategy='random', rng=None):
     """ Select the triplets for training
     """
-    trip_idx = 0
-    emb_start_idx = 0
-    num_trips = 0
-    triplets = []
-    
     # VGG Face: Choosing good triplets is crucial and should strike a balance between
     #  selecting informative (i.e. challenging) examples and swamping training with examples that
     #  are too hard. This is achieve by extending each pair (a, p) to a triplet (a, p, n) by sampling
     #  the image n at random, but only between the ones that violate the triplet loss margin. The
     #  latter is a form of hard-negative mining, but it is not as aggressive (and much cheaper) than
     #  choosing the maximally violating example, as often done in structured output learning.
-
-    for i in xrange(people_per_batch):
-        nrof_images = int(nrof_images_per_class[i])
-        for j in xrange(1,nrof_images):
-            a_idx = emb_start_idx + j - 1
-            neg_dists_sqr = np.sum(np.square(embeddings[a_idx] - embeddings), 1)
-            for pair in xrange(j, nrof_images): # For every possible positive pair.
-                p_idx = emb_start_idx + pair
-                pos_dist_sqr = np.sum(np.square(embeddings[a_idx]-embeddings[p_idx]))
-                neg_dists_sqr[emb_start_idx:emb_start_idx+nrof_images] = np.NaN
-                #all_neg = np.where(np.logical_and(neg_dists_sqr-pos_dist_sqr<alpha, pos_dist_sqr<neg_dists_sqr))[0]  # FaceNet selection
-                all_neg = np.where(neg_dists_sqr-pos_dist_sqr<alpha)[0] # VGG Face selecction
-                nrof_random_negs = all_neg.shape[0]
-                if nrof_random_negs>0:
-                    rnd_idx = np.random.randint(nrof_random_negs)
-                    n_idx = all_neg[rnd_idx]
-                    triplets.append((image_paths[a_idx], image_paths[p_idx], image_paths[n_idx]))
-                    #print('Triplet %d: (%d, %d, %d), pos_dist=%2.6f, neg_dist=%2.6f (%d, %d, %d, %d, %d)' % 
-                    #    (trip_idx, a_idx, p_idx, n_idx, pos_dist_sqr, neg_dists_sqr[n_idx], nrof_random_negs, rnd_idx, i, j, emb_start_idx))
-                    trip_idx += 1
-
-                num_trips += 1
-
-        emb_start_idx += nrof_images
-
-    np.random.shuffle(triplets)
+    rng = np.random if rng is None else rng
+    # Anchors come from the first people_per_batch people, negatives from every sampled image:
+    # sample_people draws extra people when some have fewer than images_per_person images
+    triplet_idx, num_trips = triplet_selection.mine_triplets(embeddings, nrof_images_per_class,
+        alpha, strategy=strategy, rng=rng, nrof_anchor_classes=people_per_batch)
+    triplet_idx = triplet_idx[rng.permutation(triplet_idx.shape[0])]
+    triplets = [(image_paths[a_idx], image_paths[p_idx], image_paths[n_idx]) for a_idx, p_idx, n_idx in triplet_idx]
     return triplets, num_trips, len(triplets)
 
 def sample_people(dataset, people_per_batch, images_per_person):
@@ -338,8 +287,8 @@ def sample_people(dataset, people_per_batch, images_per_person):
   
     return image_paths, num_per_class
 
-def evaluate(sess, image_paths, embeddings, labels_batch, image_paths_placeholder, labels_placeholder, 
-        batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, enqueue_op, actual_issame, batch_size, 
+def evaluate(sess, image_paths, embeddings, labels_batch, image_paths_placeholder, labels_placeholder, control_placeholder,
+        batch_size_placeholder, learning_rate_placeholder, phase_train_placeholder, input_init_op, actual_issame, batch_size, 
         nrof_folds, log_dir, step, summary_writer, embedding_size):
     start_time = time.time()
     # Run forward pass to calculate embeddings
@@ -349,14 +298,14 @@ def evaluate(sess, image_paths, embeddings, labels_batch, image_paths_placeholde
     assert(len(image_paths)==nrof_images)
     labels_array = np.reshape(np.arange(nrof_images),(-1,3))
     image_paths_array = np.reshape(np.expand_dims(np.array(image_paths),1), (-1,3))
-    sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array})
+    control_array = np.zeros_like(labels_array, np.int32)
+    sess.run(input_init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array,
+        control_placeholder: control_array, batch_size_placeholder: batch_size})
     emb_array = np.zeros((nrof_images, embedding_size))
     nrof_batches = int(np.ceil(nrof_images / batch_size))
     label_check_array = np.zeros((nrof_images,))
-    for i in xrange(nrof_batches):
-        batch_size = min(nrof_images-i*batch_size, batch_size)
-        emb, lab = sess.run([embeddings, labels_batch], feed_dict={batch_size_placeholder: batch_size,
-            learning_rate_placeholder: 0.0, phase_train_placeholder: False})
+    for i in range(nrof_batches):
+        emb, lab = sess.run([embeddings, labels_batch], feed_dict={learning_rate_placeholder: 0.0, phase_train_placeholder: False})
         emb_array[lab,:] = emb
         label_check_array[lab] = 1
     print('%.3f' % (time.time()-start_time))
@@ -427,7 +376,7 @@ def parse_arguments(argv):
     parser.add_argument('--pretrained_model', type=str,
         help='Load a pretrained model before training starts.')
     parser.add_argument('--data_dir', type=str,
-        help='Path to the data directory containing aligned face patches.',
+        help='Path to the data directory containing aligned face patches, or a dataset packed by packed_dataset.py.',
         default='~/datasets/casia/casia_maxpy_mtcnnalign_182_160')
     parser.add_argument('--model_def', type=str,
         help='Model definition. Points to a module containing the definition of the inference graph.', default='models.inception_resnet_v1')
@@ -445,6 +394,9 @@ def parse_arguments(argv):
         help='Number of batches per epoch.', default=1000)
     parser.add_argument('--alpha', type=float,
         help='Positive to negative triplet distance margin.', default=0.2)
+    parser.add_argument('--triplet_strategy', type=str, choices=triplet_selection.STRATEGIES,
+        help='How a negative is picked for each (anchor, positive) pair: at random among the margin violators (VGG Face), ' +
+        'semi-hard (FaceNet) or the hardest violator.', default='random')
     parser.add_argument('--embedding_size', type=int,
         help='Dimensionality of the embedding.', default=128)
     parser.add_argument('--random_crop', 
@@ -476,7 +428,7 @@ def parse_arguments(argv):
     parser.add_argument('--lfw_pairs', type=str,
         help='The file containing the pairs to use for validation.', default='data/pairs.txt')
     parser.add_argument('--lfw_dir', type=str,
-        help='Path to the data directory containing aligned face patches.', default='')
+        help='Path to the data directory containing aligned face patches, or a dataset packed by packed_dataset.py.', default='')
     parser.add_argument('--lfw_nrof_folds', type=int,
         help='Number of folds to use for cross validation. Mainly used for testing.', default=10)
     return parser.parse_args(argv)
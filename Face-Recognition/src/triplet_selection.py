@@ -0,0 +1,108 @@
+"""Vectorised triplet mining for triplet loss training.
+
+The pairwise distance matrix of a sampled batch is computed once; every
+(anchor, positive) pair of the same person is then extended with a
+negative chosen by masked array operations over chunks of pairs instead
+of per-anchor and per-positive Python loops.
+"""
+# MIT License
+#
+# Copyright (c) 2016 David Sandberg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+
+# random:   VGG Face, a random negative among those violating the margin (neg - pos < alpha)
+# semihard: FaceNet, a random negative that is further than the positive but within the margin
+# hard:     the closest negative violating the margin
+STRATEGIES = ('random', 'semihard', 'hard')
+
+PAIR_CHUNK_SIZE = 2048
+
+def pairwise_squared_distances(embeddings):
+    """Squared euclidean distance between every pair of rows"""
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    sqr = np.sum(np.square(embeddings), axis=1)
+    dists = sqr[:, np.newaxis] - 2.0 * embeddings.dot(embeddings.T) + sqr[np.newaxis, :]
+    np.maximum(dists, 0.0, out=dists)
+    np.fill_diagonal(dists, 0.0)
+    return dists
+
+def positive_pairs(nrof_images_per_class, nrof_anchor_classes=None):
+    """(anchors, positives): every a < p pair within each consecutive block of images of one person.
+
+    With nrof_anchor_classes only the blocks of the first that many people give pairs.
+    """
+    counts = np.asarray(nrof_images_per_class, dtype=np.int64)
+    labels = np.repeat(np.arange(counts.shape[0]), counts)
+    same = labels[:, np.newaxis] == labels[np.newaxis, :]
+    if nrof_anchor_classes is not None:
+        same &= (labels < nrof_anchor_classes)[:, np.newaxis]
+    anchors, positives = np.nonzero(np.triu(same, k=1))
+    return anchors, positives, labels
+
+def mine_triplets(embeddings, nrof_images_per_class, alpha, strategy='random', rng=None, nrof_anchor_classes=None):
+    """Index triplets (anchor, positive, negative) for a batch laid out person by person.
+
+    Returns (triplets, nrof_pairs) where triplets is an (n, 3) int array in
+    pair order and nrof_pairs the number of (anchor, positive) pairs tried.
+    Pass a seeded np.random.RandomState as rng for reproducible selection.
+    nrof_anchor_classes limits anchors and positives to the first that many
+    people; negatives are still drawn from every image of the batch.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError('Unknown triplet selection strategy "%s"' % strategy)
+    rng = np.random if rng is None else rng
+
+    dists = pairwise_squared_distances(embeddings)
+    anchors, positives, labels = positive_pairs(nrof_images_per_class, nrof_anchor_classes)
+    nrof_pairs = anchors.shape[0]
+
+    selected = []
+    for start in range(0, nrof_pairs, PAIR_CHUNK_SIZE):
+        a = anchors[start:start+PAIR_CHUNK_SIZE]
+        p = positives[start:start+PAIR_CHUNK_SIZE]
+        pos_dist_sqr = dists[a, p][:, np.newaxis]
+        neg_dists_sqr = dists[a]
+        valid = (neg_dists_sqr - pos_dist_sqr < alpha) & (labels[np.newaxis, :] != labels[a][:, np.newaxis])
+        if strategy == 'semihard':
+            valid &= neg_dists_sqr > pos_dist_sqr
+
+        nrof_valid = np.sum(valid, axis=1)
+        has_neg = nrof_valid > 0
+        if not np.any(has_neg):
+            continue
+        valid = valid[has_neg]
+
+        if strategy == 'hard':
+            n = np.argmin(np.where(valid, neg_dists_sqr[has_neg], np.inf), axis=1)
+        else:
+            # k-th valid negative of each row, k drawn uniformly below the row's count
+            k = rng.randint(0, nrof_valid[has_neg])
+            n = np.argmax(np.cumsum(valid, axis=1) > k[:, np.newaxis], axis=1)
+
+        selected.append(np.stack([a[has_neg], p[has_neg], n], axis=1))
+
+    triplets = np.concatenate(selected) if selected else np.zeros((0, 3), dtype=np.int64)
+    return triplets, nrof_pairs
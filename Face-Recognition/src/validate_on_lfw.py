@@ -34,9 +34,10 @@ import numpy as np
 import argparse
 import facenet
 import lfw
+import packed_dataset
 import os
 import sys
-from tensorflow.python.ops import data_flow_ops
+import math
 from sklearn import metrics
 from scipy.optimize import brentq
 from scipy import interpolate
@@ -59,14 +60,14 @@ def main(args):
             control_placeholder = tf.placeholder(tf.int32, shape=(None,1), name='control')
             phase_train_placeholder = tf.placeholder(tf.bool, name='phase_train')
  
-            nrof_preprocess_threads = 4
             image_size = (args.image_size, args.image_size)
-            eval_input_queue = data_flow_ops.FIFOQueue(capacity=2000000,
-                                        dtypes=[tf.string, tf.int32, tf.int32],
-                                        shapes=[(1,), (1,), (1,)],
-                                        shared_name=None, name=None)
-            eval_enqueue_op = eval_input_queue.enqueue_many([image_paths_placeholder, labels_placeholder, control_placeholder], name='eval_enqueue_op')
-            image_batch, label_batch = facenet.create_input_pipeline(eval_input_queue, image_size, nrof_preprocess_threads, batch_size_placeholder)
+            packed = packed_dataset.is_packed_dataset(args.lfw_dir)
+            cache_file = None
+            if args.cache_dir and not packed:
+                nrof_flips = 2 if args.use_flipped_images else 1
+                cache_file = facenet.dataset_cache_file(os.path.expanduser(args.cache_dir), list(np.repeat(np.array(paths), nrof_flips)))
+            image_batch, label_batch, eval_init_op = facenet.create_dataset_pipeline(image_paths_placeholder, labels_placeholder,
+                control_placeholder, batch_size_placeholder, image_size, args.nrof_preprocess_threads, cache_file, packed)
      
             # Load the model
             input_map = {'image_batch': image_batch, 'label_batch': label_batch, 'phase_train': phase_train_placeholder}
@@ -74,21 +75,18 @@ def main(args):
 
             # Get output tensor
             embeddings = tf.get_default_graph().get_tensor_by_name("embeddings:0")
-#              
-            coord = tf.train.Coordinator()
-            tf.train.start_queue_runners(coord=coord, sess=sess)
 
-            evaluate(sess, eval_enqueue_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder,
+            evaluate(sess, eval_init_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder,
                 embeddings, label_batch, paths, actual_issame, args.lfw_batch_size, args.lfw_nrof_folds, args.distance_metric, args.subtract_mean,
                 args.use_flipped_images, args.use_fixed_image_standardization)
 
               
-def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder,
+def evaluate(sess, init_op, image_paths_placeholder, labels_placeholder, phase_train_placeholder, batch_size_placeholder, control_placeholder,
         embeddings, labels, image_paths, actual_issame, batch_size, nrof_folds, distance_metric, subtract_mean, use_flipped_images, use_fixed_image_standardization):
     # Run forward pass to calculate embeddings
     print('Runnning forward pass on LFW images')
     
-    # Enqueue one epoch of image paths and labels
+    # Feed one epoch of image paths and labels to the input pipeline
     nrof_embeddings = len(actual_issame)*2  # nrof_pairs * nrof_images_per_pair
     nrof_flips = 2 if use_flipped_images else 1
     nrof_images = nrof_embeddings * nrof_flips
@@ -100,15 +98,16 @@ def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phas
     if use_flipped_images:
         # Flip every second image
         control_array += (labels_array % 2)*facenet.FLIP
-    sess.run(enqueue_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array})
+    sess.run(init_op, {image_paths_placeholder: image_paths_array, labels_placeholder: labels_array, control_placeholder: control_array,
+        batch_size_placeholder: batch_size})
     
     embedding_size = int(embeddings.get_shape()[1])
-    assert nrof_images % batch_size == 0, 'The number of LFW images must be an integer multiple of the LFW batch size'
-    nrof_batches = nrof_images // batch_size
+    # The dataset pipeline ends with a smaller batch, so any batch size works
+    nrof_batches = int(math.ceil(nrof_images / batch_size))
     emb_array = np.zeros((nrof_images, embedding_size))
     lab_array = np.zeros((nrof_images,))
     for i in range(nrof_batches):
-        feed_dict = {phase_train_placeholder:False, batch_size_placeholder:batch_size}
+        feed_dict = {phase_train_placeholder:False}
         emb, lab = sess.run([embeddings, labels], feed_dict=feed_dict)
         lab_array[lab] = lab
         emb_array[lab, :] = emb
@@ -116,6 +115,7 @@ def evaluate(sess, enqueue_op, image_paths_placeholder, labels_placeholder, phas
             print('.', end='')
             sys.stdout.flush()
     print('')
+    facenet.finish_dataset_pass(sess, labels)
     embeddings = np.zeros((nrof_embeddings, embedding_size*nrof_flips))
     if use_flipped_images:
         # Concatenate embeddings for flipped and non flipped version of the images
@@ -139,7 +139,7 @@ def parse_arguments(argv):
     parser = argparse.ArgumentParser()
     
     parser.add_argument('lfw_dir', type=str,
-        help='Path to the data directory containing aligned LFW face patches.')
+        help='Path to the data directory containing aligned LFW face patches, or a dataset packed by packed_dataset.py.')
     parser.add_argument('--lfw_batch_size', type=int,
         help='Number of images to process in a batch in the LFW test set.', default=100)
     parser.add_argument('model', type=str, 
@@ -158,6 +158,10 @@ def parse_arguments(argv):
         help='Subtract feature mean before calculating distance.', action='store_true')
     parser.add_argument('--use_fixed_image_standardization', 
         help='Performs fixed standardization of images.', action='store_true')
+    parser.add_argument('--nrof_preprocess_threads', type=int,
+        help='Number of parallel image reading and preprocessing calls. Tuned automatically if not set.', default=None)
+    parser.add_argument('--cache_dir', type=str,
+        help='Directory where the LFW image files are cached on the first run so later runs read one local file.', default='')
     return parser.parse_args(argv)
 
 if __name__ == '__main__':
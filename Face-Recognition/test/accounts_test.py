@@ -0,0 +1,73 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+# The API reads DATABASE_URL when database.py is imported
+os.environ["DATABASE_URL"] = "sqlite:///%s" % os.path.join(tempfile.mkdtemp(), "accounts_test.db")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from database import SessionLocal, ensure_schema
+from models import CodeCounter, Student
+from services import accounts
+
+class AccountsTest(unittest.TestCase):
+
+    def setUp(self):
+        ensure_schema()
+        self.db = SessionLocal()
+        for model in (accounts.User, Student, CodeCounter):
+            self.db.query(model).delete()
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def rows(self, *codes):
+        return [(i, {"student_code": code, "full_name": "Student %d" % i, "password": "secret"}, None)
+                for i, code in enumerate(codes, 1)]
+
+    def testExplicitCodesAdvanceCounter(self):
+        accounts.allocate_codes(self.db, "SV", Student.student_code, 100)
+        self.db.commit()
+        report = accounts.import_accounts(self.db, "student", self.rows("SV123", None, "SV050", "X999"))
+        self.assertEqual(report["created"], 4)
+        self.assertEqual(report["conflicts"], [])
+        # The auto-allocated row of the same batch comes after the explicit codes
+        self.assertEqual(self.db.query(Student.student_code).filter(Student.full_name == "Student 2").scalar(), "SV124")
+
+        student = accounts.create_student_account(self.db, SimpleNamespace(
+            full_name="Created later", email=None, phone=None, year=None, password="secret"))
+        self.assertEqual(student.student_code, "SV125")
+
+    def testExplicitCodesBelowCounter(self):
+        accounts.allocate_codes(self.db, "SV", Student.student_code, 100)
+        self.db.commit()
+        accounts.import_accounts(self.db, "student", self.rows("SV007"))
+        self.assertEqual(accounts.allocate_codes(self.db, "SV", Student.student_code), ["SV101"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import time
+import unittest
+import numpy as np
+from batch_loader import BatchLoader
+
+class BatchLoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = ['image_%03d.png' % i for i in range(23)]
+
+    def load(self, path):
+        time.sleep(0.001)
+        return np.full((4, 4, 3), int(path[6:9]), dtype=np.float32)
+
+    def testBatchesInOrder(self):
+        for depth in (1, 2, 3):
+            loader = BatchLoader(self.paths, 5, self.load, (4, 4, 3), depth=depth, nrof_threads=3)
+            self.assertEqual(len(loader), 5)
+            batches = [batch.copy() for batch in loader]
+            self.assertEqual([len(batch) for batch in batches], [5, 5, 5, 5, 3])
+            values = np.concatenate(batches)[:, 0, 0, 0]
+            np.testing.assert_array_equal(values, np.arange(len(self.paths)))
+            self.assertEqual(batches[0].dtype, np.float32)
+
+    def testSlotNotOverwrittenWhileInUse(self):
+        loader = BatchLoader(self.paths, 5, self.load, (4, 4, 3), depth=2, nrof_threads=4)
+        for i, batch in enumerate(loader):
+            time.sleep(0.02)  # let the workers run ahead as far as they can
+            np.testing.assert_array_equal(batch[:, 0, 0, 0], np.arange(i*5, min((i+1)*5, len(self.paths))))
+
+    def testDepthBatchesDecodedAhead(self):
+        for depth in (1, 2, 3):
+            loaded = []
+            def load(path):
+                loaded.append(path)
+                return self.load(path)
+            loader = BatchLoader(self.paths, 5, load, (4, 4, 3), depth=depth, nrof_threads=4)
+            for _ in loader:
+                time.sleep(0.05)  # the consumer holds batch 0 while the workers finish what was submitted
+                self.assertEqual(len(loaded), 5 * (depth + 1))
+                break
+
+    def testErrorsPropagate(self):
+        def load(path):
+            if path == 'image_007.png':
+                raise IOError('cannot read %s' % path)
+            return self.load(path)
+        loader = BatchLoader(self.paths, 5, load, (4, 4, 3))
+        with self.assertRaises(IOError):
+            for _ in loader:
+                pass
+
+    def testSummaryReportsTimes(self):
+        loader = BatchLoader(self.paths, 5, self.load, (4, 4, 3))
+        for _ in loader:
+            time.sleep(0.005)
+        self.assertGreater(loader.compute_seconds, 0.02)
+        self.assertGreater(loader.decode_seconds, 0.0)
+        self.assertIn('waited', loader.summary())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+import dataset_cleaning
+
+class DatasetCleaningTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.nrof_classes = 4
+        self.centers = np.random.normal(size=(self.nrof_classes, 32)) * 3.0
+        self.labels = np.repeat(np.arange(self.nrof_classes), 10)
+        self.emb = self.centers[self.labels] + np.random.normal(scale=0.3, size=(self.labels.shape[0], 32))
+
+    def testMatchesPerClassLoop(self):
+        metrics = dataset_cleaning.filtering_metrics(self.emb, self.labels, self.nrof_classes)
+        for cls in range(self.nrof_classes):
+            idx = np.where(self.labels==cls)[0]
+            center = np.mean(self.emb[idx], axis=0)
+            dists_sqr = np.sum(np.square(self.emb[idx] - center), axis=1)
+            np.testing.assert_allclose(metrics['class_center'][cls], center)
+            np.testing.assert_allclose(metrics['distance_to_center'][idx], np.sqrt(dists_sqr))
+            np.testing.assert_allclose(metrics['class_variance'][cls], np.mean(dists_sqr))
+        self.assertFalse(np.any(metrics['mislabeled']))
+
+    def testFlagsMislabeledImage(self):
+        labels = self.labels.copy()
+        labels[3] = 2  # an image of class 0 filed under class 2
+        metrics = dataset_cleaning.filtering_metrics(self.emb, labels, self.nrof_classes)
+        self.assertEqual(list(np.where(metrics['mislabeled'])[0]), [3])
+        self.assertEqual(metrics['nearest_other_class'][3], 0)
+        self.assertGreater(metrics['outlier_score'][3], 2.0)
+
+        quarantine = dataset_cleaning.select_for_quarantine(metrics, labels, outlier_threshold=10.0)
+        self.assertEqual(list(np.where(quarantine)[0]), [3])
+
+    def testQuarantineKeepsMinimumPerClass(self):
+        labels = np.array([0, 0, 1, 1])
+        emb = np.array([[0.0, 0.0], [0.1, 0.0], [0.05, 0.0], [5.0, 5.0]])
+        metrics = dataset_cleaning.filtering_metrics(emb, labels, 2)
+        self.assertTrue(metrics['mislabeled'][2])
+        quarantine = dataset_cleaning.select_for_quarantine(metrics, labels, min_nrof_images_per_class=1)
+        self.assertEqual(list(np.where(quarantine)[0]), [2])
+        quarantine = dataset_cleaning.select_for_quarantine(metrics, labels, min_nrof_images_per_class=2)
+        self.assertFalse(np.any(quarantine))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import face_classifier
+
+def clustered_embeddings(nrof_classes, nrof_images_per_class, embedding_size=16, spread=0.3):
+    centers = np.eye(embedding_size)[:nrof_classes]
+    labels = np.repeat(np.arange(nrof_classes), nrof_images_per_class)
+    emb_array = centers[labels] + np.random.randn(len(labels), embedding_size) * spread / np.sqrt(embedding_size)
+    return emb_array / np.linalg.norm(emb_array, axis=1, keepdims=True), labels
+
+class FaceClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.emb_array, self.labels = clustered_embeddings(5, 12)
+        self.class_names = ['person %d' % i for i in range(5)]
+        self.paths = ['image_%02d.png' % i for i in range(len(self.labels))]
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def predict(self, classifier, emb_array):
+        return list(np.array(classifier.class_names)[np.argmax(classifier.predict_proba(emb_array), axis=1)])
+
+    def testFitAllBackends(self):
+        for backend in face_classifier.BACKENDS:
+            classifier = face_classifier.FaceClassifier(backend).fit(self.emb_array, self.labels, self.class_names, self.paths)
+            self.assertEqual(self.predict(classifier, self.emb_array), list(np.array(self.class_names)[self.labels]))
+
+    def testUpdateWithNewClass(self):
+        old = self.labels < 4
+        for backend in face_classifier.BACKENDS:
+            classifier = face_classifier.FaceClassifier(backend)
+            classifier.fit(self.emb_array[old], self.labels[old], self.class_names[:4], np.array(self.paths)[old])
+            # The new person sorts first, so the dataset labels of everyone else shift by one
+            class_names = ['person 4'] + self.class_names[:4]
+            labels = np.where(self.labels == 4, 0, self.labels + 1)
+            classifier.update(self.emb_array[~old], labels[~old], class_names, np.array(self.paths)[~old])
+            self.assertEqual(classifier.class_names, self.class_names)
+            self.assertEqual(classifier.metadata['nrof_new_classes'], 1)
+            self.assertEqual(self.predict(classifier, self.emb_array), list(np.array(self.class_names)[self.labels]))
+
+    def testPartialFitUpdate(self):
+        first = np.arange(len(self.labels)) % 3 != 0
+        classifier = face_classifier.FaceClassifier('sgd')
+        classifier.fit(self.emb_array[first], self.labels[first], self.class_names, np.array(self.paths)[first])
+        classifier.update(self.emb_array[~first], self.labels[~first], self.class_names, np.array(self.paths)[~first])
+        self.assertEqual(classifier.metadata['last_training'], 'partial_fit')
+        self.assertEqual(len(classifier.image_paths), len(self.paths))
+        self.assertEqual(self.predict(classifier, self.emb_array), list(np.array(self.class_names)[self.labels]))
+
+    def testUpdateDropsRemovedImages(self):
+        classifier = face_classifier.FaceClassifier('logistic').fit(self.emb_array, self.labels, self.class_names, self.paths)
+        current = [path for path, label in zip(self.paths, self.labels) if label != 2]
+        classifier.update(np.zeros((0, 16)), [], self.class_names, [], current_paths=current)
+        self.assertEqual(classifier.image_paths, current)
+        self.assertEqual(classifier.metadata['nrof_removed'], 12)
+        self.assertTrue(np.all(classifier.predict_proba(self.emb_array)[:, 2] == 0))
+
+    def testSaveAndLoad(self):
+        filename = os.path.join(self.tmp_dir, 'classifier.pkl')
+        classifier = face_classifier.FaceClassifier('logistic').fit(self.emb_array, self.labels, self.class_names, self.paths)
+        classifier.save(filename)
+        loaded = face_classifier.load_classifier(filename)
+        self.assertEqual(loaded.backend, 'logistic')
+        self.assertEqual(loaded.class_names, self.class_names)
+        self.assertEqual(loaded.image_paths, self.paths)
+        np.testing.assert_array_equal(loaded.predict_proba(self.emb_array), classifier.predict_proba(self.emb_array))
+
+        classifier.save(filename, keep_embeddings=False)
+        self.assertFalse(face_classifier.load_classifier(filename).has_embeddings)
+
+    def testLoadLegacyPickle(self):
+        filename = os.path.join(self.tmp_dir, 'facemodel.pkl')
+        model = face_classifier.create_model('svc').fit(self.emb_array, self.labels)
+        with open(filename, 'wb') as outfile:
+            pickle.dump((model, self.class_names), outfile)
+        loaded = face_classifier.load_classifier(filename)
+        self.assertEqual(loaded.backend, 'svc')
+        self.assertFalse(loaded.has_embeddings)
+        self.assertEqual(loaded.class_names, self.class_names)
+
+    def testRejectsNewerFormat(self):
+        filename = os.path.join(self.tmp_dir, 'classifier.pkl')
+        state = face_classifier.FaceClassifier('sgd').to_state()
+        state['version'] = face_classifier.FORMAT_VERSION + 1
+        with open(filename, 'wb') as outfile:
+            pickle.dump(state, outfile)
+        with self.assertRaises(ValueError):
+            face_classifier.load_classifier(filename)
+
+if __name__ == "__main__":
+    unittest.main()
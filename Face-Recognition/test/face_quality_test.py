@@ -0,0 +1,67 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+import face_quality
+
+class FaceQualityTest(unittest.TestCase):
+
+    def testFrontalPose(self):
+        # left eye, right eye, nose, left mouth, right mouth; x values then y values
+        points = np.array([60, 100, 80, 65, 95, 70, 70, 90, 110, 110], dtype=np.float64)
+        yaw, pitch, roll = face_quality.pose_from_landmarks(points)
+        np.testing.assert_almost_equal([yaw, pitch, roll], [0.0, 0.0, 0.0])
+
+    def testTurnedAndTiltedPose(self):
+        points = np.array([[60, 100, 95, 65, 95, 70, 80, 95, 115, 120]], dtype=np.float64).T
+        yaw, pitch, roll = face_quality.pose_from_landmarks(points)
+        self.assertGreater(yaw[0], 0.3)
+        np.testing.assert_almost_equal(roll[0], np.degrees(np.arctan2(10, 40)))
+
+    def testQualityScoreOrdering(self):
+        crisp = face_quality.quality_score(300.0, 200.0)
+        blurry = face_quality.quality_score(20.0, 200.0)
+        turned = face_quality.quality_score(300.0, 200.0, yaw=0.4)
+        self.assertAlmostEqual(crisp, 1.0)
+        self.assertLess(blurry, crisp)
+        self.assertLess(turned, crisp)
+        np.testing.assert_allclose(face_quality.quality_score(np.array([300.0, 20.0]), 200.0), [crisp, blurry])
+
+    def testLaplacianVariance(self):
+        np.random.seed(seed=666)
+        sharp = np.random.uniform(0, 255, size=(64, 64))
+        self.assertEqual(face_quality.laplacian_variance(np.full((64, 64), 128.0)), 0.0)
+        self.assertGreater(face_quality.laplacian_variance(sharp), face_quality.laplacian_variance(sharp[::2, ::2].repeat(2, 0).repeat(2, 1)))
+
+    def testSelectDiverseSkipsNearDuplicates(self):
+        np.random.seed(seed=666)
+        base = np.random.normal(size=(3, 128))
+        embeddings = np.vstack([base[0], base[0] + 1e-3, base[1], base[2]])
+        scores = np.array([0.9, 0.95, 0.5, 0.7])
+        selected = face_quality.select_diverse(embeddings, scores, top_k=3)
+        self.assertEqual(selected, [1, 3, 2])
+        self.assertEqual(face_quality.select_diverse(embeddings, scores, top_k=2), [1, 3])
+        self.assertEqual(face_quality.select_diverse(np.zeros((0, 128)), np.zeros(0), top_k=3), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import itertools
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+import numpy as np
+import face_classifier
+import open_set
+from face_classifier_test import clustered_embeddings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from services.face_recognition import FaceRecognitionService
+
+def loaded_classifier(emb_array, labels, class_names):
+    """The parts of a load_model namespace that match reads"""
+    model = face_classifier.FaceClassifier('logistic').fit(emb_array, labels, class_names)
+    return SimpleNamespace(model=model, class_names=model.class_names, open_set=open_set,
+                           thresholds=open_set.thresholds(model))
+
+class FaceRecognitionServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.emb_array, labels = clustered_embeddings(4, 10)
+        class_names = ['person %d' % i for i in range(4)]
+        self.expected = [class_names[label] for label in labels]
+        self.old = loaded_classifier(self.emb_array, labels, class_names)
+        # The retrained classifier numbers the classes the other way round, so mixing the two misnames everyone
+        self.new = loaded_classifier(self.emb_array, 3 - labels, class_names[::-1])
+        self.service = FaceRecognitionService()
+        self.service._loaded, self.service.model_loaded = self.old, True
+
+    def testMatchDuringReload(self):
+        stop = threading.Event()
+
+        def reload():
+            for loaded in itertools.cycle([self.new, self.old]):
+                if stop.is_set():
+                    return
+                self.service._loaded = loaded
+
+        thread = threading.Thread(target=reload)
+        thread.start()
+        try:
+            for i in range(400):
+                index = i % len(self.emb_array)
+                name, _, message = self.service.match(self.service.snapshot(), self.emb_array[index:index + 1])
+                self.assertEqual(message, "Success")
+                self.assertEqual(name, self.expected[index])
+        finally:
+            stop.set()
+            thread.join()
+
+    def testSnapshotKeepsModelAcrossReload(self):
+        loaded = self.service.snapshot()
+        self.service._loaded = self.new
+        names = [self.service.match(loaded, self.emb_array[i:i + 1])[0] for i in range(len(self.emb_array))]
+        self.assertEqual(names, self.expected)
+        self.assertIs(self.service.snapshot(), self.new)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import unittest
+import numpy as np
+import identification
+
+class IdentificationTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        nrof_identities, embedding_size = 60, 32
+        centers = identification.normalize(np.random.randn(nrof_identities, embedding_size))
+        self.labels = np.repeat(np.arange(nrof_identities), 4)
+        self.emb_array = identification.normalize(centers[self.labels] + 0.1 * np.random.randn(len(self.labels), embedding_size))
+
+    def testBuildBenchmark(self):
+        benchmark = identification.build_benchmark(self.emb_array, self.labels, 20, 10, nrof_enroll_images=2)
+        self.assertEqual(benchmark['mated_templates'].shape, (20, 32))
+        self.assertEqual(benchmark['distractor_templates'].shape, (30, 32))
+        self.assertEqual(len(benchmark['mated_probes']), 20 * 2)
+        self.assertEqual(len(benchmark['nonmated_probes']), 10 * 4)
+        np.testing.assert_array_equal(np.bincount(benchmark['probe_mates']), np.full(20, 2))
+        np.testing.assert_allclose(np.linalg.norm(benchmark['mated_templates'], axis=1), 1.0, rtol=1e-5)
+
+    def testSearchMatchesBruteForce(self):
+        gallery = identification.synthetic_templates(500, 32)
+        probes = self.emb_array[:300]
+        indices, similarities = identification.search(gallery, probes, k=5, chunk_size=64)
+        expected = np.argsort(-probes.dot(gallery.T), axis=1)[:, :5]
+        np.testing.assert_array_equal(indices, expected)
+        self.assertTrue(np.all(np.diff(similarities, axis=1) <= 0))
+
+    def testSearchSmallGallery(self):
+        indices, _ = identification.search(self.emb_array[:3], self.emb_array[:2], k=5)
+        self.assertEqual(indices.shape, (2, 3))
+        np.testing.assert_array_equal(indices[:, 0], [0, 1])
+
+    def testFnirAtFpir(self):
+        mated_top = np.array([0, 1, 2, 0])
+        probe_mates = np.array([0, 1, 2, 3])
+        mated_similarity = np.array([0.9, 0.6, 0.4, 0.9])
+        nonmated_similarity = np.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.8, 0.15, 0.25, 0.35, 0.45])
+        # FPIR 0.1 accepts only above 0.7, FPIR 0.5 above 0.3
+        fnirs = identification.fnir_at_fpir(mated_top, mated_similarity, probe_mates, nonmated_similarity, [0.1, 0.5])
+        self.assertEqual(fnirs, [0.75, 0.25])
+
+    def testEvaluateGallery(self):
+        benchmark = identification.build_benchmark(self.emb_array, self.labels, 20, 10, nrof_enroll_images=2)
+        args = argparse.Namespace(ranks=[1, 5], far_targets=[1e-2], fpir_targets=[0.1], nrof_impostors_per_probe=50,
+                                  nrof_latency_probes=5, seed=1)
+        result = identification.evaluate_gallery(benchmark, 80, args)
+        self.assertEqual(result['nrof_synthetic_templates'], 30)
+        self.assertEqual(result['rank1'], 1.0)
+        self.assertEqual(result['tar@far=0.01'], 1.0)
+        self.assertLess(result['fnir@fpir=0.1'], 0.1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+import image_normalization
+
+def legacy_prewhiten(x):
+    # facenet.prewhiten, which cannot be imported without tensorflow
+    mean = np.mean(x)
+    std = np.std(x)
+    std_adj = np.maximum(std, 1.0/np.sqrt(x.size))
+    return np.multiply(np.subtract(x, mean), 1/std_adj)
+
+class ImageNormalizationTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.images = np.random.randint(0, 256, size=(7, 20, 16, 3)).astype(np.uint8)
+        self.expected = np.stack([legacy_prewhiten(img) for img in self.images])
+
+    def testPrewhitenBatchMatchesPerImage(self):
+        whitened = image_normalization.prewhiten_batch(self.images)
+        self.assertEqual(whitened.dtype, np.float32)
+        np.testing.assert_allclose(whitened, self.expected, rtol=0, atol=1e-5)
+
+    def testFloatBatchInPlace(self):
+        images = self.images.astype(np.float32)
+        whitened = image_normalization.prewhiten_batch(images, out=images)
+        self.assertIs(whitened, images)
+        np.testing.assert_allclose(images, self.expected, rtol=0, atol=1e-5)
+
+    def testConstantImage(self):
+        images = np.full((2, 8, 8, 3), 200, dtype=np.uint8)
+        np.testing.assert_array_equal(image_normalization.prewhiten_batch(images), np.zeros(images.shape, np.float32))
+
+    def testPrewhitenImage(self):
+        np.testing.assert_allclose(image_normalization.prewhiten_image(self.images[3]), self.expected[3], rtol=0, atol=1e-5)
+
+    def testFixedStandardization(self):
+        standardized = image_normalization.fixed_standardization(self.images)
+        self.assertEqual(standardized.dtype, np.float32)
+        np.testing.assert_allclose(standardized, (self.images.astype(np.float64) - 127.5) / 128.0, rtol=0, atol=1e-6)
+
+    def testRejectsBadOutputBuffer(self):
+        with self.assertRaises(ValueError):
+            image_normalization.prewhiten_batch(self.images, out=np.empty(self.images.shape, np.float64))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+import face_classifier
+import open_set
+from face_classifier_test import clustered_embeddings
+
+class OpenSetTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        emb_array, labels = clustered_embeddings(8, 10)
+        self.known = labels < 6
+        self.emb_array, self.labels = emb_array, labels
+        self.class_names = ['person %d' % i for i in range(6)]
+        self.classifier = face_classifier.FaceClassifier('logistic').fit(
+            emb_array[self.known], labels[self.known], self.class_names)
+
+    def testNearestGallery(self):
+        gallery = np.array([[0.0, 0.0], [1.0, 0.0], [0.0, 3.0]])
+        dists, indices = open_set.nearest_gallery(gallery, np.array([0, 0, 1]), np.array([[0.9, 0.0], [0.9, 0.0]]), [0, 1])
+        np.testing.assert_array_equal(indices, [1, 2])
+        np.testing.assert_allclose(dists, [0.01, 9.81])
+
+    def testScores(self):
+        scores = open_set.scores(self.classifier, self.emb_array[:3])
+        np.testing.assert_array_equal(scores['best_class_indices'], [0, 0, 0])
+        self.assertTrue(np.all(scores['margin'] > 0))
+        self.assertTrue(np.all(scores['margin'] <= scores['probability']))
+        self.assertTrue(np.all(self.classifier.labels[scores['nearest_gallery_index']] == 0))
+
+    def testStrangersRejected(self):
+        thresholds = open_set.thresholds(self.classifier, max_distance=0.5)
+        accepted = open_set.accept(open_set.scores(self.classifier, self.emb_array), thresholds)
+        np.testing.assert_array_equal(accepted, self.known)
+
+    def testThresholds(self):
+        self.assertEqual(open_set.thresholds(self.classifier), open_set.DEFAULT_THRESHOLDS)
+        self.assertEqual(open_set.thresholds(self.classifier, min_probability=0.8)['min_probability'], 0.8)
+        self.classifier.open_set = {'thresholds': {'max_distance': 1.2, 'min_probability': 0.3, 'min_margin': 0.1}}
+        self.assertEqual(open_set.thresholds(self.classifier, min_probability=0.8)['min_probability'], 0.3)
+
+    def testNoGallery(self):
+        self.classifier.emb_array = None
+        scores = open_set.scores(self.classifier, self.emb_array[:2])
+        self.assertTrue(np.all(np.isnan(scores['gallery_distance'])))
+        self.assertTrue(np.all(open_set.accept(scores, dict(open_set.DEFAULT_THRESHOLDS, max_distance=0.1))))
+
+    def testHeldoutScores(self):
+        heldout = open_set.heldout_scores(self.classifier, nrof_folds=3)
+        # Every image of a class is an impostor probe once, plus one genuine probe per class and fold it is known in
+        self.assertEqual(len(heldout['issame']), np.sum(self.known) + 6 * 2)
+        self.assertEqual(np.sum(heldout['issame']), 12)
+        self.assertEqual(heldout['probes'].shape, heldout['nearest'].shape)
+        self.assertGreater(np.min(heldout['gallery_distance'][~heldout['issame']]),
+                           np.max(heldout['gallery_distance'][heldout['issame']]))
+
+    def testCalibrate(self):
+        thresholds = open_set.calibrate(self.classifier, 0.01, nrof_folds=3)
+        self.assertEqual(self.classifier.open_set['thresholds'], thresholds)
+        self.assertLess(thresholds['max_distance'], np.inf)
+        strangers = open_set.scores(self.classifier, self.emb_array[~self.known])
+        self.assertLess(np.mean(open_set.accept(strangers, open_set.thresholds(self.classifier))), 0.5)
+
+    def testCalibrateTwoClasses(self):
+        emb_array, labels = clustered_embeddings(2, 10)
+        classifier = face_classifier.FaceClassifier('svc').fit(emb_array, labels, ['a', 'b'])
+        classifier.open_set = {'thresholds': {'max_distance': 0.5, 'min_probability': 0.9, 'min_margin': 0.5}}
+        with self.assertWarns(UserWarning):
+            thresholds = open_set.calibrate(classifier, 0.01)
+        self.assertEqual(thresholds, open_set.DEFAULT_THRESHOLDS)
+        self.assertEqual(open_set.thresholds(classifier), open_set.DEFAULT_THRESHOLDS)
+
+    def testCalibrateSmallGalleries(self):
+        # Fewer genuine probes than the default number of VAL folds
+        for nrof_classes, nrof_images in ((3, 5), (4, 10), (5, 10)):
+            emb_array, labels = clustered_embeddings(nrof_classes, nrof_images)
+            classifier = face_classifier.FaceClassifier('svc').fit(emb_array, labels,
+                ['person %d' % i for i in range(nrof_classes)])
+            thresholds = open_set.calibrate(classifier, 0.01)
+            self.assertEqual(sorted(thresholds), sorted(open_set.DEFAULT_THRESHOLDS))
+            self.assertTrue(all(np.isfinite(value) for value in thresholds.values()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+import imageio
+import numpy as np
+import packed_dataset
+
+class PackedDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp_dir, 'processed')
+        self.images = {}
+        for class_name, nrof_images in (('Alice', 3), ('Bob', 2)):
+            os.makedirs(os.path.join(self.data_dir, class_name))
+            for i in range(nrof_images):
+                relative_path = os.path.join(class_name, '%s_%04d.png' % (class_name, i+1))
+                image = np.random.randint(0, 256, size=(12, 12, 3)).astype(np.uint8)
+                imageio.imwrite(os.path.join(self.data_dir, relative_path), image)
+                self.images[relative_path] = image
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def testPackNpy(self):
+        pack_dir = os.path.join(self.tmp_dir, 'packed')
+        packed_dataset.pack_dataset(self.data_dir, pack_dir, 'npy', images_per_shard=2, nrof_threads=2)
+        self.assertTrue(packed_dataset.is_packed_dataset(pack_dir))
+
+        packed = packed_dataset.PackedDataset(pack_dir)
+        self.assertEqual(len(packed), 5)
+        self.assertEqual(len(packed.shards), 3)
+        self.assertEqual(packed.class_names, ['Alice', 'Bob'])
+        self.assertEqual(list(packed.labels), [0, 0, 0, 1, 1])
+        for index, relative_path in enumerate(packed.paths):
+            np.testing.assert_array_equal(packed.image(index), self.images[relative_path])
+
+        indices = [4, 0, 3, 1]
+        expected = np.stack([self.images[packed.paths[i]] for i in indices])
+        np.testing.assert_array_equal(packed.images(indices), expected)
+
+        classes = packed.class_image_keys()
+        self.assertEqual([len(keys) for _, keys in classes], [3, 2])
+        key = packed.find(os.path.join('Bob', 'Bob_0002'))
+        self.assertEqual(key, packed_dataset.image_key(pack_dir, 4))
+        np.testing.assert_array_equal(packed_dataset.read_image(key), self.images[os.path.join('Bob', 'Bob_0002.png')])
+        self.assertIsNone(packed.find(os.path.join('Bob', 'Bob_0003')))
+        self.assertFalse(packed_dataset.is_image_key(os.path.join(self.data_dir, 'Bob', 'Bob_0001.png')))
+
+    def testReadTfrecordShard(self):
+        # Frame the records the way TFRecordWriter does; the reader skips the checksums
+        pack_dir = os.path.join(self.tmp_dir, 'packed_tfrecord')
+        os.makedirs(pack_dir)
+        paths = sorted(self.images)
+        with open(os.path.join(pack_dir, 'images-00000-of-00001.tfrecord'), 'wb') as f:
+            for relative_path in paths:
+                data = self.images[relative_path].tobytes()
+                f.write(struct.pack('<QI', len(data), 0) + data + struct.pack('<I', 0))
+        index = {'format': 'tfrecord', 'image_shape': [12, 12, 3], 'classes': ['Alice', 'Bob'],
+                 'shards': [{'file': 'images-00000-of-00001.tfrecord', 'count': len(paths)}],
+                 'labels': [0, 0, 0, 1, 1], 'paths': paths}
+        with open(os.path.join(pack_dir, packed_dataset.INDEX_FILENAME), 'w') as f:
+            json.dump(index, f)
+
+        packed = packed_dataset.PackedDataset(pack_dir)
+        np.testing.assert_array_equal(packed.images(range(len(paths))), np.stack([self.images[p] for p in paths]))
+
+    def testCenterCropOrPad(self):
+        image = np.arange(6*8*3, dtype=np.uint8).reshape((6, 8, 3))
+        result = packed_dataset.center_crop_or_pad(image, 4)
+        np.testing.assert_array_equal(result, image[1:5, 2:6])
+        result = packed_dataset.center_crop_or_pad(image, 10)
+        self.assertEqual(result.shape, (10, 10, 3))
+        np.testing.assert_array_equal(result[2:8, 1:9], image)
+
+if __name__ == "__main__":
+    unittest.main()
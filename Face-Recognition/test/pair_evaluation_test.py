@@ -0,0 +1,155 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+from sklearn.model_selection import KFold
+from scipy import interpolate
+import pair_evaluation
+
+# The per-threshold loops facenet used before pair_evaluation, as references
+
+def legacy_accuracy(threshold, dist, actual_issame):
+    predict_issame = np.less(dist, threshold)
+    tp = np.sum(np.logical_and(predict_issame, actual_issame))
+    fp = np.sum(np.logical_and(predict_issame, np.logical_not(actual_issame)))
+    tn = np.sum(np.logical_and(np.logical_not(predict_issame), np.logical_not(actual_issame)))
+    fn = np.sum(np.logical_and(np.logical_not(predict_issame), actual_issame))
+    tpr = 0 if (tp+fn==0) else float(tp) / float(tp+fn)
+    fpr = 0 if (fp+tn==0) else float(fp) / float(fp+tn)
+    acc = float(tp+tn)/dist.size
+    return tpr, fpr, acc
+
+def legacy_val_far(threshold, dist, actual_issame):
+    predict_issame = np.less(dist, threshold)
+    true_accept = np.sum(np.logical_and(predict_issame, actual_issame))
+    false_accept = np.sum(np.logical_and(predict_issame, np.logical_not(actual_issame)))
+    n_same = np.sum(actual_issame)
+    n_diff = np.sum(np.logical_not(actual_issame))
+    return float(true_accept) / float(n_same), float(false_accept) / float(n_diff)
+
+def legacy_roc(thresholds, embeddings1, embeddings2, actual_issame, nrof_folds=10, distance_metric=0, subtract_mean=False):
+    nrof_pairs = min(len(actual_issame), embeddings1.shape[0])
+    nrof_thresholds = len(thresholds)
+    k_fold = KFold(n_splits=nrof_folds, shuffle=False)
+    tprs = np.zeros((nrof_folds,nrof_thresholds))
+    fprs = np.zeros((nrof_folds,nrof_thresholds))
+    accuracy = np.zeros((nrof_folds))
+    for fold_idx, (train_set, test_set) in enumerate(k_fold.split(np.arange(nrof_pairs))):
+        mean = np.mean(np.concatenate([embeddings1[train_set], embeddings2[train_set]]), axis=0) if subtract_mean else 0.0
+        dist = pair_evaluation.distance(embeddings1-mean, embeddings2-mean, distance_metric)
+        acc_train = np.zeros((nrof_thresholds))
+        for threshold_idx, threshold in enumerate(thresholds):
+            _, _, acc_train[threshold_idx] = legacy_accuracy(threshold, dist[train_set], actual_issame[train_set])
+        best_threshold_index = np.argmax(acc_train)
+        for threshold_idx, threshold in enumerate(thresholds):
+            tprs[fold_idx,threshold_idx], fprs[fold_idx,threshold_idx], _ = legacy_accuracy(threshold, dist[test_set], actual_issame[test_set])
+        _, _, accuracy[fold_idx] = legacy_accuracy(thresholds[best_threshold_index], dist[test_set], actual_issame[test_set])
+    return np.mean(tprs,0), np.mean(fprs,0), accuracy
+
+def legacy_interpolated_threshold(thresholds, far_train, far_target):
+    """facenet's threshold step; interp1d needs distinct FAR values on recent scipy"""
+    if np.max(far_train)>=far_target:
+        f = interpolate.interp1d(far_train, thresholds, kind='slinear')
+        return f(far_target)
+    return 0.0
+
+def legacy_val(thresholds, embeddings1, embeddings2, actual_issame, far_target, nrof_folds=10, distance_metric=0, subtract_mean=False):
+    """The per-threshold FAR loop; the threshold step is pair_evaluation's, as the FAR curves here repeat values"""
+    nrof_pairs = min(len(actual_issame), embeddings1.shape[0])
+    k_fold = KFold(n_splits=nrof_folds, shuffle=False)
+    val = np.zeros(nrof_folds)
+    far = np.zeros(nrof_folds)
+    for fold_idx, (train_set, test_set) in enumerate(k_fold.split(np.arange(nrof_pairs))):
+        mean = np.mean(np.concatenate([embeddings1[train_set], embeddings2[train_set]]), axis=0) if subtract_mean else 0.0
+        dist = pair_evaluation.distance(embeddings1-mean, embeddings2-mean, distance_metric)
+        far_train = np.zeros(len(thresholds))
+        for threshold_idx, threshold in enumerate(thresholds):
+            _, far_train[threshold_idx] = legacy_val_far(threshold, dist[train_set], actual_issame[train_set])
+        threshold = pair_evaluation.threshold_at_far(thresholds, far_train, far_target)
+        val[fold_idx], far[fold_idx] = legacy_val_far(threshold, dist[test_set], actual_issame[test_set])
+    return np.mean(val), np.std(val), np.mean(far)
+
+class PairEvaluationTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        nrof_pairs, embedding_size = 600, 32
+        self.actual_issame = np.random.rand(nrof_pairs) < 0.5
+        emb1 = np.random.randn(nrof_pairs, embedding_size)
+        noise = np.random.randn(nrof_pairs, embedding_size)
+        emb2 = np.where(self.actual_issame[:, np.newaxis], emb1 + 0.8 * noise, noise)
+        normalize = lambda x: (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+        self.embeddings1, self.embeddings2 = normalize(emb1), normalize(emb2)
+        self.thresholds = np.arange(0, 4, 0.01)
+
+    def testRocMatchesLegacy(self):
+        for distance_metric, thresholds in ((0, self.thresholds), (1, np.arange(0, 1, 0.0025))):
+            for subtract_mean in (False, True):
+                args = (thresholds, self.embeddings1, self.embeddings2, self.actual_issame)
+                kwargs = dict(nrof_folds=10, distance_metric=distance_metric, subtract_mean=subtract_mean)
+                for new, old in zip(pair_evaluation.calculate_roc(*args, **kwargs), legacy_roc(*args, **kwargs)):
+                    np.testing.assert_array_equal(new, old)
+
+    def testValFarLoopMatchesLegacy(self):
+        for far_target in (1e-3, 1e-2, 0.1):
+            for subtract_mean in (False, True):
+                args = (self.thresholds, self.embeddings1, self.embeddings2, self.actual_issame, far_target)
+                self.assertEqual(pair_evaluation.calculate_val(*args, subtract_mean=subtract_mean),
+                                 legacy_val(*args, subtract_mean=subtract_mean))
+
+    def testThresholdAtFarMatchesInterp1d(self):
+        thresholds = np.arange(0, 4, 0.01)
+        far = np.sort(np.random.rand(len(thresholds)))
+        self.assertEqual(len(np.unique(far)), len(far))
+        for far_target in (far[0], 1e-2, 0.1, 0.5, far[-1], 2.0):
+            np.testing.assert_array_equal(pair_evaluation.threshold_at_far(thresholds, far, far_target),
+                                          legacy_interpolated_threshold(thresholds, far, far_target))
+
+    def testSortedPairsCounts(self):
+        dist = pair_evaluation.distance(self.embeddings1, self.embeddings2)
+        pairs = pair_evaluation.SortedPairs.from_pairs(dist, self.actual_issame)
+        tpr, fpr, acc = pairs.accuracy(self.thresholds)
+        for i in range(0, len(self.thresholds), 37):
+            self.assertEqual((tpr[i], fpr[i], acc[i]), legacy_accuracy(self.thresholds[i], dist, self.actual_issame))
+        val, far = pairs.val_far(self.thresholds[::37])
+        for i, threshold in enumerate(self.thresholds[::37]):
+            self.assertEqual((val[i], far[i]), legacy_val_far(threshold, dist, self.actual_issame))
+
+    def testTiesAtThreshold(self):
+        dist = np.array([0.5, 0.5, 1.0, 1.0, 2.0], dtype=np.float32)
+        issame = np.array([True, False, True, False, False])
+        tp, fp = pair_evaluation.SortedPairs.from_pairs(dist, issame).counts([0.5, 1.0, 1.5, 3.0])
+        np.testing.assert_array_equal(tp, [0, 1, 2, 2])
+        np.testing.assert_array_equal(fp, [0, 1, 2, 3])
+
+    def testValFarOneSidedPairs(self):
+        dist = np.array([0.5, 1.0, 2.0])
+        val, far = pair_evaluation.SortedPairs.from_pairs(dist, np.array([False, False, False])).val_far([1.5, 3.0])
+        np.testing.assert_array_equal(val, [0, 0])
+        np.testing.assert_array_equal(far, [2 / 3.0, 1])
+        val, far = pair_evaluation.SortedPairs.from_pairs(dist, np.array([True, True, True])).val_far([1.5, 3.0])
+        np.testing.assert_array_equal(val, [2 / 3.0, 1])
+        np.testing.assert_array_equal(far, [0, 0])
+
+if __name__ == "__main__":
+    unittest.main()
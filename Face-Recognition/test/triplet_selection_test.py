@@ -0,0 +1,97 @@
+# MIT License
+# 
+# Copyright (c) 2016 David Sandberg
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest
+import numpy as np
+import triplet_selection
+
+class TripletSelectionTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(seed=666)
+        self.alpha = 2.0
+        self.layout([4, 3, 5, 2, 4])
+
+    def layout(self, nrof_images_per_class):
+        self.nrof_images_per_class = nrof_images_per_class
+        labels = np.repeat(np.arange(len(self.nrof_images_per_class)), self.nrof_images_per_class)
+        centers = np.random.normal(size=(len(self.nrof_images_per_class), 16))
+        self.labels = labels
+        self.emb = centers[labels] + np.random.normal(scale=0.8, size=(labels.shape[0], 16))
+
+    def candidates(self, semihard=False, people_per_batch=None):
+        """Valid negatives per (anchor, positive) pair as found by the original per-pair loop"""
+        result = []
+        emb_start_idx = 0
+        for nrof_images in self.nrof_images_per_class[:people_per_batch]:
+            for j in range(1, nrof_images):
+                a_idx = emb_start_idx + j - 1
+                neg_dists_sqr = np.sum(np.square(self.emb[a_idx] - self.emb), 1)
+                neg_dists_sqr[emb_start_idx:emb_start_idx+nrof_images] = np.nan
+                for pair in range(j, nrof_images):
+                    p_idx = emb_start_idx + pair
+                    pos_dist_sqr = np.sum(np.square(self.emb[a_idx]-self.emb[p_idx]))
+                    with np.errstate(invalid='ignore'):
+                        valid = neg_dists_sqr-pos_dist_sqr<self.alpha
+                        if semihard:
+                            valid &= pos_dist_sqr<neg_dists_sqr
+                    result.append((a_idx, p_idx, set(np.where(valid)[0]), neg_dists_sqr))
+            emb_start_idx += nrof_images
+        return result
+
+    def testRandomMatchesLoop(self):
+        for strategy in ('random', 'semihard'):
+            expected = self.candidates(semihard=strategy=='semihard')
+            triplets, nrof_pairs = triplet_selection.mine_triplets(self.emb, self.nrof_images_per_class, self.alpha, strategy=strategy)
+            self.assertEqual(nrof_pairs, len(expected))
+            expected = [(a, p, negs) for a, p, negs, _ in expected if negs]
+            self.assertEqual(len(triplets), len(expected))
+            for (a, p, n), (a_exp, p_exp, negs) in zip(triplets, expected):
+                self.assertEqual((a, p), (a_exp, p_exp))
+                self.assertIn(n, negs)
+
+    def testShortClassKeepsNegatives(self):
+        # sample_people with 3 people of 4 images: the second person has only 2, so a fourth fills the batch
+        self.layout([4, 2, 4, 2])
+        # The fourth person looks like the first, so they are its hardest negatives
+        self.emb[10:12] = self.emb[0:2] + np.random.normal(scale=0.1, size=(2, 16))
+        expected = self.candidates(people_per_batch=3)
+        triplets, nrof_pairs = triplet_selection.mine_triplets(self.emb, self.nrof_images_per_class, self.alpha,
+                                                               strategy='hard', nrof_anchor_classes=3)
+        self.assertEqual(nrof_pairs, len(expected))
+        self.assertEqual([tuple(t) for t in triplets],
+                         [(a, p, min(negs, key=lambda n: dists[n])) for a, p, negs, dists in expected if negs])
+        self.assertTrue(np.all(triplets[:, 0] < 10))
+        self.assertTrue(np.any(triplets[:, 2] >= 10))
+
+    def testHardPicksClosestNegative(self):
+        expected = [(a, p, min(negs, key=lambda n: dists[n])) for a, p, negs, dists in self.candidates() if negs]
+        triplets, _ = triplet_selection.mine_triplets(self.emb, self.nrof_images_per_class, self.alpha, strategy='hard')
+        self.assertEqual([tuple(t) for t in triplets], expected)
+
+    def testSeededSelectionIsReproducible(self):
+        first, _ = triplet_selection.mine_triplets(self.emb, self.nrof_images_per_class, self.alpha, rng=np.random.RandomState(1))
+        second, _ = triplet_selection.mine_triplets(self.emb, self.nrof_images_per_class, self.alpha, rng=np.random.RandomState(1))
+        np.testing.assert_array_equal(first, second)
+
+if __name__ == "__main__":
+    unittest.main()